@@ -110,6 +110,10 @@ class BGPAgent:
 }
 """
 
+    def close(self):
+        """释放工具箱持有的连接（图分析后端的共享驱动引用）"""
+        self.toolkit.close()
+
     async def _call_llm(self, messages):
         """调用 DeepSeek API (JSON 模式)"""
         try:
@@ -404,7 +408,7 @@ class BGPAgent:
             if tool_req:
                 if verbose: print(f"🛠️  Agent 调用工具: {tool_req}")
                 
-                tool_output = self.toolkit.call_tool(tool_req, alert_context)
+                tool_output = await self.toolkit.acall_tool(tool_req, alert_context)
                 step_record["tool_output"] = tool_output
                 trace["chain_of_thought"].append(step_record)
                 
@@ -596,7 +600,7 @@ class BGPAgent:
             if tool_req:
                 if verbose:
                     print(f"🛠️  Agent 调用工具: {tool_req}")
-                tool_output = self.toolkit.call_tool(tool_req, alert_batch, is_batch=True)
+                tool_output = await self.toolkit.acall_tool(tool_req, alert_batch, is_batch=True)
                 self._update_tool_evidence(tool_evidence, tool_req, tool_output)
                 step_record["tool_output"] = tool_output
                 trace["chain_of_thought"].append(step_record)
@@ -706,3 +710,4 @@ if __name__ == "__main__":
             "expected_origin": "15169"
         }
         asyncio.run(agent.diagnose(test_case, verbose=True))
+    agent.close()
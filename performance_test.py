@@ -14,6 +14,7 @@ import sys
 from bgp_agent import BGPAgent
 from tabulate import tabulate
 from tools.project_paths import EVENTS_DIR, TEST_CASES_FILE
+from tools.event_store import load_events
 
 try:
     from tqdm import tqdm
@@ -47,24 +48,8 @@ def load_local_events(events_dir=EVENTS_DIR):
         return []
 
     cases = []
-    for name in sorted(os.listdir(events_dir)):
-        ev_dir = os.path.join(events_dir, name)
-        if not os.path.isdir(ev_dir):
-            continue
-        meta_path = os.path.join(ev_dir, "meta.json")
-        updates_path = os.path.join(ev_dir, "suspicious_updates.json")
-        if not os.path.exists(meta_path) or not os.path.exists(updates_path):
-            continue
-
-        try:
-            with open(meta_path, "r", encoding="utf-8") as f:
-                meta = json.load(f)
-            with open(updates_path, "r", encoding="utf-8") as f:
-                updates = json.load(f)
-        except Exception as e:
-            print(f"   ⚠️ 读取 {name} 失败: {e}")
-            continue
-
+    # 兼容列式事件库（event_index.json + event_updates.npz）与逐事件 JSON 目录
+    for _, meta, updates in load_events(events_dir):
         if not updates:
             continue
 
@@ -240,6 +225,7 @@ async def main():
     print(f"\n⚡ 开始 {len(cases)} 轮测试 [{mode}] (真值 vs 系统判定)...\n")
 
     await run_benchmark(cases, agent, results_table, correct_count_ref)
+    agent.close()
 
     # 4. 输出报告
     print("\n" + "=" * 110)
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+进程内 AS 关系图基准：合成分层 AS 拓扑（Tier-1 全互联 + 多级 transit + stub，含 peer 与 sibling），
+写成 CAIDA serial-2 文件后加载为 tools/as_graph.py 的 ASGraph，
+用字典邻接表的参考实现比对最短路径长度、路径合法性与关系，输出加载耗时与各类查询的单次耗时；
+最后确认 BGPToolKit(graph_backend="local") 的 graph_analysis 走 CSR 后端。
+
+也可用 --as-rel 指定真实 CAIDA 文件（如 scripts/fetch_as_relationships.py 的输出）只做计时。
+
+使用: python scripts/bench_as_graph.py [--nodes 75000] [--queries 20000] [--check 2000] [--as-rel 20240101.as-rel2.txt.bz2]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_common import compare, make_as_rel, per_op, reference_graph, write_as_rel
+from tools import as_graph
+from tools.as_graph import ASGraph
+
+
+def reference_distance(adj, src, dst, max_hops):
+    if src == dst:
+        return 0
+    dist = {src: 0}
+    q = deque([src])
+    while q:
+        u = q.popleft()
+        if dist[u] >= max_hops:
+            continue
+        for v in adj[u]:
+            if v not in dist:
+                dist[v] = dist[u] + 1
+                if v == dst:
+                    return dist[v]
+                q.append(v)
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="进程内 AS 关系图基准")
+    parser.add_argument("--nodes", type=int, default=75_000, help="合成 AS 数")
+    parser.add_argument("--queries", type=int, default=20_000, help="计时查询数")
+    parser.add_argument("--check", type=int, default=2000, help="与参考实现比对的查询数（0 关闭）")
+    parser.add_argument("--as-rel", help="真实 CAIDA AS-relationship 文件（只计时，不比对）")
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    if args.as_rel:
+        path = args.as_rel
+        edges = None
+    else:
+        edges = make_as_rel(args.nodes)
+        path = os.path.join(tmp.name, "20240101.as-rel2.txt")
+        write_as_rel(path, edges)
+
+    t0 = time.perf_counter()
+    graph = ASGraph.load(path)
+    print(f"加载 {os.path.basename(path)}: {graph.stats()}，{time.perf_counter() - t0:.2f}s")
+
+    rnd = random.Random(42)
+    nodes = [str(a) for a in graph.asns]
+    pairs = [(rnd.choice(nodes), rnd.choice(nodes)) for _ in range(args.queries)]
+    per_op("最短路径", graph.shortest_path, pairs)
+    per_op("关系查询", graph.relationship, pairs)
+    per_op("邻居列表", graph.neighbors, [(a,) for a, _ in pairs])
+
+    ok = True
+    if edges is not None and args.check > 0:
+        adj = reference_graph(edges)
+
+        def want(pair):
+            src, dst = pair
+            return reference_distance(adj, src, dst, as_graph.DEFAULT_MAX_HOPS), adj[src].get(dst), True
+
+        def got(pair):
+            src, dst = pair
+            found = graph.shortest_path(src, dst)
+            valid = found is None or all(b in adj[a] for a, b in zip(found, found[1:]))
+            same_nbrs = graph.neighbors(src) == sorted(adj[src], key=int)
+            return (len(found) - 1 if found else None), graph.relationship(src, dst), valid and same_nbrs
+
+        # (距离, 关系, 路径合法且邻居一致)；再抽查相邻对的关系（随机对几乎都不相邻）
+        mismatches = compare(pairs[: args.check], want, got, "ASGraph", lambda p: f"AS{p[0]} -> AS{p[1]}")
+        mismatches += compare(
+            rnd.sample(edges, min(args.check, len(edges))),
+            lambda e: (adj[str(e[0])][str(e[1])], adj[str(e[1])][str(e[0])]),
+            lambda e: (graph.relationship(e[0], e[1]), graph.relationship(e[1], e[0])),
+            "ASGraph", lambda e: f"AS{e[0]} - AS{e[1]}",
+        )
+        ok = mismatches == 0
+
+        from tools.bgp_toolkit import BGPToolKit
+        as_graph.set_default_as_rel(path)
+        toolkit = BGPToolKit(graph_backend="local")
+        a, b, _ = next(e for e in edges if e[2] == -1)
+        far = next(s for s, d in pairs if s != str(a) and str(a) not in adj[s])
+        ctx = {"prefix": "192.0.2.0/24", "as_path": f"3356 {far}", "expected_origin": str(a)}
+        report = toolkit.call_tool("graph_analysis", ctx)
+        print(report)
+        ok &= report.startswith(("GRAPH_SUSPICIOUS", "GRAPH_ANOMALY"))
+        as_graph.set_default_as_rel(None)
+    tmp.cleanup()
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+基准 / 检查脚本的公共部分（不单独运行）：
+- 合成数据：分层 AS 关系拓扑（CAIDA serial-2）、VRP 导出
+- 与参考实现逐条比对：打印前几条不一致（❌）与汇总，返回不一致数
+- 计时：整体耗时（ms）与单次耗时（µs/次）
+"""
+import time
+import random
+from typing import Callable, Iterable, List, Optional, Sequence, Tuple
+
+
+# ---- 计时 ----
+
+def timed(label: str, fn: Callable):
+    """执行一次 fn，打印耗时（ms），返回 fn 的结果"""
+    t0 = time.perf_counter()
+    result = fn()
+    print(f"{label}: {(time.perf_counter() - t0) * 1000:.1f} ms")
+    return result
+
+
+def per_op(label: str, fn: Callable, items: Sequence[tuple]) -> float:
+    """对每个参数元组调用一次 fn，打印总耗时与 µs/次，返回总耗时（秒）"""
+    t0 = time.perf_counter()
+    for item in items:
+        fn(*item)
+    elapsed = time.perf_counter() - t0
+    print(f"{label}: {len(items)} 次 {elapsed:.3f}s，{elapsed / max(1, len(items)) * 1e6:.2f} µs/次")
+    return elapsed
+
+
+# ---- 参考实现比对 ----
+
+def compare(items: Iterable, want: Callable, got: Callable, name: str,
+            describe: Callable = str, equal: Optional[Callable] = None, show: int = 5) -> int:
+    """
+    逐条比对 want(item) 与 got(item)，打印前 show 条不一致与汇总，返回不一致数。
+    equal(want, got) 自定义判等（默认 ==）；describe(item) 生成不一致行的标签。
+    """
+    n = mismatches = 0
+    for item in items:
+        n += 1
+        w, g = want(item), got(item)
+        if not (equal(w, g) if equal else w == g):
+            mismatches += 1
+            if mismatches <= show:
+                print(f"❌ {describe(item)}: 参考 {w}，{name} {g}")
+    print(f"参考实现比对 {n} 条，不一致 {mismatches}")
+    return mismatches
+
+
+# ---- 合成 AS 关系拓扑 ----
+
+def make_as_rel(n: int, seed: int = 41) -> List[Tuple[int, int, int]]:
+    """
+    合成分层 AS 拓扑（Tier-1 全互联 + 多级 transit + stub，含 peer 与 sibling）：
+    [(as1, as2, rel)]，rel=-1 表示 as1 是 as2 的 provider
+    """
+    rnd = random.Random(seed)
+    asns = rnd.sample(range(1, 400000), n)
+    n_t1 = min(15, n)
+    n_transit = max(n_t1, n // 8)
+    tier1, transit, stubs = asns[:n_t1], asns[n_t1:n_transit], asns[n_transit:]
+    edges, seen = [], set()
+
+    def add(a, b, rel):
+        key = (min(a, b), max(a, b))
+        if a != b and key not in seen:
+            seen.add(key)
+            edges.append((a, b, rel))
+
+    for i, a in enumerate(tier1):
+        for b in tier1[i + 1:]:
+            add(a, b, 0)
+    # transit 按层级依次接入：provider 只从更早接入的 AS 中选，保证无 provider 环
+    upstream = list(tier1)
+    for a in transit:
+        for p in rnd.sample(upstream, min(len(upstream), rnd.choice((1, 2, 2, 3)))):
+            add(p, a, -1)
+        upstream.append(a)
+    for a in transit:
+        for _ in range(rnd.choice((0, 1, 2, 4))):
+            add(a, rnd.choice(transit), 0)
+    for a in stubs:
+        for p in rnd.sample(transit or tier1, min(len(transit or tier1), rnd.choice((1, 1, 2)))):
+            add(p, a, -1)
+        if rnd.random() < 0.01:
+            add(a, rnd.choice(stubs), 1)
+    return edges
+
+
+def write_as_rel(path: str, edges) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("# source:synthetic\n")
+        for a, b, rel in edges:
+            f.write(f"{a}|{b}|{rel}|synthetic\n")
+
+
+def reference_graph(edges):
+    """参考实现：{asn: {neighbor: 站在 asn 看 neighbor 的角色}}"""
+    adj = {}
+    for a, b, rel in edges:
+        a, b = str(a), str(b)
+        if rel == -1:
+            adj.setdefault(a, {})[b] = "customer"
+            adj.setdefault(b, {})[a] = "provider"
+        else:
+            role = "peer" if rel == 0 else "sibling"
+            adj.setdefault(a, {})[b] = role
+            adj.setdefault(b, {})[a] = role
+    return adj
+
+
+# ---- 合成 VRP ----
+
+def make_vrps(n: int, seed: int = 11) -> List[Tuple[str, str, int]]:
+    """合成 VRP：长度分布接近真实 ROA（IPv4 以 /24、/22 为主，IPv6 /32-/48），部分 maxLength 放宽，含 MOAS 与 AS0 ROA"""
+    import ipaddress
+
+    rnd = random.Random(seed)
+    out = []
+    for _ in range(n):
+        if rnd.random() < 0.8:
+            length = rnd.choice((24, 24, 24, 24, 24, 23, 22, 22, 21, 20, 19, 16, 12))
+            net = ipaddress.IPv4Network((rnd.getrandbits(32) >> (32 - length) << (32 - length), length))
+            max_length = min(32, length + rnd.choice((0, 0, 0, 1, 2, 4, 8)))
+        else:
+            length = rnd.choice((29, 32, 32, 36, 40, 44, 48, 48))
+            net = ipaddress.IPv6Network((rnd.getrandbits(128) >> (128 - length) << (128 - length), length))
+            max_length = min(128, length + rnd.choice((0, 0, 4, 8, 16)))
+        asn = "0" if rnd.random() < 0.01 else str(rnd.randint(1, 400000))
+        out.append((f"AS{asn}", str(net), max_length))
+        if rnd.random() < 0.05:
+            out.append((f"AS{rnd.randint(1, 400000)}", str(net), max_length))
+    return out
+
+
+def write_vrp_csv(path: str, vrps) -> None:
+    """routinator vrps -f csv 格式"""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("ASN,IP Prefix,Max Length,Trust Anchor\n")
+        for asn, prefix, max_length in vrps:
+            f.write(f"{asn},{prefix},{max_length},synthetic\n")
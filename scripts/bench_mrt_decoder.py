@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+MRT 解码基准：对比 mrtparse 全量解析与 tools/mrt_fast.py 快速解码。
+
+对同一批 MRT 文件分别运行 _parse_mrt_file_multi(fast=False / fast=True)，
+校验两者输出完全一致，并输出每秒处理的 MRT 记录数与加速比。
+未指定文件时生成一个合成夹具（覆盖 AS4 / 2 字节 + AS4_PATH / AS_SET / BGP4MP_ET /
+IPv6 会话 / withdrawn / ADD-PATH 回退 / STATE_CHANGE 等记录形态）。
+
+使用: python scripts/bench_mrt_decoder.py [files ...] [--records 200000] [--targets 8.8.8.0/24]
+"""
+import os
+import sys
+import gzip
+import time
+import random
+import struct
+import socket
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.mrt_io import open_mrt
+from tools.ris_mrt_fetcher import _parse_mrt_file_multi
+from tools.mrt_fast import AS_TRANS
+from check_common import bgp4mp_update, mrt_record
+
+DEFAULT_TARGETS = "8.8.8.0/24,104.244.42.0/24,208.65.152.0/22"
+_HOT = [("8.8.8.0", 24), ("8.8.0.0", 16), ("104.244.42.0", 24), ("208.65.153.0", 24)]
+
+
+def write_synthetic_mrt(path, records, seed=11):
+    """生成合成 BGP4MP updates 文件（gzip）"""
+    rnd = random.Random(seed)
+    ts0 = 1396339200
+    transit = [3356, 174, 1299, 2914, 6939, 4761, 9498, 396982, 4200000001]
+    origins = [15169, 15169, 13414, 36692, 17557, 4761]
+
+    def rand_pfx():
+        if rnd.random() < 0.08:
+            return rnd.choice(_HOT)
+        ln = rnd.choice((16, 20, 22, 23, 24, 24, 24))
+        a = rnd.getrandbits(32) & ~((1 << (32 - ln)) - 1)
+        return socket.inet_ntoa(struct.pack("!I", a)), ln
+
+    out = []
+    for i in range(records):
+        ts = ts0 + i % 300
+        r = rnd.random()
+        if r < 0.02:
+            # STATE_CHANGE_AS4
+            body = struct.pack("!IIHH", 65000, 65001, 0, 1) + os.urandom(8) + struct.pack("!HH", 1, 6)
+            out.append(mrt_record(ts, 5, body))
+            continue
+        # 同一 UPDATE 内前缀不重复（重复前缀会触发 mrtparse 的 ADD-PATH 猜测逻辑而误解析）
+        nlri = list(dict.fromkeys(rand_pfx() for _ in range(rnd.choice((0, 1, 1, 1, 2, 3)))))
+        withdrawn = list(dict.fromkeys(rand_pfx() for _ in range(rnd.choice((0, 0, 0, 1, 2)))))
+        as_path = [rnd.choice(transit) for _ in range(rnd.randint(1, 4))] + [rnd.choice(origins)]
+        segs = [(2, as_path)]
+        if rnd.random() < 0.03:
+            segs.append((1, [rnd.choice(origins)] if rnd.random() < 0.5 else [64512, 64513]))
+        if r < 0.70:
+            out.append(bgp4mp_update(ts, rnd, 4, nlri, withdrawn, segs, et=rnd.random() < 0.1))
+        elif r < 0.85:
+            # 2 字节会话：4 字节 AS 被替换为 AS_TRANS，真实值放在 AS4_PATH
+            segs2 = [(t, [a if a < 65536 else AS_TRANS for a in asns]) for t, asns in segs]
+            as4 = segs if any(a >= 65536 for _, asns in segs for a in asns) else None
+            out.append(bgp4mp_update(ts, rnd, 1, nlri, withdrawn, segs2, as4_segs=as4))
+        elif r < 0.95:
+            out.append(bgp4mp_update(ts, rnd, 7, nlri, withdrawn, segs, v6_peer=True))
+        else:
+            out.append(bgp4mp_update(ts, rnd, 9, nlri, withdrawn, segs, addpath=True))
+    with gzip.open(path, "wb") as f:
+        f.write(b"".join(out))
+
+
+def count_records(path):
+    n = 0
+    with open_mrt(path) as f:
+        while True:
+            hdr = f.read(12)
+            if len(hdr) < 12:
+                return n
+            f.seek(struct.unpack("!I", hdr[8:12])[0], os.SEEK_CUR)
+            n += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="mrtparse vs mrt_fast 解码基准")
+    parser.add_argument("files", nargs="*", help="MRT 文件（updates.*.gz），为空则生成合成夹具")
+    parser.add_argument("--records", type=int, default=200_000, help="合成夹具记录数")
+    parser.add_argument("--targets", default=DEFAULT_TARGETS, help="目标前缀，逗号分隔")
+    parser.add_argument("--repeat", type=int, default=1, help="重复次数，取最快一次")
+    args = parser.parse_args()
+
+    targets = [t.strip() for t in args.targets.split(",") if t.strip()]
+    files = list(args.files)
+    tmp_dir = None
+    if not files:
+        tmp_dir = tempfile.mkdtemp(prefix="bench_mrt_")
+        fixture = os.path.join(tmp_dir, "updates.synthetic.gz")
+        print(f"生成合成夹具: {args.records} 条记录 -> {fixture}")
+        write_synthetic_mrt(fixture, args.records)
+        files = [fixture]
+
+    total_records = sum(count_records(f) for f in files)
+    timings = {}
+    outputs = {}
+    for label, fast in (("mrtparse", False), ("mrt_fast", True)):
+        best = None
+        for _ in range(max(1, args.repeat)):
+            t0 = time.perf_counter()
+            result = [_parse_mrt_file_multi(f, targets, fast=fast) for f in files]
+            elapsed = time.perf_counter() - t0
+            best = elapsed if best is None else min(best, elapsed)
+        timings[label] = best
+        outputs[label] = result
+
+    same = outputs["mrtparse"] == outputs["mrt_fast"]
+    matched = sum(len(v) for per_file in outputs["mrt_fast"] for v in per_file.values())
+    # 末段为多成员 AS_SET 的 update 整体保留为一跳 "{a,b}"，且不给出唯一 Origin
+    as_set = [u for per_file in outputs["mrt_fast"] for v in per_file.values() for u in v
+              if u["as_path"].endswith("}")]
+    same &= all(u["detected_origin"] == "" for u in as_set)
+    print(f"末段多成员 AS_SET 的 updates: {len(as_set)}（均无唯一 Origin: {same}）")
+    print(f"文件 {len(files)} 个 | MRT 记录 {total_records} | 命中 updates {matched}")
+    print(f"{'解码器':<12}{'耗时(s)':>10}{'记录/s':>14}")
+    for label in ("mrtparse", "mrt_fast"):
+        print(f"{label:<12}{timings[label]:>10.2f}{total_records / timings[label]:>14,.0f}")
+    print(f"加速比: {timings['mrtparse'] / timings['mrt_fast']:.1f}x | 输出一致: {same}")
+
+    if tmp_dir:
+        for name in os.listdir(tmp_dir):
+            os.unlink(os.path.join(tmp_dir, name))
+        os.rmdir(tmp_dir)
+    if not same:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
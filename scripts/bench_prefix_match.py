@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+前缀匹配微基准：对比 ris_mrt_fetcher._prefix_matches（逐条 ipaddress）与 PrefixIndex（整数 trie）。
+
+合成 NLRI 流（默认 100 万条，IPv4 为主、少量 IPv6，按比例混入目标前缀的子/超前缀），
+分别跑两种匹配并校验命中结果一致。
+
+使用: python scripts/bench_prefix_match.py [--count 1000000] [--seed 7]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.ris_mrt_fetcher import _prefix_matches
+from tools.prefix_index import PrefixIndex
+
+DEFAULT_TARGETS = ["8.8.8.0/24", "104.244.42.0/24", "208.65.152.0/22", "2001:4860::/32"]
+
+
+def synth_nlri(count, seed, hit_ratio=0.05):
+    """生成 (addr, length) 列表；hit_ratio 比例落在目标前缀附近"""
+    rnd = random.Random(seed)
+    near = [("8.8.8.0", 24), ("8.8.0.0", 16), ("8.8.8.128", 25), ("104.244.40.0", 21),
+            ("208.65.153.0", 24), ("2001:4860:4860::", 48), ("2001:4800::", 21)]
+    out = []
+    for _ in range(count):
+        r = rnd.random()
+        if r < hit_ratio:
+            out.append(near[rnd.randrange(len(near))])
+        elif r < 0.92:
+            ln = rnd.choice((16, 19, 20, 22, 23, 24, 24, 24))
+            addr = rnd.getrandbits(32) & ~((1 << (32 - ln)) - 1)
+            out.append((f"{addr >> 24}.{(addr >> 16) & 255}.{(addr >> 8) & 255}.{addr & 255}", ln))
+        else:
+            ln = rnd.choice((32, 40, 44, 48, 48))
+            groups = [rnd.getrandbits(16) for _ in range(ln // 16)]
+            out.append((":".join(f"{g:x}" for g in groups) + "::", ln))
+    return out
+
+
+def bench_legacy(stream, targets):
+    hits = 0
+    t0 = time.perf_counter()
+    for addr, ln in stream:
+        full = f"{addr}/{ln}"
+        for t in targets:
+            if _prefix_matches(full, t):
+                hits += 1
+    return hits, time.perf_counter() - t0
+
+
+def bench_index(stream, targets):
+    index = PrefixIndex(targets)
+    hits = 0
+    t0 = time.perf_counter()
+    for addr, ln in stream:
+        hits += len(index.match(addr, ln))
+    return hits, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PrefixIndex vs ipaddress 前缀匹配微基准")
+    parser.add_argument("--count", type=int, default=1_000_000, help="合成 NLRI 条数")
+    parser.add_argument("--seed", type=int, default=7, help="随机种子")
+    parser.add_argument("--targets", default=",".join(DEFAULT_TARGETS), help="目标前缀，逗号分隔")
+    args = parser.parse_args()
+
+    targets = [t.strip() for t in args.targets.split(",") if t.strip()]
+    print(f"生成 {args.count} 条合成 NLRI，目标前缀 {len(targets)} 个 ...")
+    stream = synth_nlri(args.count, args.seed)
+
+    legacy_hits, legacy_sec = bench_legacy(stream, targets)
+    index_hits, index_sec = bench_index(stream, targets)
+
+    print(f"{'方法':<16}{'命中':>10}{'耗时(s)':>12}{'NLRI/s':>14}")
+    print(f"{'ipaddress':<16}{legacy_hits:>10}{legacy_sec:>12.2f}{args.count / legacy_sec:>14,.0f}")
+    print(f"{'PrefixIndex':<16}{index_hits:>10}{index_sec:>12.2f}{args.count / index_sec:>14,.0f}")
+    print(f"加速比: {legacy_sec / index_sec:.1f}x | 结果一致: {legacy_hits == index_hits}")
+    if legacy_hits != index_hits:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+离线 RPKI 校验基准：合成 VRP 导出（CSV / JSON），加载为 tools/rpki_vrp.py 的 VRPTable，
+用基于 ipaddress 的逐条 RFC 6811 参考实现校验分类结果，并输出加载耗时与单次查询耗时。
+
+也可用 --vrp-file 指定真实导出（如 routinator vrps -f csv / rpki-client -j 的输出）只做计时。
+
+使用: python scripts/bench_rpki_vrp.py [--vrps 300000] [--queries 100000] [--check 3000] [--vrp-file vrps.csv]
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import ipaddress
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_common import compare, make_vrps, per_op, write_vrp_csv
+from tools.rpki_vrp import VRPTable, iter_vrp_file
+
+
+def make_queries(vrps, n: int, seed: int = 12):
+    """查询：多数落在某个 VRP 内（Origin 取 VRP 的 ASN 或随机），其余为随机前缀"""
+    rnd = random.Random(seed)
+    out = []
+    for _ in range(n):
+        if rnd.random() < 0.7:
+            asn, prefix, max_length = rnd.choice(vrps)
+            net = ipaddress.ip_network(prefix)
+            bits = net.max_prefixlen
+            length = min(bits, net.prefixlen + rnd.choice((0, 0, 1, 2, 4, 8, 9)))
+            addr = int(net.network_address) | (rnd.getrandbits(bits - net.prefixlen) if bits > net.prefixlen else 0)
+            sub = ipaddress.ip_network((addr >> (bits - length) << (bits - length), length))
+            origin = asn[2:] if rnd.random() < 0.6 else str(rnd.randint(1, 400000))
+            out.append((str(sub), origin))
+        else:
+            length = rnd.choice((16, 20, 24))
+            out.append((str(ipaddress.IPv4Network((rnd.getrandbits(32) >> (32 - length) << (32 - length), length))),
+                        str(rnd.randint(1, 400000))))
+    return out
+
+
+def reference_status(vrps_by_net, prefix: str, origin: str) -> str:
+    """RFC 6811 逐条参考实现（ipaddress 逐层取超网）"""
+    net = ipaddress.ip_network(prefix)
+    covering = []
+    for length in range(net.prefixlen, -1, -1):
+        covering.extend(vrps_by_net.get(net.supernet(new_prefix=length), ()))
+    if not covering:
+        return "unknown"
+    same_asn = [m for asn, m in covering if asn == origin and asn != "0"]
+    if any(net.prefixlen <= m for m in same_asn):
+        return "valid"
+    return "invalid_length" if same_asn else "invalid_asn"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="离线 RPKI VRP 校验基准")
+    parser.add_argument("--vrps", type=int, default=300_000, help="合成 VRP 条数")
+    parser.add_argument("--queries", type=int, default=100_000, help="计时查询数")
+    parser.add_argument("--check", type=int, default=3000, help="与参考实现比对的查询数（0 关闭）")
+    parser.add_argument("--vrp-file", help="真实 VRP 导出文件（只计时，不比对）")
+    args = parser.parse_args()
+
+    tmp = None
+    if args.vrp_file:
+        files = [args.vrp_file]
+        vrps = None
+    else:
+        vrps = make_vrps(args.vrps)
+        tmp = tempfile.TemporaryDirectory()
+        csv_path = os.path.join(tmp.name, "vrps.csv")
+        write_vrp_csv(csv_path, vrps)
+        json_path = os.path.join(tmp.name, "vrps.json")
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump({"roas": [{"asn": a, "prefix": p, "maxLength": m, "ta": "synthetic"} for a, p, m in vrps]}, f)
+        files = [csv_path, json_path]
+
+    tables = []
+    for path in files:
+        t0 = time.perf_counter()
+        table = VRPTable.load(path)
+        print(f"加载 {os.path.basename(path)}: {len(table)} 条 VRP（跳过 {table.meta['skipped']}）{time.perf_counter() - t0:.2f}s")
+        tables.append(table)
+    table = tables[0]
+
+    if vrps is None:
+        # 真实导出：以其中的 VRP 自身（及随机 Origin）作为查询
+        rnd = random.Random(12)
+        rows = [(p, str(a)) for a, p, _ in iter_vrp_file(args.vrp_file) if a is not None and p is not None]
+        queries = []
+        for _ in range(args.queries):
+            prefix, asn = rnd.choice(rows)
+            queries.append((prefix, asn if rnd.random() < 0.6 else str(rnd.randint(1, 400000))))
+    else:
+        queries = make_queries(vrps, args.queries)
+    per_op("status 查询", table.status, queries)
+    print(f"分类分布: {dict(Counter(table.status(p, o) for p, o in queries))}")
+
+    mismatches = 0
+    if vrps is not None and args.check > 0:
+        by_net = {}
+        for asn, prefix, max_length in vrps:
+            by_net.setdefault(ipaddress.ip_network(prefix), []).append((asn[2:], max_length))
+        # CSV / JSON 两个表都要与参考一致
+        mismatches = compare(
+            queries[: args.check], lambda q: reference_status(by_net, *q), lambda q: [t.status(*q) for t in tables],
+            "VRPTable", lambda q: f"{q[0]} AS{q[1]}", equal=lambda want, got: all(g == want for g in got),
+        )
+    if tmp is not None:
+        tmp.cleanup()
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
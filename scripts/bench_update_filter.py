@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+BGPlay 可疑 update 过滤基准：对比逐跳重复解析的旧实现与单次解析的 filter_suspicious_updates。
+
+生成合成 BGPlay 响应（initial_state + events，含 Tier1 谷形路径、MOAS、AS 前置重复、
+字符串 / 列表两种 path 形态），分别运行两种实现，校验输出一致并输出每秒处理的事件数。
+
+使用: python scripts/bench_update_filter.py [--events 100000] [--max-len 12] [--repeat 3]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.config_loader import get_tier1_asns
+from tools.update_fetcher import _parse_path, filter_suspicious_updates
+
+PREFIX = "8.8.8.0/24"
+EXPECTED = "15169"
+
+
+def make_payload(events: int, max_len: int, seed: int = 7) -> dict:
+    """合成 BGPlay data：约 1% 为 initial_state，其余为 events"""
+    rnd = random.Random(seed)
+    tier1 = sorted(get_tier1_asns()) or ["3356", "174", "1299"]
+    transit = ["6939", "4761", "9498", "3491", "7473", "20940", "13335", "4134"]
+    origins = [EXPECTED] * 8 + ["4761", "13414", "36692"]
+    sub_prefixes = [PREFIX, "8.8.8.0/25", "8.8.8.128/25"]
+
+    def rand_path():
+        hops = [rnd.choice(tier1 + transit) for _ in range(rnd.randint(1, max_len - 1))]
+        if rnd.random() < 0.1 and len(hops) >= 3:
+            # Tier1 -> 非 Tier1 -> Tier1 谷形
+            i = rnd.randrange(1, len(hops) - 1)
+            hops[i - 1], hops[i], hops[i + 1] = rnd.choice(tier1), rnd.choice(transit), rnd.choice(tier1)
+        origin = rnd.choice(origins)
+        hops += [origin] * rnd.choice((1, 1, 1, 3))
+        if rnd.random() < 0.3:
+            return " ".join(hops)
+        return [int(h) for h in hops]
+
+    n_initial = max(1, events // 100)
+    initial_state = [
+        {"source_id": f"{i % 300}-rrc00", "target_prefix": rnd.choice(sub_prefixes), "path": rand_path()}
+        for i in range(n_initial)
+    ]
+    t0 = 1396339200
+    evs = [
+        {
+            "timestamp": f"2014-04-01T{8 + i // 36000 % 16:02d}:{i // 600 % 60:02d}:{i // 10 % 60:02d}",
+            "type": "A",
+            "attrs": {"source_id": f"{i % 300}-rrc00", "target_prefix": rnd.choice(sub_prefixes), "path": rand_path()},
+        }
+        for i in range(events - n_initial)
+    ]
+    return {"query_starttime": t0, "initial_state": initial_state, "events": evs}
+
+
+def legacy_filter(bgplay_data: dict, prefix: str, expected: str, tier1) -> list:
+    """重构前的实现（Valley-Free 循环中对每一跳重新调用 _parse_path），仅作对比基线"""
+    result = []
+
+    def check_update(entry, ts=None):
+        attrs = entry.get("attrs", entry)
+        path = attrs.get("path", entry.get("path", entry.get("as_path", [])))
+        parsed = _parse_path(path)
+        origin = parsed[-1] if parsed else None
+        if not origin:
+            return
+        as_path_str = " ".join(_parse_path(path))
+        target = attrs.get("target_prefix", entry.get("target_prefix", entry.get("target", prefix)))
+        pfx = target if "/" in str(target) else prefix
+        record = {"prefix": pfx, "as_path": as_path_str, "detected_origin": origin,
+                  "expected_origin": expected, "timestamp": ts}
+        if str(origin) != str(expected):
+            result.append({**record, "reason": "ORIGIN_MISMATCH"})
+            return
+        if tier1 and len(_parse_path(path)) >= 3:
+            for i in range(1, len(_parse_path(path)) - 1):
+                prev = _parse_path(path)[i - 1]
+                curr = _parse_path(path)[i]
+                nxt = _parse_path(path)[i + 1]
+                if prev in tier1 and nxt in tier1 and curr not in tier1:
+                    result.append({**record, "reason": "VALLEY_FREE_VIOLATION", "suspicious_as": curr})
+                    return
+
+    for entry in bgplay_data.get("initial_state", []):
+        check_update(entry, bgplay_data.get("query_starttime"))
+    for ev in bgplay_data.get("events", []):
+        check_update(ev, ev.get("timestamp"))
+    return result
+
+
+def _best(fn, repeat: int):
+    best, out = None, None
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        out = fn()
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best, out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="filter_suspicious_updates 单次解析基准")
+    parser.add_argument("--events", type=int, default=100_000, help="合成 BGPlay 事件数")
+    parser.add_argument("--max-len", type=int, default=12, help="AS path 最大长度（不含前置重复）")
+    parser.add_argument("--repeat", type=int, default=3, help="重复次数，取最快一次")
+    args = parser.parse_args()
+
+    payload = make_payload(args.events, max(3, args.max_len))
+    tier1 = get_tier1_asns()
+    total = len(payload["initial_state"]) + len(payload["events"])
+    print(f"合成 BGPlay: {total} 个事件 | Tier1 {len(tier1)} 个")
+
+    t_old, old = _best(lambda: legacy_filter(payload, PREFIX, EXPECTED, tier1), args.repeat)
+    t_new, new = _best(lambda: filter_suspicious_updates(payload, PREFIX, EXPECTED), args.repeat)
+
+    same = old == new
+    reasons = {}
+    for r in new:
+        reasons[r["reason"]] = reasons.get(r["reason"], 0) + 1
+    print(f"可疑 updates {len(new)} | {reasons}")
+    print(f"{'实现':<14}{'耗时(s)':>10}{'事件/s':>14}")
+    print(f"{'逐跳重复解析':<14}{t_old:>10.3f}{total / t_old:>14,.0f}")
+    print(f"{'单次解析':<14}{t_new:>10.3f}{total / t_new:>14,.0f}")
+    print(f"加速比: {t_old / t_new:.1f}x | 输出一致: {same}")
+    if not same:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+基于 AS 关系的 Valley-Free 检查基准：在 bench_common 的合成分层拓扑上生成
+合法 valley-free 路径（上行 customer->provider、至多一段 peer、再下行）与随机游走路径（含各类 RFC 7908 泄露），
+夹杂 prepend 与关系未知的跳，用逐跳字典参考实现比对 tools/valley_free.py 的泄露者与泄露类型，
+输出单条路径检查吞吐（路径/s）与 filter_suspicious_from_ris 逐条 / 向量化两种路径的整批耗时及结果一致性。
+
+使用: python scripts/bench_valley_free.py [--nodes 75000] [--paths 200000] [--updates 200000]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_common import compare, make_as_rel, reference_graph, write_as_rel
+from tools import as_graph, valley_free
+from tools.valley_free import LEAK_TYPES, RelationshipTable
+
+_INVERSE = {"customer": "provider", "provider": "customer", "peer": "peer", "sibling": "sibling"}
+
+
+def reference_leak(adj, hops):
+    """参考实现：沿传播方向逐跳，返回 (泄露者下标, 类型) 或 None"""
+    seq = [(i, h) for i, h in enumerate(hops) if i == len(hops) - 1 or h != hops[i + 1]][::-1]
+    learned = "origin"
+    for (i, x), (_, y) in zip(seq, seq[1:]):
+        role = adj.get(x, {}).get(y)
+        if role is None:
+            learned = None
+        elif role == "sibling":
+            continue
+        else:
+            if learned in ("provider", "peer") and role in ("provider", "peer"):
+                return i, LEAK_TYPES[(learned, role)]
+            learned = _INVERSE[role]
+    return None
+
+
+def _by_role(adj):
+    out = {}
+    for a, nbrs in adj.items():
+        groups = {}
+        for b, role in nbrs.items():
+            groups.setdefault(role, []).append(b)
+        out[a] = groups
+    return out
+
+
+def valley_free_path(rnd, groups, nodes):
+    """传播方向：origin 上行若干跳、可选一段 peer、再下行；返回 AS_PATH 顺序（采集点在前）"""
+    x = rnd.choice(nodes)
+    walk = [x]
+    for _ in range(rnd.randint(0, 4)):
+        ups = groups[x].get("provider")
+        if not ups:
+            break
+        x = rnd.choice(ups)
+        walk.append(x)
+    if rnd.random() < 0.5 and groups[x].get("peer"):
+        x = rnd.choice(groups[x]["peer"])
+        walk.append(x)
+    for _ in range(rnd.randint(0, 4)):
+        downs = groups[x].get("customer")
+        if not downs:
+            break
+        x = rnd.choice(downs)
+        walk.append(x)
+    return walk[::-1]
+
+
+def random_path(rnd, adj, nodes):
+    x = rnd.choice(nodes)
+    walk = [x]
+    for _ in range(rnd.randint(2, 8)):
+        x = rnd.choice(list(adj[x]))
+        walk.append(x)
+    return walk[::-1]
+
+
+def make_paths(adj, count, seed=7):
+    rnd = random.Random(seed)
+    groups = _by_role(adj)
+    nodes = list(adj)
+    paths = []
+    for _ in range(count):
+        hops = valley_free_path(rnd, groups, nodes) if rnd.random() < 0.6 else random_path(rnd, adj, nodes)
+        if rnd.random() < 0.1:
+            k = rnd.randrange(len(hops))
+            hops = hops[:k + 1] + [hops[k]] * rnd.randint(1, 3) + hops[k + 1:]
+        if rnd.random() < 0.03:
+            hops.insert(rnd.randrange(len(hops) + 1), str(rnd.randint(400001, 500000)))
+        paths.append(hops)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AS 关系 Valley-Free 检查基准")
+    parser.add_argument("--nodes", type=int, default=75_000, help="合成 AS 数")
+    parser.add_argument("--paths", type=int, default=200_000, help="单条检查计时的路径数")
+    parser.add_argument("--updates", type=int, default=200_000, help="filter_suspicious_from_ris 整批 update 数")
+    args = parser.parse_args()
+
+    edges = make_as_rel(args.nodes)
+    adj = reference_graph(edges)
+    tmp = tempfile.TemporaryDirectory()
+    path = os.path.join(tmp.name, "20240101.as-rel2.txt")
+    write_as_rel(path, edges)
+
+    t0 = time.perf_counter()
+    table = RelationshipTable.load(path)
+    print(f"加载关系表: {table.stats()}，{time.perf_counter() - t0:.2f}s")
+
+    paths = make_paths(adj, args.paths)
+    t0 = time.perf_counter()
+    got = [table.first_leak(h) for h in paths]
+    elapsed = time.perf_counter() - t0
+    print(f"first_leak: {len(paths)} 条路径 {elapsed:.3f}s，{len(paths) / elapsed:,.0f} 路径/s")
+
+    mismatches = compare(zip(paths, got), lambda x: reference_leak(adj, x[0]), lambda x: x[1],
+                         "RelationshipTable", lambda x: " ".join(x[0]))
+    types = Counter(leak[1] for leak in got if leak)
+    print(f"泄露类型分布 {dict(sorted(types.items()))}，合法 {sum(1 for leak in got if leak is None)}")
+    ok = mismatches == 0 and all(types.get(t) for t in (1, 2, 3, 4))
+
+    # 过滤器整批：有限条不同路径重复出现（与真实 RIS updates 一致），逐条 vs 向量化
+    from tools import vector_filter
+    from tools.ris_mrt_fetcher import filter_suspicious_from_ris
+
+    as_graph.set_default_as_rel(path)
+    valley_free._TABLES.clear()
+    rnd = random.Random(11)
+    distinct = paths[:20_000]
+    expected = "64500"
+    updates = []
+    for _ in range(args.updates):
+        # Origin 统一为 expected，只考察 Valley-Free 一步
+        hops = rnd.choice(distinct)
+        updates.append({"prefix": "192.0.2.0/24", "as_path": " ".join(hops), "detected_origin": expected,
+                        "timestamp": "2024-01-01T00:00:00"})
+    filter_suspicious_from_ris(updates[:10], "192.0.2.0/24", expected, vectorized=False)  # 预加载关系表
+    results = {}
+    for label, vectorized in (("逐条", False), ("向量化", True)):
+        if vectorized and not vector_filter.vector_filter_available():
+            print("numpy 不可用，跳过向量化")
+            continue
+        t0 = time.perf_counter()
+        results[label] = filter_suspicious_from_ris(updates, "192.0.2.0/24", expected, vectorized=vectorized)
+        elapsed = time.perf_counter() - t0
+        print(f"filter_suspicious_from_ris[{label}]: {len(updates)} 条 update {elapsed:.3f}s，"
+              f"{len(updates) / elapsed:,.0f} 条/s，可疑 {len(results[label])}")
+    if len(results) == 2:
+        same = results["逐条"] == results["向量化"]
+        print(f"逐条 / 向量化结果一致: {same}")
+        ok &= same
+    leaks = [r for r in results["逐条"] if r["reason"] == "VALLEY_FREE_VIOLATION"]
+    ok &= bool(leaks) and all(r.get("leak_type") in (1, 2, 3, 4) for r in leaks)
+
+    from tools.topology import TopologyInspector
+    sample = leaks[0]
+    print(TopologyInspector().run({"as_path": sample["as_path"]}))
+    as_graph.set_default_as_rel(None)
+    tmp.cleanup()
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+构建 RIB 快照基线（前缀 -> Origin 集合），供 Step1 与 AuthorityValidator 离线推断合法 Owner。
+
+默认下载（或命中 data/mrt_cache/）各 collector 在 --time 之前最近的 bview，
+统计每个前缀的 Origin 观测数，写出 data/rib_baseline/<collectors>.<YYYYmmdd.HHMM>.tsv.gz。
+也可用 --files 直接从本地 bview 文件构建（不联网）。
+
+使用: python scripts/build_rib_baseline.py --time 2014-04-01T08:00:00 [--collectors rrc00,rrc24] [--files bview.gz ...]
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.mrt_io import to_datetime
+from tools.ris_mrt_fetcher import DEFAULT_RRC
+from tools.rib_baseline import build_baseline, build_from_files, baseline_path, bview_slot
+
+
+def main():
+    parser = argparse.ArgumentParser(description="从 RIS bview 构建前缀 -> Origin 基线")
+    parser.add_argument("--time", required=True, help="基线时间（取不晚于该时间的最近一份 bview）")
+    parser.add_argument("--collectors", default=DEFAULT_RRC, help="RIS collector 列表，逗号分隔")
+    parser.add_argument("--files", nargs="*", default=[], help="本地 bview 文件，提供时不联网")
+    parser.add_argument("--output", default="", help="输出路径，默认 data/rib_baseline/ 下按 collector 与时间命名")
+    parser.add_argument("--no-cache", action="store_true", help="不使用 MRT 本地缓存")
+    args = parser.parse_args()
+
+    when = to_datetime(args.time)
+    if not when:
+        print(f"无效时间: {args.time}")
+        sys.exit(1)
+    collectors = [c.strip() for c in args.collectors.split(",") if c.strip()] or [DEFAULT_RRC]
+
+    t0 = time.perf_counter()
+    if args.files:
+        meta = {"collectors": ",".join(collectors), "time": bview_slot(when).strftime("%Y-%m-%dT%H:%M:%S")}
+        baseline = build_from_files(args.files, meta)
+    else:
+        print(f"获取 {','.join(collectors)} 在 {bview_slot(when)} 的 bview ...")
+        baseline = build_baseline(when, collectors, use_cache=not args.no_cache)
+    if baseline is None or not len(baseline):
+        print("未得到任何 RIB 条目，基线未生成")
+        sys.exit(1)
+    build_sec = time.perf_counter() - t0
+
+    out = args.output or baseline_path(collectors, when)
+    baseline.save(out)
+    print(f"RIB 条目 {baseline.meta.get('rib_entries', 0)} | 前缀 {len(baseline)} | 耗时 {build_sec:.1f}s")
+    print(f"已写出: {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+本地 AS 元数据库检查：合成 CAIDA as2org（txt / jsonl）、RIR delegated stats 与补充 CSV，
+加载为 tools/as_metadata.py 的 ASMetadataStore，与字典参考实现逐条比对名称 / 国家；
+再在本地 RIPEstat 桩服务（scripts/check_common.py）上确认 BGPDataProvider 命中本地库时不联网、未命中才联网，
+且目录内容只按 CHECK_INTERVAL_SEC 间隔检查。
+
+使用: python scripts/check_as_metadata.py [--asns 100000]
+"""
+import os
+import sys
+import gzip
+import json
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_common import compare
+from check_common import ServerStats, check, make_ripestat_server
+from tools import as_metadata, ripestat_client
+from tools.as_metadata import ASMetadataStore
+from tools.data_provider import BGPDataProvider
+
+_CCS = ("US", "DE", "NL", "CN", "JP", "BR", "RU", "GB", "FR", "IN", "AU", "ZA")
+
+
+def make_dataset(root: str, n: int, seed: int = 21):
+    """写出合成数据，返回参考答案 {asn: (holder 或 None, country 或 None)}"""
+    rnd = random.Random(seed)
+    asns = sorted(rnd.sample(range(1, 400000), n))
+    orgs = {f"ORG-{i}": (f"Org {i} Ltd", rnd.choice(_CCS)) for i in range(n // 4 + 1)}
+    org_ids = list(orgs)
+    auts = {asn: (f"NET-{asn}", rnd.choice(org_ids)) for asn in asns if rnd.random() < 0.9}
+
+    # 一半用 txt、一半用 jsonl（org 段两份都写）
+    half = len(asns) // 2
+    with gzip.open(os.path.join(root, "20240101.as-org2info.txt.gz"), "wt", encoding="utf-8") as f:
+        f.write("# format:org_id|changed|org_name|country|source\n")
+        for org_id, (name, cc) in orgs.items():
+            f.write(f"{org_id}|20240101|{name}|{cc}|SYN\n")
+        f.write("# format:aut|changed|aut_name|org_id|opaque_id|source\n")
+        for asn in asns[:half]:
+            if asn in auts:
+                f.write(f"{asn}|20240101|{auts[asn][0]}|{auts[asn][1]}||SYN\n")
+    with open(os.path.join(root, "20240101.as-org2info.jsonl"), "w", encoding="utf-8") as f:
+        for org_id, (name, cc) in orgs.items():
+            f.write(json.dumps({"type": "Organization", "organizationId": org_id, "name": name, "country": cc}) + "\n")
+        for asn in asns[half:]:
+            if asn in auts:
+                f.write(json.dumps({"type": "ASN", "asn": str(asn), "name": auts[asn][0],
+                                    "organizationId": auts[asn][1]}) + "\n")
+
+    # delegated：ASN 段（部分连续段合并为一条），个别 ZZ / 保留段
+    delegated = {}
+    with open(os.path.join(root, "delegated-synthetic-extended-latest"), "w", encoding="utf-8") as f:
+        f.write("2|synthetic|20240101|3|19700101|20240101|+0000\n")
+        f.write("synthetic|*|asn|*|3|summary\n")
+        i = 0
+        while i < len(asns):
+            if rnd.random() < 0.3:
+                i += 1
+                continue
+            start, count = asns[i], 1
+            while i + count < len(asns) and asns[i + count] == start + count and count < 8:
+                count += 1
+            cc = "ZZ" if rnd.random() < 0.02 else rnd.choice(_CCS)
+            f.write(f"synthetic|{cc}|asn|{start}|{count}|20100101|allocated|h{start}\n")
+            if cc != "ZZ":
+                for a in range(start, start + count):
+                    delegated[a] = cc
+            i += count
+        f.write("synthetic|US|ipv4|192.0.2.0|256|20100101|allocated|x\n")
+
+    # 补充 CSV：覆盖少量名称
+    overrides = {asn: f"OVERRIDE-{asn}" for asn in rnd.sample(asns, max(1, n // 100))}
+    with open(os.path.join(root, "local_overrides.csv"), "w", encoding="utf-8") as f:
+        f.write("asn,name\n")
+        for asn, name in overrides.items():
+            f.write(f"AS{asn},{name}\n")
+
+    expected = {}
+    for asn in asns:
+        holder, org_cc = None, None
+        if asn in auts:
+            aut_name, org_id = auts[asn]
+            org_name, org_cc = orgs[org_id]
+            holder = f"{aut_name} - {org_name}"
+        holder = overrides.get(asn, holder)
+        expected[asn] = (holder, delegated.get(asn, org_cc))
+    return expected
+
+
+def _provider_checks(store_dir: str, expected):
+    stats = ServerStats()
+    server = make_ripestat_server(stats, 0.0)
+    ripestat_client.BASE_URL = f"http://127.0.0.1:{server.server_address[1]}/data"
+    ripestat_client.PERSISTENT_CACHE = False
+    os.environ["AS_METADATA_DIR"] = store_dir
+    BGPDataProvider.cache_clear()
+
+    known = [a for a, (h, c) in expected.items() if h and c][:50]
+    stats.reset()
+    ok = all(BGPDataProvider.get_as_info(str(a))["holder"] == expected[a][0] for a in known)
+    ok &= all(BGPDataProvider.get_geo_location(f"AS{a}") == expected[a][1] for a in known)
+    results = [check(ok and stats.requests == 0, "本地命中不联网", f"{2 * len(known)} 次查询 {stats.requests} 次联网")]
+
+    # 间隔内不重复扫描目录；本地命中写入进程内 LRU，重复查询不再访问本地库
+    scans = []
+    signature = as_metadata._dir_signature
+    as_metadata._dir_signature = lambda root: scans.append(root) or signature(root)
+    as_metadata.reload()
+    BGPDataProvider.cache_clear()
+    for _ in range(20):
+        for a in known:
+            BGPDataProvider.get_as_info(str(a))
+    as_metadata.reload()
+    as_metadata.get_as_metadata()
+    as_metadata._dir_signature = signature
+    results.append(check(scans == [store_dir] * 2, "目录签名按间隔检查，reload() 立即重新检查",
+                          f"{20 * len(known)} 次查询扫描 {len(scans) - 1} 次"))
+
+    unknown = next(a for a in range(400001, 500000) if a not in expected)
+    stats.reset()
+    holder = BGPDataProvider.get_as_info(str(unknown))["holder"]
+    results.append(check(holder == f"HOLDER-AS{unknown}" and stats.requests == 1, "未命中回退 RIPEstat",
+                          f"{stats.requests} 次联网"))
+    server.shutdown()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地 AS 元数据库检查")
+    parser.add_argument("--asns", type=int, default=100_000, help="合成 ASN 数")
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    expected = make_dataset(tmp.name, args.asns)
+    store = ASMetadataStore.load_dir(tmp.name)
+    stats = store.stats()
+    print(f"加载 {len(stats['files'])} 个文件: {stats['asns']} 个 ASN 名称，{stats['country_ranges']} 个国家段")
+
+    mismatches = compare(expected.items(), lambda item: item[1],
+                         lambda item: (store.holder(item[0]), store.country(f"AS{item[0]}")),
+                         "ASMetadataStore", lambda item: f"AS{item[0]}")
+    ok = mismatches == 0 and all(_provider_checks(tmp.name, expected))
+    tmp.cleanup()
+    if not ok:
+        sys.exit(1)
+    print("✅ 全部检查通过")
+
+
+if __name__ == "__main__":
+    main()
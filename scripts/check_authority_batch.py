@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+批量 RPKI 校验检查：逐条 AuthorityValidator.run 与 AuthorityValidator.validate_bulk 对比。
+
+合成一个批次（--updates 条，取自 --pairs 组不同的 prefix/Origin），两种模式各跑一次：
+1) 本地 VRP：合成 VRP 导出（scripts/bench_common.py 的 make_vrps）
+2) RIPEstat：本地 RIPEstat 桩服务（scripts/check_common.py），每个请求延迟 --delay 秒，不读写持久化缓存
+
+要求两种实现逐条输出的报告文本完全一致；RIPEstat 模式下批量实现每组 prefix/Origin 只联网一次。
+
+使用: python scripts/check_authority_batch.py [--updates 500] [--pairs 60] [--delay 0.02]
+"""
+import os
+import sys
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_common import make_vrps, write_vrp_csv
+from check_common import ServerStats, check, make_ripestat_server
+from tools import ripestat_client, rpki_vrp
+from tools.authority import AuthorityValidator
+from tools.data_provider import BGPDataProvider
+
+
+def make_batch(vrps, n_updates: int, n_pairs: int, seed: int = 5):
+    rnd = random.Random(seed)
+    pairs = []
+    for _ in range(n_pairs):
+        asn, prefix, _ = rnd.choice(vrps)
+        origin = asn[2:] if rnd.random() < 0.5 else str(rnd.randint(1, 400000))
+        pairs.append((prefix, origin))
+    updates = []
+    for i in range(n_updates):
+        prefix, origin = rnd.choice(pairs)
+        updates.append({
+            "prefix": prefix,
+            "as_path": f"3356 174 {origin}",
+            "detected_origin": origin,
+            "timestamp": f"2024-01-01 00:{i // 60 % 60:02d}:{i % 60:02d}",
+        })
+    return updates
+
+
+def _run(label, updates, request_count=None):
+    """request_count: 返回自上次调用以来桩服务收到的请求数（None 表示不统计）"""
+    validator = AuthorityValidator()
+    BGPDataProvider.cache_clear()
+    if request_count:
+        request_count()
+    legacy = [validator.run(u) for u in updates]
+    n_legacy = request_count() if request_count else None
+
+    BGPDataProvider.cache_clear()
+    bulk = validator.validate_bulk(updates)
+    n_bulk = request_count() if request_count else None
+
+    results = [check(
+        legacy == [r["message"] for r in bulk["results"]], f"{label}: 批量与逐条报告一致",
+        f"{len(updates)} 条（{bulk['unique_pairs']} 组）{bulk['counts']}",
+    )]
+    if request_count:
+        results.append(check(
+            n_bulk == bulk["unique_pairs"], f"{label}: 批量每组只联网一次", f"请求数 逐条 {n_legacy} / 批量 {n_bulk}",
+        ))
+    return all(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量 RPKI 校验检查")
+    parser.add_argument("--updates", type=int, default=500, help="批次 update 数")
+    parser.add_argument("--pairs", type=int, default=60, help="批次内不同 prefix/Origin 组数")
+    parser.add_argument("--vrps", type=int, default=50_000, help="合成 VRP 条数")
+    parser.add_argument("--delay", type=float, default=0.02, help="桩服务每个请求的延迟（秒）")
+    args = parser.parse_args()
+
+    vrps = make_vrps(args.vrps)
+    updates = make_batch(vrps, args.updates, args.pairs)
+    ok = True
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "vrps.csv")
+        write_vrp_csv(path, vrps)
+        rpki_vrp.set_default_vrp(path)
+        rpki_vrp.get_vrp_table()
+        ok &= _run("本地 VRP", updates)
+        rpki_vrp.set_default_vrp(None)
+
+    if rpki_vrp.get_vrp_table() is not None:
+        print("已配置默认 VRP 文件，跳过 RIPEstat 模式（请取消 RPKI_VRP_FILE）")
+    else:
+        stats = ServerStats()
+        server = make_ripestat_server(stats, args.delay)
+        ripestat_client.BASE_URL = f"http://127.0.0.1:{server.server_address[1]}/data"
+        ripestat_client.PERSISTENT_CACHE = False
+
+        def requests_since_reset():
+            n = stats.requests
+            stats.reset()
+            return n
+
+        ok &= _run("RIPEstat", updates, request_count=requests_since_reset)
+        server.shutdown()
+
+    if not ok:
+        sys.exit(1)
+    print("✅ 全部检查通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+检查 / 基准脚本共用的测试夹具（不单独运行）：
+- check                 打印一项检查结果（✅ / ❌）并返回是否通过
+- ServerStats           桩服务统计：TCP 连接数、请求数、各 endpoint 在途峰值，可预置失败状态码
+- make_ripestat_server  本地 RIPEstat 桩服务（rpki-validation / as-overview / maxmind-geo-lite / whois）
+- mrt_record            MRT 记录头封装（BGP4MP / BGP4MP_ET）
+- bgp4mp_update         合成 BGP4MP UPDATE 记录（2/4 字节 AS、AS4_PATH、IPv6 会话、ADD-PATH）
+"""
+import os
+import json
+import time
+import socket
+import struct
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+def check(ok, label, detail=""):
+    print(f"{'✅' if ok else '❌'} {label}{(' | ' + detail) if detail else ''}")
+    return ok
+
+
+# ---- RIPEstat 桩服务 ----
+
+class ServerStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = 0
+        self.inflight = {}
+        self.peak = {}
+        # endpoint -> 剩余需返回的失败状态码
+        self.failures = {}
+
+    def enter(self, endpoint):
+        with self.lock:
+            self.requests += 1
+            n = self.inflight[endpoint] = self.inflight.get(endpoint, 0) + 1
+            self.peak[endpoint] = max(self.peak.get(endpoint, 0), n)
+            queue = self.failures.get(endpoint)
+            return queue.pop(0) if queue else None
+
+    def leave(self, endpoint):
+        with self.lock:
+            self.inflight[endpoint] -= 1
+
+    def reset(self):
+        with self.lock:
+            self.connections = self.requests = 0
+            self.peak = {}
+
+
+def _payload(endpoint, resource, prefix):
+    if endpoint == "rpki-validation":
+        return {"status": "valid" if resource == "13335" else "invalid_asn", "prefix": prefix}
+    if endpoint == "as-overview":
+        return {"holder": f"HOLDER-{resource}"}
+    if endpoint == "maxmind-geo-lite":
+        return {"located_resources": [{"locations": [{"country": "US"}]}]}
+    if endpoint == "whois":
+        return {"records": [[{"key": "country", "value": "nl"}]]}
+    return {}
+
+
+def make_ripestat_server(stats: ServerStats, delay: float):
+    """在随机端口启动桩服务（后台线程），每个请求固定延迟 delay 秒；返回 server，调用方负责 shutdown"""
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            super().setup()
+            with stats.lock:
+                stats.connections += 1
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            endpoint = url.path.strip("/").split("/")[-2]
+            qs = parse_qs(url.query)
+            fail = stats.enter(endpoint)
+            try:
+                time.sleep(delay)
+                if fail:
+                    body = b"{}"
+                    self.send_response(fail)
+                    self.send_header("Retry-After", "0")
+                else:
+                    data = _payload(endpoint, qs.get("resource", [""])[0], qs.get("prefix", [""])[0])
+                    body = json.dumps({"status": "ok", "data": data}).encode()
+                    self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            finally:
+                stats.leave(endpoint)
+
+    class Server(ThreadingHTTPServer):
+        daemon_threads = True
+
+        def handle_error(self, request, client_address):
+            # 客户端关闭空闲 keep-alive 连接时的 reset 属正常现象
+            pass
+
+    server = Server(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# ---- 合成 MRT 记录 ----
+
+def _prefix_bytes(addr, ln):
+    return bytes([ln]) + socket.inet_aton(addr)[: (ln + 7) // 8]
+
+
+def _attr(typ, value, flags=0x40):
+    if len(value) > 255:
+        return struct.pack("!BBH", flags | 0x10, typ, len(value)) + value
+    return struct.pack("!BBB", flags, typ, len(value)) + value
+
+
+def _segments(segs, as_size):
+    fmt = "!I" if as_size == 4 else "!H"
+    return b"".join(struct.pack("!BB", t, len(a)) + b"".join(struct.pack(fmt, x) for x in a) for t, a in segs)
+
+
+def mrt_record(ts, subtype, body, et=False):
+    mrt_type = 17 if et else 16
+    if et:
+        body = struct.pack("!I", 123456) + body
+    return struct.pack("!IHHI", ts, mrt_type, subtype, len(body)) + body
+
+
+def bgp4mp_update(ts, rnd, subtype, nlri, withdrawn, segs, as4_segs=None, v6_peer=False, et=False, addpath=False):
+    """
+    BGP4MP UPDATE 记录字节。subtype 4/7/9/11 为 4 字节 AS 会话；segs / as4_segs 为 [(段类型, [ASN])]，
+    nlri / withdrawn 为 [(IPv4 地址, 前缀长度)]。rnd 决定是否附带（偶尔超长的）COMMUNITIES。
+    """
+    as_size = 4 if subtype in (4, 7, 9, 11) else 2
+    afi = 2 if v6_peer else 1
+    ip_len = 16 if v6_peer else 4
+    peer = struct.pack("!" + ("I" if as_size == 4 else "H") * 2, 65000, 65001)
+    peer += struct.pack("!HH", 0, afi) + os.urandom(ip_len) + os.urandom(ip_len)
+    attrs = _attr(1, b"\x00") + _attr(2, _segments(segs, as_size)) + _attr(3, socket.inet_aton("10.0.0.1"))
+    if as4_segs:
+        attrs += _attr(17, _segments(as4_segs, 4), flags=0xC0)
+    if rnd.random() < 0.5:
+        attrs += _attr(8, os.urandom(4 * rnd.randint(1, 80)), flags=0xC0)  # COMMUNITIES，偶尔超长
+    path_id = struct.pack("!I", 1) if addpath else b""
+    w = b"".join(path_id + _prefix_bytes(a, l) for a, l in withdrawn)
+    n = b"".join(path_id + _prefix_bytes(a, l) for a, l in nlri)
+    body = struct.pack("!H", len(w)) + w + struct.pack("!H", len(attrs)) + attrs + n
+    msg = b"\xff" * 16 + struct.pack("!HB", 19 + len(body), 2) + body
+    return mrt_record(ts, subtype, peer + msg, et=et)
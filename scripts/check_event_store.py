@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+列式事件库往返检查：构造带 seen_by 列表、整数 raw_timestamp、非字符串取值与部分缺失字段的 updates，
+经 tools/event_store.py 的 EventStoreWriter 写出后用 load_events / load_event_updates 读回，
+确认与原始 updates（即 JSON 布局）逐条完全一致；路由泄露类型 leak_type（整数 1-4）原样读回；
+再次写入同一 event_id 时以新数据为准。
+
+使用: python scripts/check_event_store.py [--events 20] [--updates 200]
+"""
+import os
+import sys
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from check_common import check
+from tools.event_store import EventStoreWriter, columnar_available, load_event_updates, load_events
+
+
+def make_updates(rnd: random.Random, n: int):
+    updates = []
+    for i in range(n):
+        origin = rnd.choice(["15169", "13335", "64500"])
+        u = {
+            "prefix": f"10.{i % 256}.0.0/16",
+            "as_path": f"3356 1299 {origin}",
+            "detected_origin": origin,
+            "expected_origin": "15169",
+            "timestamp": "2024-01-01T00:00:00",
+            "raw_timestamp": 1704067200 + i,
+            "reason": rnd.choice(["ORIGIN_MISMATCH", "VALLEY_FREE", "VALLEY_FREE_RELATIONSHIP"]),
+        }
+        if rnd.random() < 0.5:
+            u["suspicious_as"] = origin
+        if rnd.random() < 0.5:
+            u["collector"] = "rrc00"
+            u["seen_by"] = ["rrc00", "rrc24"][: rnd.randint(1, 2)]
+        if rnd.random() < 0.2:
+            u["leak_type"] = rnd.randint(1, 4)
+        if rnd.random() < 0.1:
+            # 列字段的非字符串取值也要原样保留
+            u["detected_origin"] = int(origin)
+            u["note"] = None
+        updates.append(u)
+    return updates
+
+
+def main():
+    parser = argparse.ArgumentParser(description="列式事件库往返检查")
+    parser.add_argument("--events", type=int, default=20, help="事件数")
+    parser.add_argument("--updates", type=int, default=200, help="每个事件的 update 数")
+    args = parser.parse_args()
+    if not columnar_available():
+        print("⚠️ 未安装 numpy，列式事件库不可用")
+        sys.exit(1)
+
+    rnd = random.Random(7)
+    events = {f"ev{i}": make_updates(rnd, rnd.randint(0, args.updates)) for i in range(args.events)}
+    tmp = tempfile.TemporaryDirectory()
+    with EventStoreWriter(tmp.name) as w:
+        for event_id, updates in events.items():
+            w.add({"event_id": event_id, "suspicious_count": len(updates)}, updates)
+
+    loaded = {event_id: updates for event_id, _, updates in load_events(tmp.name)}
+    results = [
+        check(loaded == events, "load_events 与原始 updates 一致",
+               f"{len(events)} 个事件，{sum(map(len, events.values()))} 条 update"),
+        check(load_event_updates(tmp.name, "ev3") == events["ev3"], "load_event_updates 按事件读取一致"),
+    ]
+
+    leaks = [dict(u, reason="ROUTE_LEAK", leak_type=t) for t, u in enumerate(make_updates(rnd, 4), start=1)]
+    with EventStoreWriter(tmp.name) as w:
+        w.add({"event_id": "leaks"}, leaks)
+    got = load_event_updates(tmp.name, "leaks")
+    results.append(check(
+        got == leaks and [u.get("leak_type") for u in got] == [1, 2, 3, 4],
+        "leak_type 往返一致", f"读回 {[u.get('leak_type') for u in got]}",
+    ))
+    events["leaks"] = leaks
+
+    replaced = make_updates(rnd, 5)
+    with EventStoreWriter(tmp.name) as w:
+        w.add({"event_id": "ev3"}, replaced)
+    loaded = {event_id: updates for event_id, _, updates in load_events(tmp.name)}
+    results.append(check(
+        loaded.pop("ev3") == replaced and loaded == {k: v for k, v in events.items() if k != "ev3"},
+        "同 event_id 重写后以新数据为准，其余事件不变",
+    ))
+    tmp.cleanup()
+
+    if not all(results):
+        sys.exit(1)
+    print("✅ 全部检查通过")
+
+
+if __name__ == "__main__":
+    main()
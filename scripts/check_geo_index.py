@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+离线地理位置索引检查：合成地理位置段文件（起止地址 CSV / CIDR CSV）与 RIR delegated stats，
+加载为 tools/geo_index.py 的 GeoIndex，用基于 ipaddress 的逐层超网参考实现比对国家代码；
+再在本地 RIPEstat 桩服务（scripts/check_common.py）上确认批量 geo_check 逐条检查、命中本地索引时不联网，
+且数据文件只按 CHECK_INTERVAL_SEC 间隔检查。
+
+使用: python scripts/check_geo_index.py [--blocks 200000] [--check 5000]
+"""
+import os
+import sys
+import random
+import argparse
+import tempfile
+import ipaddress
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_common import compare
+from check_common import ServerStats, check, make_ripestat_server
+from tools import ripestat_client, geo_index
+from tools.geo_index import GeoIndex
+
+_CCS = ("US", "DE", "NL", "CN", "JP", "BR", "RU", "GB", "FR", "IN", "AU", "ZA")
+
+
+def _random_net(rnd, v6=False, slot=None):
+    """随机 CIDR 块；slot 给定时块长度不短于 slot（同一 slot 内只取一个块即可保证互不重叠）"""
+    bits = 128 if v6 else 32
+    lo = slot if slot else (29 if v6 else 16)
+    length = rnd.randint(lo, lo + (16 if v6 else 4))
+    value = rnd.getrandbits(bits) >> (bits - length) << (bits - length)
+    return ipaddress.ip_network((value, length)), value >> (bits - lo)
+
+
+def make_blocks(n: int, seed: int = 31, slots=(20, 32)):
+    """互不重叠的 CIDR 块 -> 国家：每个 IPv4 /20（IPv6 /32）槽位最多一个块"""
+    rnd = random.Random(seed)
+    blocks, used = {}, set()
+    while len(blocks) < n:
+        v6 = rnd.random() < 0.2
+        net, key = _random_net(rnd, v6, slots[1] if v6 else slots[0])
+        if (v6, key) in used:
+            continue
+        used.add((v6, key))
+        blocks[net] = rnd.choice(_CCS)
+    return blocks
+
+
+def write_dataset(root: str, blocks, seed: int = 32):
+    """一半块写成起止地址 CSV、一半写成 CIDR CSV（两个段文件），另写 delegated stats"""
+    items = list(blocks.items())
+    half = len(items) // 2
+    range_csv = os.path.join(root, "ranges.csv")
+    with open(range_csv, "w", encoding="utf-8") as f:
+        for net, cc in items[:half]:
+            f.write(f"{net.network_address},{net.broadcast_address},{cc}\n")
+    cidr_csv = os.path.join(root, "cidr.csv")
+    with open(cidr_csv, "w", encoding="utf-8") as f:
+        f.write("network,country,country_code,continent\n")
+        for net, cc in items[half:]:
+            f.write(f"{net},Somewhere,{cc},XX\n")
+
+    # delegated 以 IPv4 /16、IPv6 /29 为槽位（与段文件部分重叠，国家随机，用于验证段文件优先）
+    delegated = make_blocks(len(items) // 4, seed=seed, slots=(16, 29))
+    path = os.path.join(root, "delegated-synthetic-extended-latest")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("2|synthetic|20240101|0|19700101|20240101|+0000\n")
+        for net, cc in delegated.items():
+            value = net.num_addresses if net.version == 4 else net.prefixlen
+            f.write(f"synthetic|{cc}|ipv{net.version}|{net.network_address}|{value}|20100101|allocated|x\n")
+    return [range_csv, cidr_csv], [path], delegated
+
+
+def reference_country(blocks, delegated, prefix: str):
+    """参考实现：取网络地址，逐层取超网，先查段文件、再查 delegated"""
+    net = ipaddress.ip_network(prefix, strict=False)
+    host = ipaddress.ip_network(net.network_address)
+    for table in (blocks, delegated):
+        for length in range(host.max_prefixlen, -1, -1):
+            cc = table.get(host.supernet(new_prefix=length))
+            if cc:
+                return cc
+    return None
+
+
+def make_queries(nets, n: int, seed: int = 33):
+    """查询：多数落在某个块内（更具体的子前缀），其余为随机前缀"""
+    rnd = random.Random(seed)
+    out = []
+    for _ in range(n):
+        if rnd.random() < 0.8 and nets:
+            net = rnd.choice(nets)
+            bits = net.max_prefixlen
+            length = min(bits, net.prefixlen + rnd.choice((0, 0, 2, 4, 8)))
+            addr = int(net.network_address) | rnd.getrandbits(bits - net.prefixlen)
+            out.append(str(ipaddress.ip_network((addr >> (bits - length) << (bits - length), length))))
+        else:
+            out.append(str(_random_net(rnd, v6=rnd.random() < 0.2)[0]))
+    return out
+
+
+def _batch_check(root: str, blocks):
+    """批量 geo_check：每条 update 都检查，命中本地索引 / AS 元数据时不联网"""
+    from tools.bgp_toolkit import BGPToolKit
+    from tools.data_provider import BGPDataProvider
+
+    stats = ServerStats()
+    server = make_ripestat_server(stats, 0.0)
+    ripestat_client.BASE_URL = f"http://127.0.0.1:{server.server_address[1]}/data"
+    ripestat_client.PERSISTENT_CACHE = False
+    # AS 元数据：两个 Origin 各有国家
+    with open(os.path.join(root, "as_meta.csv"), "w", encoding="utf-8") as f:
+        f.write("asn,name,country\n64500,ORIGIN-A,US\n64501,ORIGIN-B,DE\n")
+    os.environ["AS_METADATA_DIR"] = root
+    BGPDataProvider.cache_clear()
+
+    nets = [n for n in blocks if n.version == 4][:40]
+    updates = [{"prefix": str(nets[i % len(nets)]), "as_path": f"3356 {64500 + i % 2}"} for i in range(200)]
+    toolkit = BGPToolKit.__new__(BGPToolKit)
+    toolkit.graph_engine = None
+    stats.reset()
+    report = toolkit.call_tool("geo_check", {"updates": updates}, is_batch=True)
+    lines = [l for l in report.splitlines() if l.startswith("[Update ")]
+    want = []
+    for u in updates:
+        cc, origin_cc = blocks[ipaddress.ip_network(u["prefix"])], ("US" if u["as_path"].endswith("64500") else "DE")
+        want.append("MATCH" if cc == origin_cc else None)
+    ok = len(lines) == len(updates) and all(
+        (w == "MATCH") == ("MATCH:" in l) for w, l in zip(want, lines)
+    )
+    results = [check(ok, "批量 geo_check 逐条检查", report.splitlines()[-1])]
+    results.append(check(stats.requests == 0, "本地命中不联网", f"{len(updates)} 条 update {stats.requests} 次联网"))
+
+    # 间隔内不重复 listdir + stat 数据文件；reload() 立即重新检查
+    scans = []
+    signature = geo_index._signature
+    geo_index._signature = lambda paths: scans.append(len(paths)) or signature(paths)
+    geo_index.reload()
+    BGPDataProvider.cache_clear()
+    for n in nets * 10:
+        BGPDataProvider.get_geo_location(str(n))
+    geo_index.reload()
+    geo_index.get_geo_index()
+    geo_index._signature = signature
+    results.append(check(len(scans) == 2, "数据文件按间隔检查，reload() 立即重新检查",
+                          f"{len(nets) * 10} 次查询扫描 {len(scans) - 1} 次"))
+    server.shutdown()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="离线地理位置索引检查")
+    parser.add_argument("--blocks", type=int, default=200_000, help="合成地址块数")
+    parser.add_argument("--check", type=int, default=5000, help="与参考实现比对的查询数")
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    blocks = make_blocks(args.blocks)
+    range_files, delegated_files, delegated = write_dataset(tmp.name, blocks)
+    index = GeoIndex.load(range_files, delegated_files)
+    print(f"加载 {len(range_files)} 个段文件 + {len(delegated_files)} 个 delegated 文件: {index.stats()['layers']}")
+
+    # 段文件分两个文件加载（两层），参考实现中二者互不重叠，合并为一张表
+    queries = make_queries(list(blocks) + list(delegated), args.check)
+    ok = compare(queries, lambda q: reference_country(blocks, delegated, q), index.country, "GeoIndex") == 0
+    geo_index.set_default_geo_ranges(range_files[1])
+    ok &= all(_batch_check(tmp.name, {n: cc for n, cc in list(blocks.items())[len(blocks) // 2:]}))
+    geo_index.set_default_geo_ranges(None)
+    tmp.cleanup()
+    if not ok:
+        sys.exit(1)
+    print("✅ 全部检查通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Origin <-> Owner 距离服务检查：在 bench_common 的合成拓扑上构造一批 updates（少量不同 (Origin, Owner) 对反复出现），
+核对 tools/graph_distance.py 的 DistanceService 返回的路径（方向、端点、跳数）与直接 BFS 一致，
+且热缓存下整批不再访问后端；
+Neo4j 后端用按本地图应答的假读事务确认整批只发一条 UNWIND 查询；
+最后确认 BGPToolKit(graph_backend="local") 的批量 graph_analysis 覆盖整批 updates。
+
+使用: python scripts/check_graph_distance.py [--nodes 75000] [--updates 20000] [--pairs 2000]
+"""
+import os
+import sys
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_common import compare, make_as_rel, write_as_rel
+from check_common import check
+from tools import as_graph
+from tools.as_graph import ASGraph
+from tools.graph_distance import DistanceService, local_lookup, neo4j_lookup
+
+
+def _fake_read(graph, counter):
+    """按本地图应答 neo4j_lookup 的 UNWIND 查询（代替 BGPGraphRAG._read），统计往返次数"""
+
+    def read(query, pairs):
+        counter.append(len(pairs))
+        return [{"src": a, "dst": b, "path_nodes": graph.shortest_path(a, b)}
+                for a, b in pairs if a in graph and b in graph]
+
+    return read
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Origin/Owner 距离服务检查")
+    parser.add_argument("--nodes", type=int, default=75_000, help="合成 AS 数")
+    parser.add_argument("--updates", type=int, default=20_000, help="一批 update 数")
+    parser.add_argument("--pairs", type=int, default=2000, help="其中不同 (Origin, Owner) 对数")
+    args = parser.parse_args()
+
+    edges = make_as_rel(args.nodes)
+    tmp = tempfile.TemporaryDirectory()
+    path = os.path.join(tmp.name, "20240101.as-rel2.txt")
+    write_as_rel(path, edges)
+    graph = ASGraph.load(path)
+
+    rnd = random.Random(5)
+    nodes = [str(a) for a in graph.asns]
+    distinct = [(rnd.choice(nodes), rnd.choice(nodes)) for _ in range(args.pairs)]
+    batch = [rnd.choice(distinct) for _ in range(args.updates)]
+
+    service = DistanceService(local_lookup(graph))
+    got = service.paths(batch)
+    service.paths(batch)
+    stats = service.stats()
+    results = [check(stats["backend_calls"] == 1 and stats["hits"] == stats["misses"],
+                      "热缓存下整批不再访问后端", str(stats))]
+
+    def shape(p):
+        """(是否连通, 起点, 终点, 跳数)"""
+        return (p is not None, p[0], p[-1], len(p)) if p else (False,)
+
+    unique = sorted(set(batch))
+    results.append(compare(unique, lambda k: shape(graph.shortest_path(*k)), lambda k: shape(got[k]),
+                           "DistanceService", lambda k: f"AS{k[0]} -> AS{k[1]}") == 0)
+
+    calls = []
+    neo = DistanceService(neo4j_lookup(_fake_read(graph, calls)))
+    neo_got = neo.paths(batch)
+    neo.paths(batch)
+    same = all(len(neo_got[k] or ()) == len(got[k] or ()) for k in got)
+    results.append(check(len(calls) == 1 and same, "Neo4j 后端整批一次往返，跳数与本地一致",
+                          f"往返 {len(calls)} 次（{calls} 个键）"))
+
+    from tools.bgp_toolkit import BGPToolKit
+    as_graph.set_default_as_rel(path)
+    toolkit = BGPToolKit(graph_backend="local")
+    updates = [{"prefix": f"10.{i % 200}.0.0/16", "as_path": f"3356 {a}", "expected_origin": b,
+                "detected_origin": a} for i, (a, b) in enumerate(batch[:2000])]
+    report = toolkit.call_tool("graph_analysis", {"updates": updates}, is_batch=True)
+    tail = report.rsplit("\n", 1)[-1]
+    covered = sum(int(line.split("（共 ", 1)[1].split(" 条", 1)[0]) for line in report.splitlines()
+                  if line.startswith("[Update "))
+    results.append(check(covered == len(updates), "批量 graph_analysis 覆盖整批",
+                          f"{covered}/{len(updates)} | {tail}"))
+    toolkit.close()
+    as_graph.set_default_as_rel(None)
+    tmp.cleanup()
+    if not all(results):
+        sys.exit(1)
+    print("✅ 全部检查通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+MRT 并发下载检查：本地 http.server 模拟 data.ris.ripe.net，按 RIS 路径提供小型 BGP4MP 夹具
+（每个 5 分钟槽若干条目标前缀 update，相邻文件含一条完全相同的 update 用于验证去重），
+部分槽返回 404，每个请求随机延迟使完成顺序与请求顺序不同。
+
+验证 fetch_and_parse：
+- 并发（workers=4）、流式（stream=True）与串行（workers=1）结果完全一致，且按文件时间顺序排列
+- 服务端同时在途请求数不超过 workers
+- 404 文件被跳过、不计入结果；带 MRT 缓存时 404 写入缺失标记，第二次运行不再联网
+- (prefix, as_path, raw_timestamp) 去重保留
+- MRT 缓存超出上限时淘汰到低水位，不会每次写入都重新扫描目录，累计大小与磁盘一致
+- 多 collector 合并：另一 RRC 晚几秒看到的同一公告合并为一条（seen_by 记两个 RRC），
+  同一 RRC 内时间戳不同的公告、超出容差的公告各自保留
+
+使用: python scripts/check_mrt_download_pool.py [--slots 12] [--workers 4] [--delay 0.05]
+"""
+import os
+import sys
+import gzip
+import time
+import random
+import argparse
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from check_common import bgp4mp_update, check
+from tools import mrt_cache, ris_mrt_fetcher
+
+PREFIX = "8.8.8.0/24"
+START = datetime(2024, 1, 1, 0, 0)
+
+
+def make_fixtures(slots: int, missing):
+    """{RIS 相对路径: gzip 字节}，以及期望的去重后 update 数"""
+    rnd = random.Random(3)
+    files = {}
+    expected = 0
+    for i in range(slots):
+        slot = START + timedelta(minutes=5 * i)
+        if i in missing:
+            continue
+        ts0 = int((slot - datetime(1970, 1, 1)).total_seconds())
+        records = [
+            bgp4mp_update(ts0 + k, rnd, 4, [("8.8.8.0", 24)], [], [(2, [3356, 1299 + i, 15169])])
+            for k in range(3)
+        ]
+        # 与上一个文件最后一条完全相同（同一时间戳）的 update：去重后只保留一条
+        if i > 0 and i - 1 not in missing:
+            prev = int((slot - timedelta(minutes=5) - datetime(1970, 1, 1)).total_seconds())
+            records.insert(0, bgp4mp_update(prev + 2, rnd, 4, [("8.8.8.0", 24)], [], [(2, [3356, 1299 + i - 1, 15169])]))
+        # 不相关前缀
+        records.append(bgp4mp_update(ts0 + 4, rnd, 4, [("10.0.0.0", 8)], [], [(2, [174, 64500])]))
+        files[f"rrc00/{slot:%Y.%m}/updates.{slot:%Y%m%d.%H%M}.gz"] = gzip.compress(b"".join(records))
+        expected += 3
+    return files, expected
+
+
+def make_collector_fixtures(slots: int, missing, shift: int):
+    """
+    两个 RRC 的夹具：rrc24 每槽 3 条同路径、相隔 20 秒的 update，rrc25 看到同样 3 条但晚 shift 秒，
+    另有一条同路径、相隔 200 秒的 update 只有 rrc25 看到。返回 ({路径: gzip 字节}, 期望条数, 期望合并条数)
+    """
+    rnd = random.Random(4)
+    files = {}
+    for i in range(slots):
+        if i in missing:
+            continue
+        slot = START + timedelta(minutes=5 * i)
+        ts0 = int((slot - datetime(1970, 1, 1)).total_seconds())
+        path = [(2, [3356, 2914 + i, 15169])]
+        for rrc, offsets in (("rrc24", (0, 20, 40)), ("rrc25", (shift, 20 + shift, 40 + shift, 240))):
+            records = [bgp4mp_update(ts0 + o, rnd, 4, [("8.8.8.0", 24)], [], path) for o in offsets]
+            files[f"{rrc}/{slot:%Y.%m}/updates.{slot:%Y%m%d.%H%M}.gz"] = gzip.compress(b"".join(records))
+    present = slots - len(missing)
+    return files, 4 * present, 3 * present
+
+
+class _Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.inflight = 0
+        self.peak = 0
+        self.not_found = 0
+
+    def reset(self):
+        with self.lock:
+            self.requests = self.peak = self.not_found = 0
+
+
+def _make_server(files, stats: _Stats, delay: float):
+    rnd = random.Random(9)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            with stats.lock:
+                stats.requests += 1
+                stats.inflight += 1
+                stats.peak = max(stats.peak, stats.inflight)
+                wait = delay * rnd.uniform(0.2, 2.0)
+            try:
+                time.sleep(wait)
+                body = files.get(self.path.lstrip("/"))
+                if body is None:
+                    with stats.lock:
+                        stats.not_found += 1
+                    body = b"not found"
+                    self.send_response(404)
+                else:
+                    self.send_response(200)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            finally:
+                with stats.lock:
+                    stats.inflight -= 1
+
+    class Server(ThreadingHTTPServer):
+        daemon_threads = True
+
+        def handle_error(self, request, client_address):
+            pass
+
+    server = Server(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _eviction_check(files: int = 300, size: int = 100, cap_files: int = 100):
+    """小上限缓存连续写入：统计目录扫描次数，确认总大小不超上限且与磁盘一致"""
+    tmp = tempfile.TemporaryDirectory()
+    grace = mrt_cache.IN_USE_GRACE_SEC
+    mrt_cache.IN_USE_GRACE_SEC = 0
+    try:
+        cache = mrt_cache.MRTCache(tmp.name, max_bytes=cap_files * size)
+        scan = cache._scan
+        scans = []
+        cache._scan = lambda: scans.append(1) or scan()
+        for i in range(files):
+            slot = START + timedelta(minutes=5 * i)
+            cache.put_stream(f"http://x/rrc00/{slot:%Y.%m}/updates.{slot:%Y%m%d.%H%M}.gz", [b"x" * size])
+        on_disk = sum(st.st_size for st in scan().values())
+        tracked = cache.total_bytes()
+    finally:
+        mrt_cache.IN_USE_GRACE_SEC = grace
+        tmp.cleanup()
+    return check(
+        len(scans) <= files // 5 and tracked == on_disk <= cap_files * size, "MRT 缓存淘汰到低水位",
+        f"{files} 次写入扫描 {len(scans)} 次，累计 {tracked} 字节 / 磁盘 {on_disk} / 上限 {cap_files * size}",
+    )
+
+
+def _run(stats, label, **kwargs):
+    stats.reset()
+    end = (START + timedelta(minutes=5 * kwargs.pop("slots"))).strftime("%Y-%m-%dT%H:%M:%S")
+    t0 = time.perf_counter()
+    updates, source = ris_mrt_fetcher.fetch_and_parse(
+        PREFIX, START.strftime("%Y-%m-%dT%H:%M:%S"), end, max_files=None, **kwargs
+    )
+    elapsed = time.perf_counter() - t0
+    print(f"{label}: {len(updates)} 条 update，{stats.requests} 次请求（404 {stats.not_found}），"
+          f"峰值在途 {stats.peak}，{elapsed:.2f}s")
+    return updates
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MRT 并发下载本地桩服务检查")
+    parser.add_argument("--slots", type=int, default=12, help="5 分钟槽数")
+    parser.add_argument("--workers", type=int, default=4, help="并发下载数")
+    parser.add_argument("--delay", type=float, default=0.05, help="桩服务平均延迟（秒）")
+    args = parser.parse_args()
+
+    missing = {3, 7} if args.slots > 7 else set()
+    files, expected = make_fixtures(args.slots, missing)
+    collector_files, collector_expected, collector_merged = make_collector_fixtures(
+        args.slots, missing, ris_mrt_fetcher.MERGE_TOLERANCE_SEC - 2
+    )
+    files.update(collector_files)
+    stats = _Stats()
+    server = _make_server(files, stats, args.delay)
+    ris_mrt_fetcher.RIS_BASE = f"http://127.0.0.1:{server.server_address[1]}"
+    results = []
+
+    serial = _run(stats, "串行", slots=args.slots, workers=1, use_cache=False)
+    results.append(check(stats.peak == 1, "workers=1 串行下载"))
+    pooled = _run(stats, "并发", slots=args.slots, workers=args.workers, use_cache=False)
+    results.append(check(stats.peak <= args.workers, "在途请求不超过 workers", f"峰值 {stats.peak} / {args.workers}"))
+    results.append(check(pooled == serial, "并发结果与串行完全一致（含顺序）"))
+    streamed = _run(stats, "流式", slots=args.slots, workers=args.workers, stream=True)
+    results.append(check(streamed == serial, "流式结果与串行一致"))
+
+    stamps = [u["raw_timestamp"] for u in pooled]
+    results.append(check(stamps == sorted(stamps), "按文件时间顺序排列"))
+    results.append(check(
+        len(pooled) == expected, "跨文件重复 update 去重", f"期望 {expected}，实际 {len(pooled)}",
+    ))
+    results.append(check(
+        stats.requests == args.slots and stats.not_found == len(missing), "404 文件跳过",
+        f"{len(missing)} 个槽缺失",
+    ))
+
+    end = (START + timedelta(minutes=5 * args.slots)).strftime("%Y-%m-%dT%H:%M:%S")
+    merged, _ = ris_mrt_fetcher.fetch_and_parse_collectors(
+        PREFIX, START.strftime("%Y-%m-%dT%H:%M:%S"), end, rrcs=["rrc24", "rrc25"],
+        max_files=None, workers=args.workers, use_cache=False,
+    )
+    both = [u for u in merged if u["seen_by"] == ["rrc24", "rrc25"]]
+    epoch0 = int((START - datetime(1970, 1, 1)).total_seconds())
+    results.append(check(
+        len(merged) == collector_expected and len(both) == collector_merged
+        and all(u["collector"] == "rrc24" and (u["raw_timestamp"] - epoch0) % 20 == 0 for u in both),
+        "跨 collector 时间容差合并",
+        f"期望 {collector_expected} 条（合并 {collector_merged}），实际 {len(merged)} 条（合并 {len(both)}）",
+    ))
+
+    tmp = tempfile.TemporaryDirectory()
+    mrt_cache._DEFAULT_CACHE = mrt_cache.MRTCache(tmp.name)
+    first = _run(stats, "缓存首次", slots=args.slots, workers=args.workers, use_cache=True)
+    second = _run(stats, "缓存再次", slots=args.slots, workers=args.workers, use_cache=True)
+    results.append(check(
+        first == serial and second == serial and stats.requests == 0, "缓存命中与 404 缺失标记",
+        f"第二次运行联网 {stats.requests} 次",
+    ))
+    mrt_cache._DEFAULT_CACHE = None
+    server.shutdown()
+    tmp.cleanup()
+    results.append(_eviction_check())
+
+    if not all(results):
+        sys.exit(1)
+    print("✅ 全部检查通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+RIPEstat 客户端检查：在本地桩服务上验证连接池复用、按 endpoint 并发上限、429/503 重试、
+BGPToolKit.acall_tool 并发诊断时不阻塞事件循环、BGPDataProvider 合并并发的相同查询
+（负责查询的协程被取消时等待方重新发起；失败结果不驻留进程内缓存），
+以及持久化缓存的命中 / 过期 / 负缓存 / cache-only 行为。
+
+桩服务实现 rpki-validation / as-overview / maxmind-geo-lite / whois 四个 endpoint，
+每个请求固定延迟 --delay 秒，并统计 TCP 连接数与各 endpoint 的最大在途请求数。
+
+使用: python scripts/check_ripestat_client.py [--delay 0.05] [--requests 64]
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools import ripestat_client, ripestat_cache
+from tools.data_provider import BGPDataProvider
+from check_common import ServerStats, check, make_ripestat_server
+
+
+async def _async_checks(stats, n_requests, delay):
+    results = []
+    client = await ripestat_client.get_async_client()
+
+    # 1. 连接复用 + 并发上限
+    stats.reset()
+    limit = client.endpoint_limits["rpki-validation"]
+    t0 = time.perf_counter()
+    out = await asyncio.gather(*(
+        client.get("rpki-validation", {"resource": str(64500 + i), "prefix": "10.0.0.0/8"})
+        for i in range(n_requests)
+    ))
+    elapsed = time.perf_counter() - t0
+    results.append(check(
+        all(o.get("status") == "invalid_asn" for o in out), "异步请求全部成功", f"{n_requests} 个请求 {elapsed:.2f}s"
+    ))
+    results.append(check(
+        stats.peak.get("rpki-validation", 0) <= limit,
+        "rpki-validation 并发不超过上限", f"峰值 {stats.peak.get('rpki-validation')} / 上限 {limit}",
+    ))
+    results.append(check(
+        stats.connections <= limit, "连接池复用", f"{stats.requests} 个请求使用 {stats.connections} 条 TCP 连接",
+    ))
+
+    # 2. 429 / 503 重试
+    stats.reset()
+    stats.failures["as-overview"] = [429, 503]
+    info = await client.get("as-overview", {"resource": "AS13335"})
+    results.append(check(
+        info.get("holder") == "HOLDER-AS13335" and stats.requests == 3, "429 / 503 后重试成功",
+        f"共 {stats.requests} 次请求",
+    ))
+
+    # 3. 并发的相同查询合并为一次请求
+    stats.reset()
+    before = BGPDataProvider.coalescing_stats()["coalesced"]
+    out = await asyncio.gather(*(BGPDataProvider.aget_rpki_status("192.0.2.0/24", "AS64496") for _ in range(32)))
+    saved = BGPDataProvider.coalescing_stats()["coalesced"] - before
+    results.append(check(
+        len(set(out)) == 1 and stats.requests == 1 and saved == 31, "异步相同查询合并",
+        f"32 次调用 {stats.requests} 次联网，合并 {saved} 次",
+    ))
+
+    # 3b. 负责查询的协程被取消：等待方重新发起查询，而不是跟着被取消
+    stats.reset()
+    leader = asyncio.create_task(BGPDataProvider.aget_rpki_status("198.51.100.0/24", "AS64497"))
+    await asyncio.sleep(0)
+    followers = [asyncio.create_task(BGPDataProvider.aget_rpki_status("198.51.100.0/24", "AS64497"))
+                 for _ in range(4)]
+    await asyncio.sleep(delay / 2)
+    leader.cancel()
+    out = await asyncio.gather(*followers, return_exceptions=True)
+    try:
+        await leader
+        leader_cancelled = False
+    except asyncio.CancelledError:
+        leader_cancelled = True
+    results.append(check(
+        leader_cancelled and all(o == "invalid_asn" for o in out), "负责方被取消后等待方重新查询",
+        f"等待方结果 {[type(o).__name__ if isinstance(o, BaseException) else o for o in out]}",
+    ))
+
+    # 4. 并发诊断期间事件循环心跳
+    from tools.bgp_toolkit import BGPToolKit
+
+    BGPDataProvider.cache_clear()
+    toolkit = BGPToolKit.__new__(BGPToolKit)
+    toolkit.graph_engine = None
+    gaps = []
+    stop = asyncio.Event()
+
+    async def heartbeat():
+        last = time.perf_counter()
+        while not stop.is_set():
+            await asyncio.sleep(0.01)
+            now = time.perf_counter()
+            gaps.append(now - last)
+            last = now
+
+    contexts = [
+        {"prefix": f"10.{i}.0.0/16", "as_path": f"3356 {64500 + i} 13335", "detected_origin": "13335",
+         "expected_origin": "13335", "timestamp": "2024-01-01 00:00:00"}
+        for i in range(16)
+    ]
+    hb = asyncio.create_task(heartbeat())
+    t0 = time.perf_counter()
+    reports = await asyncio.gather(*(
+        toolkit.acall_tool(tool, ctx)
+        for ctx in contexts for tool in ("authority_check", "geo_check", "neighbor_check")
+    ))
+    elapsed = time.perf_counter() - t0
+    stop.set()
+    await hb
+    worst = max(gaps) if gaps else 0.0
+    results.append(check(
+        all(r.startswith(("VALID", "MATCH", "CONFLICT", "LOW_RISK", "INFO")) for r in reports),
+        "acall_tool 报告正常", f"{len(reports)} 次工具调用 {elapsed:.2f}s",
+    ))
+    results.append(check(worst < max(0.2, delay * 2), "事件循环未被阻塞", f"最大心跳间隔 {worst * 1000:.0f}ms"))
+    return results
+
+
+def _cache_checks(stats, cache_path):
+    """持久化缓存：跨实例命中、TTL 过期、失败负缓存、cache-only 不联网"""
+    results = []
+    cache = ripestat_cache.RIPEstatCache(cache_path, ttl={"as-overview": 3600})
+    client = ripestat_client.RIPEstatClient(cache=cache, max_retries=1)
+    params = {"resource": "AS3333"}
+
+    stats.reset()
+    first = client.get("as-overview", params)
+    # 新实例（模拟新进程）读取同一文件
+    cache2 = ripestat_cache.RIPEstatCache(cache_path, ttl={"as-overview": 3600})
+    second = ripestat_client.RIPEstatClient(cache=cache2).get("as-overview", params)
+    results.append(check(
+        first == second and stats.requests == 1 and cache2.hits == 1, "跨进程命中持久化缓存",
+        f"2 次查询 {stats.requests} 次联网",
+    ))
+
+    stats.reset()
+    expired = ripestat_cache.RIPEstatCache(cache_path, ttl={"as-overview": 0})
+    ripestat_client.RIPEstatClient(cache=expired).get("as-overview", params)
+    results.append(check(stats.requests == 1 and expired.expired == 1, "TTL 过期后重新联网"))
+
+    stats.reset()
+    stats.failures["whois"] = [503, 503]
+    client.get("whois", {"resource": "AS64511"})
+    client.get("whois", {"resource": "AS64511"})
+    results.append(check(
+        stats.requests == 2 and cache.negative_hits == 1, "失败结果负缓存", f"重试耗尽后第二次查询联网 {stats.requests - 2} 次",
+    ))
+
+    stats.reset()
+    offline = ripestat_cache.RIPEstatCache(cache_path, cache_only=True)
+    offline_client = ripestat_client.RIPEstatClient(cache=offline)
+    hit = offline_client.get("as-overview", {"resource": "AS3333"})
+    miss = offline_client.get("as-overview", {"resource": "AS3334"})
+    results.append(check(
+        stats.requests == 0 and hit and miss == {} and offline.offline_misses == 1, "cache-only 模式不联网",
+        json.dumps(offline.stats(), ensure_ascii=False),
+    ))
+    for c in (cache, cache2, expired, offline):
+        c.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RIPEstat 客户端本地桩服务检查")
+    parser.add_argument("--delay", type=float, default=0.05, help="桩服务每个请求的延迟（秒）")
+    parser.add_argument("--requests", type=int, default=64, help="并发请求数")
+    args = parser.parse_args()
+
+    stats = ServerStats()
+    server = make_ripestat_server(stats, args.delay)
+    ripestat_client.BASE_URL = f"http://127.0.0.1:{server.server_address[1]}/data"
+    ripestat_client.BACKOFF_BASE = 0.01
+    tmp = tempfile.TemporaryDirectory()
+    # 默认持久化缓存指向临时文件，避免复用历史结果影响计数
+    ripestat_cache._DEFAULT_CACHE = ripestat_cache.RIPEstatCache(os.path.join(tmp.name, "default.sqlite"))
+    results = []
+
+    # 同步客户端：顺序请求复用同一连接
+    stats.reset()
+    for i in range(8):
+        BGPDataProvider.get_as_info(str(64500 + i))
+    results.append(check(stats.connections == 1, "同步 Session 连接复用", f"8 个请求使用 {stats.connections} 条连接"))
+    rpki = BGPDataProvider.get_rpki_status("1.1.1.0/24", "AS13335")
+    results.append(check(rpki == "valid", "同步 RPKI 查询", rpki))
+
+    stats.reset()
+    before = BGPDataProvider.coalescing_stats()["coalesced"]
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        holders = list(pool.map(lambda _: BGPDataProvider.get_as_info("64497")["holder"], range(16)))
+    saved = BGPDataProvider.coalescing_stats()["coalesced"] - before
+    results.append(check(
+        len(set(holders)) == 1 and stats.requests == 1, "多线程相同查询合并",
+        f"16 个线程 {stats.requests} 次联网，合并 {saved} 次",
+    ))
+
+    # 失败结果不写进程内 LRU：持久化负缓存期内不联网，过期后重新查询即可恢复
+    stats.reset()
+    stats.failures["as-overview"] = [404]
+    failed = BGPDataProvider.get_as_info("64496")["holder"]
+    again = BGPDataProvider.get_as_info("64496")["holder"]
+    default_cache = ripestat_cache.get_default_cache()
+    default_cache.negative_ttl = 0
+    recovered = BGPDataProvider.get_as_info("64496")["holder"]
+    default_cache.negative_ttl = ripestat_cache.NEGATIVE_TTL_SEC
+    results.append(check(
+        failed == again == "AS64496" and recovered == "HOLDER-AS64496" and stats.requests == 2,
+        "失败结果不驻留进程内缓存", f"负缓存期内 / 过期后共联网 {stats.requests} 次，恢复为 {recovered}",
+    ))
+
+    if ripestat_client.aiohttp is None:
+        print("未安装 aiohttp，异步接口回退到线程池")
+    results.extend(asyncio.run(_async_checks(stats, args.requests, args.delay)))
+    results.extend(_cache_checks(stats, os.path.join(tmp.name, "ripestat_cache.sqlite")))
+    server.shutdown()
+    ripestat_cache.get_default_cache().close()
+    tmp.cleanup()
+
+    if not all(results):
+        sys.exit(1)
+    print("✅ 全部检查通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+向量化筛选等价性检查：filter_suspicious_from_ris 逐条判定 vs tools/vector_filter.py 批量判定。
+
+数据来源：
+1) 分类案例库（data/case_catalog/*/cases_10.json）中含 context.updates 的案例
+2) 案例事件在本地事件缓存（data/events，列式库或逐事件目录）中命中的 suspicious_updates
+3) 合成 RIS updates（--synthetic 条，路径取自 --distinct-paths 条的路径池），用于覆盖大批量并计时
+
+每组 updates 分别以案例 Owner、组内出现过的每个 Origin 作为 expected，Valley-Free 开 / 关各跑一次，
+要求两种实现输出的记录（含 reason / suspicious_as / 来源标记）完全一致。
+
+使用: python scripts/check_vector_filter_equivalence.py [--types hijack,leak,forgery] [--synthetic 200000] [--distinct-paths 5000]
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from tools import vector_filter
+from tools.config_loader import get_tier1_asns
+from tools.ris_mrt_fetcher import filter_suspicious_from_ris
+from tools.event_store import load_events
+from tools.project_paths import CASE_CATALOG_DIR, EVENTS_DIR
+
+
+def _case_groups(catalog_root: Path, types, events_dir):
+    """产出 (标签, expected, updates)"""
+    cached = load_events(events_dir) if events_dir and os.path.isdir(events_dir) else []
+    for t in types:
+        path = catalog_root / t / "cases_10.json"
+        if not path.exists():
+            continue
+        with path.open("r", encoding="utf-8") as f:
+            cases = json.load(f)
+        for case in cases:
+            label = case.get("case_id", "?")
+            event = case.get("event") or {}
+            updates = (case.get("context") or {}).get("updates") or []
+            owner = str(event.get("victim") or "")
+            if not owner and updates:
+                owner = str(updates[0].get("expected_origin", ""))
+            if updates:
+                yield label, owner, updates
+            prefix = event.get("prefix")
+            for event_id, meta, ups in cached:
+                if prefix and meta.get("prefix") == prefix and ups:
+                    yield f"{label}@{event_id}", owner or str(meta.get("victim", "")), ups
+
+
+def _edge_updates():
+    """边界形态：列表路径、逗号分隔、非数字 token、分隔符 token、空 Origin、短路径"""
+    t1 = sorted(get_tier1_asns())[:2] or ["3356", "174"]
+    a, b = t1[0], t1[-1]
+    paths = [
+        f"{a} 65001 {b} 15169", f"{a},65001,{b},15169", f"{a} | 65001 {b} 15169",
+        f"{a} {{65001,65002}} {b} 15169", f"{a} 65001", "15169", "",
+        [int(a), 65001, int(b), 15169], [a, "65001", b, "4761"], [a, "1,234", b, "15169"],
+    ]
+    updates = []
+    for i, path in enumerate(paths):
+        origin = "" if path == "" else ("4761" if i % 4 == 3 else "15169")
+        updates.append({"prefix": "8.8.8.0/24", "as_path": path, "detected_origin": origin, "timestamp": str(i)})
+    return updates
+
+
+def _synthetic_updates(n: int, distinct_paths: int, seed: int = 3):
+    """合成 RIS updates：从 distinct_paths 条路径中抽样（真实窗口内大量 update 共享少量路径）"""
+    from bench_update_filter import make_payload
+
+    rnd = random.Random(seed)
+    payload = make_payload(max(distinct_paths, 1), 12)
+    pool = []
+    for e in payload["events"] + payload["initial_state"]:
+        path = e.get("attrs", e)["path"]
+        pool.append(path if isinstance(path, str) else " ".join(str(p) for p in path))
+    updates = []
+    for i in range(n):
+        as_path = rnd.choice(pool)
+        u = {
+            "prefix": rnd.choice(("8.8.8.0/24", "8.8.8.0/25")),
+            "as_path": as_path,
+            "detected_origin": as_path.split()[-1],
+            "timestamp": f"2014-04-01T08:{i // 3600 % 60:02d}:{i // 60 % 60:02d}",
+        }
+        if i % 3:
+            u["collector"] = "rrc00" if i % 3 == 1 else "rrc24"
+            u["seen_by"] = ["rrc00", "rrc24"][: i % 3]
+        updates.append(u)
+    return updates
+
+
+def _compare(updates, prefix, expected, use_valley_free):
+    a = filter_suspicious_from_ris(updates, prefix, expected, use_valley_free=use_valley_free, vectorized=False)
+    b = filter_suspicious_from_ris(updates, prefix, expected, use_valley_free=use_valley_free, vectorized=True)
+    return a == b, len(a)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="向量化可疑 update 筛选等价性检查")
+    parser.add_argument("--types", default="hijack,leak,forgery", help="案例类别，逗号分隔")
+    parser.add_argument("--events-dir", default=str(EVENTS_DIR), help="本地事件缓存目录")
+    parser.add_argument("--synthetic", type=int, default=200_000, help="合成 updates 条数（0 关闭）")
+    parser.add_argument("--distinct-paths", type=int, default=5000, help="合成 updates 中不同 AS path 的数量")
+    args = parser.parse_args()
+
+    if not vector_filter.vector_filter_available():
+        print("未安装 numpy，无法运行向量化判定")
+        sys.exit(1)
+    # 案例库批量很小，强制走向量化路径
+    vector_filter.VECTOR_MIN_BATCH = 0
+
+    types = [t.strip() for t in args.types.split(",") if t.strip()]
+    groups = list(_case_groups(CASE_CATALOG_DIR, types, args.events_dir))
+    groups.append(("边界样例", "15169", _edge_updates()))
+    checks = mismatches = suspicious = 0
+    for label, owner, updates in groups:
+        prefix = str(updates[0].get("prefix", ""))
+        candidates = {owner} | {str(u.get("detected_origin", "")) for u in updates}
+        for expected in sorted(c for c in candidates if c):
+            for vf in (True, False):
+                same, n = _compare(updates, prefix, expected, vf)
+                checks += 1
+                suspicious += n
+                if not same:
+                    mismatches += 1
+                    print(f"❌ {label} expected={expected} valley_free={vf}")
+    print(f"案例组 {len(groups)} | 检查 {checks} 次 | 可疑记录 {suspicious} | 不一致 {mismatches}")
+
+    if args.synthetic > 0:
+        updates = _synthetic_updates(args.synthetic, args.distinct_paths)
+        print(f"合成 {len(updates)} 条 updates，{len({u['as_path'] for u in updates})} 条不同路径")
+        for vf in (True, False):
+            t0 = time.perf_counter()
+            a = filter_suspicious_from_ris(updates, "8.8.8.0/24", "15169", use_valley_free=vf, vectorized=False)
+            t1 = time.perf_counter()
+            b = filter_suspicious_from_ris(updates, "8.8.8.0/24", "15169", use_valley_free=vf, vectorized=True)
+            t2 = time.perf_counter()
+            same = a == b
+            mismatches += not same
+            print(
+                f"valley_free={vf}: 可疑 {len(a)} | "
+                f"逐条 {t1 - t0:.3f}s | 向量化 {t2 - t1:.3f}s ({(t1 - t0) / (t2 - t1):.1f}x) | 一致: {same}"
+            )
+
+    if mismatches:
+        sys.exit(1)
+    print("✅ 两种实现输出一致")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+下载本地 AS 元数据库的数据源到 data/as_metadata/（或 AS_METADATA_DIR）：
+
+- 五个 RIR 的 delegated-<rir>-extended-latest（ASN / IPv4 / IPv6 分配段 -> 国家）
+- CAIDA as2org 最新一期（*.as-org2info.jsonl.gz，ASN -> 名称 / 组织 / 国家）
+
+文件先写 .part 再原子替换，下载失败时保留旧文件；完成后加载一次并打印统计。
+
+使用: python scripts/fetch_as_metadata.py [--skip-delegated] [--skip-as2org] [--as2org-url URL]
+"""
+import os
+import re
+import sys
+import time
+import argparse
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.as_metadata import ASMetadataStore, metadata_dir
+
+DELEGATED_URLS = {
+    "ripencc": "https://ftp.ripe.net/pub/stats/ripencc/delegated-ripencc-extended-latest",
+    "arin": "https://ftp.arin.net/pub/stats/arin/delegated-arin-extended-latest",
+    "apnic": "https://ftp.apnic.net/stats/apnic/delegated-apnic-extended-latest",
+    "lacnic": "https://ftp.lacnic.net/pub/stats/lacnic/delegated-lacnic-extended-latest",
+    "afrinic": "https://ftp.afrinic.net/pub/stats/afrinic/delegated-afrinic-extended-latest",
+}
+AS2ORG_INDEX = "https://publicdata.caida.org/datasets/as-organizations/"
+
+
+def _download(url: str, dest: str) -> bool:
+    tmp = dest + ".part"
+    try:
+        with requests.get(url, timeout=120, stream=True) as resp:
+            resp.raise_for_status()
+            with open(tmp, "wb") as f:
+                for chunk in resp.iter_content(chunk_size=65536):
+                    f.write(chunk)
+        os.replace(tmp, dest)
+        print(f"✅ {os.path.basename(dest)} ({os.path.getsize(dest) / 1e6:.1f} MB)")
+        return True
+    except (requests.RequestException, OSError) as e:
+        print(f"❌ {url}: {e}")
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        return False
+
+
+def latest_as2org_url() -> str:
+    """CAIDA 目录页中日期最新的 as-org2info.jsonl.gz"""
+    resp = requests.get(AS2ORG_INDEX, timeout=60)
+    resp.raise_for_status()
+    names = sorted(set(re.findall(r"\d{8}\.as-org2info\.jsonl\.gz", resp.text)))
+    if not names:
+        raise ValueError("CAIDA 目录页中未找到 as-org2info 文件")
+    return AS2ORG_INDEX + names[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="下载 RIR delegated stats 与 CAIDA as2org")
+    parser.add_argument("--output-dir", default="", help="输出目录，默认 AS_METADATA_DIR 或 data/as_metadata/")
+    parser.add_argument("--skip-delegated", action="store_true", help="不下载 RIR delegated stats")
+    parser.add_argument("--skip-as2org", action="store_true", help="不下载 CAIDA as2org")
+    parser.add_argument("--as2org-url", default="", help="指定 as2org 文件 URL（默认取 CAIDA 最新一期）")
+    args = parser.parse_args()
+
+    root = args.output_dir or metadata_dir()
+    os.makedirs(root, exist_ok=True)
+    ok = True
+
+    if not args.skip_delegated:
+        for rir, url in DELEGATED_URLS.items():
+            ok &= _download(url, os.path.join(root, f"delegated-{rir}-extended-latest"))
+
+    if not args.skip_as2org:
+        try:
+            url = args.as2org_url or latest_as2org_url()
+        except (requests.RequestException, ValueError) as e:
+            print(f"❌ 获取 as2org 列表失败: {e}")
+            ok = False
+        else:
+            name = url.rstrip("/").rsplit("/", 1)[-1]
+            if _download(url, os.path.join(root, name)):
+                # 只保留最新一期，避免旧文件覆盖新名称
+                for old in os.listdir(root):
+                    if "as-org2info" in old and old != name and not old.endswith(".part"):
+                        os.remove(os.path.join(root, old))
+            else:
+                ok = False
+
+    t0 = time.perf_counter()
+    store = ASMetadataStore.load_dir(root)
+    stats = store.stats()
+    print(
+        f"加载 {root}: {stats['asns']} 个 ASN 名称，{stats['country_ranges']} 个国家段，"
+        f"{time.perf_counter() - t0:.1f}s"
+    )
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
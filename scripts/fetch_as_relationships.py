@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+下载 CAIDA AS-relationship 数据集（serial-2，YYYYMMDD.as-rel2.txt.bz2）到 data/as_graph/，
+供 tools/as_graph.py 的进程内 CSR 图后端使用。默认取最新一期，文件先写 .part 再原子替换。
+
+使用: python scripts/fetch_as_relationships.py [--date 20240101] [--url URL]
+"""
+import os
+import re
+import sys
+import time
+import argparse
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.as_graph import ASGraph
+from tools.project_paths import AS_REL_FILE
+
+AS_REL_INDEX = "https://publicdata.caida.org/datasets/as-relationships/serial-2/"
+
+
+def latest_as_rel_url(date: str = "") -> str:
+    """CAIDA 目录页中日期最新（或指定日期）的 as-rel2 文件"""
+    resp = requests.get(AS_REL_INDEX, timeout=60)
+    resp.raise_for_status()
+    names = sorted(set(re.findall(r"\d{8}\.as-rel2\.txt\.bz2", resp.text)))
+    if date:
+        names = [n for n in names if n.startswith(date)]
+    if not names:
+        raise ValueError(f"CAIDA 目录页中未找到 as-rel2 文件{'（' + date + '）' if date else ''}")
+    return AS_REL_INDEX + names[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="下载 CAIDA AS-relationship 数据集")
+    parser.add_argument("--date", default="", help="数据集日期 YYYYMMDD（默认最新）")
+    parser.add_argument("--url", default="", help="直接指定文件 URL")
+    parser.add_argument("--output-dir", default=str(AS_REL_FILE.parent), help="输出目录")
+    args = parser.parse_args()
+
+    try:
+        url = args.url or latest_as_rel_url(args.date)
+    except (requests.RequestException, ValueError) as e:
+        print(f"❌ 获取 AS-relationship 列表失败: {e}")
+        sys.exit(1)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    dest = os.path.join(args.output_dir, url.rstrip("/").rsplit("/", 1)[-1])
+    tmp = dest + ".part"
+    try:
+        with requests.get(url, timeout=120, stream=True) as resp:
+            resp.raise_for_status()
+            with open(tmp, "wb") as f:
+                for chunk in resp.iter_content(chunk_size=65536):
+                    f.write(chunk)
+        os.replace(tmp, dest)
+    except (requests.RequestException, OSError) as e:
+        print(f"❌ {url}: {e}")
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        sys.exit(1)
+
+    t0 = time.perf_counter()
+    graph = ASGraph.load(dest)
+    print(f"✅ {dest}: {graph.stats()}，加载 {time.perf_counter() - t0:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
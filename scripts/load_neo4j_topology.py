@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+把 CAIDA AS-relationship / prefix2as（及本地 AS 元数据）批量导入 Neo4j，供 graph_analysis 的 Neo4j 后端使用。
+导入幂等（UNWIND + MERGE，先建唯一约束），可重复执行；不会清空已有数据。
+
+默认读取 data/as_graph/ 下最新的 as-rel 文件（见 scripts/fetch_as_relationships.py）；
+prefix2as 可从 https://publicdata.caida.org/datasets/routing/routeviews-prefix2as/ 下载。
+
+使用: python scripts/load_neo4j_topology.py [--as-rel FILE] [--pfx2as FILE] [--with-metadata] [--batch-size 10000]
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.as_graph import as_rel_path
+from tools.as_metadata import get_as_metadata
+from tools.neo4j_loader import DEFAULT_BATCH_SIZE, load_topology
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CAIDA 拓扑批量导入 Neo4j")
+    parser.add_argument("--as-rel", default="", help="AS-relationship 文件，默认 data/as_graph/ 下最新一份")
+    parser.add_argument("--pfx2as", default="", help="CAIDA prefix2as 文件（可 .gz）")
+    parser.add_argument("--with-metadata", action="store_true", help="用本地 AS 元数据库补充 AS 名称 / 国家")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="每个写事务的行数")
+    parser.add_argument("--uri", default=os.getenv("NEO4J_URI", "bolt://localhost:7687"))
+    parser.add_argument("--user", default=os.getenv("NEO4J_USER", "neo4j"))
+    parser.add_argument("--password", default=os.getenv("NEO4J_PASSWORD", "neo4j"))
+    parser.add_argument("--database", default=os.getenv("NEO4J_DATABASE", ""), help="目标数据库（默认服务端默认库）")
+    args = parser.parse_args()
+
+    from neo4j import GraphDatabase
+
+    as_rel = args.as_rel or as_rel_path()
+    metadata = get_as_metadata() if args.with_metadata else None
+    if args.with_metadata and metadata is None:
+        print("⚠️ 未找到本地 AS 元数据（scripts/fetch_as_metadata.py），跳过名称补充")
+    if not as_rel and not args.pfx2as and metadata is None:
+        print("没有可导入的数据：请指定 --as-rel / --pfx2as，或先运行 scripts/fetch_as_relationships.py")
+        sys.exit(1)
+
+    t0 = time.perf_counter()
+
+    def progress(label, n):
+        elapsed = time.perf_counter() - t0
+        print(f"  {label}: {n} 行（{elapsed:.0f}s）", end="\r", flush=True)
+
+    driver = GraphDatabase.driver(args.uri, auth=(args.user, args.password))
+    try:
+        driver.verify_connectivity()
+        summary = load_topology(
+            driver, as_rel=as_rel or None, pfx2as=args.pfx2as or None, metadata=metadata,
+            database=args.database or None, batch_size=args.batch_size, progress=progress,
+        )
+    finally:
+        driver.close()
+    rows = sum(v for k, v in summary.items() if k != "elapsed_sec")
+    print(f"\n✅ 导入完成: {summary}，{rows / max(summary['elapsed_sec'], 1e-9):.0f} 行/s")
+
+
+if __name__ == "__main__":
+    main()
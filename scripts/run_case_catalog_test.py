@@ -34,6 +34,10 @@ from tools.project_paths import (
     EXPERIMENT_REAL_EVENTS_DIR,
     REPORT_FORENSICS_DIR,
 )  # noqa: E402
+from tools.event_store import load_event_index, load_event_updates, load_events  # noqa: E402
+from tools.ripestat_cache import get_default_cache, set_cache_only  # noqa: E402
+from tools.data_provider import BGPDataProvider  # noqa: E402
+from tools.rpki_vrp import set_default_vrp, vrp_path  # noqa: E402
 
 
 def normalize_asn(val: Any) -> str:
@@ -101,7 +105,12 @@ def build_updates_from_event_dir(event_dir: Path, fallback_event: Dict[str, Any]
         updates = load_json(updates_path)
     except Exception:
         return None
+    return build_updates_from_event(meta, updates, fallback_event)
 
+
+def build_updates_from_event(
+    meta: Dict[str, Any], updates: List[Dict[str, Any]], fallback_event: Dict[str, Any]
+) -> Optional[Dict[str, Any]]:
     if not updates:
         return None
 
@@ -143,12 +152,20 @@ def event_match_score(event: Dict[str, Any], meta: Dict[str, Any]) -> int:
 def resolve_context_from_cache(
     event: Dict[str, Any], cache_dirs: List[Path]
 ) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
-    candidates: List[Tuple[int, Path]] = []
+    # 候选: (score, 事件目录, 列式库中的 event_id)；列式库只读索引表打分，命中后再取 updates
+    candidates: List[Tuple[int, Path, Optional[str]]] = []
     for cache_dir in cache_dirs:
         if not cache_dir.exists() or not cache_dir.is_dir():
             continue
+        stored = set()
+        for meta in load_event_index(cache_dir):
+            event_id = str(meta.get("event_id", ""))
+            stored.add(event_id)
+            score = event_match_score(event, meta)
+            if score >= 6:
+                candidates.append((score, cache_dir, event_id))
         for child in cache_dir.iterdir():
-            if not child.is_dir():
+            if not child.is_dir() or child.name in stored:
                 continue
             meta_path = child / "meta.json"
             if not meta_path.exists():
@@ -159,16 +176,22 @@ def resolve_context_from_cache(
                 continue
             score = event_match_score(event, meta)
             if score >= 6:
-                candidates.append((score, child))
+                candidates.append((score, child, None))
 
     if not candidates:
         return None, None
 
     candidates.sort(key=lambda x: x[0], reverse=True)
-    for _, event_dir in candidates:
-        context = build_updates_from_event_dir(event_dir, event)
+    for _, event_dir, event_id in candidates:
+        if event_id is None:
+            context = build_updates_from_event_dir(event_dir, event)
+            source = f"cache:{event_dir}"
+        else:
+            meta = next((m for m in load_event_index(event_dir) if str(m.get("event_id", "")) == event_id), {})
+            context = build_updates_from_event(meta, load_event_updates(event_dir, event_id), event)
+            source = f"cache:{event_dir / event_id}"
         if context and context.get("updates"):
-            return context, f"cache:{event_dir}"
+            return context, source
     return None, None
 
 
@@ -197,11 +220,10 @@ def fetch_context_via_step1(
         if not output_dir.exists():
             return None, None, "Step1 输出目录不存在"
 
-        for child in output_dir.iterdir():
-            if child.is_dir():
-                context = build_updates_from_event_dir(child, event)
-                if context and context.get("updates"):
-                    return context, f"fetched:{child}", None
+        for event_id, meta, updates in load_events(output_dir):
+            context = build_updates_from_event(meta, updates, event)
+            if context and context.get("updates"):
+                return context, f"fetched:{output_dir / event_id}", None
         return None, None, "Step1 未生成可用 suspicious_updates"
     except subprocess.CalledProcessError as e:
         err = e.stderr.strip() if e.stderr else str(e)
@@ -250,107 +272,116 @@ async def run_eval(args: argparse.Namespace) -> Dict[str, Any]:
     if args.max_cases > 0:
         cases = cases[: args.max_cases]
 
+    if args.ripestat_cache_only:
+        set_cache_only(True)
+    if args.vrp_file:
+        set_default_vrp(args.vrp_file)
     agent = BGPAgent(report_dir=args.trace_report_dir)
 
     results: List[Dict[str, Any]] = []
     skipped: List[Dict[str, Any]] = []
 
-    for idx, case in enumerate(cases, 1):
-        case_id = case.get("case_id", f"CASE-{idx:03d}")
-        event_type = str(case.get("event_type", "UNKNOWN")).upper().strip()
-        source_type = case.get("source_type", "unknown")
-        expected_attacker = normalize_asn(case.get("expected_attacker"))
-        if expected_attacker == "None" and isinstance(case.get("event"), dict):
-            expected_attacker = normalize_asn(case["event"].get("attacker"))
-
-        context = case.get("context")
-        context_source = "embedded"
-        fetch_error = None
-
-        if not (isinstance(context, dict) and isinstance(context.get("updates"), list) and context.get("updates")):
-            event = case.get("event") if isinstance(case.get("event"), dict) else None
-            if event:
-                context, context_source = resolve_context_from_cache(event, cache_dirs)
-                if context is None and args.fetch_missing_real:
-                    context, context_source, fetch_error = fetch_context_via_step1(
-                        event=event,
-                        source=args.source,
-                        project_root=project_root,
-                    )
+    try:
+        for idx, case in enumerate(cases, 1):
+            case_id = case.get("case_id", f"CASE-{idx:03d}")
+            event_type = str(case.get("event_type", "UNKNOWN")).upper().strip()
+            source_type = case.get("source_type", "unknown")
+            expected_attacker = normalize_asn(case.get("expected_attacker"))
+            if expected_attacker == "None" and isinstance(case.get("event"), dict):
+                expected_attacker = normalize_asn(case["event"].get("attacker"))
+
+            context = case.get("context")
+            context_source = "embedded"
+            fetch_error = None
+
+            if not (isinstance(context, dict) and isinstance(context.get("updates"), list) and context.get("updates")):
+                event = case.get("event") if isinstance(case.get("event"), dict) else None
+                if event:
+                    context, context_source = resolve_context_from_cache(event, cache_dirs)
+                    if context is None and args.fetch_missing_real:
+                        context, context_source, fetch_error = fetch_context_via_step1(
+                            event=event,
+                            source=args.source,
+                            project_root=project_root,
+                        )
+                else:
+                    context = None
+
+            if context is None:
+                skipped.append(
+                    {
+                        "case_id": case_id,
+                        "case_name": case.get("case_name"),
+                        "event_type": event_type,
+                        "source_type": source_type,
+                        "reason": fetch_error or "案例缺少可用 context.updates，且未能从缓存/抓取恢复。",
+                    }
+                )
+                continue
+
+            start = time.time()
+            trace: Dict[str, Any] = {}
+            error = None
+            try:
+                trace = await agent.diagnose_batch(context, verbose=args.verbose)
+            except Exception as e:
+                error = str(e)
+                trace = {"final_result": None, "error": error}
+            latency = round(time.time() - start, 3)
+
+            final = trace.get("final_result") if isinstance(trace, dict) else None
+            final = final if isinstance(final, dict) else {}
+            status = str(final.get("status", "UNKNOWN")).upper()
+            pred_attacker = normalize_asn(
+                final.get("most_likely_attacker", final.get("attacker_as", "None"))
+            )
+            output_summary = str(final.get("summary", ""))
+            output_type_fine = infer_fine_type_from_output(status, output_summary)
+            expected_type_coarse = map_expected_to_coarse(event_type)
+            output_type_coarse = map_status_to_coarse(status)
+
+            accept_uncertain = bool(case.get("accept_uncertain", False))
+            if expected_attacker == "None":
+                attacker_match = (pred_attacker == "None") or (accept_uncertain and status == "UNCERTAIN")
             else:
-                context = None
+                attacker_match = pred_attacker == expected_attacker
+
+            type_match_coarse = output_type_coarse == expected_type_coarse
+            type_match_fine = output_type_fine == event_type
 
-        if context is None:
-            skipped.append(
+            leak_check = check_reason_leak(case.get("simulation_reason", ""), trace if isinstance(trace, dict) else {})
+            reason_leaked = leak_check["field_name_leak"] or leak_check["exact_text_leak"]
+
+            results.append(
                 {
+                    "index": idx,
                     "case_id": case_id,
                     "case_name": case.get("case_name"),
-                    "event_type": event_type,
                     "source_type": source_type,
-                    "reason": fetch_error or "案例缺少可用 context.updates，且未能从缓存/抓取恢复。",
+                    "event_type_input": event_type,
+                    "event_type_input_coarse": expected_type_coarse,
+                    "attacker_input": expected_attacker,
+                    "event_type_output_raw": status,
+                    "event_type_output_coarse": output_type_coarse,
+                    "event_type_output_fine_inferred": output_type_fine,
+                    "attacker_output": pred_attacker,
+                    "attacker_match": attacker_match,
+                    "type_match_coarse": type_match_coarse,
+                    "type_match_fine_inferred": type_match_fine,
+                    "both_match_coarse": attacker_match and type_match_coarse,
+                    "accept_uncertain": accept_uncertain,
+                    "simulation_reason_leak": reason_leaked,
+                    "simulation_reason_leak_detail": leak_check,
+                    "context_source": context_source,
+                    "updates_count": len(context.get("updates", [])),
+                    "latency_sec": latency,
+                    "error": error,
                 }
             )
-            continue
-
-        start = time.time()
-        trace: Dict[str, Any] = {}
-        error = None
-        try:
-            trace = await agent.diagnose_batch(context, verbose=args.verbose)
-        except Exception as e:
-            error = str(e)
-            trace = {"final_result": None, "error": error}
-        latency = round(time.time() - start, 3)
-
-        final = trace.get("final_result") if isinstance(trace, dict) else None
-        final = final if isinstance(final, dict) else {}
-        status = str(final.get("status", "UNKNOWN")).upper()
-        pred_attacker = normalize_asn(
-            final.get("most_likely_attacker", final.get("attacker_as", "None"))
-        )
-        output_summary = str(final.get("summary", ""))
-        output_type_fine = infer_fine_type_from_output(status, output_summary)
-        expected_type_coarse = map_expected_to_coarse(event_type)
-        output_type_coarse = map_status_to_coarse(status)
-
-        accept_uncertain = bool(case.get("accept_uncertain", False))
-        if expected_attacker == "None":
-            attacker_match = (pred_attacker == "None") or (accept_uncertain and status == "UNCERTAIN")
-        else:
-            attacker_match = pred_attacker == expected_attacker
-
-        type_match_coarse = output_type_coarse == expected_type_coarse
-        type_match_fine = output_type_fine == event_type
-
-        leak_check = check_reason_leak(case.get("simulation_reason", ""), trace if isinstance(trace, dict) else {})
-        reason_leaked = leak_check["field_name_leak"] or leak_check["exact_text_leak"]
-
-        results.append(
-            {
-                "index": idx,
-                "case_id": case_id,
-                "case_name": case.get("case_name"),
-                "source_type": source_type,
-                "event_type_input": event_type,
-                "event_type_input_coarse": expected_type_coarse,
-                "attacker_input": expected_attacker,
-                "event_type_output_raw": status,
-                "event_type_output_coarse": output_type_coarse,
-                "event_type_output_fine_inferred": output_type_fine,
-                "attacker_output": pred_attacker,
-                "attacker_match": attacker_match,
-                "type_match_coarse": type_match_coarse,
-                "type_match_fine_inferred": type_match_fine,
-                "both_match_coarse": attacker_match and type_match_coarse,
-                "accept_uncertain": accept_uncertain,
-                "simulation_reason_leak": reason_leaked,
-                "simulation_reason_leak_detail": leak_check,
-                "context_source": context_source,
-                "updates_count": len(context.get("updates", [])),
-                "latency_sec": latency,
-                "error": error,
-            }
-        )
+        # 关闭前取图后端统计（close 后 graph_engine 置空）
+        graph_health = agent.toolkit.graph_health()
+    finally:
+        agent.close()
 
     valid_rows = [r for r in results if not r.get("error")]
     by_type: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
@@ -391,8 +422,15 @@ async def run_eval(args: argparse.Namespace) -> Dict[str, Any]:
             "cache_dirs": args.cache_dirs.split(","),
             "fetch_missing_real": args.fetch_missing_real,
             "source": args.source,
+            "ripestat_cache_only": args.ripestat_cache_only,
+            "vrp_file": vrp_path(),
         },
         "summary": summary,
+        "ripestat_cache": get_default_cache().stats(),
+        "ripestat_coalescing": BGPDataProvider.coalescing_stats(),
+        "as_metadata": BGPDataProvider.metadata_stats(),
+        "geo_index": BGPDataProvider.geo_index_stats(),
+        "graph_backend": graph_health,
         "by_type_summary": by_type_summary,
         "results": results,
         "skipped": skipped,
@@ -414,6 +452,12 @@ def parse_args() -> argparse.Namespace:
     p.add_argument("--trace-report-dir", default=str(REPORT_FORENSICS_DIR), help="Agent trace 报告目录")
     p.add_argument("--max-cases", type=int, default=0, help="仅运行前 N 条案例（0 表示全部）")
     p.add_argument("--verbose", action="store_true", help="打印 Agent 详细过程")
+    p.add_argument(
+        "--ripestat-cache-only",
+        action="store_true",
+        help="RIPEstat 查询只读本地持久化缓存，不联网（未命中按查询失败处理）",
+    )
+    p.add_argument("--vrp-file", help="本地 VRP 导出（CSV/JSON），配置后 RPKI 校验离线进行")
     return p.parse_args()
 
 
@@ -448,6 +492,22 @@ async def main() -> None:
         f"({summary['simulation_reason_leak_rate']:.2%}) | "
         f"mean_latency={summary['mean_latency_sec']:.2f}s"
     )
+    cache = report["ripestat_cache"]
+    print(
+        f"ripestat_cache: hits={cache['hits']} negative_hits={cache['negative_hits']} "
+        f"misses={cache['misses']} offline_misses={cache['offline_misses']} hit_rate={cache['hit_rate']:.2%}"
+    )
+    flights = report["ripestat_coalescing"]
+    print(f"ripestat_coalescing: fetches={flights['fetches']} saved={flights['coalesced']}")
+    meta = report["as_metadata"]
+    if meta:
+        print(f"as_metadata: asns={meta['asns']} hits={meta['hits']} misses={meta['misses']}")
+    geo = report["geo_index"]
+    if geo:
+        print(f"geo_index: ranges={geo['ranges']} hits={geo['hits']} misses={geo['misses']}")
+    graph = report["graph_backend"]
+    if graph.get("backend"):
+        print(f"graph_backend: {graph['backend']} queries={graph.get('queries', 0)} p95_ms={graph.get('p95_ms')}")
     print(f"report: {out_path}")
 
     if report["by_type_summary"]:
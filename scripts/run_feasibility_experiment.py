@@ -25,6 +25,7 @@ from tools.project_paths import (
     EXPERIMENT_REAL_EVENTS_DIR,
     FEASIBILITY_REPORT,
 )
+from tools.event_store import load_events
 
 
 def normalize_asn(val) -> str:
@@ -62,23 +63,8 @@ def load_real_cases(events_dir: str) -> List[Dict[str, Any]]:
     if not os.path.isdir(events_dir):
         return cases
 
-    for name in sorted(os.listdir(events_dir)):
-        ev_dir = os.path.join(events_dir, name)
-        if not os.path.isdir(ev_dir):
-            continue
-        meta_path = os.path.join(ev_dir, "meta.json")
-        updates_path = os.path.join(ev_dir, "suspicious_updates.json")
-        if not (os.path.exists(meta_path) and os.path.exists(updates_path)):
-            continue
-
-        try:
-            with open(meta_path, "r", encoding="utf-8") as f:
-                meta = json.load(f)
-            with open(updates_path, "r", encoding="utf-8") as f:
-                updates = json.load(f)
-        except Exception:
-            continue
-
+    # 兼容列式事件库与逐事件 JSON 目录
+    for _, meta, updates in load_events(events_dir):
         if not updates:
             continue
 
@@ -283,33 +269,36 @@ async def main():
         return
 
     agent = BGPAgent()
-    real_results = await evaluate_cases(real_cases, agent)
-
-    real_all_summary = summarize(real_results)
-    real_by_type = summarize_by_type(real_results)
-
-    real_non_fallback = [r for r in real_results if not r.get("is_fallback")]
-    real_non_fb_summary = summarize(real_non_fallback)
-    real_non_fb_by_type = summarize_by_type(real_non_fallback)
-    covered_types = {r.get("event_type") for r in real_non_fallback}
-    missing_types = sorted(t for t in required_types if t not in covered_types)
-
-    need_synthetic = (
-        (not args.disable_synthetic)
-        and (
-            len(real_non_fallback) < args.min_real_cases
-            or bool(missing_types)
+    try:
+        real_results = await evaluate_cases(real_cases, agent)
+
+        real_all_summary = summarize(real_results)
+        real_by_type = summarize_by_type(real_results)
+
+        real_non_fallback = [r for r in real_results if not r.get("is_fallback")]
+        real_non_fb_summary = summarize(real_non_fallback)
+        real_non_fb_by_type = summarize_by_type(real_non_fallback)
+        covered_types = {r.get("event_type") for r in real_non_fallback}
+        missing_types = sorted(t for t in required_types if t not in covered_types)
+
+        need_synthetic = (
+            (not args.disable_synthetic)
+            and (
+                len(real_non_fallback) < args.min_real_cases
+                or bool(missing_types)
+            )
         )
-    )
 
-    synthetic_results: List[Dict[str, Any]] = []
-    if need_synthetic:
-        print("[Stage-2] 真实事件覆盖不足，补充模拟事件...")
-        synthetic_cases = load_synthetic_cases(args.synthetic_input)
-        if missing_types:
-            picked = [c for c in synthetic_cases if c.get("event_type") in set(missing_types)]
-            synthetic_cases = picked if picked else synthetic_cases
-        synthetic_results = await evaluate_cases(synthetic_cases, agent)
+        synthetic_results: List[Dict[str, Any]] = []
+        if need_synthetic:
+            print("[Stage-2] 真实事件覆盖不足，补充模拟事件...")
+            synthetic_cases = load_synthetic_cases(args.synthetic_input)
+            if missing_types:
+                picked = [c for c in synthetic_cases if c.get("event_type") in set(missing_types)]
+                synthetic_cases = picked if picked else synthetic_cases
+            synthetic_results = await evaluate_cases(synthetic_cases, agent)
+    finally:
+        agent.close()
 
     synthetic_summary = summarize(synthetic_results)
     synthetic_by_type = summarize_by_type(synthetic_results)
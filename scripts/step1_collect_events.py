@@ -4,7 +4,8 @@ Step1: 从本地 test_events.json 读取待测案例 → 下载 RIPEstat 原始
 
 待测案例在 data/test_events.json 中手动配置，格式见 data/README_test_events.md。
 
-使用: python scripts/step1_collect_events.py [--input data/test_events.json] [--output data/events]
+使用: python scripts/step1_collect_events.py [--input data/test_events.json] [--output data/events] [--format columnar|json|both]
+      [--full-window] [--collectors rrc00,rrc24,rrc25] [--rib-baseline FILE] [--no-stream-bgplay]
 """
 import os
 import sys
@@ -21,6 +22,10 @@ except ImportError:
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from tools.update_fetcher import fetch_and_filter
+from tools.ris_mrt_fetcher import fetch_and_parse_multi
+from tools.rib_baseline import infer_expected_origin, set_default_baseline
+from tools.config_loader import get_known_prefix_origin
+from tools.event_store import EventStoreWriter, columnar_available
 from tools.project_paths import EVENTS_DIR, TEST_EVENTS_FILE
 
 
@@ -65,10 +70,47 @@ def main():
         default="ris_mrt",
         help="数据源: ris_mrt=RIPE RIS MRT(支持历史), ripestat=BGPlay API(仅2024+), auto=优先RIS",
     )
+    parser.add_argument(
+        "--full-window",
+        action="store_true",
+        help="RIS 分块抓取完整事件窗口（默认每个事件最多 24 个 MRT 文件，约 2 小时）",
+    )
+    parser.add_argument(
+        "--collectors",
+        default="",
+        help="RIS collector 列表，逗号分隔（如 rrc00,rrc24,rrc25）；多个时并发抓取并跨 collector 去重",
+    )
+    parser.add_argument(
+        "--format",
+        choices=["columnar", "json", "both"],
+        default="columnar",
+        help="输出格式: columnar=事件索引表 + 列式 updates（tools/event_store.py）, "
+             "json=逐事件目录, both=两者都写；原始 BGPlay 响应总是写入逐事件目录",
+    )
+    parser.add_argument(
+        "--no-stream-bgplay",
+        action="store_true",
+        help="RIPEstat 数据源整体下载 BGPlay 响应后再筛选（默认流式解析，原始响应另存 raw_bgplay.json.gz）",
+    )
+    parser.add_argument(
+        "--rib-baseline",
+        default="",
+        help="RIB 基线文件（scripts/build_rib_baseline.py 生成），默认按事件时间从 data/rib_baseline/ 选取",
+    )
     args = parser.parse_args()
+    collectors = [c.strip() for c in args.collectors.split(",") if c.strip()] or None
+    if args.rib_baseline:
+        set_default_baseline(args.rib_baseline)
 
     out_root = args.output
     os.makedirs(out_root, exist_ok=True)
+    store = None
+    if args.format in ("columnar", "both"):
+        if columnar_available():
+            store = EventStoreWriter(out_root)
+        else:
+            print("⚠️ 未安装 numpy，改为逐事件 JSON 目录输出")
+    write_dirs = store is None or args.format == "both"
 
     print("=" * 60)
     print("Step1: 读取本地案例 → 下载 RIPEstat 真实 updates → 过滤")
@@ -82,39 +124,70 @@ def main():
 
     print(f"\n📂 从 {args.input} 加载 {len(events)} 个待测案例")
 
-    total_events = 0
-    total_updates = 0
-
-    iterator = tqdm(events, desc="Step1 收集事件", unit="事件") if tqdm else events
-    for ev in iterator:
+    # 先校验全部事件，便于按 MRT 文件分组共享下载与解析
+    known_origins = get_known_prefix_origin()
+    jobs = []
+    for ev in events:
         prefix = ev.get("prefix")
         victim = ev.get("victim")
         attacker_raw = ev.get("attacker")
         attacker = str(attacker_raw).strip() if attacker_raw else ""
         st = _to_iso8601(ev.get("start_time"))
         et = _to_iso8601(ev.get("end_time"))
-        source = ev.get("source", "local")
 
-        if not prefix or not victim:
-            print(f"   跳过: 缺少 prefix/victim")
+        if not prefix:
+            print(f"   跳过: 缺少 prefix")
             continue
         if not st:
             print(f"   跳过 {prefix}: 无有效 start_time")
             continue
+        if not victim:
+            # 未给出 victim：先查知识库，再用本地 RIB 快照基线推断合法 Owner
+            victim, victim_source = known_origins.get(prefix), "knowledge_base"
+            if not victim:
+                victim, victim_source = infer_expected_origin(prefix, st), "rib_baseline"
+            if not victim:
+                print(f"   跳过 {prefix}: 缺少 victim，知识库与 RIB 基线均无法推断")
+                continue
+            print(f"   {prefix}: 缺少 victim，{victim_source} 推断为 AS{victim}")
+            ev = dict(ev, victim_source=victim_source)
         if not et:
             et_dt = datetime.strptime(st[:10], "%Y-%m-%d") + timedelta(hours=24)
             et = et_dt.strftime("%Y-%m-%dT%H:%M:%S")
+        jobs.append((ev, prefix, victim, attacker, st, et))
+
+    prefetched = {}
+    if args.source in ("ris_mrt", "auto") and jobs and not args.full_window and not collectors:
+        print(f"\n📦 按 MRT 文件分组预抓取 {len(jobs)} 个事件（每个文件只下载、解析一次）...")
+        ris_results = fetch_and_parse_multi({str(i): (j[1], j[4], j[5]) for i, j in enumerate(jobs)})
+        prefetched = {k: ups for k, (ups, _) in ris_results.items()}
+
+    total_events = 0
+    total_updates = 0
+
+    iterator = tqdm(list(enumerate(jobs)), desc="Step1 收集事件", unit="事件") if tqdm else enumerate(jobs)
+    for idx, (ev, prefix, victim, attacker, st, et) in iterator:
+        source = ev.get("source", "local")
 
         is_benign = not attacker or attacker.lower() == "none"
         attacker_disp = "None(良性)" if is_benign else attacker
         print(f"\n   {prefix} | victim=AS{victim} attacker=AS{attacker_disp} | {st} ~ {et}")
 
+        event_id = _safe_event_id(ev)
+        ev_dir = os.path.join(out_root, event_id)
+        os.makedirs(ev_dir, exist_ok=True)
+
         suspicious, raw_bgplay, data_source = fetch_and_filter(
             prefix=prefix,
             expected_origin=victim,
             start_time=st,
             end_time=et,
             source=args.source,
+            ris_updates=prefetched.get(str(idx)),
+            full_window=args.full_window,
+            collectors=collectors,
+            stream=False if args.no_stream_bgplay else None,
+            raw_copy_path=os.path.join(ev_dir, "raw_bgplay.json.gz"),
         )
 
         used_fallback = False
@@ -140,12 +213,9 @@ def main():
                 }]
         data_source_meta = "fallback" if used_fallback and data_source == "empty" else data_source
 
-        event_id = _safe_event_id(ev)
-        ev_dir = os.path.join(out_root, event_id)
-        os.makedirs(ev_dir, exist_ok=True)
-
-        # 保存原始 BGPlay 数据作为备用（真实下载）
-        if raw_bgplay:
+        # 保存原始 BGPlay 数据作为备用（真实下载）；流式抓取时原始响应已写成 raw_bgplay.json.gz
+        streamed = bool(raw_bgplay and raw_bgplay.get("streamed"))
+        if raw_bgplay and not streamed:
             with open(os.path.join(ev_dir, "raw_bgplay.json"), "w", encoding="utf-8") as f:
                 json.dump(raw_bgplay, f, indent=2, ensure_ascii=False, default=str)
 
@@ -160,20 +230,34 @@ def main():
             "data_source": data_source_meta,
             "suspicious_count": len(suspicious),
         }
+        if args.full_window and data_source == "ris_mrt":
+            meta["ris_window"] = {k: raw_bgplay.get(k) for k in ("files", "missing_files", "updates", "stopped_early")}
+            meta["ris_window"]["chunks"] = len(raw_bgplay.get("chunks", []))
+        if streamed:
+            meta["bgplay_stream"] = {k: raw_bgplay.get(k) for k in ("initial_state", "events", "bytes")}
+        if raw_bgplay and raw_bgplay.get("collector_stats"):
+            meta["collector_stats"] = raw_bgplay["collector_stats"]
         # 透传输入中的可选标签字段，便于后续分类型实验评测
-        for opt_key in ("event_type", "reference", "is_real", "case_name", "note"):
+        for opt_key in ("event_type", "reference", "is_real", "case_name", "note", "victim_source"):
             if opt_key in ev:
                 meta[opt_key] = ev.get(opt_key)
 
-        with open(os.path.join(ev_dir, "meta.json"), "w", encoding="utf-8") as f:
-            json.dump(meta, f, indent=2, ensure_ascii=False)
-        with open(os.path.join(ev_dir, "suspicious_updates.json"), "w", encoding="utf-8") as f:
-            json.dump(suspicious, f, indent=2, ensure_ascii=False)
+        if store is not None:
+            store.add(meta, suspicious)
+        if write_dirs:
+            with open(os.path.join(ev_dir, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump(meta, f, indent=2, ensure_ascii=False)
+            with open(os.path.join(ev_dir, "suspicious_updates.json"), "w", encoding="utf-8") as f:
+                json.dump(suspicious, f, indent=2, ensure_ascii=False)
 
         total_events += 1
         total_updates += len(suspicious)
         ds = f" [{data_source_meta}]" if data_source_meta else ""
-        print(f"      -> {len(suspicious)} 条可疑 update{ds}，已保存到 {ev_dir}")
+        saved_to = ev_dir if write_dirs else f"{out_root} (列式库)"
+        print(f"      -> {len(suspicious)} 条可疑 update{ds}，已保存到 {saved_to}")
+
+    if store is not None:
+        store.close()
 
     print("\n" + "=" * 60)
     print(f"✅ Step1 完成: {total_events} 个事件, 共 {total_updates} 条可疑 updates")
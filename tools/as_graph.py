@@ -0,0 +1,314 @@
+"""
+进程内 AS 关系图：CAIDA AS-relationship 文件 -> CSR 压缩邻接数组
+作为 Neo4j（tools/graph_rag.py）之外的图分析后端，不依赖外部服务，单次查询为微秒级。
+
+输入格式（CAIDA serial-1 / serial-2，可 .gz / .bz2 压缩，'#' 开头为注释）：
+    <provider-as>|<customer-as>|-1[|source]     provider -> customer
+    <peer-as>|<peer-as>|0[|source]              peer <-> peer
+    <sibling-as>|<sibling-as>|1                 sibling（部分派生数据集使用）
+
+存储：节点按 ASN 升序编号（array('I')），每个节点的邻居区间由 indptr 给出，
+邻居下标（array('I')）与关系（array('b')，站在本节点看邻居是 customer / provider / peer / sibling）平行存放，
+区间内按邻居下标升序，关系查询在区间内二分查找。
+"""
+import os
+import bz2
+import gzip
+import bisect
+import logging
+import threading
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .project_paths import AS_REL_FILE
+
+logger = logging.getLogger("ASGraph")
+
+# 站在本节点看邻居的角色
+REL_CUSTOMER = 1
+REL_PEER = 0
+REL_PROVIDER = -1
+REL_SIBLING = 2
+
+REL_NAMES = {REL_CUSTOMER: "customer", REL_PEER: "peer", REL_PROVIDER: "provider", REL_SIBLING: "sibling"}
+# 路径上一跳的方向标记：本 AS 相对下一跳的关系
+_HOP_LABELS = {REL_CUSTOMER: "p2c", REL_PEER: "p2p", REL_PROVIDER: "c2p", REL_SIBLING: "s2s"}
+
+DEFAULT_MAX_HOPS = 8
+
+
+def _open_text(path: str):
+    if path.endswith(".bz2"):
+        return bz2.open(path, "rt", encoding="utf-8", errors="replace")
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace")
+    return open(path, "r", encoding="utf-8", errors="replace")
+
+
+def _asn_int(asn) -> Optional[int]:
+    s = str(asn).strip().upper()
+    if s.startswith("AS"):
+        s = s[2:]
+    if not s.isdigit():
+        return None
+    v = int(s)
+    return v if v < 2 ** 32 else None
+
+
+def iter_as_rel(path: str) -> Iterable[Tuple[int, int, int]]:
+    """AS-relationship 记录：(as1, as2, rel)，rel 取文件原值（-1 / 0 / 1），无法解析的行跳过"""
+    with _open_text(path) as f:
+        for line in f:
+            if not line or line[0] == "#":
+                continue
+            parts = line.strip().split("|")
+            if len(parts) < 3:
+                continue
+            a, b = _asn_int(parts[0]), _asn_int(parts[1])
+            try:
+                rel = int(parts[2])
+            except ValueError:
+                continue
+            if a is None or b is None or a == b or rel not in (-1, 0, 1):
+                continue
+            yield a, b, rel
+
+
+class ASGraph:
+    """只读 CSR AS 关系图"""
+
+    def __init__(self, meta: Optional[Dict] = None):
+        self.meta = dict(meta or {})
+        self.asns = array("I")
+        self.indptr = array("I", [0])
+        self.nbrs = array("I")
+        self.rels = array("b")
+
+    def __len__(self) -> int:
+        return len(self.asns)
+
+    @property
+    def edge_count(self) -> int:
+        """无向边数（每条关系在两端各存一次）"""
+        return len(self.nbrs) // 2
+
+    @classmethod
+    def build(cls, edges: Iterable[Tuple[int, int, int]], meta: Optional[Dict] = None) -> "ASGraph":
+        """
+        :param edges: [(as1, as2, rel), ...]，rel 为 CAIDA 取值：-1 表示 as1 是 as2 的 provider，0 peer，1 sibling
+        同一对 AS 重复出现时保留先出现的关系
+        """
+        pairs: Dict[Tuple[int, int], int] = {}
+        for a, b, rel in edges:
+            key = (a, b) if a < b else (b, a)
+            if key in pairs:
+                continue
+            if rel == -1:
+                # 站在较小 ASN 一端看另一端
+                pairs[key] = REL_CUSTOMER if a < b else REL_PROVIDER
+            else:
+                pairs[key] = REL_PEER if rel == 0 else REL_SIBLING
+
+        graph = cls(meta)
+        nodes = sorted({x for key in pairs for x in key})
+        graph.asns = array("I", nodes)
+        index = {asn: i for i, asn in enumerate(nodes)}
+        adj: List[List[Tuple[int, int]]] = [[] for _ in nodes]
+        for (a, b), rel in pairs.items():
+            ia, ib = index[a], index[b]
+            adj[ia].append((ib, rel))
+            # 反向：customer <-> provider 互换，peer / sibling 不变
+            adj[ib].append((ia, -rel if rel in (REL_CUSTOMER, REL_PROVIDER) else rel))
+        indptr = array("I", [0])
+        nbrs = array("I")
+        rels = array("b")
+        for row in adj:
+            row.sort()
+            nbrs.extend(n for n, _ in row)
+            rels.extend(r for _, r in row)
+            indptr.append(len(nbrs))
+        graph.indptr, graph.nbrs, graph.rels = indptr, nbrs, rels
+        return graph
+
+    @classmethod
+    def load(cls, path: str) -> "ASGraph":
+        return cls.build(iter_as_rel(str(path)), {"path": str(path)})
+
+    # ---- 查询 ----
+    def index(self, asn) -> int:
+        """ASN -> 节点下标，不在图中返回 -1"""
+        v = _asn_int(asn)
+        if v is None:
+            return -1
+        i = bisect.bisect_left(self.asns, v)
+        return i if i < len(self.asns) and self.asns[i] == v else -1
+
+    def __contains__(self, asn) -> bool:
+        return self.index(asn) >= 0
+
+    def degree(self, asn) -> int:
+        i = self.index(asn)
+        return self.indptr[i + 1] - self.indptr[i] if i >= 0 else 0
+
+    def _rel_index(self, i: int, j: int) -> Optional[int]:
+        lo, hi = self.indptr[i], self.indptr[i + 1]
+        k = bisect.bisect_left(self.nbrs, j, lo, hi)
+        return self.rels[k] if k < hi and self.nbrs[k] == j else None
+
+    def relationship(self, asn, neighbor) -> Optional[str]:
+        """站在 asn 看 neighbor 的角色：customer / provider / peer / sibling，不相邻返回 None"""
+        i, j = self.index(asn), self.index(neighbor)
+        if i < 0 or j < 0:
+            return None
+        rel = self._rel_index(i, j)
+        return REL_NAMES[rel] if rel is not None else None
+
+    def neighbors(self, asn, rel: Optional[str] = None) -> List[str]:
+        """邻居 ASN 列表（升序），rel 为 customer / provider / peer / sibling 时只返回该角色"""
+        i = self.index(asn)
+        if i < 0:
+            return []
+        lo, hi = self.indptr[i], self.indptr[i + 1]
+        asns, nbrs = self.asns, self.nbrs
+        if rel is None:
+            return [str(asns[nbrs[k]]) for k in range(lo, hi)]
+        want = next((k for k, v in REL_NAMES.items() if v == rel), None)
+        rels = self.rels
+        return [str(asns[nbrs[k]]) for k in range(lo, hi) if rels[k] == want]
+
+    def neighbor_summary(self, asn) -> Dict[str, int]:
+        """各角色邻居数：{customer, provider, peer, sibling}"""
+        i = self.index(asn)
+        counts = {name: 0 for name in REL_NAMES.values()}
+        if i >= 0:
+            for k in range(self.indptr[i], self.indptr[i + 1]):
+                counts[REL_NAMES[self.rels[k]]] += 1
+        return counts
+
+    def shortest_path(self, src, dst, max_hops: int = DEFAULT_MAX_HOPS) -> Optional[List[str]]:
+        """
+        无向最短路径（不考虑商业关系），超过 max_hops 或不连通返回 None。
+        双向 BFS：每轮扩展较小的一侧前沿一层，发现对侧已访问的节点即得到最短路径（总长度等于已扩展层数）；
+        AS 图直径小、度分布极不均匀，双向扩展访问的节点数比单向少几个数量级。
+        """
+        s, t = self.index(src), self.index(dst)
+        if s < 0 or t < 0:
+            return None
+        if s == t:
+            return [str(self.asns[s])]
+        indptr, nbrs = self.indptr, self.nbrs
+        # 两侧各自的 {节点: 父节点}
+        parents = ({s: -1}, {t: -1})
+        frontiers = ([s], [t])
+        hops = 0
+        while frontiers[0] and frontiers[1] and hops < max_hops:
+            side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+            mine, other = parents[side], parents[1 - side]
+            nxt = []
+            meet = -1
+            for u in frontiers[side]:
+                for k in range(indptr[u], indptr[u + 1]):
+                    v = nbrs[k]
+                    if v in mine:
+                        continue
+                    mine[v] = u
+                    if v in other:
+                        meet = v
+                        break
+                    nxt.append(v)
+                if meet >= 0:
+                    break
+            hops += 1
+            if meet >= 0:
+                # 先扩展的一侧整层推进，任一交汇点的总长度都是 hops
+                return [str(self.asns[x]) for x in self._join(parents, meet)]
+            frontiers = (nxt, frontiers[1]) if side == 0 else (frontiers[0], nxt)
+        return None
+
+    @staticmethod
+    def _join(parents, meet: int) -> List[int]:
+        left = [meet]
+        while parents[0][left[-1]] >= 0:
+            left.append(parents[0][left[-1]])
+        right = []
+        x = parents[1][meet]
+        while x >= 0:
+            right.append(x)
+            x = parents[1][x]
+        return list(reversed(left)) + right
+
+    def annotate_path(self, path: List[str]) -> str:
+        """'A -[c2p]-> B -[p2p]-> C'：每一跳标出 A 相对 B 的关系（不相邻时为 ?）"""
+        if not path:
+            return ""
+        out = [str(path[0])]
+        for a, b in zip(path, path[1:]):
+            i, j = self.index(a), self.index(b)
+            rel = self._rel_index(i, j) if i >= 0 and j >= 0 else None
+            # rel 是站在 a 看 b 的角色：b 是 a 的 provider 即 a -> b 为 c2p
+            out.append(f"-[{_HOP_LABELS.get(rel, '?')}]-> {b}")
+        return " ".join(out)
+
+    def stats(self) -> Dict:
+        counts = {name: 0 for name in REL_NAMES.values()}
+        for r in self.rels:
+            counts[REL_NAMES[r]] += 1
+        return {
+            "nodes": len(self.asns),
+            "edges": self.edge_count,
+            "p2c": counts["customer"],
+            "p2p": counts["peer"] // 2,
+            "s2s": counts["sibling"] // 2,
+            **self.meta,
+        }
+
+
+_GRAPHS: Dict[str, Tuple[float, ASGraph]] = {}
+_LOAD_LOCK = threading.Lock()
+_DEFAULT_PATH: Optional[str] = None
+
+
+def set_default_as_rel(path: Optional[str]) -> None:
+    """指定 get_as_graph 使用的 AS-relationship 文件（None 恢复环境变量 / 默认路径）"""
+    global _DEFAULT_PATH
+    _DEFAULT_PATH = str(path) if path else None
+
+
+def as_rel_path() -> Optional[str]:
+    """当前配置的 AS-relationship 文件：set_default_as_rel > 环境变量 AS_REL_FILE > data/as_graph/ 下最新一份"""
+    path = _DEFAULT_PATH or os.getenv("AS_REL_FILE")
+    if path:
+        return path
+    root = os.path.dirname(str(AS_REL_FILE))
+    if os.path.isfile(AS_REL_FILE):
+        return str(AS_REL_FILE)
+    try:
+        # CAIDA 文件名以日期开头（YYYYMMDD.as-rel[2].txt[.bz2]），按名称排序即按时间排序
+        names = sorted(n for n in os.listdir(root) if ".as-rel" in n and not n.endswith(".part"))
+    except OSError:
+        return None
+    return os.path.join(root, names[-1]) if names else None
+
+
+def get_as_graph() -> Optional[ASGraph]:
+    """返回已配置的 AS 关系图（按文件 mtime 缓存，文件更新后重新加载），未配置或读取失败返回 None"""
+    path = as_rel_path()
+    if not path:
+        return None
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        logger.warning(f"AS-relationship 文件不存在: {path}")
+        return None
+    with _LOAD_LOCK:
+        cached = _GRAPHS.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        try:
+            graph = ASGraph.load(path)
+        except (OSError, EOFError, ValueError) as e:
+            logger.warning(f"加载 AS-relationship 失败 {path}: {e}")
+            return None
+        _GRAPHS[path] = (mtime, graph)
+        logger.info(f"已加载 AS 关系图 {path}（{len(graph)} 个 AS，{graph.edge_count} 条边）")
+        return graph
@@ -0,0 +1,326 @@
+"""
+本地 AS 元数据库：ASN -> 持有者名称 / 注册国家
+从离线数据构建紧凑的数组索引，查询只做二分查找，不产生 I/O：
+
+- CAIDA as2org（*.as-org2info.txt[.gz] 管道分隔两段式，或 *.as-org2info.jsonl[.gz]）
+  -> 持有者名称（"AUT_NAME - Org Name"，与 RIPEstat as-overview 的 holder 格式一致）及组织国家
+- RIR delegated stats（delegated-<rir>-[extended-]latest，管道分隔）中的 asn 段 -> 注册国家
+- 通用 CSV（表头含 asn 与 name / holder / country 任一列）-> 补充或覆盖名称与国家
+
+数据放在 data/as_metadata/（或环境变量 AS_METADATA_DIR 指定的目录），文件按名称识别格式；
+scripts/fetch_as_metadata.py 可下载最新的 delegated stats 与 as2org。
+BGPDataProvider.get_as_info / get_geo_location(ASN) 先查本库，未命中才联网。
+目录内容每 CHECK_INTERVAL_SEC 秒最多检查一次，reload() 可立即重新检查。
+"""
+import os
+import time
+import csv
+import gzip
+import json
+import bisect
+import logging
+import threading
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .project_paths import AS_METADATA_DIR
+
+logger = logging.getLogger("ASMetadata")
+
+_NAME_KEYS = ("holder", "name", "as_name", "aut_name", "org_name")
+_COUNTRY_KEYS = ("country", "cc", "country_code")
+
+
+def open_text(path: str):
+    """按 UTF-8 打开文本数据文件（.gz 透明解压），坏字节替换而非报错"""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace", newline="")
+    return open(path, "r", encoding="utf-8", errors="replace", newline="")
+
+
+def _asn_int(asn) -> Optional[int]:
+    s = str(asn).strip().upper()
+    if s.startswith("AS"):
+        s = s[2:]
+    if not s.isdigit():
+        return None
+    v = int(s)
+    return v if v < 2 ** 32 else None
+
+
+def country_code(cc) -> Optional[str]:
+    """规范化为两位大写国家代码，无效值返回 None"""
+    cc = str(cc or "").strip().upper()
+    # delegated stats 中未分配 / 保留段的国家为空或 ZZ
+    return cc if len(cc) == 2 and cc.isalpha() and cc != "ZZ" else None
+
+
+def iter_delegated(path: str) -> Iterable[Tuple[str, str, str, str, int]]:
+    """RIR delegated stats 记录：(registry, cc, type, start, value)，跳过版本行、汇总行与注释"""
+    with open_text(path) as f:
+        for line in f:
+            if not line or line[0] == "#":
+                continue
+            parts = line.rstrip("\n").split("|")
+            if len(parts) < 7 or parts[1] == "*" or parts[2] not in ("asn", "ipv4", "ipv6"):
+                continue
+            try:
+                yield parts[0], parts[1], parts[2], parts[3], int(parts[4])
+            except ValueError:
+                continue
+
+
+def _iter_as2org_txt(f):
+    """as-org2info.txt：先 org 段（org_id|changed|org_name|country|source），再 aut 段"""
+    section = None
+    for line in f:
+        line = line.rstrip("\n")
+        if line.startswith("#"):
+            if "format:" in line:
+                section = "aut" if "format:aut" in line else "org"
+            continue
+        parts = line.split("|")
+        if section == "org" and len(parts) >= 4:
+            yield "org", parts[0], parts[2], parts[3]
+        elif section == "aut" and len(parts) >= 4:
+            yield "aut", parts[0], parts[2], parts[3]
+
+
+def _iter_as2org_jsonl(f):
+    for line in f:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            rec = json.loads(line)
+        except ValueError:
+            continue
+        kind = str(rec.get("type", "")).lower()
+        if kind in ("organization", "org"):
+            yield "org", rec.get("organizationId", rec.get("org_id", "")), rec.get("name", ""), rec.get("country", "")
+        elif kind in ("asn", "aut"):
+            yield "aut", rec.get("asn", ""), rec.get("name", ""), rec.get("organizationId", rec.get("org_id", ""))
+
+
+class ASMetadataStore:
+    """
+    只读 AS 元数据索引。
+    名称：升序 ASN 数组（array('I')）+ 平行的名称列表 / 国家下标数组；
+    国家：delegated stats 的 ASN 段（起止数组 + 国家下标），二分查找。
+    """
+
+    def __init__(self, meta: Optional[Dict] = None):
+        self.meta = dict(meta or {})
+        self._countries: List[str] = [""]
+        self._country_ids: Dict[str, int] = {"": 0}
+        self._asns = array("I")
+        self._names: List[str] = []
+        self._name_cc = array("H")
+        self._range_start = array("I")
+        self._range_end = array("I")
+        self._range_cc = array("H")
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._asns)
+
+    def _cc_id(self, cc: Optional[str]) -> int:
+        if not cc:
+            return 0
+        k = self._country_ids.get(cc)
+        if k is None:
+            k = self._country_ids[cc] = len(self._countries)
+            self._countries.append(cc)
+        return k
+
+    @classmethod
+    def build(cls, names: Dict[int, Tuple[str, Optional[str]]],
+              ranges: Iterable[Tuple[int, int, str]], meta: Optional[Dict] = None) -> "ASMetadataStore":
+        """
+        :param names: {asn: (holder, 组织国家或 None)}
+        :param ranges: [(起始 ASN, 结束 ASN（含）, 国家), ...]
+        """
+        store = cls(meta)
+        for asn in sorted(names):
+            holder, cc = names[asn]
+            store._asns.append(asn)
+            store._names.append(holder)
+            store._name_cc.append(store._cc_id(cc))
+        merged: List[Tuple[int, int, int]] = []
+        for start, end, cc in sorted(ranges):
+            k = store._cc_id(cc)
+            if merged and start <= merged[-1][1] + 1 and merged[-1][2] == k:
+                merged[-1] = (merged[-1][0], max(end, merged[-1][1]), k)
+            elif merged and start <= merged[-1][1]:
+                # 重叠且国家不同（不同 RIR 重复登记）：保留先出现的段
+                if end > merged[-1][1]:
+                    merged.append((merged[-1][1] + 1, end, k))
+            else:
+                merged.append((start, end, k))
+        for start, end, k in merged:
+            store._range_start.append(start)
+            store._range_end.append(end)
+            store._range_cc.append(k)
+        return store
+
+    def _name_index(self, asn: int) -> int:
+        i = bisect.bisect_left(self._asns, asn)
+        return i if i < len(self._asns) and self._asns[i] == asn else -1
+
+    def holder(self, asn) -> Optional[str]:
+        """持有者名称，未收录返回 None"""
+        v = _asn_int(asn)
+        i = self._name_index(v) if v is not None else -1
+        if i < 0 or not self._names[i]:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return self._names[i]
+
+    def country(self, asn) -> Optional[str]:
+        """注册国家：优先 RIR delegated stats，其次 as2org 组织国家；未收录返回 None"""
+        v = _asn_int(asn)
+        if v is not None:
+            j = bisect.bisect_right(self._range_start, v) - 1
+            if j >= 0 and v <= self._range_end[j] and self._range_cc[j]:
+                self.hits += 1
+                return self._countries[self._range_cc[j]]
+            i = self._name_index(v)
+            if i >= 0 and self._name_cc[i]:
+                self.hits += 1
+                return self._countries[self._name_cc[i]]
+        self.misses += 1
+        return None
+
+    def records(self) -> Iterable[Tuple[str, str, Optional[str]]]:
+        """全部有名称的 ASN：(asn, holder, 国家或 None)，不计入命中统计"""
+        for i, asn in enumerate(self._asns):
+            name = self._names[i]
+            if not name:
+                continue
+            j = bisect.bisect_right(self._range_start, asn) - 1
+            k = self._range_cc[j] if j >= 0 and asn <= self._range_end[j] else 0
+            yield str(asn), name, self._countries[k or self._name_cc[i]] or None
+
+    def stats(self) -> Dict:
+        return {
+            "asns": len(self._asns),
+            "country_ranges": len(self._range_start),
+            "hits": self.hits,
+            "misses": self.misses,
+            **self.meta,
+        }
+
+    @classmethod
+    def load_dir(cls, root: str) -> "ASMetadataStore":
+        """读取目录下所有可识别的文件（as2org / delegated stats / CSV）"""
+        orgs: Dict[str, Tuple[str, str]] = {}
+        auts: Dict[int, Tuple[str, str]] = {}
+        extra: Dict[int, Tuple[Optional[str], Optional[str]]] = {}
+        ranges: List[Tuple[int, int, str]] = []
+        files = []
+        for name in sorted(os.listdir(root)):
+            path = os.path.join(root, name)
+            if not os.path.isfile(path) or name.endswith(".part"):
+                continue
+            lower = name.lower()
+            if "as-org2info" in lower:
+                with open_text(path) as f:
+                    rows = _iter_as2org_jsonl(f) if ".jsonl" in lower else _iter_as2org_txt(f)
+                    for kind, key, label, value in rows:
+                        if kind == "org":
+                            orgs[str(key)] = (label, value)
+                        else:
+                            asn = _asn_int(key)
+                            if asn is not None:
+                                auts[asn] = (label, str(value))
+            elif lower.startswith("delegated-"):
+                for _, cc, kind, start, value in iter_delegated(path):
+                    cc = country_code(cc)
+                    asn = _asn_int(start) if kind == "asn" else None
+                    if cc and asn is not None and value > 0:
+                        ranges.append((asn, asn + value - 1, cc))
+            elif lower.endswith((".csv", ".csv.gz")):
+                with open_text(path) as f:
+                    for row in csv.DictReader(f):
+                        row = {str(k).strip().lower(): (v or "").strip() for k, v in row.items() if k}
+                        asn = _asn_int(row.get("asn", ""))
+                        if asn is None:
+                            continue
+                        label = next((row[k] for k in _NAME_KEYS if row.get(k)), None)
+                        cc = next((country_code(row[k]) for k in _COUNTRY_KEYS if row.get(k)), None)
+                        extra[asn] = (label, cc)
+            else:
+                continue
+            files.append(name)
+
+        names: Dict[int, Tuple[str, Optional[str]]] = {}
+        for asn, (aut_name, org_id) in auts.items():
+            org_name, org_cc = orgs.get(org_id, ("", ""))
+            if aut_name and org_name and org_name != aut_name:
+                holder = f"{aut_name} - {org_name}"
+            else:
+                holder = aut_name or org_name
+            names[asn] = (holder, country_code(org_cc))
+        for asn, (label, cc) in extra.items():
+            old_label, old_cc = names.get(asn, ("", None))
+            names[asn] = (label or old_label, cc or old_cc)
+        return cls.build(names, ranges, {"root": str(root), "files": files})
+
+
+# 两次检查目录内容（scandir + stat）之间的最短间隔（秒），间隔内直接返回已加载的库
+CHECK_INTERVAL_SEC = float(os.getenv("AS_METADATA_CHECK_SEC", "30"))
+
+_STORE: Optional[ASMetadataStore] = None
+_STORE_SIG = None
+# (目录, 上次检查时间)
+_CHECKED: Optional[Tuple[str, float]] = None
+_LOCK = threading.Lock()
+
+
+def metadata_dir() -> str:
+    return str(os.getenv("AS_METADATA_DIR") or AS_METADATA_DIR)
+
+
+def _dir_signature(root: str):
+    try:
+        return tuple(sorted((e.name, e.stat().st_mtime, e.stat().st_size) for e in os.scandir(root) if e.is_file()))
+    except OSError:
+        return None
+
+
+def reload() -> None:
+    """下次 get_as_metadata 时立即重新检查目录（写入新数据后调用）"""
+    global _CHECKED
+    _CHECKED = None
+
+
+def get_as_metadata() -> Optional[ASMetadataStore]:
+    """
+    进程内共享的元数据库（目录内容变化后重新加载）；目录不存在或为空时返回 None。
+    距上次检查不足 CHECK_INTERVAL_SEC 秒时不访问文件系统。
+    """
+    global _STORE, _STORE_SIG, _CHECKED
+    root = metadata_dir()
+    now = time.monotonic()
+    checked = _CHECKED
+    if checked is not None and checked[0] == root and now - checked[1] < CHECK_INTERVAL_SEC:
+        return _STORE if _STORE_SIG else None
+    sig = _dir_signature(root)
+    if not sig:
+        _STORE_SIG = None
+        _CHECKED = (root, now)
+        return None
+    with _LOCK:
+        if _STORE is None or sig != _STORE_SIG:
+            try:
+                _STORE = ASMetadataStore.load_dir(root)
+            except (OSError, EOFError, ValueError) as e:
+                logger.warning(f"加载 AS 元数据失败 {root}: {e}")
+                _STORE = None
+            _STORE_SIG = sig
+            if _STORE is not None:
+                logger.info(f"已加载 AS 元数据 {root}（{len(_STORE)} 个 ASN 名称，{len(_STORE._range_start)} 个国家段）")
+        _CHECKED = (root, now)
+        return _STORE
@@ -1,27 +1,104 @@
+from typing import Dict, List, Optional, Tuple
+
 from .data_provider import BGPDataProvider
 from .config_loader import get_known_prefix_origin
+from .rib_baseline import get_baseline
+from .mrt_io import to_datetime
+from .rpki_vrp import get_vrp_table
 
 class AuthorityValidator:
-    """RPKI 授权校验，优先联网查询 RIPEstat API，失败时使用知识库兜底"""
+    """RPKI 授权校验：配置了本地 VRP 时离线判定，否则联网查询 RIPEstat API，失败时使用知识库兜底"""
 
     def run(self, context):
         prefix = context.get('prefix')
-        as_path = context.get('as_path', "").split(" ")
-        origin_as = as_path[-1] if as_path else None
+        origin_as = self._origin(context)
         
         if not origin_as: return "ERROR: 无法提取 Origin AS"
 
-        # 1. 调用真实 API
-        status = BGPDataProvider.get_rpki_status(prefix, origin_as)
-        
+        vrps = get_vrp_table()
+        status = self._status(vrps, prefix, origin_as)
+        res = self._judge(prefix, origin_as, status)
+        if res is None:
+            res = self._judge_rib(prefix, origin_as, status[0], get_baseline(to_datetime(context.get('timestamp', ''))))
+        return res["message"]
+
+    def validate_bulk(self, updates: List[Dict]) -> Dict:
+        """
+        批量校验：(prefix, origin) 去重后一次性判定（本地 VRP 单遍查表，或 RIPEstat 并发批量查询），
+        再按 update 展开。
+        :return: {"results": [{index, prefix, origin, verdict, status, source, message}, ...],
+                  "counts": {VALID / INVALID / UNKNOWN / ERROR: 条数}, "unique_pairs": 去重后的组数}
+        """
+        rows: List[Tuple[int, Optional[str], str, Dict]] = []
+        for i, u in enumerate(updates):
+            rows.append((i, u.get('prefix'), self._origin(u), u))
+        pairs = list(dict.fromkeys((prefix, origin) for _, prefix, origin, _ in rows if origin))
+
+        vrps = get_vrp_table()
+        if vrps is None:
+            remote = BGPDataProvider.get_rpki_status_many(pairs)
+            statuses = {pair: (remote.get(pair, "unknown"), "API", None) for pair in pairs}
+        else:
+            statuses = {pair: self._status(vrps, *pair) for pair in pairs}
+
+        # 与时间无关的结论按 (prefix, origin) 复用；RIB 兜底按所选基线复用
+        judged: Dict[Tuple, Optional[Dict]] = {}
+        results = []
+        counts = {"VALID": 0, "INVALID": 0, "UNKNOWN": 0, "ERROR": 0}
+        for i, prefix, origin, u in rows:
+            if not origin:
+                res = {"verdict": "ERROR", "status": None, "source": None, "message": "ERROR: 无法提取 Origin AS"}
+            else:
+                pair = (prefix, origin)
+                if pair not in judged:
+                    judged[pair] = self._judge(prefix, origin, statuses[pair])
+                res = judged[pair]
+                if res is None:
+                    baseline = get_baseline(to_datetime(u.get('timestamp', '')))
+                    key = (prefix, origin, id(baseline))
+                    if key not in judged:
+                        judged[key] = self._judge_rib(prefix, origin, statuses[pair][0], baseline)
+                    res = judged[key]
+            counts[res["verdict"]] += 1
+            results.append({"index": i, "prefix": prefix, "origin": origin, **res})
+        return {"results": results, "counts": counts, "unique_pairs": len(pairs)}
+
+    @staticmethod
+    def _origin(context) -> str:
+        as_path = context.get('as_path', "").split(" ")
+        return as_path[-1] if as_path else None
+
+    @staticmethod
+    def _status(vrps, prefix, origin_as) -> Tuple[str, str, Optional[Tuple]]:
+        """(RPKI 状态, 来源, 命中的 VRP)：本地 VRP 表（RFC 6811），未配置时调用真实 API"""
+        if vrps is not None and prefix:
+            res = vrps.validate(prefix, origin_as)
+            return res["status"], "VRP", res["matched"]
+        return BGPDataProvider.get_rpki_status(prefix, origin_as), "API", None
+
+    @staticmethod
+    def _result(verdict, status, source, message) -> Dict:
+        return {"verdict": verdict, "status": status, "source": source, "message": message}
+
+    def _judge(self, prefix, origin_as, status_info) -> Optional[Dict]:
+        """RPKI 结论或知识库兜底；需要按时间查 RIB 基线时返回 None"""
+        status, source, matched = status_info
+        if source == "VRP" and matched:
+            asn, max_length, vrp_prefix = matched
+            roa = f"ROA {vrp_prefix} maxLength {max_length} AS{asn}"
+            if status == 'valid':
+                return self._result("VALID", status, "VRP", f"VALID: [VRP] RPKI 验证通过 (Valid, {roa})。AS{origin_as} 是授权拥有者。")
+            reason = "ASN不匹配" if "asn" in status else "掩码长度不匹配"
+            return self._result("INVALID", status, "VRP", f"INVALID: [VRP] RPKI 验证失败 ({status}, {roa})！AS{origin_as} 非法宣告 ({reason})。")
+
         # --- 核心修复：处理 invalid_asn 和 invalid_length ---
-        if status == 'valid':
-            return f"VALID: [API] RPKI 验证通过 (Valid)。AS{origin_as} 是授权拥有者。"
+        if source == "API" and status == 'valid':
+            return self._result("VALID", status, "API", f"VALID: [API] RPKI 验证通过 (Valid)。AS{origin_as} 是授权拥有者。")
         
-        elif status and status.startswith('invalid'):
+        elif source == "API" and status and status.startswith('invalid'):
             # 这里会捕获 invalid_asn 和 invalid_length
             reason = "ASN不匹配" if "asn" in status else "掩码长度不匹配"
-            return f"INVALID: [API] RPKI 验证失败 ({status})！AS{origin_as} 非法宣告 ({reason})。"
+            return self._result("INVALID", status, "API", f"INVALID: [API] RPKI 验证失败 ({status})！AS{origin_as} 非法宣告 ({reason})。")
 
         # 2. 如果 API 返回 unknown 或网络失败，使用知识库兜底
         known = get_known_prefix_origin()
@@ -31,8 +108,20 @@ class AuthorityValidator:
 
         if expected:
             if origin_as != expected:
-                return f"INVALID (History): [历史库] API数据缺失，但根据档案，该前缀属于 AS{expected}，当前 Origin 非法。"
+                return self._result("INVALID", status, "History", f"INVALID (History): [历史库] API数据缺失，但根据档案，该前缀属于 AS{expected}，当前 Origin 非法。")
             else:
-                return f"VALID (History): [历史库] 匹配已知历史归属。"
+                return self._result("VALID", status, "History", f"VALID (History): [历史库] 匹配已知历史归属。")
+        return None
+
+    def _judge_rib(self, prefix, origin_as, status, baseline) -> Dict:
+        # 3. 知识库也没有记录时，查本地 RIB 快照基线（bview 统计的 Origin 集合）
+        hit = baseline.lookup(prefix) if baseline is not None and prefix else None
+        if hit:
+            origins = hit['origins']
+            if origin_as in origins:
+                return self._result("VALID", status, "RIB", f"VALID (RIB): [RIB 基线] AS{origin_as} 在 {hit['prefix']} 的快照 Origin 集合中 ({origins[origin_as]} 条 RIB 观测)。")
+            owner = baseline.expected_origin(prefix)
+            if owner:
+                return self._result("INVALID", status, "RIB", f"INVALID (RIB): [RIB 基线] API数据缺失，RIB 快照中 {hit['prefix']} 属于 AS{owner}，当前 Origin 非法。")
 
-        return f"UNKNOWN: 未找到 RPKI ROA 记录 (API返回: {status})。"
\ No newline at end of file
+        return self._result("UNKNOWN", status, None, f"UNKNOWN: 未找到 RPKI ROA 记录 (API返回: {status})。")
@@ -1,6 +1,7 @@
 import os
 import json
 import sys
+import asyncio
 
 # 尝试导入 Graph RAG 模块 (用于连接 Neo4j)
 # 确保 tools 目录在 python 路径下
@@ -10,33 +11,88 @@ try:
     GRAPH_RAG_AVAILABLE = True
 except ImportError:
     GRAPH_RAG_AVAILABLE = False
+
+# 进程内 CSR 图后端（AS-relationship 文件），不依赖 Neo4j
+try:
+    from tools.graph_local import LocalGraphEngine
+    from tools.as_graph import get_as_graph
+    GRAPH_LOCAL_AVAILABLE = True
+except ImportError:
+    GRAPH_LOCAL_AVAILABLE = False
+
+if not GRAPH_RAG_AVAILABLE and not GRAPH_LOCAL_AVAILABLE:
     print("⚠️ [Warning] graph_rag.py 未找到，Graph Analysis 将使用模拟模式。")
 
+# 图分析后端：local（CSR）/ neo4j / auto（有 AS-relationship 文件时用 local，否则 neo4j）
+GRAPH_BACKEND = os.getenv("GRAPH_BACKEND", "auto").lower()
+
 try:
     from tools.data_provider import BGPDataProvider
     from tools.authority import AuthorityValidator
     from tools.geo import GeoConflictChecker
     from tools.topology import TopologyInspector
     from tools.config_loader import get_risk_asns
+    from tools.rpki_vrp import get_vrp_table
     ONLINE_AVAILABLE = True
 except ImportError:
     ONLINE_AVAILABLE = False
 
 class BGPToolKit:
-    def __init__(self):
+    def __init__(self, graph_backend=None):
         """
         初始化 BGP 工具箱
+        :param graph_backend: 图分析后端 local / neo4j / auto，默认取环境变量 GRAPH_BACKEND
         """
+        self.graph_engine = self._init_graph_engine(str(graph_backend or GRAPH_BACKEND).lower())
+
+    def close(self):
+        """释放图分析后端（Neo4j 时归还共享驱动的引用），可重复调用"""
+        if self.graph_engine:
+            self.graph_engine.close()
+            self.graph_engine = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def graph_health(self):
+        """图分析后端状态；Neo4j 后端含连通性、往返延迟与查询耗时统计"""
+        engine = self.graph_engine
+        if engine is None:
+            return {"backend": None, "connected": False}
+        info = engine.health() if hasattr(engine, "health") else {"connected": True}
+        if hasattr(engine, "distances") and "distance_cache" not in info:
+            info["distance_cache"] = engine.distances.stats()
+        return {"backend": type(engine).__name__, **info}
+
+    @staticmethod
+    def _init_graph_engine(backend):
+        if backend not in ("local", "neo4j", "auto"):
+            print(f"⚠️ [Warning] 未知图分析后端 {backend}，按 auto 处理")
+            backend = "auto"
+        if backend == "auto":
+            backend = "local" if GRAPH_LOCAL_AVAILABLE and get_as_graph() is not None else "neo4j"
+        if backend == "local":
+            if not GRAPH_LOCAL_AVAILABLE:
+                print("❌ [Error] 本地图后端不可用")
+                return None
+            try:
+                return LocalGraphEngine()
+            except FileNotFoundError as e:
+                print(f"❌ [Error] {e}")
+                return None
         # 如果环境中有 Neo4j 且代码存在，初始化图分析引擎
         if GRAPH_RAG_AVAILABLE:
             try:
                 # 优先从环境变量读取 Neo4j 密码
-                self.graph_engine = BGPGraphRAG(password=os.getenv("NEO4J_PASSWORD", "neo4j"))
+                engine = BGPGraphRAG(password=os.getenv("NEO4J_PASSWORD", "neo4j"))
+                # 连接失败时 BGPGraphRAG 不抛异常而是 driver 为空
+                return engine if engine.driver else None
             except Exception as e:
                 print(f"❌ [Error] Neo4j 连接失败: {e}")
-                self.graph_engine = None
-        else:
-            self.graph_engine = None
+        return None
 
     def call_tool(self, tool_name, context, is_batch=False):
         """
@@ -68,6 +124,46 @@ class BGPToolKit:
         else:
             return f"Error: Tool '{tool_name}' is not supported."
 
+    async def acall_tool(self, tool_name, context, is_batch=False):
+        """
+        call_tool 的异步版本（供 BGPAgent 在事件循环中调用）：
+        先用共享 aiohttp 连接池并发预取该工具需要的 RIPEstat 数据（写入 BGPDataProvider 缓存），
+        再把报告组装放到线程池执行，避免同步 HTTP 阻塞其他并发诊断。
+        """
+        if ONLINE_AVAILABLE:
+            lookups = self._ripestat_lookups(str(tool_name).lower().strip(), context, is_batch)
+            if lookups:
+                await asyncio.gather(*lookups, return_exceptions=True)
+        engine = self.graph_engine
+        if str(tool_name).lower().strip() == "graph_analysis" and not is_batch and getattr(engine, "async_mode", False):
+            # Neo4j 异步驱动：直接在事件循环中等待，不占用线程池
+            try:
+                return await engine.arun(context)
+            except Exception as e:
+                return f"Graph Engine Error: {str(e)}"
+        return await asyncio.to_thread(self.call_tool, tool_name, context, is_batch)
+
+    def _ripestat_lookups(self, tool_name, context, is_batch):
+        """工具将要发出的 RIPEstat 查询（去重后的协程列表）"""
+        ctx = context.get("updates", [{}])[0] if is_batch and context.get("updates") else context
+        wanted = {}
+        if tool_name == "authority_check" and get_vrp_table() is None:
+            for u in (context.get("updates", []) if is_batch else [context]):
+                origin = u.get("as_path", "").split(" ")[-1]
+                if origin:
+                    wanted[("rpki", u.get("prefix"), origin)] = (BGPDataProvider.aget_rpki_status, u.get("prefix"), origin)
+        elif tool_name == "geo_check":
+            for u in (context.get("updates", []) if is_batch else [context]):
+                origin = u.get("as_path", "").split(" ")[-1]
+                for res in (u.get("prefix"), origin):
+                    if res:
+                        wanted[("geo", res)] = (BGPDataProvider.aget_geo_location, res)
+        elif tool_name == "neighbor_check":
+            parts = ctx.get("as_path", "").replace(",", " ").split()
+            if parts:
+                wanted[("as", parts[0])] = (BGPDataProvider.aget_as_info, parts[0])
+        return [fn(*args) for fn, *args in wanted.values()]
+
     # ==========================================
     # 🔍 [NEW] 核心溯源工具
     # ==========================================
@@ -185,8 +281,8 @@ class BGPToolKit:
     # ==========================================
     def graph_analysis(self, context, is_batch=False):
         """
-        调用 Neo4j 检查 Origin 和 Owner 之间的真实拓扑距离。
-        批量模式：对第一条 update 进行分析（或可扩展为对最可疑的 update 分析）
+        调用图分析后端（本地 CSR 图或 Neo4j）检查 Origin 和 Owner 之间的真实拓扑距离。
+        批量模式：整批 (Origin, Owner) 去重后一次取距离（DistanceService），按结论分组汇总
         """
         ctx = context
         if is_batch:
@@ -194,17 +290,32 @@ class BGPToolKit:
             ctx = updates[0] if updates else context
         if self.graph_engine:
             try:
-                print("⚡ [Toolkit] Calling Neo4j Graph Engine...")
-                return self.graph_engine.run_analysis(ctx)
+                if is_batch and context.get("updates"):
+                    return self._graph_analysis_batch(context["updates"])
+                return self.graph_engine.run(ctx)
             except Exception as e:
                 return f"Graph Engine Error: {str(e)}"
         else:
             observed = ctx.get("detected_origin", "Unknown")
             expected = ctx.get("expected_origin", "Unknown")
-            return (f"[Graph 离线] Neo4j 未连接，无法查询真实拓扑。"
-                    f"请先导入 CAIDA 拓扑数据并启动 Neo4j 后再启用图分析。"
+            return (f"[Graph 离线] 图分析后端不可用，无法查询真实拓扑。"
+                    f"请导入 CAIDA AS-relationship 文件（data/as_graph/ 或 AS_REL_FILE）或启动 Neo4j 后再启用图分析。"
                     f" Observed AS{observed} vs Expected AS{expected}。")
 
+    def _graph_analysis_batch(self, updates):
+        """批量图分析：相同 (prefix, Origin, 期望 Origin) 的 update 合并为一组，逐组输出结论"""
+        bulk = self.graph_engine.run_bulk(updates)
+        lines = []
+        for r in bulk["results"]:
+            idx = r["indices"]
+            shown = ",".join(str(i + 1) for i in idx[:5]) + (" 等" if len(idx) > 5 else "")
+            lines.append(f"[Update {shown}（共 {len(idx)} 条）] {r['message']}")
+        summary = " | ".join(f"{k} {v}" for k, v in bulk["counts"].items())
+        cache = bulk["distance_cache"]
+        lines.append(f"\n图分析结论统计: {summary}（{bulk['unique_pairs']} 组不同 Origin/Owner，"
+                     f"距离缓存命中率 {cache['hit_rate']:.0%}）")
+        return "\n".join(lines)
+
     # ==========================================
     # 🛡️ 基础检测工具 (模拟实现，可对接外部API)
     # ==========================================
@@ -221,21 +332,24 @@ class BGPToolKit:
         return "RPKI Status: VALID."
 
     def _authority_check_batch(self, context):
-        """批量 RPKI 检查，联网查询"""
+        """批量 RPKI 检查：(prefix, origin) 去重后一次性校验（AuthorityValidator.validate_bulk），再逐条展开"""
         updates = context.get("updates", [])
         if not updates:
             return "无 updates"
-        validator = AuthorityValidator() if ONLINE_AVAILABLE else None
         lines = []
         invalid_asns = {}
-        for i, u in enumerate(updates):
-            if validator:
-                res = validator.run(u)
-                lines.append(f"[Update {i+1}] {res}")
-                if "INVALID" in res:
+        if ONLINE_AVAILABLE:
+            bulk = AuthorityValidator().validate_bulk(updates)
+            for r in bulk["results"]:
+                u = updates[r["index"]]
+                lines.append(f"[Update {r['index']+1}] {r['message']}")
+                if r["verdict"] == "INVALID":
                     origin = u.get("detected_origin", u.get("as_path", "").split()[-1] if u.get("as_path") else "?")
                     invalid_asns[origin] = invalid_asns.get(origin, 0) + 1
-            else:
+            counts = bulk["counts"]
+            summary = " | ".join(f"{k} {v}" for k, v in counts.items() if v)
+        else:
+            for i, u in enumerate(updates):
                 detected = u.get("detected_origin")
                 expected = u.get("expected_origin")
                 prefix = u.get("prefix", "?")
@@ -244,16 +358,38 @@ class BGPToolKit:
                     invalid_asns[detected] = invalid_asns.get(detected, 0) + 1
                 else:
                     lines.append(f"[Update {i+1}] VALID: AS{detected}")
+            summary = None
         if invalid_asns:
             lines.append(f"\n汇总: 非法 Origin AS 出现频次: {dict(invalid_asns)}")
+        if summary:
+            lines.append(f"校验结论统计: {summary}（{bulk['unique_pairs']} 组不同 prefix/Origin）")
         return "\n".join(lines)
 
     def geo_check(self, context, is_batch=False):
-        """检查 AS 地理位置冲突，联网查询 RIPEstat MaxMind/Whois"""
-        ctx = context.get("updates", [{}])[0] if is_batch and context.get("updates") else context
-        if ONLINE_AVAILABLE:
-            return GeoConflictChecker().run(ctx)
-        return "Geo Check: 需要联网获取地理位置数据 (RIPEstat API)。"
+        """检查 AS 地理位置冲突，优先查本地地理位置索引 / AS 元数据，未命中再查 RIPEstat。批量模式：逐条检查并汇总"""
+        if not ONLINE_AVAILABLE:
+            return "Geo Check: 需要联网获取地理位置数据 (RIPEstat API)。"
+        if is_batch:
+            return self._geo_check_batch(context)
+        return GeoConflictChecker().run(context)
+
+    def _geo_check_batch(self, context):
+        """批量地理检查：(prefix, origin) 去重后判定（GeoConflictChecker.run_bulk），再逐条展开"""
+        updates = context.get("updates", [])
+        if not updates:
+            return "无 updates"
+        bulk = GeoConflictChecker().run_bulk(updates)
+        lines = [f"[Update {r['index']+1}] {r['message']}" for r in bulk["results"]]
+        conflicts = {}
+        for r in bulk["results"]:
+            if r["verdict"] == "CONFLICT":
+                key = f"AS{r['origin']}({r['origin_country']}) -> {r['prefix_country']}"
+                conflicts[key] = conflicts.get(key, 0) + 1
+        if conflicts:
+            lines.append(f"\n汇总: 地理冲突出现频次: {conflicts}")
+        summary = " | ".join(f"{k} {v}" for k, v in bulk["counts"].items() if v)
+        lines.append(f"地理检查结论统计: {summary}（{bulk['unique_pairs']} 组不同 prefix/Origin）")
+        return "\n".join(lines)
 
     def neighbor_check(self, context, is_batch=False):
         """检查上游邻居信誉，联网获取 AS 信息，风险 AS 从知识库读取"""
@@ -1,40 +1,205 @@
-import requests
+import asyncio
 import logging
-from functools import lru_cache
+import threading
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+
+from .ripestat_client import BASE_URL, SOURCE_APP, ENDPOINT_LIMITS, DEFAULT_ENDPOINT_LIMIT, get_client, get_async_client
+from .ripestat_cache import get_default_cache
+from .as_metadata import get_as_metadata
+from .geo_index import get_geo_index
+from .lru import SharedLRU
 
 # 配置日志
 logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger("RIPEstat_Data")
 
+
+class _SingleFlight:
+    """
+    请求合并：同一缓存键同时只有一个在途查询，其余调用方（线程或协程）等待其结果。
+    在途查询用 concurrent.futures.Future 表示，线程直接 result()，协程经 wrap_future 等待。
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.fetches = 0
+        self.coalesced = 0
+
+    def join(self, key, can_wait=True):
+        """返回 (future, 是否由调用方负责查询)；已有在途查询但调用方不能等待时返回 (None, False)"""
+        with self._lock:
+            fut = self._calls.get(key)
+            if fut is not None:
+                if not can_wait:
+                    return None, False
+                self.coalesced += 1
+                return fut, False
+            fut = self._calls[key] = Future()
+            self.fetches += 1
+            return fut, True
+
+    def abandon(self, key, fut):
+        """负责查询的协程被取消：撤下在途查询并取消 future，等待方据此重新发起（或成为新的负责方）"""
+        with self._lock:
+            if self._calls.get(key) is fut:
+                del self._calls[key]
+        fut.cancel()
+
+    def finish(self, key, fut, value=None, exc=None):
+        with self._lock:
+            self._calls.pop(key, None)
+        if fut.done():
+            return
+        if exc is not None:
+            fut.set_exception(exc)
+        else:
+            fut.set_result(value)
+
+    def stats(self):
+        with self._lock:
+            return {"fetches": self.fetches, "coalesced": self.coalesced, "in_flight": len(self._calls)}
+
+
+_cache = SharedLRU(maxsize=1024)
+_flights = _SingleFlight()
+
+
+def _on_loop_thread():
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+
 class BGPDataProvider:
     """
-    RIPEstat Data API 接口层 (修复缓存 Bug 版)
+    RIPEstat Data API 接口层
+    同步方法（get_*）走共享连接池的 RIPEstatClient；异步方法（aget_*）走 aiohttp 连接池，
+    两者共用同一份进程内结果缓存，其下是跨进程的 SQLite 持久化缓存（按 endpoint TTL）。
+    AS 名称 / 国家先查本地元数据库（tools/as_metadata.py），IP / 前缀国家先查本地地理位置索引
+    （tools/geo_index.py），未命中才联网。
     """
-    BASE_URL = "https://stat.ripe.net/data"
-    SOURCE_APP = "bgp-anomaly-analysis-tool"
+    BASE_URL = BASE_URL
+    SOURCE_APP = SOURCE_APP
 
     @staticmethod
-    # [关键修改] 移除了这里的 @lru_cache，因为它不能处理 dict 参数
     def _fetch(endpoint, params):
         """
-        通用 HTTP 请求器
+        通用 HTTP 请求器（共享 Session，连接复用 + 重试退避）
         """
-        url = f"{BGPDataProvider.BASE_URL}/{endpoint}/data.json"
-        
-        # 注入 SourceApp 标识
-        if params is None: params = {}
-        params['sourceapp'] = BGPDataProvider.SOURCE_APP
-        
+        return get_client().get(endpoint, params)
+
+    @staticmethod
+    async def _afetch(endpoint, params):
+        """异步请求器：当前事件循环共享的 aiohttp 客户端，按 endpoint 限制并发"""
+        client = await get_async_client()
+        return await client.get(endpoint, params)
+
+    @staticmethod
+    def _parsed(key, parse, data):
+        """
+        解析响应并写入进程内 LRU。请求失败时客户端返回空 data：只返回解析出的默认值、不写 LRU，
+        由持久化缓存按 NEGATIVE_TTL_SEC 负缓存，过期后重新联网，避免一次瞬时失败在整个进程内生效
+        """
+        value = parse(data)
+        if data:
+            _cache.put(key, value)
+        return value
+
+    @staticmethod
+    def _cached(plan):
+        """plan = (缓存键, endpoint, params, 解析函数, 本地查询)；并发的相同查询合并为一次"""
+        key, endpoint, params, parse, local = plan
+        value = _cache.get(key)
+        if value is not SharedLRU.MISS:
+            return value
+        value = local() if local else None
+        if value is not None:
+            _cache.put(key, value)
+            return value
+        fut, leader = _flights.join(key, can_wait=not _on_loop_thread())
+        if fut is None:
+            # 事件循环线程内的同步调用不能阻塞等待同一循环里的协程查询，单独请求
+            return BGPDataProvider._parsed(key, parse, BGPDataProvider._fetch(endpoint, params))
+        if not leader:
+            try:
+                return fut.result()
+            except CancelledError:
+                if not fut.cancelled():
+                    raise
+                return BGPDataProvider._cached(plan)
+        try:
+            # 上一个在途查询可能刚刚写入缓存
+            value = _cache.get(key)
+            if value is SharedLRU.MISS:
+                value = BGPDataProvider._parsed(key, parse, BGPDataProvider._fetch(endpoint, params))
+        except BaseException as e:
+            _flights.finish(key, fut, exc=e)
+            raise
+        _flights.finish(key, fut, value)
+        return value
+
+    @staticmethod
+    async def _acached(plan):
+        key, endpoint, params, parse, local = plan
+        value = _cache.get(key)
+        if value is not SharedLRU.MISS:
+            return value
+        value = local() if local else None
+        if value is not None:
+            _cache.put(key, value)
+            return value
+        fut, leader = _flights.join(key)
+        if not leader:
+            try:
+                # shield：等待方被取消时不连带取消共享的查询
+                return await asyncio.shield(asyncio.wrap_future(fut))
+            except asyncio.CancelledError:
+                # 负责查询的协程被取消不是查询失败：重新发起，而不是把取消转给等待方
+                if not fut.cancelled():
+                    raise
+                return await BGPDataProvider._acached(plan)
         try:
-            resp = requests.get(url, params=params, timeout=15)
-            if resp.status_code == 200:
-                json_body = resp.json()
-                return json_body.get('data', {})
-            else:
-                logger.warning(f"API Error [{endpoint}]: HTTP {resp.status_code} - {resp.url}")
+            value = _cache.get(key)
+            if value is SharedLRU.MISS:
+                value = BGPDataProvider._parsed(key, parse, await BGPDataProvider._afetch(endpoint, params))
+        except asyncio.CancelledError:
+            _flights.abandon(key, fut)
+            raise
         except Exception as e:
-            logger.error(f"Connection Failed [{endpoint}]: {e}")
-        return {}
+            _flights.finish(key, fut, exc=e)
+            raise
+        _flights.finish(key, fut, value)
+        return value
+
+    @staticmethod
+    def cache_clear():
+        """清空进程内 LRU（持久化缓存不受影响）"""
+        _cache.clear()
+
+    @staticmethod
+    def cache_stats():
+        """持久化缓存（tools/ripestat_cache.py）的命中统计"""
+        return get_default_cache().stats()
+
+    @staticmethod
+    def metadata_stats():
+        """本地 AS 元数据库的命中统计（未配置时为空）"""
+        store = get_as_metadata()
+        return store.stats() if store is not None else {}
+
+    @staticmethod
+    def geo_index_stats():
+        """本地地理位置索引的命中统计（未配置时为空）"""
+        index = get_geo_index()
+        return index.stats() if index is not None else {}
+
+    @staticmethod
+    def coalescing_stats():
+        """请求合并统计：fetches 为实际发起的查询数，coalesced 为合并掉（省下）的查询数"""
+        return _flights.stats()
 
     @staticmethod
     def _format_asn(asn, needs_prefix=False):
@@ -49,59 +214,111 @@ class BGPDataProvider:
             return f"AS{clean_asn}"
         return clean_asn
 
+    # ---- 查询计划：(缓存键, endpoint, params, 解析函数, 本地查询或 None)，同步 / 异步共用 ----
+    @staticmethod
+    def _rpki_plan(prefix, origin_as):
+        # RPKI 接口通常使用纯数字 ASN
+        fmt_asn = BGPDataProvider._format_asn(origin_as, needs_prefix=False)
+        params = {"resource": fmt_asn, "prefix": prefix}
+        return ("rpki", prefix, fmt_asn), "rpki-validation", params, lambda data: data.get("status", "unknown"), None
+
+    @staticmethod
+    def _local_holder(fmt_asn):
+        store = get_as_metadata()
+        holder = store.holder(fmt_asn) if store is not None else None
+        return {"holder": holder} if holder else None
+
+    @staticmethod
+    def _local_asn_country(fmt_asn):
+        store = get_as_metadata()
+        return store.country(fmt_asn) if store is not None else None
+
+    @staticmethod
+    def _local_ip_country(resource):
+        index = get_geo_index()
+        return index.country(resource) if index is not None else None
+
+    @staticmethod
+    def _as_info_plan(asn):
+        # AS Overview 接口通常需要 AS 前缀
+        fmt_asn = BGPDataProvider._format_asn(asn, needs_prefix=True)
+        return ("as", fmt_asn), "as-overview", {"resource": fmt_asn}, \
+            lambda data: {"holder": data.get("holder", f"{fmt_asn}")}, \
+            lambda: BGPDataProvider._local_holder(fmt_asn)
+
+    @staticmethod
+    def _geo_plan(resource):
+        res_str = str(resource).strip()
+
+        # 判断 ASN (AS开头 或 纯数字且无点冒号)
+        is_asn = res_str.upper().startswith("AS") or (res_str.isdigit() and "." not in res_str and ":" not in res_str)
+
+        if is_asn:
+            fmt_res = BGPDataProvider._format_asn(res_str, needs_prefix=True)
+            return ("geo", fmt_res), "whois", {"resource": fmt_res}, BGPDataProvider._parse_whois_country, \
+                lambda: BGPDataProvider._local_asn_country(fmt_res)
+        return ("geo", res_str), "maxmind-geo-lite", {"resource": res_str}, BGPDataProvider._parse_maxmind_country, \
+            lambda: BGPDataProvider._local_ip_country(res_str)
+
     @staticmethod
-    @lru_cache(maxsize=1024) # [保留] 这里参数是字符串，可以缓存
     def get_rpki_status(prefix, origin_as):
         """
         Endpoint: rpki-validation
         """
-        # RPKI 接口通常使用纯数字 ASN
-        fmt_asn = BGPDataProvider._format_asn(origin_as, needs_prefix=False)
-        
-        params = {
-            "resource": fmt_asn,
-            "prefix": prefix
-        }
-        data = BGPDataProvider._fetch("rpki-validation", params)
-        return data.get("status", "unknown")
+        return BGPDataProvider._cached(BGPDataProvider._rpki_plan(prefix, origin_as))
+
+    @staticmethod
+    def get_rpki_status_many(pairs):
+        """
+        批量 RPKI 查询：[(prefix, origin_as), ...] -> {(prefix, origin_as): status}。
+        去重后只对未缓存的组合发请求，按 rpki-validation 的并发上限在线程池中并行（共享连接池）。
+        """
+        unique = list(dict.fromkeys(pairs))
+        missing = [p for p in unique if _cache.get(BGPDataProvider._rpki_plan(*p)[0]) is SharedLRU.MISS]
+        if len(missing) > 1:
+            workers = min(len(missing), ENDPOINT_LIMITS.get("rpki-validation", DEFAULT_ENDPOINT_LIMIT))
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                list(pool.map(lambda p: BGPDataProvider.get_rpki_status(*p), missing))
+        return {p: BGPDataProvider.get_rpki_status(*p) for p in unique}
 
     @staticmethod
-    @lru_cache(maxsize=1024) # [保留] 这里参数是字符串，可以缓存
     def get_as_info(asn):
         """
         Endpoint: as-overview
         """
-        # AS Overview 接口通常需要 AS 前缀
-        fmt_asn = BGPDataProvider._format_asn(asn, needs_prefix=True)
-        
-        params = {"resource": fmt_asn}
-        data = BGPDataProvider._fetch("as-overview", params)
-        
-        holder = data.get("holder", f"{fmt_asn}")
-        return {"holder": holder}
+        return dict(BGPDataProvider._cached(BGPDataProvider._as_info_plan(asn)))
 
     @staticmethod
-    @lru_cache(maxsize=1024) # [保留] 缓存地理位置查询结果
     def get_geo_location(resource):
         """
-        Geo 统一入口
+        Geo 统一入口：ASN 查 whois，IP / 前缀查 maxmind-geo-lite
         """
-        res_str = str(resource).strip()
-        
-        # 判断 ASN (AS开头 或 纯数字且无点冒号)
-        is_asn = res_str.upper().startswith("AS") or (res_str.isdigit() and "." not in res_str and ":" not in res_str)
-        
-        if is_asn:
-            fmt_res = BGPDataProvider._format_asn(res_str, needs_prefix=True)
-            return BGPDataProvider._get_asn_country_via_whois(fmt_res)
-        else:
-            return BGPDataProvider._get_ip_country_via_maxmind(res_str)
+        return BGPDataProvider._cached(BGPDataProvider._geo_plan(resource))
 
     @staticmethod
-    def _get_ip_country_via_maxmind(ip_resource):
-        params = {"resource": ip_resource}
-        data = BGPDataProvider._fetch("maxmind-geo-lite", params)
-        
+    async def aget_rpki_status(prefix, origin_as):
+        """get_rpki_status 的异步版本"""
+        return await BGPDataProvider._acached(BGPDataProvider._rpki_plan(prefix, origin_as))
+
+    @staticmethod
+    async def aget_rpki_status_many(pairs):
+        """get_rpki_status_many 的异步版本（并发度由异步客户端按 endpoint 限制）"""
+        unique = list(dict.fromkeys(pairs))
+        statuses = await asyncio.gather(*(BGPDataProvider.aget_rpki_status(*p) for p in unique))
+        return dict(zip(unique, statuses))
+
+    @staticmethod
+    async def aget_as_info(asn):
+        """get_as_info 的异步版本"""
+        return dict(await BGPDataProvider._acached(BGPDataProvider._as_info_plan(asn)))
+
+    @staticmethod
+    async def aget_geo_location(resource):
+        """get_geo_location 的异步版本"""
+        return await BGPDataProvider._acached(BGPDataProvider._geo_plan(resource))
+
+    @staticmethod
+    def _parse_maxmind_country(data):
         try:
             resources = data.get("located_resources", [])
             if resources:
@@ -113,10 +330,7 @@ class BGPDataProvider:
         return "UNKNOWN"
 
     @staticmethod
-    def _get_asn_country_via_whois(asn_resource):
-        params = {"resource": asn_resource}
-        data = BGPDataProvider._fetch("whois", params)
-        
+    def _parse_whois_country(data):
         try:
             records = data.get("records", [])
             for block in records:
@@ -127,9 +341,19 @@ class BGPDataProvider:
             pass
         return "UNKNOWN"
 
-# --- 验证代码 ---
+    @staticmethod
+    def _get_ip_country_via_maxmind(ip_resource):
+        data = BGPDataProvider._fetch("maxmind-geo-lite", {"resource": ip_resource})
+        return BGPDataProvider._parse_maxmind_country(data)
+
+    @staticmethod
+    def _get_asn_country_via_whois(asn_resource):
+        data = BGPDataProvider._fetch("whois", {"resource": asn_resource})
+        return BGPDataProvider._parse_whois_country(data)
+
+# --- 验证代码（python -m tools.data_provider）---
 if __name__ == "__main__":
-    print(">>> 开始 RIPEstat 接口格式验证 (Fix Cache Bug) <<<")
+    print(">>> 开始 RIPEstat 接口格式验证 <<<")
     
     # 1. RPKI
     print("\n[Test 1] RPKI Validation")
@@ -0,0 +1,234 @@
+"""
+列式事件库
+Step1 的输出除逐事件目录（meta.json + suspicious_updates.json + raw_bgplay.json）外，
+可写成事件目录根下的两个文件：
+
+- event_index.json   事件索引表：每个事件的 meta（含 event_id），按写入顺序排列
+- event_updates.npz  全部事件的可疑 updates，列式存储：
+    strings            去重后的字符串表（前缀、AS 路径、ASN、时间戳等统一驻留）
+    <field>            UPDATE_FIELDS 每个字段一列 int32，取值为 strings 下标，-1 表示该条 update 没有此字段
+    _extra             其余字段（seen_by、raw_timestamp 等）及非字符串取值，每条 update 一个 JSON 对象（同样驻留在 strings 中），
+                       读取时原样合并回 update，列式库因此与 JSON 布局等价
+    event_offsets      CSR 偏移，第 i 个事件的 updates 为 [offsets[i], offsets[i+1])
+
+读取方（performance_test / run_case_catalog_test / run_feasibility_experiment）通过 load_events
+同时兼容两种布局；同一 event_id 两处都有时以列式库为准。列式库依赖 numpy，缺失时退回 JSON 目录。
+"""
+import os
+import json
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger("EventStore")
+
+INDEX_FILE = "event_index.json"
+UPDATES_FILE = "event_updates.npz"
+# 按列存储的 update 字段（取值为字符串时）；其他字段写入 EXTRA_FIELD 列
+UPDATE_FIELDS = (
+    "prefix", "as_path", "detected_origin", "expected_origin",
+    "timestamp", "reason", "suspicious_as", "collector", "leak_type",
+)
+EXTRA_FIELD = "_extra"
+
+
+def columnar_available() -> bool:
+    return np is not None
+
+
+def has_store(root) -> bool:
+    return os.path.isfile(os.path.join(str(root), INDEX_FILE))
+
+
+def load_event_index(root) -> List[Dict]:
+    """只读事件索引表（不加载 updates）"""
+    path = os.path.join(str(root), INDEX_FILE)
+    if not os.path.isfile(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return data if isinstance(data, list) else []
+
+
+def _load_columns(root) -> Optional[Dict]:
+    path = os.path.join(str(root), UPDATES_FILE)
+    if np is None or not os.path.isfile(path):
+        return None
+    with np.load(path, allow_pickle=False) as data:
+        cols = {name: data[name] for name in data.files}
+    # 末尾追加 None 哨兵：下标 -1（字段缺失）直接取到 None
+    strings = cols.pop("strings").tolist() + [None]
+    offsets = cols.pop("event_offsets").tolist()
+    fields = {}
+    for name in UPDATE_FIELDS + (EXTRA_FIELD,):
+        col = cols.get(name)
+        # 整列缺失的字段（如单 collector 时的 collector）不参与逐行组装
+        if col is not None and col.size and col.max() >= 0:
+            fields[name] = col
+    return {"strings": strings, "offsets": offsets, "fields": fields}
+
+
+def _rows(cols: Dict, start: int, end: int) -> List[Dict]:
+    strings = cols["strings"]
+    full, partial = [], []
+    for name, col in cols["fields"].items():
+        part = col[start:end]
+        values = [strings[k] for k in part.tolist()]
+        (full if part.size and part.min() >= 0 else partial).append((name, values))
+    if full:
+        names = [name for name, _ in full]
+        rows = [dict(zip(names, vals)) for vals in zip(*(values for _, values in full))]
+    else:
+        rows = [{} for _ in range(start, end)]
+    for name, values in partial:
+        for row, v in zip(rows, values):
+            if v is not None:
+                row[name] = v
+    for row in rows:
+        extra = row.pop(EXTRA_FIELD, None)
+        if extra is not None:
+            row.update(json.loads(extra))
+    return rows
+
+
+def load_store(root) -> List[Tuple[Dict, List[Dict]]]:
+    """读取列式库，返回 [(meta, updates), ...]，顺序与索引表一致"""
+    index = load_event_index(root)
+    if not index:
+        return []
+    cols = _load_columns(root)
+    if cols is None:
+        if np is None:
+            logger.warning(f"缺少 numpy，无法读取列式事件库 {root}")
+        return [(meta, []) for meta in index]
+    offsets = cols["offsets"]
+    # 整库一次性解码，再按 CSR 偏移切分到各事件
+    rows = _rows(cols, 0, offsets[-1])
+    return [(meta, rows[offsets[i]:offsets[i + 1]]) for i, meta in enumerate(index)]
+
+
+def load_event_updates(root, event_id: str) -> List[Dict]:
+    """按 event_id 读取单个事件的 updates"""
+    for i, meta in enumerate(load_event_index(root)):
+        if meta.get("event_id") == event_id:
+            cols = _load_columns(root)
+            if cols is None:
+                return []
+            offsets = cols["offsets"]
+            return _rows(cols, offsets[i], offsets[i + 1])
+    return []
+
+
+def iter_event_dirs(root) -> Iterable[Tuple[str, Dict, List[Dict]]]:
+    """逐事件目录布局：产出 (目录名, meta, updates)，读取失败的目录跳过"""
+    root = str(root)
+    if not os.path.isdir(root):
+        return
+    for name in sorted(os.listdir(root)):
+        ev_dir = os.path.join(root, name)
+        meta_path = os.path.join(ev_dir, "meta.json")
+        updates_path = os.path.join(ev_dir, "suspicious_updates.json")
+        if not (os.path.isfile(meta_path) and os.path.isfile(updates_path)):
+            continue
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(updates_path, "r", encoding="utf-8") as f:
+                updates = json.load(f)
+        except Exception as e:
+            logger.warning(f"读取 {ev_dir} 失败: {e}")
+            continue
+        yield name, meta, updates
+
+
+def load_events(root) -> List[Tuple[str, Dict, List[Dict]]]:
+    """
+    统一读取入口：列式库 + 逐事件目录，返回 [(event_id, meta, updates), ...]。
+    列式库中已有的 event_id 不再读取对应目录。
+    """
+    events = []
+    seen = set()
+    for meta, updates in load_store(root):
+        event_id = str(meta.get("event_id", ""))
+        seen.add(event_id)
+        events.append((event_id, meta, updates))
+    for name, meta, updates in iter_event_dirs(root):
+        event_id = str(meta.get("event_id", name))
+        if event_id in seen or name in seen:
+            continue
+        events.append((event_id, meta, updates))
+    return events
+
+
+class EventStoreWriter:
+    """
+    累积事件后一次性写出列式库；目标目录已有列式库时合并（同 event_id 以新写入为准）。
+    用法: with EventStoreWriter(root) as w: w.add(meta, updates)
+    """
+
+    def __init__(self, root):
+        if np is None:
+            raise RuntimeError("列式事件库需要 numpy: pip install numpy")
+        self.root = str(root)
+        self._events: Dict[str, Tuple[Dict, List[Dict]]] = {}
+
+    def add(self, meta: Dict, updates: List[Dict]) -> None:
+        self._events[str(meta.get("event_id", ""))] = (meta, updates)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+
+    def close(self) -> None:
+        if not self._events:
+            return
+        merged = [
+            (meta, updates) for meta, updates in load_store(self.root)
+            if str(meta.get("event_id", "")) not in self._events
+        ]
+        merged.extend(self._events.values())
+        self._events = {}
+
+        strings: Dict[str, int] = {}
+
+        def intern(v: str) -> int:
+            k = strings.get(v)
+            if k is None:
+                k = strings[v] = len(strings)
+            return k
+
+        cols: Dict[str, List[int]] = {f: [] for f in UPDATE_FIELDS + (EXTRA_FIELD,)}
+        offsets = [0]
+        for _, updates in merged:
+            for u in updates:
+                for f in UPDATE_FIELDS:
+                    v = u.get(f)
+                    cols[f].append(intern(v) if isinstance(v, str) else -1)
+                extra = {k: v for k, v in u.items() if k not in UPDATE_FIELDS or not isinstance(v, str)}
+                cols[EXTRA_FIELD].append(
+                    intern(json.dumps(extra, ensure_ascii=False, sort_keys=True, default=str)) if extra else -1
+                )
+            offsets.append(offsets[-1] + len(updates))
+
+        os.makedirs(self.root, exist_ok=True)
+        arrays = {f: np.asarray(c, dtype=np.int32) for f, c in cols.items()}
+        arrays["strings"] = np.asarray(list(strings), dtype=str) if strings else np.zeros(0, dtype="<U1")
+        arrays["event_offsets"] = np.asarray(offsets, dtype=np.int64)
+
+        updates_path = os.path.join(self.root, UPDATES_FILE)
+        index_path = os.path.join(self.root, INDEX_FILE)
+        tmp_updates = updates_path + ".tmp"
+        with open(tmp_updates, "wb") as f:
+            np.savez(f, **arrays)
+        tmp_index = index_path + ".tmp"
+        with open(tmp_index, "w", encoding="utf-8") as f:
+            json.dump([meta for meta, _ in merged], f, ensure_ascii=False)
+        os.replace(tmp_updates, updates_path)
+        os.replace(tmp_index, index_path)
@@ -1,31 +1,62 @@
+from typing import Dict, List
+
 from .data_provider import BGPDataProvider
 from .config_loader import get_europe_region_codes
 
 class GeoConflictChecker:
+    """地理围栏检查：前缀注册国家 vs Origin AS 注册国家（本地索引优先，未命中才查 RIPEstat）"""
+
     def run(self, context):
-        prefix = context.get('prefix')
+        return self._judge(context.get('prefix'), self._origin(context), context.get('expected_origin'))["message"]
+
+    def run_bulk(self, updates: List[Dict]) -> Dict:
+        """
+        批量检查：(prefix, origin, expected_origin) 去重后逐组判定，再按 update 展开。
+        :return: {"results": [{index, prefix, origin, verdict, prefix_country, origin_country, message}, ...],
+                  "counts": {MATCH / LOW_RISK / CONFLICT / SKIPPED: 条数}, "unique_pairs": 去重后的组数}
+        """
+        judged: Dict[tuple, Dict] = {}
+        results = []
+        counts = {"MATCH": 0, "LOW_RISK": 0, "CONFLICT": 0, "SKIPPED": 0}
+        for i, u in enumerate(updates):
+            prefix, origin = u.get('prefix'), self._origin(u)
+            key = (prefix, origin, u.get('expected_origin'))
+            if key not in judged:
+                judged[key] = self._judge(*key)
+            res = judged[key]
+            counts[res["verdict"]] += 1
+            results.append({"index": i, "prefix": prefix, "origin": origin, **res})
+        return {"results": results, "counts": counts, "unique_pairs": len(judged)}
+
+    @staticmethod
+    def _origin(context) -> str:
         as_path = context.get('as_path', "").split(" ")
-        origin_as = as_path[-1] if as_path else ""
+        return as_path[-1] if as_path else ""
 
-        # 1. 查 IP 地理位置 (API 可能失败)
-        prefix_country = BGPDataProvider.get_geo_location(prefix)
-        
-        # 2. 如果 IP 查不到，回退查目标 ASN (Twitter AS13414)
-        if prefix_country == "UNKNOWN":
-            # 假设它是 Twitter 的 IP，回退到查 AS13414
-            prefix_country = BGPDataProvider.get_geo_location("13414")
+    @staticmethod
+    def _judge(prefix, origin_as, expected_origin=None) -> Dict:
+        # 1. 查 IP 地理位置
+        prefix_country = BGPDataProvider.get_geo_location(prefix) if prefix else "UNKNOWN"
+
+        # 2. 如果 IP 查不到，回退查该前缀的合法 Owner（已知时）
+        if prefix_country == "UNKNOWN" and expected_origin and str(expected_origin) != str(origin_as):
+            prefix_country = BGPDataProvider.get_geo_location(str(expected_origin))
 
         # 3. 查 Origin ASN 地理位置 (劫持者)
-        origin_country = BGPDataProvider.get_geo_location(origin_as)
+        origin_country = BGPDataProvider.get_geo_location(origin_as) if origin_as else "UNKNOWN"
+
+        def result(verdict, message):
+            return {"verdict": verdict, "prefix_country": prefix_country, "origin_country": origin_country,
+                    "message": message}
 
         if prefix_country == "UNKNOWN" or origin_country == "UNKNOWN":
-            return f"SKIPPED: 数据缺失 (IP:{prefix_country}, Origin:{origin_country})。"
+            return result("SKIPPED", f"SKIPPED: 数据缺失 (IP:{prefix_country}, Origin:{origin_country})。")
 
         if prefix_country != origin_country:
             eu = get_europe_region_codes()
             if prefix_country in eu and origin_country in eu:
-                 return f"LOW_RISK: 地理不一致 ({prefix_country} vs {origin_country})，但在同一区域内。"
+                return result("LOW_RISK", f"LOW_RISK: 地理不一致 ({prefix_country} vs {origin_country})，但在同一区域内。")
+
+            return result("CONFLICT", f"CONFLICT: 地理围栏警报！IP注册地 [{prefix_country}] 与 Origin AS 注册地 [{origin_country}] 不一致。")
 
-            return f"CONFLICT: 地理围栏警报！IP注册地 [{prefix_country}] 与 Origin AS 注册地 [{origin_country}] 不一致。"
-        
-        return f"MATCH: 两者均位于 [{prefix_country}]。"
\ No newline at end of file
+        return result("MATCH", f"MATCH: 两者均位于 [{prefix_country}]。")
@@ -0,0 +1,317 @@
+"""
+离线 IP 前缀地理位置索引：IP / 前缀 -> 国家代码
+把地址段按起始地址排序存入数组（IPv4 用 array('I')，IPv6 用整数列表），查询对起始地址做一次二分查找，不产生 I/O。
+
+数据来源（按优先级，先命中者为准）：
+1. 地理位置段文件（GEO_RANGES_FILE 或 data/geo/ip_ranges.csv，可 gzip），支持：
+   - 起止地址 CSV：start_ip,end_ip,country_code[,...]（DB-IP / IP2Location LITE，地址可为整数）
+   - CIDR CSV：network,country_code[,...]（ipinfo 等），表头含 network / cidr / prefix 列时识别
+2. RIR delegated stats（data/as_metadata/ 中的 delegated-* 文件，见 tools/as_metadata.py）的 ipv4 / ipv6 分配段
+
+前缀取其网络地址所在段的国家；BGPDataProvider.get_geo_location(IP / 前缀) 先查本索引，未命中才联网。
+数据文件每 CHECK_INTERVAL_SEC 秒最多检查一次，reload() 可立即重新检查。
+"""
+import os
+import time
+import csv
+import bisect
+import logging
+import threading
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .project_paths import GEO_RANGES_FILE
+from .prefix_index import addr_to_int
+from .as_metadata import country_code, iter_delegated, metadata_dir, open_text
+
+logger = logging.getLogger("GeoIndex")
+
+_NETWORK_KEYS = ("network", "cidr", "prefix")
+_START_KEYS = ("start_ip", "ip_start", "start", "ip_from", "range_start")
+_END_KEYS = ("end_ip", "ip_end", "end", "ip_to", "range_end")
+_CC_KEYS = ("country_code", "cc", "country_iso_code", "country")
+
+# ::ffff:0:0/96（IP2Location IPv6 文件用它表示 IPv4 段）
+_V4_MAPPED = 0xFFFF << 32
+
+
+def _parse_addr(value: str) -> Tuple[int, int]:
+    """地址字符串或整数 -> (ip_version, 整数)；IPv4-mapped IPv6 转回 IPv4"""
+    value = value.strip()
+    if value.isdigit():
+        n = int(value)
+        version = 4 if n < 2 ** 32 else 6
+    else:
+        version, n = addr_to_int(value)
+    if version == 6 and n >> 32 == 0xFFFF:
+        return 4, n - _V4_MAPPED
+    return version, n
+
+
+def _parse_network(value: str) -> Tuple[int, int, int]:
+    """'a.b.c.d/len' -> (ip_version, 起始整数, 结束整数)"""
+    addr, sep, plen = value.strip().partition("/")
+    version, n = addr_to_int(addr)
+    bits = 32 if version == 4 else 128
+    length = int(plen) if sep else bits
+    if not 0 <= length <= bits:
+        raise ValueError(f"非法前缀长度: {value}")
+    host = (1 << (bits - length)) - 1
+    return version, n & ~host, (n & ~host) | host
+
+
+def _pick(row: Dict, keys: Iterable[str]) -> Optional[str]:
+    for k in keys:
+        if row.get(k):
+            return row[k]
+    return None
+
+
+def iter_range_file(path: str) -> Iterable[Tuple[int, int, int, Optional[str]]]:
+    """地理位置段文件：(ip_version, 起始整数, 结束整数, 国家或 None)，无法解析的行跳过"""
+    with open_text(path) as f:
+        header = None
+        for row in csv.reader(f):
+            if not row or row[0].startswith("#"):
+                continue
+            cells = [c.strip() for c in row]
+            if header is None:
+                lowered = [c.lower() for c in cells]
+                if any(k in lowered for k in _NETWORK_KEYS + _START_KEYS):
+                    header = lowered
+                    continue
+                # 无表头：第一列含 "/" 为 CIDR 格式，否则为起止地址格式
+                header = ["network", "country_code"] if "/" in cells[0] else ["start_ip", "end_ip", "country_code"]
+            rec = dict(zip(header, cells))
+            # country 列可能是国家全名（ipinfo），只接受两位代码
+            cc = next((c for c in (country_code(rec.get(k)) for k in _CC_KEYS) if c), None)
+            try:
+                network = _pick(rec, _NETWORK_KEYS)
+                if network:
+                    version, start, end = _parse_network(network)
+                else:
+                    start_s, end_s = _pick(rec, _START_KEYS), _pick(rec, _END_KEYS)
+                    if not start_s or not end_s:
+                        continue
+                    version, start = _parse_addr(start_s)
+                    end_version, end = _parse_addr(end_s)
+                    if end_version != version or end < start:
+                        continue
+            except ValueError:
+                continue
+            yield version, start, end, cc
+
+
+def iter_delegated_ranges(path: str) -> Iterable[Tuple[int, int, int, Optional[str]]]:
+    """delegated stats 的 ipv4（value 为地址数）/ ipv6（value 为前缀长度）段"""
+    for _, cc, kind, start, value in iter_delegated(path):
+        if kind == "asn" or value <= 0:
+            continue
+        try:
+            version, n = addr_to_int(start)
+        except ValueError:
+            continue
+        if kind == "ipv4" and version == 4:
+            yield 4, n, n + value - 1, country_code(cc)
+        elif kind == "ipv6" and version == 6 and value <= 128:
+            yield 6, n, n | ((1 << (128 - value)) - 1), country_code(cc)
+
+
+class _RangeTable:
+    """单一地址族的有序不重叠地址段：起始 / 结束 / 国家下标三个平行数组"""
+
+    __slots__ = ("starts", "ends", "ccs")
+
+    def __init__(self, version: int):
+        self.starts = array("I") if version == 4 else []
+        self.ends = array("I") if version == 4 else []
+        self.ccs = array("H")
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def lookup(self, addr: int) -> int:
+        i = bisect.bisect_right(self.starts, addr) - 1
+        if i >= 0 and addr <= self.ends[i]:
+            return self.ccs[i]
+        return 0
+
+
+class GeoIndex:
+    """
+    只读前缀地理位置索引。每个数据源一层（按优先级），每层 IPv4 / IPv6 各一张 _RangeTable；
+    同一层内重叠的段保留起始地址更小者（各数据源本身不重叠，重叠只出现在异常数据中）。
+    """
+
+    def __init__(self, meta: Optional[Dict] = None):
+        self.meta = dict(meta or {})
+        self._countries: List[str] = [""]
+        self._country_ids: Dict[str, int] = {"": 0}
+        self._layers: List[Dict[int, _RangeTable]] = []
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return sum(len(t) for layer in self._layers for t in layer.values())
+
+    def _cc_id(self, cc: Optional[str]) -> int:
+        if not cc:
+            return 0
+        k = self._country_ids.get(cc)
+        if k is None:
+            k = self._country_ids[cc] = len(self._countries)
+            self._countries.append(cc)
+        return k
+
+    def add_layer(self, ranges: Iterable[Tuple[int, int, int, Optional[str]]]) -> int:
+        """追加一层（优先级低于已有层）：[(ip_version, 起始, 结束, 国家), ...]，返回收录段数"""
+        layer = {4: _RangeTable(4), 6: _RangeTable(6)}
+        n = 0
+        for version, start, end, cc in sorted(r for r in ranges if r[3]):
+            table = layer[version]
+            k = self._cc_id(cc)
+            if table.starts and start <= table.ends[-1]:
+                if end <= table.ends[-1]:
+                    continue
+                start = table.ends[-1] + 1
+            if table.starts and start == table.ends[-1] + 1 and table.ccs[-1] == k:
+                # 相邻且国家相同：合并
+                table.ends[-1] = end
+                continue
+            table.starts.append(start)
+            table.ends.append(end)
+            table.ccs.append(k)
+            n += 1
+        self._layers.append(layer)
+        return n
+
+    def lookup_int(self, version: int, addr: int) -> Optional[str]:
+        for layer in self._layers:
+            table = layer.get(version)
+            k = table.lookup(addr) if table is not None else 0
+            if k:
+                return self._countries[k]
+        return None
+
+    def country(self, resource) -> Optional[str]:
+        """IP 或前缀（取网络地址）所在段的国家代码，未收录或非法输入返回 None"""
+        addr, _, plen = str(resource).strip().partition("/")
+        try:
+            version, n = addr_to_int(addr)
+            if plen:
+                bits = 32 if version == 4 else 128
+                n &= ~((1 << (bits - int(plen))) - 1)
+        except ValueError:
+            self.misses += 1
+            return None
+        cc = self.lookup_int(version, n)
+        if cc is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return cc
+
+    def stats(self) -> Dict:
+        return {
+            "ranges": len(self),
+            "layers": [{f"ipv{v}": len(t) for v, t in layer.items()} for layer in self._layers],
+            "hits": self.hits,
+            "misses": self.misses,
+            **self.meta,
+        }
+
+    @classmethod
+    def load(cls, range_files: Iterable[str] = (), delegated_files: Iterable[str] = ()) -> "GeoIndex":
+        """地理位置段文件每个一层，delegated stats 合为最后一层"""
+        range_files, delegated_files = list(range_files), list(delegated_files)
+        index = cls({"range_files": range_files, "delegated_files": [os.path.basename(p) for p in delegated_files]})
+        for path in range_files:
+            index.add_layer(iter_range_file(path))
+        if delegated_files:
+            index.add_layer(r for path in delegated_files for r in iter_delegated_ranges(path))
+        return index
+
+
+# 两次检查数据文件（listdir + stat）之间的最短间隔（秒），间隔内直接返回已加载的索引
+CHECK_INTERVAL_SEC = float(os.getenv("GEO_INDEX_CHECK_SEC", "30"))
+
+_INDEX: Optional[GeoIndex] = None
+_INDEX_SIG = None
+# (数据源配置, 上次检查时间)
+_CHECKED: Optional[Tuple[Tuple, float]] = None
+_LOCK = threading.Lock()
+_DEFAULT_PATH: Optional[str] = None
+
+
+def set_default_geo_ranges(path: Optional[str]) -> None:
+    """指定 get_geo_index 使用的地理位置段文件（None 恢复环境变量 / 默认路径）"""
+    global _DEFAULT_PATH
+    _DEFAULT_PATH = str(path) if path else None
+    reload()
+
+
+def reload() -> None:
+    """下次 get_geo_index 时立即重新检查数据文件（写入新数据后调用）"""
+    global _CHECKED
+    _CHECKED = None
+
+
+def geo_ranges_path() -> Optional[str]:
+    """当前配置的地理位置段文件：set_default_geo_ranges > 环境变量 GEO_RANGES_FILE > data/geo/ip_ranges.csv（存在时）"""
+    path = _DEFAULT_PATH or os.getenv("GEO_RANGES_FILE")
+    if path:
+        return path
+    return str(GEO_RANGES_FILE) if os.path.isfile(GEO_RANGES_FILE) else None
+
+
+def _delegated_files() -> List[str]:
+    root = metadata_dir()
+    try:
+        names = sorted(os.listdir(root))
+    except OSError:
+        return []
+    return [os.path.join(root, n) for n in names if n.lower().startswith("delegated-") and not n.endswith(".part")]
+
+
+def _signature(paths: List[str]):
+    sig = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        sig.append((path, st.st_mtime, st.st_size))
+    return tuple(sig)
+
+
+def get_geo_index() -> Optional[GeoIndex]:
+    """
+    进程内共享的地理位置索引（源文件变化后重新加载）；没有任何数据源时返回 None。
+    距上次检查不足 CHECK_INTERVAL_SEC 秒且数据源配置未变时不访问文件系统。
+    """
+    global _INDEX, _INDEX_SIG, _CHECKED
+    config = (_DEFAULT_PATH, os.getenv("GEO_RANGES_FILE"), metadata_dir())
+    now = time.monotonic()
+    checked = _CHECKED
+    if checked is not None and checked[0] == config and now - checked[1] < CHECK_INTERVAL_SEC:
+        return _INDEX if _INDEX_SIG else None
+    range_file = geo_ranges_path()
+    range_files = [range_file] if range_file else []
+    delegated = _delegated_files()
+    sig = _signature(range_files + delegated)
+    if not sig:
+        _INDEX_SIG = None
+        _CHECKED = (config, now)
+        return None
+    with _LOCK:
+        if _INDEX is None or sig != _INDEX_SIG:
+            try:
+                _INDEX = GeoIndex.load([p for p in range_files if os.path.isfile(p)], delegated)
+            except (OSError, EOFError, ValueError) as e:
+                logger.warning(f"加载地理位置索引失败: {e}")
+                _INDEX = None
+            _INDEX_SIG = sig
+            if _INDEX is not None:
+                logger.info(f"已加载地理位置索引（{len(_INDEX)} 个地址段，{len(range_files)} 个段文件 + {len(delegated)} 个 delegated 文件）")
+        _CHECKED = (config, now)
+        return _INDEX
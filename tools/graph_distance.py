@@ -0,0 +1,162 @@
+"""
+Origin <-> Owner 拓扑距离服务（graph_analysis 的两种后端共用）
+一批 (origin, owner) 对先去重、查 LRU，未命中的一次性交给后端：
+    本地 CSR 图：ASGraph.shortest_path（有界双向 BFS）
+    Neo4j：一条 UNWIND + 有界 shortestPath 查询（一次往返）
+结果（最短路径节点列表，max_hops 内不连通为 None）写回 LRU。距离按无向图计算，(a, b) 与 (b, a) 共用一个缓存项。
+
+run_bulk 把整批 updates 按 (prefix, Origin, 期望 Origin) 去重后统一解析 Owner、批量取距离，再逐组生成结论，
+批量 graph_analysis 因此覆盖整批而不只是第一条。
+"""
+import os
+import logging
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from .as_graph import DEFAULT_MAX_HOPS
+from .lru import SharedLRU
+
+logger = logging.getLogger("GraphDistance")
+
+DISTANCE_CACHE_SIZE = int(os.getenv("GRAPH_DISTANCE_CACHE", "65536"))
+
+Pair = Tuple[str, str]
+PathLookup = Callable[[List[Pair]], Dict[Pair, Optional[List[str]]]]
+
+
+def _key(a: str, b: str) -> Tuple[Pair, bool]:
+    """(缓存键, 是否反向)：键内两个 ASN 有序"""
+    if a <= b:
+        return (a, b), False
+    return (b, a), True
+
+
+class DistanceService:
+    """
+    (origin, owner) 最短路径 / 跳数服务：去重 -> LRU -> 后端批量查询。
+    lookup 接收去重后的键列表（键内 a 在前），返回 {键: 从 a 到 b 的路径或 None}，缺失的键视为不连通。
+    """
+
+    def __init__(self, lookup: PathLookup, maxsize: int = DISTANCE_CACHE_SIZE, max_hops: int = DEFAULT_MAX_HOPS):
+        self.lookup = lookup
+        self.max_hops = max_hops
+        self._lru = SharedLRU(maxsize)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.backend_calls = 0
+
+    def paths(self, pairs: Iterable[Pair]) -> Dict[Pair, Optional[List[str]]]:
+        """批量取路径：{(origin, owner): 从 origin 到 owner 的路径或 None}，未命中的键只调用一次后端"""
+        wanted: Dict[Pair, Tuple[Pair, bool]] = {}
+        for a, b in pairs:
+            a, b = str(a), str(b)
+            wanted.setdefault((a, b), _key(a, b))
+        found: Dict[Pair, Optional[List[str]]] = {}
+        missing: List[Pair] = []
+        hits = 0
+        for key, _ in dict.fromkeys(wanted.values()):
+            if key[0] == key[1]:
+                found[key] = [key[0]]
+                continue
+            cached = self._lru.get(key)
+            if cached is SharedLRU.MISS:
+                missing.append(key)
+            else:
+                found[key] = cached
+                hits += 1
+        if missing:
+            result = self.lookup(missing)
+            for key in missing:
+                path = result.get(key)
+                found[key] = path
+                self._lru.put(key, path)
+        with self._lock:
+            self.hits += hits
+            self.misses += len(missing)
+            self.backend_calls += 1 if missing else 0
+        out = {}
+        for pair, (key, reverse) in wanted.items():
+            path = found[key]
+            out[pair] = path[::-1] if reverse and path else path
+        return out
+
+    def prime(self, paths: Dict[Pair, Optional[List[str]]]) -> None:
+        """写入后端在其他查询中顺带得到的路径（{(origin, owner): 从 origin 到 owner 的路径或 None}）"""
+        for (a, b), path in paths.items():
+            key, reverse = _key(str(a), str(b))
+            self._lru.put(key, path[::-1] if reverse and path else path)
+
+    def path(self, origin: str, owner: str) -> Optional[List[str]]:
+        return self.paths([(origin, owner)])[(str(origin), str(owner))]
+
+    def distance(self, origin: str, owner: str) -> Optional[int]:
+        """跳数，max_hops 内不连通返回 None"""
+        path = self.path(origin, owner)
+        return len(path) - 1 if path else None
+
+    def clear(self) -> None:
+        self._lru.clear()
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {"cached": len(self._lru), "hits": self.hits, "misses": self.misses,
+                "backend_calls": self.backend_calls, "hit_rate": round(self.hits / total, 3) if total else 0.0}
+
+
+def local_lookup(graph, max_hops: int = DEFAULT_MAX_HOPS) -> PathLookup:
+    """本地 CSR 图后端：逐对有界双向 BFS"""
+
+    def lookup(keys: List[Pair]) -> Dict[Pair, Optional[List[str]]]:
+        return {key: graph.shortest_path(key[0], key[1], max_hops) for key in keys}
+
+    return lookup
+
+
+def neo4j_lookup(read: Callable, max_hops: int = DEFAULT_MAX_HOPS) -> PathLookup:
+    """Neo4j 后端：所有未命中的键放进一条 UNWIND 查询，一次往返；read(query, **params) 在读事务中执行并返回 [dict]"""
+    query = f"""
+    UNWIND $pairs AS pair
+    MATCH (a:AS {{asn: pair[0]}}), (b:AS {{asn: pair[1]}})
+    OPTIONAL MATCH p = shortestPath((a)-[*..{int(max_hops)}]-(b))
+    RETURN pair[0] AS src, pair[1] AS dst, [n IN nodes(p) | n.asn] AS path_nodes
+    """
+
+    def lookup(keys: List[Pair]) -> Dict[Pair, Optional[List[str]]]:
+        rows = read(query, pairs=[list(k) for k in keys])
+        return {(r["src"], r["dst"]): (list(r["path_nodes"]) if r["path_nodes"] else None) for r in rows}
+
+    return lookup
+
+
+def origin_of(context: Dict) -> Optional[str]:
+    """AS_PATH 最后一跳（Origin）"""
+    hops = str(context.get('as_path', "") or "").split()
+    return hops[-1] if hops else None
+
+
+def run_bulk(updates: List[Dict], resolve_owners: Callable, distances: DistanceService, verdict: Callable) -> Dict:
+    """
+    批量图分析。
+    :param resolve_owners: [ctx] -> [(owner_asn, owner_name)]，每个不同 (prefix, Origin, 期望 Origin) 组取一条代表 update
+    :param verdict: (ctx, origin, owner_asn, owner_name) -> 结论文本（距离经 distances 查询，此时已在 LRU 中）
+    :return: {results: [{indices, origin, owner, verdict, message}], counts, unique_pairs, distance_cache}
+    """
+    groups: Dict[Tuple, List[int]] = {}
+    for i, u in enumerate(updates):
+        key = (u.get('prefix'), origin_of(u), str(u.get('expected_origin') or ""))
+        groups.setdefault(key, []).append(i)
+    keys = list(groups)
+    contexts = [updates[groups[k][0]] for k in keys]
+    owners = resolve_owners(contexts)
+    pairs = {(k[1], owner) for k, (owner, _) in zip(keys, owners) if k[1] and owner and k[1] != owner}
+    distances.paths(pairs)
+
+    results, counts = [], {}
+    for key, ctx, (owner, name) in zip(keys, contexts, owners):
+        origin = key[1]
+        message = verdict(ctx, origin, owner, name) if origin else "GRAPH_ERROR: 无法从路径提取 Origin AS。"
+        label = message.split(":", 1)[0]
+        counts[label] = counts.get(label, 0) + len(groups[key])
+        results.append({"indices": groups[key], "origin": origin, "owner": owner, "verdict": label, "message": message})
+    return {"results": results, "counts": counts, "unique_pairs": len(pairs), "distance_cache": distances.stats()}
@@ -0,0 +1,109 @@
+"""
+进程内图分析后端：基于 tools/as_graph.py 的 CSR AS 关系图回答 Graph RAG 的三类查询
+（前缀归属、Origin 与 Owner 的最短路径、邻居关系），输出格式与 BGPGraphRAG.run 一致，可在 BGPToolKit 中替代 Neo4j。
+
+前缀归属依次取：告警上下文的 expected_origin > 知识库 known_prefix_origin > 本地 RIB 基线推断。
+AS 名称只查本地 AS 元数据库（tools/as_metadata.py），不联网。
+Origin 与 Owner 的最短路径经 tools/graph_distance.py 的 DistanceService（LRU + 批量），run_bulk 覆盖整批 updates。
+"""
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from .as_graph import ASGraph, get_as_graph
+from .as_metadata import get_as_metadata
+from .config_loader import get_known_prefix_origin
+from .graph_distance import DistanceService, local_lookup, origin_of, run_bulk
+from .rib_baseline import infer_expected_origin
+
+logger = logging.getLogger("GraphLocal")
+
+
+class LocalGraphEngine:
+    """CSR 图分析引擎；graph 为空时使用 get_as_graph() 的共享实例"""
+
+    def __init__(self, graph: Optional[ASGraph] = None, distances: Optional[DistanceService] = None):
+        self.graph = graph if graph is not None else get_as_graph()
+        if self.graph is None:
+            raise FileNotFoundError("未找到 AS-relationship 文件（AS_REL_FILE 或 data/as_graph/）")
+        self.distances = distances or DistanceService(local_lookup(self.graph))
+
+    def close(self):
+        pass
+
+    @staticmethod
+    def _name(asn: str) -> str:
+        store = get_as_metadata()
+        holder = store.holder(asn) if store is not None else None
+        return holder or f"AS{asn}"
+
+    @staticmethod
+    def owner_of(prefix, context: Optional[Dict] = None) -> Tuple[Optional[str], Optional[str]]:
+        """(合法 Owner ASN, 来源)：上下文 > 知识库 > RIB 基线"""
+        context = context or {}
+        expected = context.get('expected_origin')
+        if expected:
+            return str(expected), "context"
+        known = get_known_prefix_origin().get(prefix)
+        if known:
+            return str(known), "knowledge_base"
+        inferred = infer_expected_origin(prefix, context.get('timestamp')) if prefix else None
+        if inferred:
+            return str(inferred), "rib_baseline"
+        return None, None
+
+    def _owners(self, contexts: List[Dict]) -> List[Tuple[Optional[str], Optional[str]]]:
+        out = []
+        for ctx in contexts:
+            owner, _ = self.owner_of(ctx.get('prefix'), ctx)
+            out.append((owner, self._name(owner) if owner else None))
+        return out
+
+    def run(self, context):
+        """
+        图分析核心查询接口（与 BGPGraphRAG.run 相同的结论前缀：GRAPH_VALID / GRAPH_SUSPICIOUS / GRAPH_ANOMALY / GRAPH_MISSING）
+        """
+        origin_as = origin_of(context)
+        if not origin_as:
+            return "GRAPH_ERROR: 无法从路径提取 Origin AS。"
+        owner_asn, owner_name = self._owners([context])[0]
+        return self._verdict(context, origin_as, owner_asn, owner_name)
+
+    def run_bulk(self, updates: List[Dict]) -> Dict:
+        """批量图分析：去重后统一取距离（见 graph_distance.run_bulk）"""
+        return run_bulk(updates, self._owners, self.distances, self._verdict)
+
+    def _verdict(self, context, origin_as, owner_asn, owner_name):
+        prefix = context.get('prefix')
+
+        # --- 步骤 1: 验证前缀归属 ---
+        if not owner_asn:
+            return f"GRAPH_MISSING: 图谱中未收录前缀 {prefix} 的归属信息，无法验证。"
+
+        if origin_as == owner_asn:
+            return f"GRAPH_VALID: [图验证通过] Origin AS{origin_as} 与图谱记录的拥有者 ({owner_name}) 一致。"
+
+        graph = self.graph
+        if origin_as not in graph or owner_asn not in graph:
+            missing = [f"AS{a}" for a in (origin_as, owner_asn) if a not in graph]
+            return (f"GRAPH_MISSING: Origin AS{origin_as} 不是合法拥有者 AS{owner_asn} ({owner_name})，"
+                    f"但 {', '.join(missing)} 不在 AS 关系图中，无法做拓扑分析。")
+
+        # --- 步骤 2: 直接邻接关系 ---
+        rel = graph.relationship(owner_asn, origin_as)
+        if rel is not None:
+            return (f"GRAPH_SUSPICIOUS: [拓扑异常] Origin AS{origin_as} 不是合法拥有者 AS{owner_asn} ({owner_name})。\n"
+                    f"    - 图谱距离: 1 跳（AS{origin_as} 是 AS{owner_asn} 的 {rel}）\n"
+                    f"    - 拓扑路径: {graph.annotate_path([owner_asn, origin_as])}\n"
+                    f"    - 结论: 两者直接相连，可能是邻居误宣告 / 代播（需结合授权确认），也可能是相邻 AS 的劫持。")
+
+        # --- 步骤 3: 拓扑路径分析 (Shortest Path，经距离缓存) ---
+        path = self.distances.path(origin_as, owner_asn)
+        if path:
+            return (f"GRAPH_SUSPICIOUS: [拓扑异常] Origin AS{origin_as} 不是合法拥有者 AS{owner_asn} ({owner_name})。\n"
+                    f"    - 图谱距离: {len(path) - 1} 跳\n"
+                    f"    - 拓扑路径: {graph.annotate_path(path)}\n"
+                    f"    - 邻居构成: AS{origin_as} {graph.neighbor_summary(origin_as)}\n"
+                    f"    - 结论: 两个 AS 在物理拓扑上相距甚远，直接宣告属于“拓扑瞬移”，判定为劫持。")
+        return (f"GRAPH_ANOMALY: [严重拓扑隔离] Origin AS{origin_as} 与合法拥有者 AS{owner_asn} ({owner_name}) 在图谱中完全不连通！\n"
+                f"    - 搜索范围: {self.distances.max_hops} 跳内无路径\n"
+                f"    - 结论: 物理上不可能直接宣告，判定为伪造连接。")
@@ -1,124 +1,362 @@
 # tools/graph_rag.py
-from neo4j import GraphDatabase
+"""
+Neo4j 图分析后端（Graph RAG）
+连接：同一 (uri, user) 在进程内共享一个驱动（连接池大小 NEO4J_POOL_SIZE），按引用计数释放，进程退出时统一关闭；
+查询一律走读事务（execute_read，集群 / neo4j:// 路由时分发到只读成员）；单条分析把前缀归属与最短路径合并为一次往返。
+async_mode（或 NEO4J_ASYNC=1）时 arun 用当前事件循环共享的异步驱动，供并发诊断直接 await。
+health() 返回连通性、往返延迟与查询耗时统计。
+"""
+import asyncio
+import atexit
 import logging
 import os
+import threading
+import time
+import weakref
+from collections import deque
+
+from neo4j import GraphDatabase
+
+try:
+    from neo4j import AsyncGraphDatabase
+except ImportError:
+    # neo4j 4.4 之前没有异步驱动
+    AsyncGraphDatabase = None
+
+from .as_graph import DEFAULT_MAX_HOPS
+from .graph_distance import DistanceService, neo4j_lookup, origin_of, run_bulk
 
 # 配置日志
 logging.basicConfig(level=logging.WARNING)
 logger = logging.getLogger("Neo4j_RAG")
 
+NEO4J_URI = os.getenv("NEO4J_URI", "bolt://localhost:7687")
+NEO4J_USER = os.getenv("NEO4J_USER", "neo4j")
+NEO4J_DATABASE = os.getenv("NEO4J_DATABASE", "") or None
+# 共享驱动的连接池上限与取连接超时（秒）
+POOL_SIZE = int(os.getenv("NEO4J_POOL_SIZE", "16"))
+ACQUIRE_TIMEOUT = float(os.getenv("NEO4J_ACQUIRE_TIMEOUT", "30"))
+ASYNC_MODE = os.getenv("NEO4J_ASYNC", "").lower() in ("1", "true", "yes")
+
+# 演示拓扑（Twitter / Rostelecom 案例）；仅在 seed=True 或 NEO4J_SEED_DEMO=1 时写入，MERGE 幂等，不清空已有数据
+DEMO_SEED_QUERY = """
+MERGE (twitter:AS {asn: '13414'}) SET twitter += {name: 'Twitter', country: 'US', type: 'Content'}
+MERGE (cogent:AS {asn: '174'}) SET cogent += {name: 'Cogent', country: 'US', type: 'Tier-1'}
+MERGE (rostelecom:AS {asn: '12389'}) SET rostelecom += {name: 'Rostelecom', country: 'RU', type: 'ISP'}
+MERGE (telia:AS {asn: '1299'}) SET telia += {name: 'Telia', country: 'SE', type: 'Tier-1'}
+MERGE (google:AS {asn: '15169'}) SET google += {name: 'Google', country: 'US', type: 'Content'}
+
+// Twitter 是 Cogent 的客户，Rostelecom 是 Telia 的客户
+MERGE (twitter)-[:CUSTOMER_OF]->(cogent)
+MERGE (cogent)-[:PROVIDER_TO]->(twitter)
+MERGE (rostelecom)-[:CUSTOMER_OF]->(telia)
+MERGE (telia)-[:PROVIDER_TO]->(rostelecom)
+
+MERGE (p_twitter:Prefix {cidr: '104.244.42.0/24'})
+MERGE (twitter)-[:ORIGINATES]->(p_twitter)
+MERGE (p_google:Prefix {cidr: '8.8.8.0/24'})
+MERGE (google)-[:ORIGINATES]->(p_google)
+"""
+
+# 前缀 -> 拥有者（UNWIND 批量，一次往返解析整批前缀）
+OWNER_QUERY = """
+UNWIND $prefixes AS cidr
+MATCH (p:Prefix {cidr: cidr})<-[:ORIGINATES]-(owner:AS)
+RETURN cidr, owner.asn AS owner_asn, owner.name AS owner_name
+"""
+
+# 单条分析：前缀归属 + Origin 到 Owner 的有界最短路径，一次往返（Origin 即 Owner 或不在图中时 path_nodes 为 null）
+OWNER_PATH_QUERY = f"""
+MATCH (p:Prefix {{cidr: $prefix}})<-[:ORIGINATES]-(owner:AS)
+WITH owner LIMIT 1
+OPTIONAL MATCH (origin:AS {{asn: $origin_as}}) WHERE origin <> owner
+OPTIONAL MATCH path = shortestPath((origin)-[*..{DEFAULT_MAX_HOPS}]-(owner))
+RETURN owner.asn AS owner_asn, owner.name AS owner_name, [n IN nodes(path) | n.asn] AS path_nodes
+"""
+
+
+class _QueryMetrics:
+    """查询耗时统计（进程内所有 BGPGraphRAG 共用），保留最近 window 次耗时算分位数"""
+
+    def __init__(self, window=1024):
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=window)
+        self.queries = 0
+        self.errors = 0
+        self.total_sec = 0.0
+        self.max_sec = 0.0
+        self.last_error = None
+
+    def record(self, elapsed, error=None):
+        with self._lock:
+            self.queries += 1
+            self.total_sec += elapsed
+            self.max_sec = max(self.max_sec, elapsed)
+            self._recent.append(elapsed)
+            if error is not None:
+                self.errors += 1
+                self.last_error = f"{type(error).__name__}: {error}"
+
+    def snapshot(self):
+        with self._lock:
+            recent = sorted(self._recent)
+            pick = lambda q: round(recent[min(len(recent) - 1, int(q * len(recent)))] * 1000, 2) if recent else None
+            return {
+                "queries": self.queries,
+                "errors": self.errors,
+                "avg_ms": round(self.total_sec / self.queries * 1000, 2) if self.queries else None,
+                "p50_ms": pick(0.5),
+                "p95_ms": pick(0.95),
+                "max_ms": round(self.max_sec * 1000, 2) if self.queries else None,
+                "last_error": self.last_error,
+            }
+
+
+_metrics = _QueryMetrics()
+
+# (uri, user) -> [driver, 引用数]
+_drivers = {}
+_drivers_lock = threading.Lock()
+# 事件循环 -> {(uri, user): 异步驱动}
+_async_drivers: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def acquire_driver(uri, user, password):
+    """取共享同步驱动（引用数 +1），首次创建时校验连通性；失败抛出异常且不占用引用"""
+    key = (uri, user)
+    with _drivers_lock:
+        entry = _drivers.get(key)
+        if entry is None:
+            driver = GraphDatabase.driver(uri, auth=(user, password), max_connection_pool_size=POOL_SIZE,
+                                          connection_acquisition_timeout=ACQUIRE_TIMEOUT)
+            try:
+                driver.verify_connectivity()
+            except Exception:
+                driver.close()
+                raise
+            entry = _drivers[key] = [driver, 0]
+        entry[1] += 1
+        return entry[0]
+
+
+def release_driver(driver):
+    """引用数 -1，归零时关闭驱动"""
+    with _drivers_lock:
+        for key, entry in list(_drivers.items()):
+            if entry[0] is driver:
+                entry[1] -= 1
+                if entry[1] <= 0:
+                    del _drivers[key]
+                    driver.close()
+                return
+
+
+@atexit.register
+def close_all_drivers():
+    with _drivers_lock:
+        entries = list(_drivers.values())
+        _drivers.clear()
+    for driver, _ in entries:
+        try:
+            driver.close()
+        except Exception as e:
+            logger.debug(f"关闭 Neo4j 驱动失败: {e}")
+
+
+async def _async_lifetime(drivers):
+    # 挂在事件循环的异步生成器集合上：asyncio.run 结束时关闭该循环的异步驱动（同 ripestat_client）
+    try:
+        yield
+    finally:
+        for driver in drivers.values():
+            await driver.close()
+
+
+async def get_async_driver(uri, user, password):
+    """当前事件循环共享的异步驱动（随 asyncio.run 结束自动关闭）"""
+    if AsyncGraphDatabase is None:
+        raise RuntimeError("当前 neo4j 驱动不支持异步接口（需 neo4j>=5）")
+    loop = asyncio.get_running_loop()
+    entry = _async_drivers.get(loop)
+    if entry is None:
+        drivers = {}
+        guard = _async_lifetime(drivers)
+        await guard.__anext__()
+        entry = _async_drivers[loop] = (drivers, guard)
+    drivers = entry[0]
+    key = (uri, user)
+    if key not in drivers:
+        drivers[key] = AsyncGraphDatabase.driver(uri, auth=(user, password), max_connection_pool_size=POOL_SIZE,
+                                                 connection_acquisition_timeout=ACQUIRE_TIMEOUT)
+    return drivers[key]
+
+
 class BGPGraphRAG:
-    def __init__(self, uri="bolt://localhost:7687", user="neo4j", password=None):
+    def __init__(self, uri=None, user=None, password=None, seed=None, database=None, async_mode=None):
         """
-        初始化 Neo4j 连接并注入初始数据
+        初始化 Neo4j 连接（进程内共享驱动）。默认只读使用已有图数据（由 scripts/load_neo4j_topology.py 导入），
+        启动时不修改图内容；seed=True（或环境变量 NEO4J_SEED_DEMO=1）时额外写入演示拓扑。
+        :param async_mode: True 时 arun 走异步驱动，默认取环境变量 NEO4J_ASYNC
         """
         self.driver = None
-        neo4j_password = password if password is not None else os.getenv("NEO4J_PASSWORD", "neo4j")
+        self.uri = uri or NEO4J_URI
+        self.user = user or NEO4J_USER
+        self.database = database or NEO4J_DATABASE
+        self.async_mode = ASYNC_MODE if async_mode is None else bool(async_mode)
+        self._password = password if password is not None else os.getenv("NEO4J_PASSWORD", "neo4j")
+        # Origin <-> Owner 最短路径：LRU + 批量 UNWIND 查询（tools/graph_distance.py）
+        self.distances = DistanceService(neo4j_lookup(self._read))
+        if seed is None:
+            seed = os.getenv("NEO4J_SEED_DEMO", "").lower() in ("1", "true", "yes")
         try:
-            self.driver = GraphDatabase.driver(uri, auth=(user, neo4j_password))
-            # 验证连接
-            self.driver.verify_connectivity()
+            self.driver = acquire_driver(self.uri, self.user, self._password)
             print("✅ [Neo4j] 数据库连接成功！")
-            
-            # 初始化数据 (生产环境不需要每次都做，但为了模拟测试，我们需要先填入数据)
-            self._seed_database()
-            
+
+            if seed:
+                self._seed_database()
+
         except Exception as e:
             print(f"❌ [Neo4j] 连接失败: {e}")
             print("   -> 请检查 Docker 是否启动: docker ps")
 
     def close(self):
+        """释放对共享驱动的引用（可重复调用），最后一个使用者释放时关闭连接池"""
         if self.driver:
-            self.driver.close()
+            release_driver(self.driver)
+            self.driver = None
+
+    def _session(self):
+        return self.driver.session(database=self.database) if self.database else self.driver.session()
 
     def _seed_database(self):
         """
-        使用 Cypher 语句构建知识图谱
+        写入演示拓扑（幂等）：约束 + MERGE，不删除已有节点
         """
-        seed_query = """
-        // 1. 清理旧数据 (仅测试用)
-        MATCH (n) DETACH DELETE n;
-        """
-        
-        insert_query = """
-        // 2. 创建 AS 节点
-        CREATE (twitter:AS {asn: '13414', name: 'Twitter', country: 'US', type: 'Content'})
-        CREATE (cogent:AS {asn: '174', name: 'Cogent', country: 'US', type: 'Tier-1'})
-        CREATE (rostelecom:AS {asn: '12389', name: 'Rostelecom', country: 'RU', type: 'ISP'})
-        CREATE (telia:AS {asn: '1299', name: 'Telia', country: 'SE', type: 'Tier-1'})
-        CREATE (google:AS {asn: '15169', name: 'Google', country: 'US', type: 'Content'})
-
-        // 3. 创建关系 (商业拓扑)
-        // Twitter 是 Cogent 的客户
-        CREATE (twitter)-[:CUSTOMER_OF]->(cogent)
-        CREATE (cogent)-[:PROVIDER_TO]->(twitter)
-        
-        // Rostelecom 是 Telia 的客户
-        CREATE (rostelecom)-[:CUSTOMER_OF]->(telia)
-        CREATE (telia)-[:PROVIDER_TO]->(rostelecom)
-
-        // 4. 创建前缀节点并关联
-        CREATE (p_twitter:Prefix {cidr: '104.244.42.0/24'})
-        CREATE (twitter)-[:ORIGINATES]->(p_twitter)
-
-        CREATE (p_google:Prefix {cidr: '8.8.8.0/24'})
-        CREATE (google)-[:ORIGINATES]->(p_google)
-        """
-        
-        with self.driver.session() as session:
-            # 分步执行，确保清理和插入都成功
-            session.run(seed_query)
-            session.run(insert_query)
-            print("✅ [Neo4j] 知识图谱数据注入完成 (Twitter/Rostelecom 拓扑已构建)。")
+        from .neo4j_loader import SCHEMA_STATEMENTS
+
+        with self._session() as session:
+            for stmt in SCHEMA_STATEMENTS:
+                session.run(stmt).consume()
+            session.run(DEMO_SEED_QUERY).consume()
+            print("✅ [Neo4j] 演示拓扑已写入 (Twitter/Rostelecom)。")
+
+    def _read(self, query, **params):
+        """读事务执行查询，返回 [dict]；记录耗时与错误"""
+        def work(tx):
+            return [r.data() for r in tx.run(query, **params)]
+
+        t0 = time.perf_counter()
+        try:
+            with self._session() as session:
+                # neo4j 5.x 为 execute_read，4.x 为 read_transaction
+                read = getattr(session, "execute_read", None) or session.read_transaction
+                rows = read(work)
+        except Exception as e:
+            _metrics.record(time.perf_counter() - t0, e)
+            raise
+        _metrics.record(time.perf_counter() - t0)
+        return rows
+
+    async def _aread(self, query, **params):
+        """异步读事务，语义同 _read"""
+        async def work(tx):
+            result = await tx.run(query, **params)
+            return await result.data()
+
+        driver = await get_async_driver(self.uri, self.user, self._password)
+        t0 = time.perf_counter()
+        try:
+            session = driver.session(database=self.database) if self.database else driver.session()
+            async with session:
+                rows = await session.execute_read(work)
+        except Exception as e:
+            _metrics.record(time.perf_counter() - t0, e)
+            raise
+        _metrics.record(time.perf_counter() - t0)
+        return rows
+
+    def health(self):
+        """连通性与延迟：ping_ms 为一次 RETURN 1 往返，其余为进程内查询统计"""
+        info = {"connected": False, "uri": self.uri, "pool_size": POOL_SIZE, "async_mode": self.async_mode,
+                "ping_ms": None, "distance_cache": self.distances.stats()}
+        if self.driver:
+            t0 = time.perf_counter()
+            try:
+                self._read("RETURN 1 AS ok")
+                info["connected"] = True
+                info["ping_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+            except Exception as e:
+                logger.warning(f"Neo4j 健康检查失败: {e}")
+        info.update(_metrics.snapshot())
+        return info
+
+    def _owners(self, contexts):
+        """[(owner_asn, owner_name)]，不同前缀合并为一条查询；多个 ORIGINATES 时取第一条"""
+        prefixes = list(dict.fromkeys(c.get('prefix') for c in contexts if c.get('prefix')))
+        found = {}
+        if prefixes:
+            for r in self._read(OWNER_QUERY, prefixes=prefixes):
+                found.setdefault(r["cidr"], (r["owner_asn"], r["owner_name"]))
+        return [found.get(c.get('prefix'), (None, None)) for c in contexts]
+
+    def _owner_and_path(self, rows, origin_as):
+        """解析 OWNER_PATH_QUERY 结果，路径写入距离缓存，返回 (owner_asn, owner_name)"""
+        if not rows:
+            return None, None
+        row = rows[0]
+        owner_asn = row["owner_asn"]
+        if owner_asn and owner_asn != origin_as:
+            nodes = row["path_nodes"]
+            self.distances.prime({(origin_as, owner_asn): list(nodes) if nodes else None})
+        return owner_asn, row["owner_name"]
 
     def run(self, context):
         """
         Graph RAG 核心查询接口
         """
-        prefix = context.get('prefix')
-        as_path = context.get('as_path', "").split(" ")
-        origin_as = as_path[-1] if as_path else None
+        if not self.driver:
+            return "SYSTEM_ERROR: Neo4j 数据库未连接，无法执行图分析。"
 
+        origin_as = origin_of(context)
+        if not origin_as:
+            return "GRAPH_ERROR: 无法从路径提取 Origin AS。"
+
+        # --- 步骤 1: 验证前缀归属（与最短路径同一次往返） ---
+        rows = self._read(OWNER_PATH_QUERY, prefix=context.get('prefix'), origin_as=origin_as)
+        owner_asn, owner_name = self._owner_and_path(rows, origin_as)
+        return self._verdict(context, origin_as, owner_asn, owner_name)
+
+    async def arun(self, context):
+        """run 的异步版本（异步驱动，不占用线程池）"""
         if not self.driver:
             return "SYSTEM_ERROR: Neo4j 数据库未连接，无法执行图分析。"
 
+        origin_as = origin_of(context)
         if not origin_as:
             return "GRAPH_ERROR: 无法从路径提取 Origin AS。"
+        rows = await self._aread(OWNER_PATH_QUERY, prefix=context.get('prefix'), origin_as=origin_as)
+        owner_asn, owner_name = self._owner_and_path(rows, origin_as)
+        return self._verdict(context, origin_as, owner_asn, owner_name)
+
+    def run_bulk(self, updates):
+        """批量图分析：前缀归属一次查询，所有 (Origin, Owner) 距离一次查询（见 graph_distance.run_bulk）"""
+        return run_bulk(updates, self._owners, self.distances, self._verdict)
+
+    def _verdict(self, context, origin_as, owner_asn, owner_name):
+        prefix = context.get('prefix')
+        if not owner_asn:
+            return f"GRAPH_MISSING: 图谱中未收录前缀 {prefix} 的归属信息，无法验证。"
+
+        if origin_as == owner_asn:
+            return f"GRAPH_VALID: [图验证通过] Origin AS{origin_as} 与图谱记录的拥有者 ({owner_name}) 一致。"
 
-        with self.driver.session() as session:
-            # --- 步骤 1: 验证前缀归属 ---
-            # Cypher: 查找该 Prefix 节点的 ORIGINATES 关系来自于哪个 AS
-            owner_query = """
-            MATCH (p:Prefix {cidr: $prefix})<-[:ORIGINATES]-(owner:AS)
-            RETURN owner.asn AS owner_asn, owner.name AS owner_name
-            """
-            result = session.run(owner_query, prefix=prefix).single()
-
-            if not result:
-                return f"GRAPH_MISSING: 图谱中未收录前缀 {prefix} 的归属信息，无法验证。"
-
-            owner_asn = result["owner_asn"]
-            owner_name = result["owner_name"]
-
-            if origin_as == owner_asn:
-                return f"GRAPH_VALID: [图验证通过] Origin AS{origin_as} 与图谱记录的拥有者 ({owner_name}) 一致。"
-
-            # --- 步骤 2: 拓扑路径分析 (Shortest Path) ---
-            # Cypher: 查找 Origin 和 Owner 之间的最短路径
-            path_query = """
-            MATCH (origin:AS {asn: $origin_as}), (owner:AS {asn: $owner_asn})
-            MATCH p = shortestPath((origin)-[*]-(owner))
-            RETURN length(p) AS hops, [n IN nodes(p) | n.asn] AS path_nodes
-            """
-            path_res = session.run(path_query, origin_as=origin_as, owner_asn=owner_asn).single()
-
-            if path_res:
-                hops = path_res["hops"]
-                nodes = path_res["path_nodes"]
-                return (f"GRAPH_SUSPICIOUS: [拓扑异常] Origin AS{origin_as} 不是合法拥有者 AS{owner_asn} ({owner_name})。\n"
-                        f"    - 图谱距离: {hops} 跳\n"
-                        f"    - 拓扑路径: {nodes}\n"
-                        f"    - 结论: 两个 AS 在物理拓扑上相距甚远，直接宣告属于“拓扑瞬移”，判定为劫持。")
-            else:
-                return (f"GRAPH_ANOMALY: [严重拓扑隔离] Origin AS{origin_as} 与合法拥有者 AS{owner_asn} ({owner_name}) 在图谱中完全不连通！\n"
-                        f"    - 结论: 物理上不可能直接宣告，判定为伪造连接。")
+        # --- 步骤 2: 拓扑路径分析 (有界 shortestPath，经距离缓存) ---
+        nodes = self.distances.path(origin_as, owner_asn)
+        if nodes:
+            return (f"GRAPH_SUSPICIOUS: [拓扑异常] Origin AS{origin_as} 不是合法拥有者 AS{owner_asn} ({owner_name})。\n"
+                    f"    - 图谱距离: {len(nodes) - 1} 跳\n"
+                    f"    - 拓扑路径: {nodes}\n"
+                    f"    - 结论: 两个 AS 在物理拓扑上相距甚远，直接宣告属于“拓扑瞬移”，判定为劫持。")
+        return (f"GRAPH_ANOMALY: [严重拓扑隔离] Origin AS{origin_as} 与合法拥有者 AS{owner_asn} ({owner_name}) 在图谱中完全不连通！\n"
+                f"    - 搜索范围: {self.distances.max_hops} 跳内无路径\n"
+                f"    - 结论: 物理上不可能直接宣告，判定为伪造连接。")
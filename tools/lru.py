@@ -0,0 +1,37 @@
+"""
+线程安全 LRU 缓存（data_provider 的查询缓存、graph_distance 的距离缓存共用）
+get 未命中返回 SharedLRU.MISS，以区分缓存的 None 值。
+"""
+import threading
+from collections import OrderedDict
+
+
+class SharedLRU:
+    """线程安全 LRU，同步 / 异步接口共用（替代各方法独立的 lru_cache）"""
+    MISS = object()
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return self.MISS
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
@@ -0,0 +1,188 @@
+"""
+RIS MRT 本地文件缓存
+按 collector/月份/文件名（即 collector + 5 分钟时间戳）持久化 data.ris.ripe.net 的原始 .gz 文件，
+RIS 归档文件发布后内容不再变化，因此 URL 路径即可作为内容地址。
+
+- 命中时直接返回本地路径，不再访问网络
+- 404 记录为 .missing 标记（带过期时间），避免重复请求不存在的文件
+- 总大小超过上限时按最近访问时间（mtime）做 LRU 淘汰，一次淘汰到上限的 EVICT_LOW_WATER，
+  总大小在写入时累加维护，只在淘汰时扫描目录
+"""
+import os
+import re
+import time
+import hashlib
+import logging
+import threading
+from typing import Iterable, Optional, Dict
+from urllib.parse import urlparse
+
+from .project_paths import MRT_CACHE_DIR
+
+logger = logging.getLogger("MRTCache")
+
+# 缓存总大小上限，可用环境变量 MRT_CACHE_MAX_BYTES 覆盖
+DEFAULT_MAX_BYTES = 4 * 1024 ** 3
+# 404 标记有效期：近期窗口的文件可能尚未发布，过期后重新探测
+MISSING_TTL_SEC = 7 * 24 * 3600
+# 最近访问过的文件可能正被其他线程解析，淘汰时跳过
+IN_USE_GRACE_SEC = 60
+# 淘汰的低水位（占上限比例）：留出余量，避免每次写入都触发一次全目录扫描
+EVICT_LOW_WATER = 0.9
+
+_RIS_PATH_RE = re.compile(r"^rrc\d{2}/\d{4}\.\d{2}/(updates|bview)\.\d{8}\.\d{4}\.gz$")
+_MISSING_SUFFIX = ".missing"
+_PART_SUFFIX = ".part"
+
+
+class MRTCache:
+    """RIS MRT 文件的磁盘缓存（大小上限 + LRU 淘汰），线程安全"""
+
+    def __init__(self, root=None, max_bytes: Optional[int] = None, missing_ttl: int = MISSING_TTL_SEC):
+        self.root = str(root or os.getenv("MRT_CACHE_DIR") or MRT_CACHE_DIR)
+        if max_bytes is None:
+            max_bytes = int(os.getenv("MRT_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES))
+        self.max_bytes = max_bytes
+        self.missing_ttl = missing_ttl
+        self._lock = threading.Lock()
+        self._total_bytes = None
+        # 可淘汰文件不足时（均在使用宽限期内），此时间之前不再扫描
+        self._evict_retry_at = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key_for(url: str) -> str:
+        """URL -> 缓存相对路径，如 rrc00/2014.04/updates.20140401.0800.gz"""
+        path = urlparse(url).path.lstrip("/")
+        if _RIS_PATH_RE.match(path):
+            return path
+        # 非标准 RIS 路径：退化为 URL 摘要，避免路径穿越
+        digest = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return f"other/{digest}.gz"
+
+    def _local_path(self, url: str) -> str:
+        return os.path.join(self.root, *self.key_for(url).split("/"))
+
+    def get(self, url: str) -> Optional[str]:
+        """命中返回本地路径并刷新 LRU 时间戳，未命中返回 None"""
+        path = self._local_path(url)
+        if os.path.isfile(path):
+            try:
+                os.utime(path, None)
+            except OSError:
+                pass
+            self.hits += 1
+            return path
+        self.misses += 1
+        return None
+
+    def is_missing(self, url: str) -> bool:
+        """该 URL 近期是否已确认不存在（HTTP 404）"""
+        marker = self._local_path(url) + _MISSING_SUFFIX
+        try:
+            return time.time() - os.path.getmtime(marker) < self.missing_ttl
+        except OSError:
+            return False
+
+    def mark_missing(self, url: str) -> None:
+        marker = self._local_path(url) + _MISSING_SUFFIX
+        os.makedirs(os.path.dirname(marker), exist_ok=True)
+        with open(marker, "w", encoding="utf-8"):
+            pass
+
+    def put_stream(self, url: str, chunks: Iterable[bytes]) -> str:
+        """将下载流写入缓存（先写 .part 再原子替换），返回本地路径"""
+        path = self._local_path(url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        part = f"{path}{_PART_SUFFIX}.{threading.get_ident()}"
+        size = 0
+        try:
+            with open(part, "wb") as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    size += len(chunk)
+            try:
+                replaced = os.path.getsize(path)
+            except OSError:
+                replaced = 0
+            os.replace(part, path)
+        except BaseException:
+            try:
+                os.unlink(part)
+            except OSError:
+                pass
+            raise
+
+        with self._lock:
+            if self._total_bytes is not None:
+                self._total_bytes += size - replaced
+        self._maybe_evict(keep=path)
+        return path
+
+    def _scan(self) -> Dict[str, os.stat_result]:
+        entries = {}
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if name.endswith(_MISSING_SUFFIX) or _PART_SUFFIX in name:
+                    continue
+                full = os.path.join(dirpath, name)
+                try:
+                    entries[full] = os.stat(full)
+                except OSError:
+                    continue
+        return entries
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(st.st_size for st in self._scan().values())
+            return self._total_bytes
+
+    def _maybe_evict(self, keep: Optional[str] = None) -> None:
+        if self.max_bytes <= 0 or self.total_bytes() <= self.max_bytes:
+            return
+        with self._lock:
+            now = time.time()
+            # 其他线程可能已完成淘汰
+            if self._total_bytes <= self.max_bytes or now < self._evict_retry_at:
+                return
+            entries = self._scan()
+            total = sum(st.st_size for st in entries.values())
+            target = int(self.max_bytes * EVICT_LOW_WATER)
+            # 最久未访问的优先淘汰
+            for path, st in sorted(entries.items(), key=lambda kv: kv[1].st_mtime):
+                if total <= target:
+                    break
+                if path == keep or now - st.st_mtime < IN_USE_GRACE_SEC:
+                    continue
+                try:
+                    os.unlink(path)
+                    total -= st.st_size
+                    logger.debug(f"MRT 缓存淘汰: {path}")
+                except OSError:
+                    continue
+            self._total_bytes = total
+            self._evict_retry_at = now + IN_USE_GRACE_SEC if total > self.max_bytes else 0.0
+
+    def stats(self) -> Dict:
+        return {
+            "root": self.root,
+            "hits": self.hits,
+            "misses": self.misses,
+            "total_bytes": self.total_bytes(),
+            "max_bytes": self.max_bytes,
+        }
+
+
+_DEFAULT_CACHE = None
+_DEFAULT_LOCK = threading.Lock()
+
+
+def get_default_cache() -> MRTCache:
+    """进程级默认缓存（懒加载）"""
+    global _DEFAULT_CACHE
+    with _DEFAULT_LOCK:
+        if _DEFAULT_CACHE is None:
+            _DEFAULT_CACHE = MRTCache()
+        return _DEFAULT_CACHE
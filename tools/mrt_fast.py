@@ -0,0 +1,298 @@
+"""
+BGP4MP 轻量快速解码器
+基于 struct + memoryview 直接解析 MRT 二进制，只提取溯源需要的字段：
+timestamp、IPv4 NLRI / withdrawn 前缀、AS_PATH（含 AS4_PATH 合并与 AS_SET 处理）。
+
+- 支持 BGP4MP / BGP4MP_ET 的 MESSAGE / MESSAGE_AS4 / MESSAGE_LOCAL / MESSAGE_AS4_LOCAL
+- ADD-PATH 子类型 (8-11)、非 IPv4/IPv6 AFI、格式异常的记录，原样产出 bytes，
+  由调用方交给 mrtparse 兜底解析
+- 其他 MRT 类型（TABLE_DUMP、STATE_CHANGE 等）直接跳过
+- iter_rib_entries 解析 RIB 快照（bview，TABLE_DUMP_V2）的单播前缀条目
+"""
+import struct
+from typing import BinaryIO, Generator, List, Sequence, Tuple, Union
+
+_HDR = struct.Struct("!IHHI")
+_HDR_LEN = _HDR.size
+
+MRT_TABLE_DUMP_V2 = 13
+MRT_BGP4MP = 16
+MRT_BGP4MP_ET = 17
+# subtype -> AS 号字节数
+_MESSAGE_SUBTYPES = {1: 2, 4: 4, 6: 2, 7: 4}
+_ADDPATH_SUBTYPES = frozenset((8, 9, 10, 11))
+
+# TABLE_DUMP_V2 单播 RIB 子类型 -> (IP 版本, 是否 ADD-PATH)，RFC 6396 / RFC 8050
+_RIB_SUBTYPES = {2: (4, False), 4: (6, False), 8: (4, True), 10: (6, True)}
+
+_BGP_MARKER_LEN = 16
+_BGP_UPDATE = 2
+_ATTR_AS_PATH = 2
+_ATTR_AS4_PATH = 17
+_ATTR_FLAG_EXT_LEN = 0x10
+
+AS_SET = 1
+AS_SEQUENCE = 2
+AS_CONFED_SEQUENCE = 3
+AS_CONFED_SET = 4
+AS_TRANS = 23456
+
+_AS_FMT = {2: "H", 4: "I"}
+
+
+class Bgp4mpUpdate:
+    """一条 BGP UPDATE 的精简视图，AS_PATH 按需解码"""
+
+    __slots__ = ("timestamp", "nlri", "withdrawn", "_attrs", "_as_size")
+
+    def __init__(self, timestamp: int, nlri, withdrawn, attrs: memoryview, as_size: int):
+        self.timestamp = timestamp
+        # [(addr_int, length), ...]，IPv4
+        self.nlri = nlri
+        self.withdrawn = withdrawn
+        self._attrs = attrs
+        self._as_size = as_size
+
+    def as_path(self) -> List[str]:
+        """返回 AS 号字符串列表（已合并 AS4_PATH）"""
+        return decode_as_path(self._attrs, self._as_size)
+
+
+def _decode_prefixes(buf, start: int, end: int) -> List[Tuple[int, int]]:
+    """BGP 前缀编码（长度字节 + 最少字节的地址）-> [(addr_int, length)]"""
+    out = []
+    i = start
+    while i < end:
+        ln = buf[i]
+        nb = (ln + 7) >> 3
+        if ln > 32 or i + 1 + nb > end:
+            raise ValueError("IPv4 前缀编码越界")
+        addr = int.from_bytes(buf[i + 1:i + 1 + nb], "big") << (32 - 8 * nb) if nb else 0
+        out.append((addr, ln))
+        i += 1 + nb
+    return out
+
+
+def _decode_segments(buf, start: int, end: int, as_size: int) -> List[Tuple[int, Sequence[int]]]:
+    segs = []
+    fmt = _AS_FMT[as_size]
+    i = start
+    while i < end:
+        seg_type = buf[i]
+        cnt = buf[i + 1]
+        i += 2
+        if i + cnt * as_size > end:
+            raise ValueError("AS_PATH 段越界")
+        segs.append((seg_type, struct.unpack_from(f"!{cnt}{fmt}", buf, i)))
+        i += cnt * as_size
+    return segs
+
+
+def _segments_len(segs) -> int:
+    """RFC 6793 计数规则：AS_SET 计 1，联盟段不计"""
+    n = 0
+    for seg_type, asns in segs:
+        if seg_type == AS_SEQUENCE:
+            n += len(asns)
+        elif seg_type == AS_SET:
+            n += 1
+    return n
+
+
+def merge_as4_path(as_path, as4_path):
+    """
+    RFC 6793 4.2.3：用 AS4_PATH 还原 2 字节会话中被 AS_TRANS 替换的 4 字节 AS。
+    仅当 AS_PATH 含 AS_TRANS 且 AS4_PATH 不长于 AS_PATH 时合并，否则忽略 AS4_PATH。
+    输入/输出均为 [(seg_type, [asn, ...]), ...]
+    """
+    if not as4_path or not any(AS_TRANS in asns for _, asns in as_path):
+        return as_path
+    n, n4 = _segments_len(as_path), _segments_len(as4_path)
+    if n < n4:
+        return as_path
+    keep = n - n4
+    merged = []
+    for seg_type, asns in as_path:
+        if keep <= 0:
+            break
+        if seg_type == AS_SEQUENCE:
+            take = list(asns[:keep])
+            keep -= len(take)
+            merged.append((seg_type, take))
+        elif seg_type == AS_SET:
+            merged.append((seg_type, list(asns)))
+            keep -= 1
+        else:
+            merged.append((seg_type, list(asns)))
+    return merged + [(t, list(a)) for t, a in as4_path]
+
+
+def flatten_as_path(segs) -> List[str]:
+    """
+    段列表 -> AS 号字符串列表。
+    AS_SEQUENCE 按序展开；单成员 AS_SET 等价于该 AS；
+    多成员 AS_SET 是聚合产生的无序集合，整体记为一跳 "{a,b}"，不把成员拼进路径；
+    联盟段只在联盟内部有意义，不计入路径。
+    """
+    out = []
+    for seg_type, asns in segs:
+        if seg_type in (AS_CONFED_SEQUENCE, AS_CONFED_SET):
+            continue
+        if seg_type == AS_SET and len(asns) > 1:
+            out.append("{" + ",".join(str(a) for a in asns) + "}")
+        else:
+            out.extend(str(a) for a in asns)
+    return out
+
+
+def path_origin(path: Sequence[str]) -> str:
+    """
+    flatten_as_path 结果的 Origin AS。
+    末段为多成员 AS_SET 时没有唯一 Origin（RFC 6811 视为 NONE），返回空串，由调用方跳过 Origin 检查。
+    """
+    if not path or path[-1].startswith("{"):
+        return ""
+    return path[-1]
+
+
+def decode_as_path(attrs, as_size: int) -> List[str]:
+    """从路径属性区解码 AS_PATH（并按需合并 AS4_PATH）"""
+    as_path = as4_path = None
+    i, end = 0, len(attrs)
+    while i + 3 <= end:
+        flags = attrs[i]
+        typ = attrs[i + 1]
+        if flags & _ATTR_FLAG_EXT_LEN:
+            ln = (attrs[i + 2] << 8) | attrs[i + 3]
+            i += 4
+        else:
+            ln = attrs[i + 2]
+            i += 3
+        if typ == _ATTR_AS_PATH:
+            as_path = _decode_segments(attrs, i, i + ln, as_size)
+        elif typ == _ATTR_AS4_PATH:
+            as4_path = _decode_segments(attrs, i, i + ln, 4)
+        i += ln
+    if not as_path:
+        return []
+    return flatten_as_path(merge_as4_path(as_path, as4_path))
+
+
+def _decode_bgp4mp(ts: int, mrt_type: int, subtype: int, body: memoryview):
+    """解码单条 BGP4MP 记录；非 UPDATE 返回 None，需兜底时抛 ValueError"""
+    as_size = _MESSAGE_SUBTYPES[subtype]
+    i = 4 if mrt_type == MRT_BGP4MP_ET else 0
+    # peer_as, local_as, ifindex
+    i += 2 * as_size + 2
+    afi = (body[i] << 8) | body[i + 1]
+    i += 2
+    if afi == 1:
+        i += 8
+    elif afi == 2:
+        i += 32
+    else:
+        raise ValueError(f"未知 AFI {afi}")
+    # BGP 报文头: marker(16) + length(2) + type(1)
+    if len(body) < i + _BGP_MARKER_LEN + 3:
+        raise ValueError("BGP 报文过短")
+    msg_type = body[i + _BGP_MARKER_LEN + 2]
+    if msg_type != _BGP_UPDATE:
+        return None
+    i += _BGP_MARKER_LEN + 3
+    end = len(body)
+
+    wlen = (body[i] << 8) | body[i + 1]
+    i += 2
+    withdrawn = _decode_prefixes(body, i, i + wlen) if wlen else []
+    i += wlen
+    alen = (body[i] << 8) | body[i + 1]
+    i += 2
+    if i + alen > end:
+        raise ValueError("路径属性越界")
+    attrs = body[i:i + alen]
+    i += alen
+    nlri = _decode_prefixes(body, i, end) if i < end else []
+    return Bgp4mpUpdate(ts, nlri, withdrawn, attrs, as_size)
+
+
+def iter_bgp4mp(fileobj: BinaryIO) -> Generator[Union[Bgp4mpUpdate, bytes], None, None]:
+    """
+    逐条读取（已解压的）MRT 流。
+    产出 Bgp4mpUpdate，或需要 mrtparse 兜底的整条原始记录 bytes（含 12 字节 MRT 头）。
+    """
+    read = fileobj.read
+    while True:
+        hdr = read(_HDR_LEN)
+        if len(hdr) < _HDR_LEN:
+            return
+        ts, mrt_type, subtype, length = _HDR.unpack(hdr)
+        body = read(length)
+        if len(body) < length:
+            return
+        if mrt_type != MRT_BGP4MP and mrt_type != MRT_BGP4MP_ET:
+            continue
+        if subtype in _ADDPATH_SUBTYPES:
+            yield hdr + body
+            continue
+        if subtype not in _MESSAGE_SUBTYPES:
+            continue
+        try:
+            rec = _decode_bgp4mp(ts, mrt_type, subtype, memoryview(body))
+        except (ValueError, IndexError, struct.error):
+            yield hdr + body
+            continue
+        if rec is not None:
+            yield rec
+
+
+def _decode_rib(subtype: int, body: memoryview) -> Tuple[int, int, int, List[memoryview]]:
+    """RIB_IPV4/IPV6_UNICAST(_ADDPATH) 记录 -> (ip_version, net_int, length, [路径属性区, ...])"""
+    version, addpath = _RIB_SUBTYPES[subtype]
+    bits = 32 if version == 4 else 128
+    # sequence number(4) + prefix length(1) + prefix
+    ln = body[4]
+    nb = (ln + 7) >> 3
+    if ln > bits:
+        raise ValueError("RIB 前缀长度越界")
+    net = int.from_bytes(body[5:5 + nb], "big") << (bits - 8 * nb) if nb else 0
+    i = 5 + nb
+    count = (body[i] << 8) | body[i + 1]
+    i += 2
+    entry_hdr = 10 if addpath else 6  # peer index(2) + originated time(4) [+ path id(4)]
+    end = len(body)
+    attrs = []
+    for _ in range(count):
+        i += entry_hdr
+        alen = (body[i] << 8) | body[i + 1]
+        i += 2
+        if i + alen > end:
+            raise ValueError("RIB 条目越界")
+        attrs.append(body[i:i + alen])
+        i += alen
+    return version, net, ln, attrs
+
+
+def iter_rib_entries(fileobj: BinaryIO) -> Generator[Tuple[int, int, int, List[memoryview]], None, None]:
+    """
+    逐条读取（已解压的）TABLE_DUMP_V2 RIB 快照，产出 (ip_version, net_int, length, [各 peer 的路径属性区])。
+    PEER_INDEX_TABLE、组播 RIB 与格式异常的记录跳过；TABLE_DUMP_V2 中 AS_PATH 恒为 4 字节 AS。
+    """
+    read = fileobj.read
+    while True:
+        hdr = read(_HDR_LEN)
+        if len(hdr) < _HDR_LEN:
+            return
+        _, mrt_type, subtype, length = _HDR.unpack(hdr)
+        body = read(length)
+        if len(body) < length:
+            return
+        if mrt_type != MRT_TABLE_DUMP_V2 or subtype not in _RIB_SUBTYPES:
+            continue
+        try:
+            yield _decode_rib(subtype, memoryview(body))
+        except (ValueError, IndexError):
+            continue
+
+
+def format_ipv4(addr: int, length: int) -> str:
+    return f"{addr >> 24}.{(addr >> 16) & 255}.{(addr >> 8) & 255}.{addr & 255}/{length}"
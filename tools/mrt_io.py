@@ -0,0 +1,79 @@
+"""
+MRT 文件读写的公共工具（ris_mrt_fetcher / rib_baseline / authority 共用）
+- to_datetime      ISO8601 或常见格式的时间字符串转 datetime
+- open_mrt         按文件头识别 gzip / bz2 / 未压缩 MRT 文件
+- download_mrt     下载单个 MRT 文件（优先命中 tools/mrt_cache.py 的本地缓存，404 写缺失标记）
+- discard_file     删除 download_mrt 产生的临时文件
+"""
+import os
+import bz2
+import gzip
+import logging
+import tempfile
+from datetime import datetime
+from typing import Optional, Tuple
+
+import requests
+
+logger = logging.getLogger("MRTIO")
+
+
+def to_datetime(s: str) -> Optional[datetime]:
+    """ISO8601 或常见格式转 datetime"""
+    if not s:
+        return None
+    s = str(s).strip()
+    for fmt in ("%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M:%S", "%Y-%m-%d", "%Y%m%d"):
+        try:
+            return datetime.strptime(s[:19].replace("T", " "), fmt.replace("T", " "))
+        except ValueError:
+            continue
+    return None
+
+
+def open_mrt(filepath: str):
+    """按文件头识别 gzip / bz2 / 未压缩 MRT 文件"""
+    with open(filepath, "rb") as f:
+        magic = f.read(3)
+    if magic[:2] == b"\x1f\x8b":
+        return gzip.open(filepath, "rb")
+    if magic == b"BZh":
+        return bz2.open(filepath, "rb")
+    return open(filepath, "rb")
+
+
+def download_mrt(url: str, cache=None) -> Tuple[Optional[str], bool]:
+    """
+    获取单个 MRT 文件的本地路径，返回 (local_path, is_temp)。
+    有缓存时优先命中本地文件，未命中则下载写入缓存；无缓存时下载到临时文件（is_temp=True）。
+    非 200 返回 (None, False)。
+    """
+    if cache is not None:
+        cached = cache.get(url)
+        if cached:
+            return cached, False
+        if cache.is_missing(url):
+            return None, False
+
+    # 流式响应须显式关闭，否则非 200 时连接要等垃圾回收才归还连接池
+    with requests.get(url, timeout=120, stream=True) as resp:
+        if resp.status_code != 200:
+            logger.debug(f"跳过 {url}: HTTP {resp.status_code}")
+            if cache is not None and resp.status_code == 404:
+                cache.mark_missing(url)
+            return None, False
+        if cache is not None:
+            return cache.put_stream(url, resp.iter_content(chunk_size=65536)), False
+        with tempfile.NamedTemporaryFile(suffix=".gz", delete=False) as tmp:
+            for chunk in resp.iter_content(chunk_size=65536):
+                tmp.write(chunk)
+            return tmp.name, True
+
+
+def discard_file(path: Optional[str]) -> None:
+    if not path:
+        return
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
@@ -0,0 +1,191 @@
+"""
+Neo4j 拓扑批量导入（幂等）：CAIDA AS-relationship / prefix2as -> (:AS)、(:Prefix) 与关系
+与 tools/graph_rag.py 使用同一图模型：
+
+    (:AS {asn, name, country})   asn 为字符串，唯一约束
+    (:Prefix {cidr})             唯一约束
+    (customer)-[:CUSTOMER_OF]->(provider)，(provider)-[:PROVIDER_TO]->(customer)
+    (a)-[:PEER_WITH]->(b)（a < b，查询时按无向使用），(a)-[:SIBLING_OF]->(b)
+    (:AS)-[:ORIGINATES]->(:Prefix)
+
+全部写入用 UNWIND 批量参数 + MERGE，重复导入不会产生重复节点或关系，也不会删除已有数据。
+先建约束（MERGE 依赖唯一索引才能走索引查找），再边读文件边分批提交，每批一个写事务。
+"""
+import bz2
+import gzip
+import time
+import logging
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from .as_graph import iter_as_rel
+
+logger = logging.getLogger("Neo4j_Loader")
+
+DEFAULT_BATCH_SIZE = 10000
+
+SCHEMA_STATEMENTS = (
+    "CREATE CONSTRAINT as_asn IF NOT EXISTS FOR (a:AS) REQUIRE a.asn IS UNIQUE",
+    "CREATE CONSTRAINT prefix_cidr IF NOT EXISTS FOR (p:Prefix) REQUIRE p.cidr IS UNIQUE",
+)
+
+# 节点在同一语句内 MERGE（唯一约束保证走索引），文件可边读边写，不必先收集全部 AS
+_MERGE_EDGES = {
+    # rows: [{a: provider, b: customer}]
+    -1: """
+        UNWIND $rows AS r
+        MERGE (p:AS {asn: r.a})
+        MERGE (c:AS {asn: r.b})
+        MERGE (c)-[:CUSTOMER_OF]->(p)
+        MERGE (p)-[:PROVIDER_TO]->(c)
+    """,
+    0: """
+        UNWIND $rows AS r
+        MERGE (a:AS {asn: r.a})
+        MERGE (b:AS {asn: r.b})
+        MERGE (a)-[:PEER_WITH]->(b)
+    """,
+    1: """
+        UNWIND $rows AS r
+        MERGE (a:AS {asn: r.a})
+        MERGE (b:AS {asn: r.b})
+        MERGE (a)-[:SIBLING_OF]->(b)
+    """,
+}
+_REL_LABELS = {-1: "p2c", 0: "p2p", 1: "s2s"}
+_MERGE_ORIGINATES = """
+    UNWIND $rows AS r
+    MERGE (p:Prefix {cidr: r.cidr})
+    MERGE (a:AS {asn: r.asn})
+    MERGE (a)-[:ORIGINATES]->(p)
+"""
+_SET_AS_META = """
+    UNWIND $rows AS r
+    MATCH (a:AS {asn: r.asn})
+    SET a.name = coalesce(r.name, a.name), a.country = coalesce(r.country, a.country)
+"""
+
+
+def _open_text(path: str):
+    if path.endswith(".bz2"):
+        return bz2.open(path, "rt", encoding="utf-8", errors="replace")
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace")
+    return open(path, "r", encoding="utf-8", errors="replace")
+
+
+def iter_pfx2as(path: str) -> Iterable[Tuple[str, List[str]]]:
+    """
+    CAIDA Routeviews prefix2as：'<地址>\\t<长度>\\t<ASN>'，ASN 为 'a_b'（MOAS）或 'a,b'（AS_SET）时拆开。
+    :return: (cidr, [asn, ...])
+    """
+    with _open_text(path) as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) < 3 or line[0] == "#" or not parts[1].isdigit():
+                continue
+            asns = [a for a in parts[2].replace(",", "_").split("_") if a.isdigit()]
+            if asns:
+                yield f"{parts[0]}/{parts[1]}", asns
+
+
+def _batches(items: Iterable, size: int):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Neo4jTopologyLoader:
+    """
+    流式批量导入器。driver 为 neo4j.GraphDatabase.driver(...) 返回的驱动（调用方负责关闭）。
+    counts 累计各类写入的行数（MERGE 命中已有数据也计入）。
+    """
+
+    def __init__(self, driver, database: Optional[str] = None, batch_size: int = DEFAULT_BATCH_SIZE,
+                 progress: Optional[Callable[[str, int], None]] = None):
+        self.driver = driver
+        self.database = database
+        self.batch_size = batch_size
+        self.progress = progress
+        self.counts: Dict[str, int] = {}
+
+    def _session(self):
+        return self.driver.session(database=self.database) if self.database else self.driver.session()
+
+    def _write(self, label: str, query: str, rows: List) -> None:
+        def work(tx):
+            tx.run(query, rows=rows).consume()
+
+        with self._session() as session:
+            # neo4j 5.x 为 execute_write，4.x 为 write_transaction
+            write = getattr(session, "execute_write", None) or session.write_transaction
+            write(work)
+        self.counts[label] = self.counts.get(label, 0) + len(rows)
+        if self.progress:
+            self.progress(label, self.counts[label])
+
+    def _write_all(self, label: str, query: str, rows: Iterable) -> None:
+        for batch in _batches(rows, self.batch_size):
+            self._write(label, query, batch)
+
+    def ensure_schema(self) -> None:
+        """唯一约束（同时建立 AS.asn / Prefix.cidr 上的索引），已存在时不变"""
+        with self._session() as session:
+            for stmt in SCHEMA_STATEMENTS:
+                session.run(stmt).consume()
+
+    def load_as_rel(self, path: str) -> Dict[str, int]:
+        """流式导入 AS-relationship 文件：按关系类型各攒一批，满 batch_size 即提交"""
+        pending: Dict[int, List[Dict]] = {-1: [], 0: [], 1: []}
+        totals = {label: 0 for label in _REL_LABELS.values()}
+        for a, b, rel in iter_as_rel(str(path)):
+            # peer / sibling 统一按 a < b 存一条有向边，重复导入时 MERGE 命中同一条
+            if rel != -1 and b < a:
+                a, b = b, a
+            batch = pending[rel]
+            batch.append({"a": str(a), "b": str(b)})
+            if len(batch) >= self.batch_size:
+                self._write(_REL_LABELS[rel], _MERGE_EDGES[rel], batch)
+                totals[_REL_LABELS[rel]] += len(batch)
+                pending[rel] = []
+        for rel, batch in pending.items():
+            if batch:
+                self._write(_REL_LABELS[rel], _MERGE_EDGES[rel], batch)
+                totals[_REL_LABELS[rel]] += len(batch)
+        return totals
+
+    def load_pfx2as(self, path: str) -> Dict[str, int]:
+        """流式导入 prefix2as：MERGE 前缀、Origin AS 与 ORIGINATES（MOAS 前缀每个 Origin 一条）"""
+        rows = ({"asn": a, "cidr": cidr} for cidr, asns in iter_pfx2as(str(path)) for a in asns)
+        before = self.counts.get("originates", 0)
+        self._write_all("originates", _MERGE_ORIGINATES, rows)
+        return {"originates": self.counts.get("originates", 0) - before}
+
+    def load_as_metadata(self, store) -> Dict[str, int]:
+        """用本地 AS 元数据库（tools/as_metadata.py 的 ASMetadataStore）补充已有 AS 节点的 name / country"""
+        rows = [{"asn": asn, "name": name, "country": cc} for asn, name, cc in store.records()]
+        self._write_all("as_meta", _SET_AS_META, rows)
+        return {"as_meta": len(rows)}
+
+
+def load_topology(driver, as_rel: Optional[str] = None, pfx2as: Optional[str] = None, metadata=None,
+                  database: Optional[str] = None, batch_size: int = DEFAULT_BATCH_SIZE,
+                  progress: Optional[Callable[[str, int], None]] = None) -> Dict:
+    """建约束并依次导入 as-rel、prefix2as、AS 元数据（均可选），返回各部分行数与耗时"""
+    loader = Neo4jTopologyLoader(driver, database=database, batch_size=batch_size, progress=progress)
+    t0 = time.perf_counter()
+    loader.ensure_schema()
+    summary: Dict = {}
+    if as_rel:
+        summary.update(loader.load_as_rel(as_rel))
+    if pfx2as:
+        summary.update(loader.load_pfx2as(pfx2as))
+    if metadata is not None:
+        summary.update(loader.load_as_metadata(metadata))
+    summary["elapsed_sec"] = round(time.perf_counter() - t0, 2)
+    logger.info(f"Neo4j 拓扑导入完成: {summary}")
+    return summary
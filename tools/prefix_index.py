@@ -0,0 +1,145 @@
+"""
+整数键前缀索引
+把目标前缀按「前缀长度 -> {网络号高位整数: 目标}」组织成逐层哈希的二叉 trie，
+回答“某条 NLRI 是否与任一目标前缀相互包含（精确 / 子前缀 / 超前缀）”。
+查询只做整数移位和字典查找，不构造 ipaddress 对象，IPv4 / IPv6 分别建索引。
+"""
+import socket
+import ipaddress
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+_V4_BITS = 32
+_V6_BITS = 128
+
+
+def addr_to_int(addr: str) -> Tuple[int, int]:
+    """地址字符串 -> (ip_version, 整数)，非法地址抛 ValueError"""
+    try:
+        if ":" in addr:
+            return 6, int.from_bytes(socket.inet_pton(socket.AF_INET6, addr), "big")
+        return 4, int.from_bytes(socket.inet_pton(socket.AF_INET, addr), "big")
+    except OSError as e:
+        raise ValueError(f"非法地址: {addr}") from e
+
+
+def parse_prefix(prefix: str) -> Tuple[int, int, int]:
+    """'a.b.c.d/len' -> (ip_version, 网络号整数, 长度)，主机位清零"""
+    net = ipaddress.ip_network(str(prefix).strip(), strict=False)
+    return net.version, int(net.network_address), net.prefixlen
+
+
+class _FamilyIndex:
+    """单一地址族的逐层哈希 trie"""
+
+    __slots__ = ("bits", "levels", "lengths", "_covered_by_level")
+
+    def __init__(self, bits: int):
+        self.bits = bits
+        # length -> {net >> (bits - length): [value, ...]}
+        self.levels: Dict[int, Dict[int, List[Any]]] = {}
+        self.lengths: List[int] = []
+        # 懒构建：NLRI 长度 l -> {目标高 l 位: [比 l 更具体的目标 value]}
+        self._covered_by_level: Dict[int, Dict[int, List[Any]]] = {}
+
+    def add(self, net: int, length: int, value: Any) -> None:
+        level = self.levels.get(length)
+        if level is None:
+            level = self.levels[length] = {}
+            self.lengths = sorted(self.levels)
+        level.setdefault(net >> (self.bits - length), []).append(value)
+        self._covered_by_level.clear()
+
+    def covering(self, addr: int, length: int) -> List[Any]:
+        """包含该 NLRI 的目标（目标长度 <= NLRI 长度），按长度从短到长"""
+        out = []
+        bits = self.bits
+        levels = self.levels
+        for lt in self.lengths:
+            if lt > length:
+                break
+            hit = levels[lt].get(addr >> (bits - lt))
+            if hit:
+                out.extend(hit)
+        return out
+
+    def _more_specifics(self, length: int) -> Dict[int, List[Any]]:
+        table = self._covered_by_level.get(length)
+        if table is None:
+            table = {}
+            for lt, level in self.levels.items():
+                if lt <= length:
+                    continue
+                for key, values in level.items():
+                    # key 是目标的高 lt 位，再右移到 NLRI 的长度
+                    table.setdefault(key >> (lt - length), []).extend(values)
+            self._covered_by_level[length] = table
+        return table
+
+    def covered(self, addr: int, length: int) -> List[Any]:
+        """被该 NLRI 包含的更具体目标（目标长度 > NLRI 长度）"""
+        if not self.lengths or self.lengths[-1] <= length:
+            return []
+        return self._more_specifics(length).get(addr >> (self.bits - length), [])
+
+
+class PrefixIndex:
+    """
+    目标前缀索引（IPv4 + IPv6）。
+    add(prefix, value) 注册目标；match / covering 返回命中的 value 列表（默认 value 为前缀字符串）。
+    """
+
+    def __init__(self, prefixes: Iterable[str] = ()):
+        self._families = {4: _FamilyIndex(_V4_BITS), 6: _FamilyIndex(_V6_BITS)}
+        self.size = 0
+        for p in prefixes:
+            self.add(p)
+
+    def add(self, prefix: str, value: Optional[Any] = None) -> None:
+        version, net, length = parse_prefix(prefix)
+        self.add_int(version, net, length, str(prefix) if value is None else value)
+
+    def add_int(self, version: int, net: int, length: int, value: Any) -> None:
+        """整数形式注册（调用方已解析过前缀时避免重复解析）"""
+        self._families[version].add(net, length, value)
+        self.size += 1
+
+    def __len__(self) -> int:
+        return self.size
+
+    def match_int(self, version: int, addr: int, length: int) -> List[Any]:
+        """整数形式查询：返回与 NLRI 精确匹配、包含它或被它包含的目标"""
+        fam = self._families.get(version)
+        if fam is None:
+            return []
+        hits = fam.covering(addr, length)
+        more = fam.covered(addr, length)
+        if more:
+            hits = hits + more if hits else list(more)
+        return hits
+
+    def match(self, addr: str, length: int) -> List[Any]:
+        """NLRI 字符串形式查询（地址 + 长度），非法地址返回空列表"""
+        try:
+            version, value = addr_to_int(addr)
+        except ValueError:
+            return []
+        bits = _V4_BITS if version == 4 else _V6_BITS
+        if not 0 <= length <= bits:
+            return []
+        # MRT 中 NLRI 的主机位本应为 0，这里统一清零以防异常数据
+        value &= ~((1 << (bits - length)) - 1)
+        return self.match_int(version, value, length)
+
+    def matches(self, addr: str, length: int) -> bool:
+        return bool(self.match(addr, length))
+
+    def covering(self, addr: str, length: int) -> List[Any]:
+        """只返回包含该 NLRI 的目标（最长匹配在列表末尾）"""
+        try:
+            version, value = addr_to_int(addr)
+        except ValueError:
+            return []
+        fam = self._families[version]
+        if not 0 <= length <= fam.bits:
+            return []
+        return fam.covering(value, length)
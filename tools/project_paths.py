@@ -29,6 +29,13 @@ CASE_CATALOG_DIR = DATA_DIR / "case_catalog"
 # Generated data/cache directories
 EVENTS_DIR = DATA_DIR / "events"
 EXPERIMENT_REAL_EVENTS_DIR = DATA_DIR / "experiments" / "real_events"
+MRT_CACHE_DIR = DATA_DIR / "mrt_cache"
+RIB_BASELINE_DIR = DATA_DIR / "rib_baseline"
+RIPESTAT_CACHE_FILE = DATA_DIR / "ripestat_cache.sqlite"
+RPKI_VRP_FILE = DATA_DIR / "rpki" / "vrps.csv"
+AS_METADATA_DIR = DATA_DIR / "as_metadata"
+GEO_RANGES_FILE = DATA_DIR / "geo" / "ip_ranges.csv"
+AS_REL_FILE = DATA_DIR / "as_graph" / "as-rel.txt"
 
 # Report directories/files
 REPORT_FORENSICS_DIR = REPORT_DIR / "forensics"
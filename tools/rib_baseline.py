@@ -0,0 +1,337 @@
+"""
+RIB 快照基线：前缀 -> Origin 集合
+从 RIS bview（TABLE_DUMP_V2 全表快照，每 8 小时一份）统计每个前缀被各 peer 观测到的 Origin AS，
+构建紧凑的离线索引，用于在事件未给出 victim、知识库也没有记录时推断合法 Owner。
+
+- bview 文件经 tools/mrt_cache.py 缓存，重复构建不再联网
+- 基线落盘为 data/rib_baseline/<collectors>.<YYYYmmdd.HHMM>.tsv.gz，查询时只读本地文件
+- 查询按最长前缀匹配，返回 {origin: 观测到该 Origin 的 RIB 条目数}
+"""
+import os
+import re
+import gzip
+import time
+import logging
+import ipaddress
+import threading
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .project_paths import RIB_BASELINE_DIR
+from .prefix_index import parse_prefix
+from .mrt_fast import iter_rib_entries, decode_as_path, format_ipv4, path_origin
+from .mrt_io import to_datetime, open_mrt, download_mrt, discard_file
+
+logger = logging.getLogger("RIBBaseline")
+
+# RIS bview 发布间隔
+BVIEW_INTERVAL_HOURS = 8
+# expected_origin 推断：主 Origin 的观测占比须超过该值，否则视为归属不明（如 MOAS 分裂）
+MIN_ORIGIN_SHARE = 0.5
+
+_FILE_RE = re.compile(r"^(?P<collectors>[\w,-]+)\.(?P<stamp>\d{8}\.\d{4})\.tsv\.gz$")
+_BITS = {4: 32, 6: 128}
+
+
+def _format_prefix(version: int, net: int, length: int) -> str:
+    if version == 4:
+        return format_ipv4(net, length)
+    return str(ipaddress.IPv6Network((net, length)))
+
+
+class RIBBaseline:
+    """
+    前缀 -> Origin 计数的只读索引。
+    按地址族、前缀长度分层存储 {网络号高位整数: ((origin, count), ...)}，查询只做整数移位和字典查找。
+    """
+
+    def __init__(self, meta: Optional[Dict] = None):
+        self.meta = dict(meta or {})
+        # version -> {length: {net >> (bits - length): ((origin, count), ...)}}
+        self._levels: Dict[int, Dict[int, Dict[int, Tuple[Tuple[str, int], ...]]]] = {4: {}, 6: {}}
+        # version -> 前缀长度（从长到短，最长匹配优先）
+        self._lengths: Dict[int, List[int]] = {4: [], 6: []}
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _set(self, version: int, net: int, length: int, origins: Dict[str, int]) -> None:
+        levels = self._levels[version]
+        level = levels.get(length)
+        if level is None:
+            level = levels[length] = {}
+            self._lengths[version] = sorted(levels, reverse=True)
+        key = net >> (_BITS[version] - length)
+        if key not in level:
+            self.size += 1
+        level[key] = tuple(sorted(origins.items(), key=lambda kv: (-kv[1], kv[0])))
+
+    def add(self, prefix: str, origins: Dict[str, int]) -> None:
+        version, net, length = parse_prefix(prefix)
+        self._set(version, net, length, origins)
+
+    def lookup(self, prefix: str) -> Optional[Dict]:
+        """
+        最长前缀匹配。
+        :return: {"prefix": 命中的基线前缀, "exact": 是否精确命中, "origins": {origin: count}}，无覆盖返回 None
+        """
+        try:
+            version, net, length = parse_prefix(prefix)
+        except ValueError:
+            return None
+        bits = _BITS[version]
+        levels = self._levels[version]
+        for lt in self._lengths[version]:
+            if lt > length:
+                continue
+            hit = levels[lt].get(net >> (bits - lt))
+            if hit is not None:
+                net_lt = (net >> (bits - lt)) << (bits - lt)
+                return {
+                    "prefix": _format_prefix(version, net_lt, lt),
+                    "exact": lt == length,
+                    "origins": dict(hit),
+                }
+        return None
+
+    def origins(self, prefix: str) -> Dict[str, int]:
+        hit = self.lookup(prefix)
+        return hit["origins"] if hit else {}
+
+    def expected_origin(self, prefix: str, min_share: float = MIN_ORIGIN_SHARE) -> Optional[str]:
+        """观测最多的 Origin；其占比未超过 min_share 时返回 None"""
+        origins = self.origins(prefix)
+        if not origins:
+            return None
+        # origins 已按观测数降序排列
+        origin, count = next(iter(origins.items()))
+        if count <= min_share * sum(origins.values()):
+            return None
+        return origin
+
+    def items(self) -> Iterable[Tuple[str, Dict[str, int]]]:
+        for version, levels in self._levels.items():
+            bits = _BITS[version]
+            for length in sorted(levels):
+                for key, origins in levels[length].items():
+                    yield _format_prefix(version, key << (bits - length), length), dict(origins)
+
+    def save(self, path: str) -> None:
+        """写出 gzip TSV：首行为 # 元数据，之后每行 prefix<TAB>origin:count,origin:count"""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = f"{path}.part"
+        with gzip.open(tmp, "wt", encoding="utf-8") as f:
+            f.write("# " + " ".join(f"{k}={v}" for k, v in self.meta.items()) + "\n")
+            for prefix, origins in self.items():
+                f.write(prefix + "\t" + ",".join(f"{o}:{c}" for o, c in origins.items()) + "\n")
+        os.replace(tmp, path)
+        _LOADED.pop(path, None)
+        reload()
+
+    @classmethod
+    def load(cls, path: str) -> "RIBBaseline":
+        baseline = cls()
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("#"):
+                    for kv in line[1:].split():
+                        k, _, v = kv.partition("=")
+                        baseline.meta[k] = v
+                    continue
+                prefix, _, rest = line.rstrip("\n").partition("\t")
+                if not rest:
+                    continue
+                origins = {}
+                for item in rest.split(","):
+                    o, _, c = item.partition(":")
+                    origins[o] = int(c or 1)
+                try:
+                    baseline.add(prefix, origins)
+                except ValueError:
+                    continue
+        baseline.meta.setdefault("path", str(path))
+        return baseline
+
+
+def _count_origins(fileobj, counts: Dict[Tuple[int, int, int], Counter]) -> int:
+    """累加一个 bview 流中每个前缀的 Origin 观测数，返回 RIB 条目数"""
+    entries = 0
+    for version, net, length, attrs_list in iter_rib_entries(fileobj):
+        counter = counts.get((version, net, length))
+        if counter is None:
+            counter = counts[(version, net, length)] = Counter()
+        for attrs in attrs_list:
+            entries += 1
+            try:
+                path = decode_as_path(attrs, 4)
+            except (ValueError, IndexError):
+                continue
+            origin = path_origin(path)
+            if origin:
+                counter[origin] += 1
+    return entries
+
+
+def bview_slot(when: datetime) -> datetime:
+    """不晚于 when 的最近一次 bview 发布时间（00:00 / 08:00 / 16:00 UTC）"""
+    hour = when.hour - when.hour % BVIEW_INTERVAL_HOURS
+    return datetime(when.year, when.month, when.day, hour)
+
+
+def bview_url(rrc: str, when: datetime) -> str:
+    from . import ris_mrt_fetcher
+    slot = bview_slot(when)
+    return f"{ris_mrt_fetcher.RIS_BASE}/{rrc}/{slot:%Y.%m}/bview.{slot:%Y%m%d.%H%M}.gz"
+
+
+def baseline_path(collectors: List[str], when: datetime, root=None) -> str:
+    slot = bview_slot(when)
+    name = f"{','.join(collectors)}.{slot:%Y%m%d.%H%M}.tsv.gz"
+    return os.path.join(str(root or RIB_BASELINE_DIR), name)
+
+
+def build_from_files(paths: Iterable[str], meta: Optional[Dict] = None) -> RIBBaseline:
+    """从本地 bview 文件（gzip / bz2 / 未压缩）构建基线，多个文件的计数相加"""
+    counts: Dict[Tuple[int, int, int], Counter] = {}
+    entries = 0
+    for path in paths:
+        with open_mrt(path) as f:
+            entries += _count_origins(f, counts)
+    baseline = RIBBaseline(meta)
+    for (version, net, length), counter in counts.items():
+        if counter:
+            baseline._set(version, net, length, counter)
+    baseline.meta["rib_entries"] = entries
+    return baseline
+
+
+def build_baseline(
+    when: datetime,
+    collectors: Optional[List[str]] = None,
+    use_cache: bool = True,
+) -> Optional[RIBBaseline]:
+    """下载（或命中缓存）各 collector 在 when 之前最近的 bview 并构建基线；全部缺失时返回 None"""
+    from .mrt_cache import get_default_cache
+    from .ris_mrt_fetcher import DEFAULT_RRC
+
+    collectors = list(collectors or [DEFAULT_RRC])
+    cache = get_default_cache() if use_cache else None
+    paths, temps = [], []
+    try:
+        for rrc in collectors:
+            url = bview_url(rrc, when)
+            path, is_temp = download_mrt(url, cache)
+            if not path:
+                logger.warning(f"bview 不可用: {url}")
+                continue
+            paths.append(path)
+            if is_temp:
+                temps.append(path)
+        if not paths:
+            return None
+        meta = {
+            "collectors": ",".join(collectors),
+            "time": bview_slot(when).strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        return build_from_files(paths, meta)
+    finally:
+        for path in temps:
+            discard_file(path)
+
+
+_LOADED: Dict[str, RIBBaseline] = {}
+_LOAD_LOCK = threading.Lock()
+_DEFAULT_PATH: Optional[str] = None
+# 基线目录的重新检查间隔（秒）：间隔内直接复用候选文件列表，之后目录 mtime 变化才重新扫描
+CANDIDATE_CHECK_SEC = float(os.getenv("RIB_BASELINE_CHECK_SEC", "30"))
+# (目录, 目录 mtime, 上次检查时间, 候选文件列表)
+_CANDIDATES: Optional[Tuple[str, float, float, List[Tuple[datetime, str]]]] = None
+
+
+def set_default_baseline(path: Optional[str]) -> None:
+    """指定 get_baseline 使用的基线文件（None 恢复按目录自动选择）"""
+    global _DEFAULT_PATH
+    _DEFAULT_PATH = str(path) if path else None
+
+
+def _scan_candidates(root) -> List[Tuple[datetime, str]]:
+    out = []
+    try:
+        names = os.listdir(root)
+    except OSError:
+        return out
+    for name in names:
+        m = _FILE_RE.match(name)
+        if m:
+            out.append((datetime.strptime(m.group("stamp"), "%Y%m%d.%H%M"), os.path.join(root, name)))
+    return sorted(out)
+
+
+def _candidate_files(root) -> List[Tuple[datetime, str]]:
+    """按时间排序的候选基线文件；CANDIDATE_CHECK_SEC 内不访问文件系统，目录 mtime 不变时不重新扫描"""
+    global _CANDIDATES
+    now = time.monotonic()
+    cached = _CANDIDATES
+    if cached is not None and cached[0] == root and now - cached[2] < CANDIDATE_CHECK_SEC:
+        return cached[3]
+    try:
+        mtime = os.stat(root).st_mtime
+    except OSError:
+        mtime = -1.0
+    if cached is not None and cached[0] == root and cached[1] == mtime:
+        files = cached[3]
+    else:
+        files = _scan_candidates(root)
+    _CANDIDATES = (root, mtime, now, files)
+    return files
+
+
+def reload() -> None:
+    """下次 get_baseline 时重新扫描基线目录（新写入基线文件后调用）"""
+    global _CANDIDATES
+    _CANDIDATES = None
+
+
+def _load_cached(path: str) -> Optional[RIBBaseline]:
+    with _LOAD_LOCK:
+        baseline = _LOADED.get(path)
+        if baseline is None:
+            try:
+                baseline = RIBBaseline.load(path)
+            except (OSError, EOFError) as e:
+                logger.warning(f"加载 RIB 基线失败 {path}: {e}")
+                return None
+            _LOADED[path] = baseline
+            logger.info(f"已加载 RIB 基线 {path}（{len(baseline)} 个前缀）")
+        return baseline
+
+
+def get_baseline(when: Optional[datetime] = None) -> Optional[RIBBaseline]:
+    """
+    返回本地基线（不联网）：优先 set_default_baseline / 环境变量 RIB_BASELINE_FILE 指定的文件，
+    否则在 data/rib_baseline/ 中选不晚于 when 的最新一份（都晚于 when 时取最早一份），没有则返回 None。
+    """
+    path = _DEFAULT_PATH or os.getenv("RIB_BASELINE_FILE")
+    if not path:
+        files = _candidate_files(str(RIB_BASELINE_DIR))
+        if not files:
+            return None
+        path = files[-1][1]
+        if when is not None:
+            earlier = [p for t, p in files if t <= when]
+            path = earlier[-1] if earlier else files[0][1]
+    if not os.path.isfile(path):
+        return None
+    return _load_cached(path)
+
+
+def infer_expected_origin(prefix: str, when=None) -> Optional[str]:
+    """用本地 RIB 基线推断前缀的合法 Origin；when 可为 datetime 或 ISO8601 字符串"""
+    if isinstance(when, str):
+        when = to_datetime(when)
+    baseline = get_baseline(when)
+    if baseline is None:
+        return None
+    return baseline.expected_origin(prefix)
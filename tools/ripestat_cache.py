@@ -0,0 +1,193 @@
+"""
+RIPEstat 查询结果的持久化缓存（SQLite）
+以 endpoint + 规范化 params 为键保存 Data API 响应的 data 部分，跨进程、跨评估轮次复用。
+
+- 每个 endpoint 独立 TTL（ENDPOINT_TTL_SEC），过期条目视为未命中并在下次成功请求时覆盖
+- 请求失败（连接错误 / 重试耗尽 / 非重试类 HTTP 错误）写入负缓存，NEGATIVE_TTL_SEC 内不再联网
+- cache-only 模式（RIPESTAT_CACHE_ONLY=1 或 set_cache_only(True)）：只查缓存，未命中按失败处理，不访问网络
+- hits / misses / negative_hits / expired / offline_misses 计数，stats() 汇总
+"""
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from typing import Dict, Optional, Tuple
+
+from .project_paths import RIPESTAT_CACHE_FILE
+
+logger = logging.getLogger("RIPEstatCache")
+
+# 各 endpoint 的缓存有效期（秒）；RPKI ROA 变化较快，AS 注册信息很少变动
+ENDPOINT_TTL_SEC = {
+    "rpki-validation": 24 * 3600,
+    "as-overview": 30 * 24 * 3600,
+    "whois": 7 * 24 * 3600,
+    "maxmind-geo-lite": 7 * 24 * 3600,
+}
+DEFAULT_TTL_SEC = 24 * 3600
+# 失败结果的缓存有效期：避免对不可用的资源反复重试，又能较快恢复
+NEGATIVE_TTL_SEC = 10 * 60
+# 不参与缓存键的参数
+_IGNORED_PARAMS = {"sourceapp"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ripestat_cache (
+    endpoint   TEXT NOT NULL,
+    params     TEXT NOT NULL,
+    ok         INTEGER NOT NULL,
+    data       TEXT,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (endpoint, params)
+)
+"""
+
+
+def _params_key(params: Optional[Dict]) -> str:
+    items = {str(k): str(v) for k, v in (params or {}).items() if k not in _IGNORED_PARAMS}
+    return json.dumps(items, sort_keys=True, separators=(",", ":"))
+
+
+class RIPEstatCache:
+    """SQLite 持久化缓存，线程安全（单连接 + 锁，WAL 允许多进程并发读）"""
+
+    def __init__(self, path=None, cache_only: Optional[bool] = None,
+                 ttl: Optional[Dict[str, int]] = None, negative_ttl: int = NEGATIVE_TTL_SEC):
+        self.path = str(path or os.getenv("RIPESTAT_CACHE_FILE") or RIPESTAT_CACHE_FILE)
+        if cache_only is None:
+            cache_only = os.getenv("RIPESTAT_CACHE_ONLY", "") not in ("", "0")
+        self.cache_only = cache_only
+        self.ttl = dict(ENDPOINT_TTL_SEC if ttl is None else ttl)
+        self.negative_ttl = negative_ttl
+        self._lock = threading.Lock()
+        self._conn = None
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        self.expired = 0
+        self.offline_misses = 0
+        self.writes = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+            except sqlite3.DatabaseError:
+                pass
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def ttl_for(self, endpoint: str) -> int:
+        return self.ttl.get(endpoint, DEFAULT_TTL_SEC)
+
+    def get(self, endpoint: str, params: Optional[Dict]) -> Tuple[bool, Optional[Dict]]:
+        """
+        :return: (命中, data)。命中时 data 为缓存的响应（负缓存为 None）；
+                 未命中时 data 恒为 None，调用方应联网请求（cache_only 时直接按失败处理）
+        """
+        key = _params_key(params)
+        with self._lock:
+            try:
+                row = self._connect().execute(
+                    "SELECT ok, data, fetched_at FROM ripestat_cache WHERE endpoint=? AND params=?",
+                    (endpoint, key),
+                ).fetchone()
+            except sqlite3.Error as e:
+                logger.warning(f"RIPEstat 缓存读取失败: {e}")
+                row = None
+            if row is not None:
+                ok, data, fetched_at = row
+                age = time.time() - fetched_at
+                if age < (self.ttl_for(endpoint) if ok else self.negative_ttl):
+                    if ok:
+                        self.hits += 1
+                        return True, json.loads(data)
+                    self.negative_hits += 1
+                    return True, None
+                self.expired += 1
+            self.misses += 1
+            if self.cache_only:
+                self.offline_misses += 1
+            return False, None
+
+    def put(self, endpoint: str, params: Optional[Dict], data: Optional[Dict]) -> None:
+        """data 为 None 表示请求失败，写入负缓存"""
+        ok = data is not None
+        payload = json.dumps(data, ensure_ascii=False, separators=(",", ":")) if ok else None
+        with self._lock:
+            try:
+                self._connect().execute(
+                    "INSERT OR REPLACE INTO ripestat_cache (endpoint, params, ok, data, fetched_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (endpoint, _params_key(params), int(ok), payload, time.time()),
+                )
+                self.writes += 1
+            except sqlite3.Error as e:
+                logger.warning(f"RIPEstat 缓存写入失败: {e}")
+
+    def purge_expired(self) -> int:
+        """删除所有已过期条目，返回删除条数"""
+        now = time.time()
+        removed = 0
+        with self._lock:
+            conn = self._connect()
+            removed += conn.execute(
+                "DELETE FROM ripestat_cache WHERE ok=0 AND fetched_at < ?", (now - self.negative_ttl,)
+            ).rowcount
+            endpoints = [r[0] for r in conn.execute("SELECT DISTINCT endpoint FROM ripestat_cache WHERE ok=1")]
+            for endpoint in endpoints:
+                removed += conn.execute(
+                    "DELETE FROM ripestat_cache WHERE ok=1 AND endpoint=? AND fetched_at < ?",
+                    (endpoint, now - self.ttl_for(endpoint)),
+                ).rowcount
+        return removed
+
+    def stats(self) -> Dict:
+        with self._lock:
+            try:
+                entries = self._connect().execute("SELECT COUNT(*) FROM ripestat_cache").fetchone()[0]
+            except sqlite3.Error:
+                entries = None
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            "path": self.path,
+            "cache_only": self.cache_only,
+            "entries": entries,
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "offline_misses": self.offline_misses,
+            "writes": self.writes,
+            "hit_rate": round((self.hits + self.negative_hits) / lookups, 4) if lookups else 0.0,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_DEFAULT_CACHE = None
+_DEFAULT_LOCK = threading.Lock()
+
+
+def get_default_cache() -> RIPEstatCache:
+    """进程级默认缓存（懒加载）"""
+    global _DEFAULT_CACHE
+    with _DEFAULT_LOCK:
+        if _DEFAULT_CACHE is None:
+            _DEFAULT_CACHE = RIPEstatCache()
+        return _DEFAULT_CACHE
+
+
+def set_cache_only(enabled: bool = True) -> None:
+    """切换进程级默认缓存的 cache-only（离线）模式"""
+    get_default_cache().cache_only = enabled
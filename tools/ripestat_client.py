@@ -0,0 +1,258 @@
+"""
+RIPEstat Data API 客户端（连接池复用 + 重试退避）
+
+- RIPEstatClient：同步，共享 requests.Session（HTTPAdapter 连接池、keep-alive），供 BGPDataProvider._fetch 使用
+- AsyncRIPEstatClient：异步，aiohttp 共享 ClientSession（TCPConnector 连接池、keep-alive），
+  每个 endpoint 独立并发上限（asyncio.Semaphore），供 BGPDataProvider.aget_* 使用
+- 两者采用同一重试策略：连接错误 / 超时 / 429 / 5xx 指数退避重试，429 / 503 遵循 Retry-After
+- 未安装 aiohttp 时，异步接口把同步请求放进线程池执行，同样不阻塞事件循环
+- 两者先查持久化缓存（tools/ripestat_cache.py，按 endpoint TTL + 负缓存），cache-only 模式下不联网
+"""
+import asyncio
+import logging
+import time
+import random
+import threading
+import weakref
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from .ripestat_cache import RIPEstatCache, get_default_cache
+
+logger = logging.getLogger("RIPEstat_Client")
+
+BASE_URL = "https://stat.ripe.net/data"
+SOURCE_APP = "bgp-anomaly-analysis-tool"
+DEFAULT_TIMEOUT = 15
+# 连接池大小（同步 / 异步共用）与空闲连接保活时间
+POOL_SIZE = 16
+KEEPALIVE_SEC = 30
+# 每个 endpoint 的最大并发请求数，未列出的用 DEFAULT_ENDPOINT_LIMIT
+DEFAULT_ENDPOINT_LIMIT = 4
+ENDPOINT_LIMITS = {
+    "rpki-validation": 8,
+    "as-overview": 8,
+    "maxmind-geo-lite": 4,
+    "whois": 4,
+}
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 8.0
+RETRY_STATUS = {429, 500, 502, 503, 504}
+# 默认启用持久化缓存（客户端 cache=False 可单独关闭）
+PERSISTENT_CACHE = True
+
+
+def _backoff(attempt: int, retry_after: Optional[str] = None) -> float:
+    """第 attempt 次重试前的等待秒数：优先 Retry-After，否则指数退避 + 抖动"""
+    if retry_after:
+        try:
+            return min(float(retry_after), BACKOFF_MAX)
+        except ValueError:
+            pass
+    delay = min(BACKOFF_BASE * (2 ** attempt), BACKOFF_MAX)
+    return delay * (0.5 + random.random() / 2)
+
+
+def _with_source_app(params: Optional[Dict]) -> Dict:
+    params = dict(params or {})
+    params["sourceapp"] = SOURCE_APP
+    return params
+
+
+def _resolve_cache(cache) -> Optional[RIPEstatCache]:
+    """cache=None 使用进程级默认缓存（PERSISTENT_CACHE 关闭时不缓存），False 不缓存"""
+    if cache is None:
+        return get_default_cache() if PERSISTENT_CACHE else None
+    return cache or None
+
+
+class RIPEstatClient:
+    """同步客户端：线程安全地共享一个 requests.Session"""
+
+    def __init__(self, base_url: Optional[str] = None, timeout: float = DEFAULT_TIMEOUT,
+                 pool_size: int = POOL_SIZE, max_retries: int = MAX_RETRIES, cache=None):
+        # base_url 为 None 时每次请求读取模块级 BASE_URL（便于指向本地桩服务）
+        self.base_url = base_url.rstrip("/") if base_url else None
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.cache = cache
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def get(self, endpoint: str, params: Optional[Dict] = None) -> Dict:
+        """请求 {base_url}/{endpoint}/data.json，返回响应中的 data 部分，失败返回 {}"""
+        cache = _resolve_cache(self.cache)
+        if cache is not None:
+            hit, data = cache.get(endpoint, params)
+            if hit or cache.cache_only:
+                return data or {}
+        data = self._request(endpoint, params)
+        if cache is not None:
+            cache.put(endpoint, params, data)
+        return data or {}
+
+    def _request(self, endpoint: str, params: Optional[Dict]) -> Optional[Dict]:
+        """联网请求，失败返回 None"""
+        url = f"{self.base_url or BASE_URL}/{endpoint}/data.json"
+        params = _with_source_app(params)
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            try:
+                resp = self.session.get(url, params=params, timeout=self.timeout)
+                if resp.status_code == 200:
+                    return resp.json().get("data", {}) or {}
+                if resp.status_code not in RETRY_STATUS:
+                    logger.warning(f"API Error [{endpoint}]: HTTP {resp.status_code} - {resp.url}")
+                    return None
+                retry_after = resp.headers.get("Retry-After")
+                err = f"HTTP {resp.status_code}"
+            except (requests.ConnectionError, requests.Timeout) as e:
+                err = str(e)
+            except ValueError as e:
+                logger.error(f"Bad JSON [{endpoint}]: {e}")
+                return None
+            if attempt < self.max_retries:
+                time.sleep(_backoff(attempt, retry_after))
+        logger.error(f"Connection Failed [{endpoint}]: {err}（已重试 {self.max_retries} 次）")
+        return None
+
+    def close(self) -> None:
+        self.session.close()
+
+
+class AsyncRIPEstatClient:
+    """
+    异步客户端。aiohttp 的会话绑定事件循环，请通过 get_async_client() 获取当前循环的共享实例；
+    也可 async with AsyncRIPEstatClient() as c 自行管理生命周期。
+    """
+
+    def __init__(self, base_url: Optional[str] = None, timeout: float = DEFAULT_TIMEOUT,
+                 pool_size: int = POOL_SIZE, endpoint_limits: Optional[Dict[str, int]] = None,
+                 max_retries: int = MAX_RETRIES, cache=None):
+        self.base_url = base_url.rstrip("/") if base_url else None
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.cache = cache
+        self.endpoint_limits = dict(ENDPOINT_LIMITS if endpoint_limits is None else endpoint_limits)
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._session = None
+        self._sync: Optional[RIPEstatClient] = None
+
+    def _semaphore(self, endpoint: str) -> asyncio.Semaphore:
+        sem = self._semaphores.get(endpoint)
+        if sem is None:
+            sem = self._semaphores[endpoint] = asyncio.Semaphore(
+                self.endpoint_limits.get(endpoint, DEFAULT_ENDPOINT_LIMIT)
+            )
+        return sem
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=KEEPALIVE_SEC)
+            self._session = aiohttp.ClientSession(
+                connector=connector, timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+        return self._session
+
+    async def get(self, endpoint: str, params: Optional[Dict] = None) -> Dict:
+        """异步请求 endpoint，返回 data 部分，失败返回 {}"""
+        # 缓存命中不占用 endpoint 并发名额；SQLite 读写放到线程中，不阻塞事件循环
+        cache = _resolve_cache(self.cache)
+        if cache is not None:
+            hit, data = await asyncio.to_thread(cache.get, endpoint, params)
+            if hit or cache.cache_only:
+                return data or {}
+        async with self._semaphore(endpoint):
+            if aiohttp is None:
+                if self._sync is None:
+                    self._sync = RIPEstatClient(self.base_url, self.timeout, self.pool_size, self.max_retries)
+                data = await asyncio.to_thread(self._sync._request, endpoint, params)
+            else:
+                data = await self._request(endpoint, _with_source_app(params))
+        if cache is not None:
+            await asyncio.to_thread(cache.put, endpoint, params, data)
+        return data or {}
+
+    async def _request(self, endpoint: str, params: Dict) -> Optional[Dict]:
+        url = f"{self.base_url or BASE_URL}/{endpoint}/data.json"
+        session = self._get_session()
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            try:
+                async with session.get(url, params=params) as resp:
+                    if resp.status == 200:
+                        body = await resp.json(content_type=None)
+                        return (body or {}).get("data", {}) or {}
+                    if resp.status not in RETRY_STATUS:
+                        logger.warning(f"API Error [{endpoint}]: HTTP {resp.status} - {resp.url}")
+                        return None
+                    retry_after = resp.headers.get("Retry-After")
+                    err = f"HTTP {resp.status}"
+            except (aiohttp.ContentTypeError, ValueError) as e:
+                logger.error(f"Bad JSON [{endpoint}]: {e}")
+                return None
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                err = str(e) or type(e).__name__
+            if attempt < self.max_retries:
+                await asyncio.sleep(_backoff(attempt, retry_after))
+        logger.error(f"Connection Failed [{endpoint}]: {err}（已重试 {self.max_retries} 次）")
+        return None
+
+    async def aclose(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        if self._sync is not None:
+            self._sync.close()
+            self._sync = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+
+    async def _lifetime(self):
+        # 挂在事件循环的异步生成器集合上：asyncio.run 结束时 shutdown_asyncgens 会关闭它，
+        # 从而在循环关闭前释放 aiohttp 会话
+        try:
+            yield
+        finally:
+            await self.aclose()
+
+
+_sync_client: Optional[RIPEstatClient] = None
+_sync_lock = threading.Lock()
+_async_clients: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def get_client() -> RIPEstatClient:
+    """进程内共享的同步客户端"""
+    global _sync_client
+    with _sync_lock:
+        if _sync_client is None:
+            _sync_client = RIPEstatClient()
+        return _sync_client
+
+
+async def get_async_client() -> AsyncRIPEstatClient:
+    """当前事件循环共享的异步客户端（随 asyncio.run 结束自动关闭）"""
+    loop = asyncio.get_running_loop()
+    entry = _async_clients.get(loop)
+    if entry is None:
+        client = AsyncRIPEstatClient()
+        guard = client._lifetime()
+        await guard.__anext__()
+        entry = _async_clients[loop] = (client, guard)
+    return entry[0]
@@ -6,39 +6,56 @@ RIPE RIS MRT Updates 抓取模块
 - Updates 每 5 分钟一个文件
 - RRC00/RRC24/RRC25 为 multi-hop，覆盖全球
 """
+import io
 import os
 import re
-import tempfile
+import gzip
+import time
+import struct
 import ipaddress
 import requests
 import logging
+from collections import deque
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional, Generator
+from typing import Any, Callable, List, Dict, Optional, Generator, Iterable, Tuple, Union
+
+from .mrt_cache import get_default_cache
+from .mrt_io import to_datetime, open_mrt, download_mrt, discard_file
+from .prefix_index import PrefixIndex
+from .mrt_fast import iter_bgp4mp, format_ipv4, merge_as4_path, flatten_as_path, path_origin
 
 logger = logging.getLogger("RISMRTFetcher")
 
 RIS_BASE = "https://data.ris.ripe.net"
 # Multi-hop collectors: 覆盖全球，首选
 DEFAULT_RRC = "rrc00"
+# 多 collector 模式的默认集合：全部 multi-hop collector
+DEFAULT_COLLECTORS = ["rrc00", "rrc24", "rrc25"]
 # 单次最多下载文件数，避免长时间窗口请求过多
 MAX_FILES = 24  # 约 2 小时
-
-
-def _to_datetime(s: str) -> Optional[datetime]:
-    """ISO8601 或常见格式转 datetime"""
-    if not s:
-        return None
-    s = str(s).strip()
-    for fmt in ("%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M:%S", "%Y-%m-%d", "%Y%m%d"):
-        try:
-            return datetime.strptime(s[:19].replace("T", " "), fmt.replace("T", " "))
-        except ValueError:
-            continue
-    return None
+# 并发下载线程数：下载与解析重叠进行，同时在途的文件数不超过该值
+DOWNLOAD_WORKERS = 4
+# 分块调度（iter_suspicious_chunks）：每块最多文件数（约 1 小时），
+# 以及单块最多缓冲的 updates 条数（内存预算，达到即提前结块）
+CHUNK_FILES = 12
+CHUNK_MAX_UPDATES = 200_000
+# 跨 collector 合并的时间容差（秒）：不同 RRC 收到同一公告的时间戳因传播延迟相差数秒
+MERGE_TOLERANCE_SEC = 5
+# 使用 tools/mrt_fast.py 快速解码 BGP4MP（不支持的记录自动回退 mrtparse）
+FAST_DECODE = True
+# 大批量可疑 update 筛选使用 tools/vector_filter.py 的 NumPy 批量判定（缺少 numpy 时逐条判定）
+VECTOR_FILTER = True
+
+_END = object()
 
 
 def _prefix_matches(announced: str, target: str) -> bool:
-    """检查宣告前缀是否与目标前缀匹配（精确或包含）"""
+    """
+    检查宣告前缀是否与目标前缀匹配（精确或包含）。
+    逐条构造 ipaddress 对象，开销较大；批量解析请用 tools/prefix_index.PrefixIndex。
+    """
     try:
         a = ipaddress.ip_network(announced, strict=False)
         t = ipaddress.ip_network(target, strict=False)
@@ -53,54 +70,82 @@ def _normalize_prefix(p: str, length: int) -> str:
     return f"{p}/{length}"
 
 
+def _iter_slots(start: datetime, end: datetime) -> Generator[datetime, None, None]:
+    """按时间顺序惰性产出窗口内所有 5 分钟槽的起始时间（不设上限）"""
+    cur = datetime(start.year, start.month, start.day, start.hour, (start.minute // 5) * 5, 0)
+    while cur < end:
+        yield cur
+        cur += timedelta(minutes=5)
+
+
+def _mrt_url(rrc: str, slot: datetime) -> str:
+    # 官方文档写 update，实测 updates 可用
+    return f"{RIS_BASE}/{rrc}/{slot:%Y.%m}/updates.{slot:%Y%m%d.%H%M}.gz"
+
+
+def _iter_mrt_urls(start: datetime, end: datetime, rrc: str = DEFAULT_RRC) -> Generator[str, None, None]:
+    """按时间顺序惰性产出窗口内所有 5 分钟间隔的 MRT 文件 URL（不设上限）"""
+    for slot in _iter_slots(start, end):
+        yield _mrt_url(rrc, slot)
+
+
 def _generate_mrt_urls(
-    start: datetime, end: datetime, rrc: str = DEFAULT_RRC, max_files: int = MAX_FILES
+    start: datetime, end: datetime, rrc: str = DEFAULT_RRC, max_files: Optional[int] = MAX_FILES
 ) -> List[str]:
-    """生成时间窗口内所有 5 分钟间隔的 MRT 文件 URL"""
+    """生成时间窗口内所有 5 分钟间隔的 MRT 文件 URL；max_files=None 表示不截断"""
     urls = []
-    cur = datetime(start.year, start.month, start.day, start.hour, (start.minute // 5) * 5, 0)
-    end_ts = end
-    while cur < end_ts and len(urls) < max_files:
-        yy = cur.strftime("%Y")
-        mm = cur.strftime("%m")
-        dd = cur.strftime("%d")
-        hh = cur.strftime("%H")
-        mi = cur.strftime("%M")
-        # 官方文档写 update，实测 updates 可用
-        path = f"{rrc}/{yy}.{mm}/updates.{yy}{mm}{dd}.{hh}{mi}.gz"
-        urls.append(f"{RIS_BASE}/{path}")
-        cur += timedelta(minutes=5)
+    for url in _iter_mrt_urls(start, end, rrc):
+        if max_files is not None and len(urls) >= max_files:
+            logger.info(f"时间窗口超过 {max_files} 个 MRT 文件，已截断；完整窗口请用 iter_suspicious_chunks")
+            break
+        urls.append(url)
     return urls
 
 
+def _mrtparse_segments(value) -> List[Tuple[int, List[int]]]:
+    segs = []
+    for seg in value or []:
+        if not isinstance(seg, dict):
+            continue
+        seg_type = seg.get("type")
+        if isinstance(seg_type, dict):
+            seg_type = list(seg_type.keys())[0] if seg_type else 0
+        segs.append((seg_type, [int(x) for x in seg.get("value", [])]))
+    return segs
+
+
 def _parse_as_path(bgp_message: dict) -> List[str]:
-    """从 BGP message 提取 AS_PATH"""
+    """从 BGP message 提取 AS_PATH（合并 AS4_PATH，AS_SET 规则与 tools/mrt_fast.py 一致）"""
+    as_path = as4_path = None
     attrs = bgp_message.get("path_attributes", [])
     for a in attrs:
         t = a.get("type")
-        if isinstance(t, dict) and 2 in t:  # AS_PATH
-            v = a.get("value", [])
-            if v and isinstance(v[0], dict):
-                return [str(x) for x in v[0].get("value", [])]
-    return []
+        if not isinstance(t, dict):
+            continue
+        if 2 in t:  # AS_PATH
+            as_path = _mrtparse_segments(a.get("value", []))
+        elif 17 in t:  # AS4_PATH
+            as4_path = _mrtparse_segments(a.get("value", []))
+    if not as_path:
+        return []
+    return flatten_as_path(merge_as4_path(as_path, as4_path))
 
 
-def _parse_mrt_file(filepath: str, target_prefix: str) -> List[Dict]:
-    """解析单个 MRT 文件，提取匹配 target_prefix 的 BGP updates"""
-    try:
-        from mrtparse import Reader
-    except ImportError:
-        logger.error("请安装 mrtparse: pip install mrtparse")
-        return []
+def _build_prefix_index(targets: Iterable[str]) -> PrefixIndex:
+    index = PrefixIndex()
+    for t in targets:
+        try:
+            index.add(t)
+        except ValueError:
+            logger.debug(f"无效目标前缀: {t}")
+    return index
 
-    result = []
-    target_net = None
-    try:
-        target_net = ipaddress.ip_network(target_prefix, strict=False)
-    except Exception:
-        pass
 
-    reader = Reader(filepath)
+def _iter_matching_updates(reader, index: PrefixIndex) -> Generator[Tuple[str, Dict], None, None]:
+    """
+    遍历 mrtparse Reader 的 BGP4MP 记录，产出 (target_prefix, update)。
+    update 结构: {prefix, as_path, detected_origin, timestamp, raw_timestamp}
+    """
     for entry in reader:
             try:
                 d = entry.data
@@ -120,31 +165,349 @@ def _parse_mrt_file(filepath: str, target_prefix: str) -> List[Dict]:
 
                 bmsg = d.get("bgp_message", {})
                 nlri = bmsg.get("nlri", [])
+                if not nlri:
+                    continue
                 ts_dict = d.get("timestamp", {})
                 ts = list(ts_dict.keys())[0] if ts_dict else 0
                 ts_str = datetime.utcfromtimestamp(ts).strftime("%Y-%m-%dT%H:%M:%S") if ts else ""
 
+                path_str = None
                 for n in nlri:
                     pfx = n.get("prefix", "")
                     ln = n.get("length", 32)
-                    full_pfx = _normalize_prefix(pfx, ln)
-                    if not _prefix_matches(full_pfx, target_prefix):
+                    hits = index.match(pfx, ln)
+                    if not hits:
                         continue
-                    path = _parse_as_path(bmsg)
-                    path_str = " ".join(path) if path else ""
-                    origin = path[-1] if path else ""
-                    result.append({
-                        "prefix": full_pfx,
-                        "as_path": path_str,
-                        "detected_origin": origin,
-                        "timestamp": ts_str,
-                        "raw_timestamp": ts,
-                    })
+                    full_pfx = _normalize_prefix(pfx, ln)
+                    for t in hits:
+                        if path_str is None:
+                            path = _parse_as_path(bmsg)
+                            path_str = " ".join(path) if path else ""
+                            origin = path_origin(path)
+                        yield t, {
+                            "prefix": full_pfx,
+                            "as_path": path_str,
+                            "detected_origin": origin,
+                            "timestamp": ts_str,
+                            "raw_timestamp": ts,
+                        }
             except Exception as e:
                 logger.debug(f"解析 MRT entry 失败: {e}")
                 continue
 
-    return result
+
+def _iter_matching_updates_fast(fileobj, index: PrefixIndex) -> Generator[Tuple[str, Dict], None, None]:
+    """
+    _iter_matching_updates 的快速版本：用 tools/mrt_fast.py 直接解码已解压的 MRT 流，
+    产出结构相同的 (target_prefix, update)。快速解码器不支持的记录逐条交给 mrtparse。
+    """
+    reader_cls = None
+    for rec in iter_bgp4mp(fileobj):
+        if isinstance(rec, bytes):
+            if reader_cls is None:
+                try:
+                    from mrtparse import Reader as reader_cls
+                except ImportError:
+                    logger.debug("缺少 mrtparse，跳过快速解码器不支持的 MRT 记录")
+                    continue
+            yield from _iter_matching_updates(reader_cls(io.BytesIO(rec)), index)
+            continue
+
+        path_str = None
+        for addr, ln in rec.nlri:
+            hits = index.match_int(4, addr, ln)
+            if not hits:
+                continue
+            if path_str is None:
+                try:
+                    path = rec.as_path()
+                except (ValueError, IndexError, struct.error) as e:
+                    logger.debug(f"解析 MRT entry 失败: {e}")
+                    break
+                path_str = " ".join(path) if path else ""
+                origin = path_origin(path)
+                ts = rec.timestamp
+                ts_str = datetime.utcfromtimestamp(ts).strftime("%Y-%m-%dT%H:%M:%S") if ts else ""
+            full_pfx = format_ipv4(addr, ln)
+            for t in hits:
+                yield t, {
+                    "prefix": full_pfx,
+                    "as_path": path_str,
+                    "detected_origin": origin,
+                    "timestamp": ts_str,
+                    "raw_timestamp": ts,
+                }
+
+
+def _parse_mrt_file_multi(
+    filepath: str, target_prefixes: Iterable[str], fast: bool = FAST_DECODE
+) -> Dict[str, List[Dict]]:
+    """
+    单次遍历 MRT 文件，同时提取多个目标前缀的 BGP updates。
+    每条 NLRI 只解析一次，按匹配（精确或包含）的目标前缀分桶。
+    fast=True 使用 tools/mrt_fast.py 快速解码，False 完全使用 mrtparse。
+    :return: {target_prefix: [update, ...]}，每个目标前缀都有对应列表（可能为空）
+    """
+    targets = list(dict.fromkeys(str(t) for t in target_prefixes if t))
+    buckets: Dict[str, List[Dict]] = {t: [] for t in targets}
+    if not targets:
+        return buckets
+
+    index = _build_prefix_index(targets)
+    if fast:
+        with open_mrt(filepath) as f:
+            for t, u in _iter_matching_updates_fast(f, index):
+                buckets[t].append(u)
+        return buckets
+
+    try:
+        from mrtparse import Reader
+    except ImportError:
+        logger.error("请安装 mrtparse: pip install mrtparse")
+        return buckets
+
+    for t, u in _iter_matching_updates(Reader(filepath), index):
+        buckets[t].append(u)
+    return buckets
+
+
+def _parse_mrt_file(filepath: str, target_prefix: str) -> List[Dict]:
+    """解析单个 MRT 文件，提取匹配 target_prefix 的 BGP updates"""
+    return _parse_mrt_file_multi(filepath, [target_prefix]).get(str(target_prefix), [])
+
+
+def _iter_mrt_stream(
+    fileobj, target_prefix: str, compressed: bool = True, fast: bool = FAST_DECODE
+) -> Generator[Dict, None, None]:
+    """
+    _parse_mrt_file 的流式版本：直接从文件对象（如 HTTP 响应体）边解压边解析，
+    逐条产出与 _parse_mrt_file 相同结构的 update dict。
+    内存只与单条 MRT 记录相关，不落临时文件。
+    """
+    index = _build_prefix_index([target_prefix])
+    src = gzip.GzipFile(fileobj=fileobj, mode="rb") if compressed else fileobj
+    try:
+        if fast:
+            for _, u in _iter_matching_updates_fast(src, index):
+                yield u
+            return
+        try:
+            from mrtparse import Reader
+        except ImportError:
+            logger.error("请安装 mrtparse: pip install mrtparse")
+            return
+        for _, u in _iter_matching_updates(Reader(src), index):
+            yield u
+    finally:
+        if src is not fileobj:
+            src.close()
+
+
+def _iter_mrt_url(url: str, target_prefix: str) -> Generator[Dict, None, None]:
+    """流式下载并解析单个 RIS MRT 文件，非 200 时不产出任何 update"""
+    resp = requests.get(url, timeout=120, stream=True)
+    try:
+        if resp.status_code != 200:
+            logger.debug(f"跳过 {url}: HTTP {resp.status_code}")
+            return
+        # .gz 是文件本身的压缩格式，而非 HTTP 传输编码，由 GzipFile 负责解压
+        resp.raw.decode_content = False
+        yield from _iter_mrt_stream(resp.raw, target_prefix, compressed=url.endswith(".gz"))
+    finally:
+        resp.close()
+
+
+def _iter_ordered(
+    items: Iterable, fn: Callable, workers: int = DOWNLOAD_WORKERS, cleanup: Optional[Callable] = None
+) -> Generator[Tuple[Any, Any, Optional[Exception]], None, None]:
+    """
+    有界并发执行 fn(item)，按 items 原始顺序产出 (item, result, error)。
+    调用方处理当前结果时，后续最多 workers 个任务在后台执行；
+    调用方提前结束时，对已完成但未被消费的结果调用 cleanup。
+    """
+    if workers <= 1:
+        for item in items:
+            try:
+                yield item, fn(item), None
+            except Exception as e:
+                yield item, None, e
+        return
+
+    item_iter = iter(items)
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="mrt-dl") as pool:
+        try:
+            for item in item_iter:
+                pending.append((item, pool.submit(fn, item)))
+                if len(pending) >= workers:
+                    break
+            while pending:
+                item, fut = pending.popleft()
+                nxt = next(item_iter, _END)
+                if nxt is not _END:
+                    pending.append((nxt, pool.submit(fn, nxt)))
+                try:
+                    result, err = fut.result(), None
+                except Exception as e:
+                    result, err = None, e
+                yield item, result, err
+        finally:
+            for _, fut in pending:
+                if fut.cancel() or cleanup is None:
+                    continue
+                try:
+                    cleanup(fut.result())
+                except Exception:
+                    pass
+
+
+def _iter_downloads(
+    urls: Iterable[str], workers: int = DOWNLOAD_WORKERS, cache=None
+) -> Generator[Tuple[str, Optional[str], bool, Optional[Exception]], None, None]:
+    """
+    有界并发下载，按 URL 原始顺序产出 (url, local_path, is_temp, error)。
+    is_temp=True 的文件由调用方用完后删除。
+    """
+    def _cleanup(result):
+        path, is_temp = result
+        if is_temp:
+            discard_file(path)
+
+    for url, result, err in _iter_ordered(urls, lambda u: download_mrt(u, cache), workers, _cleanup):
+        path, is_temp = result if result else (None, False)
+        yield url, path, is_temp, err
+
+
+def _fetch_parse_timed(url: str, prefix: str, cache=None) -> Tuple[Optional[List[Dict]], int, float, float]:
+    """下载并解析单个文件，返回 (updates, 文件字节数, 下载耗时, 解析耗时)；文件不存在时 updates 为 None"""
+    t0 = time.perf_counter()
+    path, is_temp = download_mrt(url, cache)
+    t1 = time.perf_counter()
+    if not path:
+        return None, 0, t1 - t0, 0.0
+    try:
+        size = os.path.getsize(path)
+        updates = _parse_mrt_file(path, prefix)
+    finally:
+        if is_temp:
+            discard_file(path)
+    return updates, size, t1 - t0, time.perf_counter() - t1
+
+
+def _new_collector_stats() -> Dict:
+    return {
+        "files": 0,
+        "missing_files": 0,
+        "errors": 0,
+        "bytes": 0,
+        "updates": 0,
+        "unique_updates": 0,
+        "download_sec": 0.0,
+        "parse_sec": 0.0,
+    }
+
+
+def _finish_collector_stats(stats: Dict) -> Dict:
+    """补充吞吐（MB/s，按单连接下载耗时计）与单文件平均延迟"""
+    for st in stats.values():
+        fetched = st["files"] - st["missing_files"] - st["errors"]
+        st["throughput_mbps"] = round(st["bytes"] / st["download_sec"] / 1e6, 3) if st["download_sec"] else 0.0
+        st["avg_latency_ms"] = round(st["download_sec"] / st["files"] * 1000, 1) if st["files"] else 0.0
+        st["avg_parse_ms"] = round(st["parse_sec"] / fetched * 1000, 1) if fetched > 0 else 0.0
+        st["download_sec"] = round(st["download_sec"], 3)
+        st["parse_sec"] = round(st["parse_sec"], 3)
+    return stats
+
+
+def _merge_collectors(per_collector: List[Tuple[str, List[Dict]]], stats: Dict,
+                      tolerance: int = MERGE_TOLERANCE_SEC) -> List[Dict]:
+    """
+    合并同一 5 分钟槽内各 collector 的 updates：
+    相同公告（prefix, as_path）在 tolerance 秒内被其他 collector 看到时视为同一条，只保留首个 collector 的一条
+    （时间戳取首个 collector 的），seen_by 记录所有看到它的 collector；同一 collector 内只合并时间戳完全相同的重复。
+    结果按时间戳排序（同一时间戳保持 collector 顺序）。
+    """
+    merged: List[Dict] = []
+    hits: Dict[Tuple, List[Dict]] = {}
+    for rrc, updates in per_collector:
+        st = stats[rrc]
+        for u in updates:
+            st["updates"] += 1
+            ts = u.get("raw_timestamp", 0)
+            candidates = hits.setdefault((u.get("prefix"), u.get("as_path")), [])
+            hit, best = None, tolerance + 1
+            for c in candidates:
+                delta = abs(c.get("raw_timestamp", 0) - ts)
+                if delta == 0:
+                    hit = c
+                    break
+                if delta < best and rrc not in c["seen_by"]:
+                    hit, best = c, delta
+            if hit is None:
+                hit = dict(u, collector=rrc, seen_by=[rrc])
+                candidates.append(hit)
+                merged.append(hit)
+                st["unique_updates"] += 1
+            elif rrc not in hit["seen_by"]:
+                hit["seen_by"].append(rrc)
+    return sorted(merged, key=lambda u: u.get("raw_timestamp", 0))
+
+
+def _iter_slot_updates(
+    prefix: str,
+    start: datetime,
+    end: datetime,
+    rrcs: List[str],
+    max_files: Optional[int] = None,
+    workers: int = DOWNLOAD_WORKERS,
+    cache=None,
+    stats: Optional[Dict] = None,
+) -> Generator[Tuple[datetime, int, int, List[Dict]], None, None]:
+    """
+    多 collector 并发抓取：所有 (5 分钟槽, collector) 文件共用一个有界线程池下载并解析，
+    按槽的时间顺序产出 (slot, 文件数, 缺失文件数, 合并后的 updates)。
+    max_files 限制的是槽数（即每个 collector 的文件数）。stats 按 collector 累计统计。
+    """
+    if stats is None:
+        stats = {}
+    for rrc in rrcs:
+        stats.setdefault(rrc, _new_collector_stats())
+    slots = _iter_slots(start, end)
+    if max_files is not None:
+        slots = islice(slots, max_files)
+    items = ((slot, rrc) for slot in slots for rrc in rrcs)
+
+    def fn(item):
+        slot, rrc = item
+        return _fetch_parse_timed(_mrt_url(rrc, slot), prefix, cache)
+
+    cur_slot = None
+    group: List[Tuple[str, List[Dict]]] = []
+    files = missing = 0
+    for (slot, rrc), result, err in _iter_ordered(items, fn, workers):
+        if slot != cur_slot:
+            if cur_slot is not None:
+                yield cur_slot, files, missing, _merge_collectors(group, stats)
+            cur_slot, group, files, missing = slot, [], 0, 0
+        st = stats[rrc]
+        st["files"] += 1
+        files += 1
+        if err is not None:
+            logger.warning(f"下载/解析 {_mrt_url(rrc, slot)} 失败: {err}")
+            st["errors"] += 1
+            missing += 1
+            continue
+        updates, size, dl_sec, parse_sec = result
+        st["download_sec"] += dl_sec
+        st["parse_sec"] += parse_sec
+        if updates is None:
+            st["missing_files"] += 1
+            missing += 1
+            continue
+        st["bytes"] += size
+        group.append((rrc, updates))
+    if cur_slot is not None:
+        yield cur_slot, files, missing, _merge_collectors(group, stats)
 
 
 def fetch_and_parse(
@@ -152,15 +515,23 @@ def fetch_and_parse(
     start_time: str,
     end_time: str,
     rrc: str = DEFAULT_RRC,
-    max_files: int = MAX_FILES,
+    max_files: Optional[int] = MAX_FILES,
+    workers: int = DOWNLOAD_WORKERS,
+    use_cache: bool = True,
+    stream: bool = False,
 ) -> tuple[List[Dict], str]:
     """
     从 RIPE RIS 下载 MRT 并解析，按前缀过滤。
+    下载在线程池中并发进行（最多 workers 个在途），解析按文件时间顺序依次进行，
+    结果顺序与串行下载一致。
+    use_cache=True 时先查本地 MRT 缓存（tools/mrt_cache.py），命中的文件不再联网。
+    max_files=None 不截断窗口，但全部 updates 会留在内存中；长窗口建议用 iter_suspicious_chunks。
+    stream=True 时不落盘（忽略缓存）：每个文件边下载边解压边解析，只保留匹配的 updates。
     :return: (updates_list, data_source)
       data_source: "ris_mrt" 成功, "empty" 无数据
     """
-    st = _to_datetime(start_time)
-    et = _to_datetime(end_time)
+    st = to_datetime(start_time)
+    et = to_datetime(end_time)
     if not st or not et:
         logger.warning("无效时间范围")
         return [], "empty"
@@ -172,92 +543,330 @@ def fetch_and_parse(
     all_updates = []
     seen = set()
 
-    for url in urls:
-        try:
-            resp = requests.get(url, timeout=120, stream=True)
-            if resp.status_code != 200:
-                logger.debug(f"跳过 {url}: HTTP {resp.status_code}")
+    if stream:
+        for url, updates, err in _iter_ordered(urls, lambda u: list(_iter_mrt_url(u, prefix)), workers):
+            if err is not None:
+                logger.warning(f"下载/解析 {url} 失败: {err}")
                 continue
-            with tempfile.NamedTemporaryFile(suffix=".gz", delete=False) as tmp:
-                for chunk in resp.iter_content(chunk_size=65536):
-                    tmp.write(chunk)
-                tmp_path = tmp.name
-            try:
-                updates = _parse_mrt_file(tmp_path, prefix)
-                for u in updates:
-                    key = (u.get("prefix"), u.get("as_path"), u.get("raw_timestamp", 0))
-                    if key not in seen:
-                        seen.add(key)
-                        all_updates.append(u)
-            finally:
-                try:
-                    os.unlink(tmp_path)
-                except OSError:
-                    pass
+            for u in updates:
+                key = (u.get("prefix"), u.get("as_path"), u.get("raw_timestamp", 0))
+                if key not in seen:
+                    seen.add(key)
+                    all_updates.append(u)
+        return all_updates, "ris_mrt" if all_updates else "empty"
+
+    cache = get_default_cache() if use_cache else None
+    for url, local_path, is_temp, err in _iter_downloads(urls, workers, cache):
+        if err is not None:
+            logger.warning(f"下载/解析 {url} 失败: {err}")
+            continue
+        if not local_path:
+            continue
+        try:
+            updates = _parse_mrt_file(local_path, prefix)
+            for u in updates:
+                key = (u.get("prefix"), u.get("as_path"), u.get("raw_timestamp", 0))
+                if key not in seen:
+                    seen.add(key)
+                    all_updates.append(u)
         except Exception as e:
             logger.warning(f"下载/解析 {url} 失败: {e}")
+        finally:
+            if is_temp:
+                discard_file(local_path)
+
+    return all_updates, "ris_mrt" if all_updates else "empty"
+
+
+def fetch_and_parse_multi(
+    jobs: Dict[str, Tuple[str, str, str]],
+    rrc: str = DEFAULT_RRC,
+    max_files: Optional[int] = MAX_FILES,
+    workers: int = DOWNLOAD_WORKERS,
+    use_cache: bool = True,
+) -> Dict[str, tuple[List[Dict], str]]:
+    """
+    多事件共享抓取：按 MRT 文件对事件分组，每个文件只下载、解析一次，
+    再把匹配的 NLRI 分发到各事件的结果桶中。解析成本随文件数而非 文件数×事件数 增长。
+    :param jobs: {job_key: (prefix, start_time, end_time)}
+    :return: {job_key: (updates_list, data_source)}，与 fetch_and_parse 的返回一一对应
+    """
+    url_jobs: Dict[str, List[str]] = {}
+    for key, (prefix, start_time, end_time) in jobs.items():
+        st = to_datetime(start_time)
+        et = to_datetime(end_time)
+        if not st or not et or not prefix:
+            logger.warning(f"无效事件窗口: {key}")
+            continue
+        for url in _generate_mrt_urls(st, et, rrc, max_files):
+            url_jobs.setdefault(url, []).append(key)
+
+    results = {key: [] for key in jobs}
+    seen = {key: set() for key in jobs}
+    cache = get_default_cache() if use_cache else None
+
+    # RIS 文件名按时间编码，字典序即时间序，保证各事件结果仍按时间排列
+    for url, local_path, is_temp, err in _iter_downloads(sorted(url_jobs), workers, cache):
+        if err is not None:
+            logger.warning(f"下载/解析 {url} 失败: {err}")
+            continue
+        if not local_path:
             continue
+        keys = url_jobs[url]
+        try:
+            buckets = _parse_mrt_file_multi(local_path, {jobs[k][0] for k in keys})
+            for k in keys:
+                for u in buckets.get(str(jobs[k][0]), []):
+                    dedup = (u.get("prefix"), u.get("as_path"), u.get("raw_timestamp", 0))
+                    if dedup not in seen[k]:
+                        seen[k].add(dedup)
+                        results[k].append(dict(u))
+        except Exception as e:
+            logger.warning(f"下载/解析 {url} 失败: {e}")
+        finally:
+            if is_temp:
+                discard_file(local_path)
+
+    return {k: (ups, "ris_mrt" if ups else "empty") for k, ups in results.items()}
+
+
+def fetch_and_parse_collectors(
+    prefix: str,
+    start_time: str,
+    end_time: str,
+    rrcs: Optional[List[str]] = None,
+    max_files: Optional[int] = MAX_FILES,
+    workers: int = DOWNLOAD_WORKERS,
+    use_cache: bool = True,
+    stats: Optional[Dict] = None,
+) -> tuple[List[Dict], str]:
+    """
+    多 collector 版 fetch_and_parse：并发抓取多个 RRC 并合并为单一时间有序流。
+    每条 update 带 collector（首个看到它的 collector）与 seen_by（全部看到它的 collector）；
+    多个 collector 看到的相同公告只保留一条。
+    :param stats: 可选输出参数，按 collector 填入 files / bytes / updates / unique_updates /
+      throughput_mbps / avg_latency_ms 等统计
+    :return: (updates_list, data_source)
+    """
+    rrcs = list(dict.fromkeys(rrcs or DEFAULT_COLLECTORS))
+    if stats is None:
+        stats = {}
+    st = to_datetime(start_time)
+    et = to_datetime(end_time)
+    if not st or not et:
+        logger.warning("无效时间范围")
+        return [], "empty"
 
+    cache = get_default_cache() if use_cache else None
+    all_updates = []
+    for _, _, _, updates in _iter_slot_updates(prefix, st, et, rrcs, max_files, workers, cache, stats):
+        all_updates.extend(updates)
+    _finish_collector_stats(stats)
     return all_updates, "ris_mrt" if all_updates else "empty"
 
 
+def _classify_each(updates: List[Dict], expected: str, tier1,
+                   relationships=None) -> Generator[Tuple[int, str, Optional[str]], None, None]:
+    """逐条判定，产出 (update 下标, reason, suspicious_as)"""
+    from .update_fetcher import _parse_path, _classify_hops
+
+    for i, u in enumerate(updates):
+        origin = u.get("detected_origin", "")
+        if not origin:
+            continue
+        verdict = _classify_hops(_parse_path(u.get("as_path", "")), str(origin), expected, tier1, relationships)
+        if verdict is not None:
+            yield (i,) + verdict
+
+
 def filter_suspicious_from_ris(
     updates: List[Dict],
     prefix: str,
     expected_origin: str,
     use_valley_free: bool = True,
     known_prefix_origin: Optional[Dict[str, str]] = None,
+    vectorized: bool = VECTOR_FILTER,
 ) -> List[Dict]:
     """
     对 RIS 解析出的 updates 按论文四步法筛选可疑项。
+    vectorized=True 且批量不小于 VECTOR_MIN_BATCH 时用 tools/vector_filter.py 整批判定，结果与逐条判定一致。
     :return: list of {prefix, as_path, detected_origin, expected_origin, timestamp, reason}
     """
-    from .config_loader import get_tier1_asns
-    from .update_fetcher import _parse_path, _path_to_str
+    from .update_fetcher import _parse_path, _valley_rules
+    from .vector_filter import VECTOR_MIN_BATCH, classify_updates, vector_filter_available
 
     result = []
     expected = str(expected_origin).strip()
     if not expected and known_prefix_origin:
-        expected = known_prefix_origin.get(prefix, "")
+        expected = str(known_prefix_origin.get(prefix, ""))
     if not expected:
         return result
 
-    tier1 = get_tier1_asns() if use_valley_free else set()
+    tier1, relationships = _valley_rules(use_valley_free)
+    if vectorized and len(updates) >= VECTOR_MIN_BATCH and vector_filter_available():
+        verdicts = classify_updates(updates, expected, tier1, relationships)
+    else:
+        verdicts = _classify_each(updates, expected, tier1, relationships)
+
+    for i, reason, suspicious_as in verdicts:
+        u = updates[i]
+        record = {
+            "prefix": u.get("prefix", prefix),
+            "as_path": u.get("as_path", ""),
+            "detected_origin": u.get("detected_origin", ""),
+            "expected_origin": expected,
+            "timestamp": u.get("timestamp", ""),
+            "reason": reason,
+        }
+        if suspicious_as is not None:
+            record["suspicious_as"] = suspicious_as
+            if relationships is not None:
+                record["leak_type"] = relationships.first_leak(_parse_path(record["as_path"]))[1]
+        # 多 collector 模式下保留来源标记
+        for k in ("collector", "seen_by"):
+            if k in u:
+                record[k] = u[k]
+        result.append(record)
 
-    for u in updates:
-        origin = u.get("detected_origin", "")
-        if not origin:
-            continue
-        as_path = u.get("as_path", "")
-        path_list = _parse_path(as_path)
-        ts = u.get("timestamp", "")
-
-        # 2. Origin 校验
-        if str(origin) != str(expected):
-            result.append({
-                "prefix": u.get("prefix", prefix),
-                "as_path": as_path,
-                "detected_origin": origin,
-                "expected_origin": expected,
-                "timestamp": ts,
-                "reason": "ORIGIN_MISMATCH",
-            })
-            continue
+    return result
 
-        # 4. Valley-Free
-        if use_valley_free and tier1 and len(path_list) >= 3:
-            for i in range(1, len(path_list) - 1):
-                prev, curr, nxt = path_list[i - 1], path_list[i], path_list[i + 1]
-                if prev in tier1 and nxt in tier1 and curr not in tier1:
-                    result.append({
-                        "prefix": u.get("prefix", prefix),
-                        "as_path": as_path,
-                        "detected_origin": origin,
-                        "expected_origin": expected,
-                        "timestamp": ts,
-                        "reason": "VALLEY_FREE_VIOLATION",
-                        "suspicious_as": curr,
-                    })
-                    break
 
-    return result
+def _close_chunk(
+    index: int, first: Optional[datetime], last: Optional[datetime], files: int, missing: int,
+    updates: List[Dict], suspicious: List[Dict],
+) -> Dict:
+    fmt = "%Y-%m-%dT%H:%M:%S"
+    return {
+        "chunk": index,
+        "start_time": first.strftime(fmt) if first else "",
+        "end_time": (last + timedelta(minutes=5)).strftime(fmt) if last else "",
+        "files": files,
+        "missing_files": missing,
+        "updates": len(updates),
+        "suspicious": suspicious,
+        "stopped_early": False,
+    }
+
+
+def iter_suspicious_chunks(
+    prefix: str,
+    expected_origin: str,
+    start_time: str,
+    end_time: str,
+    rrc: Union[str, List[str]] = DEFAULT_RRC,
+    chunk_files: int = CHUNK_FILES,
+    max_chunk_updates: int = CHUNK_MAX_UPDATES,
+    max_files: Optional[int] = None,
+    stop_after: Optional[int] = None,
+    use_valley_free: bool = True,
+    known_prefix_origin: Optional[Dict[str, str]] = None,
+    workers: int = DOWNLOAD_WORKERS,
+    use_cache: bool = True,
+    collector_stats: Optional[Dict] = None,
+) -> Generator[Dict, None, None]:
+    """
+    分块调度：按时间顺序覆盖任意长度的窗口（默认不受 MAX_FILES 限制）。
+    每凑满 chunk_files 个 5 分钟槽（单 collector 时即文件数），或缓冲的 updates 达到
+    max_chunk_updates（内存预算），即对该块执行 filter_suspicious_from_ris 并产出部分结果，
+    随后释放该块的 updates。
+    去重键含时间戳，而各块覆盖的 5 分钟槽互不重叠，因此按块去重与全窗口去重结果相同。
+    累计可疑 update 数达到 stop_after 时提前结束（调用方也可随时停止迭代）。
+    rrc 可为 collector 列表，此时各槽内多 collector 合并去重（见 fetch_and_parse_collectors），
+    collector_stats 按 collector 累计统计。
+    :return: 逐块产出 {chunk, start_time, end_time, files, missing_files, updates, suspicious, stopped_early}
+    """
+    st = to_datetime(start_time)
+    et = to_datetime(end_time)
+    if not st or not et:
+        logger.warning("无效时间范围")
+        return
+
+    rrcs = [rrc] if isinstance(rrc, str) else list(dict.fromkeys(rrc))
+    cache = get_default_cache() if use_cache else None
+    chunk_files = max(1, chunk_files)
+
+    chunk_idx = 0
+    total_slots = 0
+    total_suspicious = 0
+    first = last = None
+    slots = files = missing = 0
+    buf: List[Dict] = []
+    seen = set()
+    slot_iter = _iter_slot_updates(prefix, st, et, rrcs, max_files, workers, cache, collector_stats)
+    for slot, n_files, n_missing, updates in slot_iter:
+        first = first or slot
+        last = slot
+        slots += 1
+        total_slots += 1
+        files += n_files
+        missing += n_missing
+        for u in updates:
+            key = (u.get("prefix"), u.get("as_path"), u.get("raw_timestamp", 0))
+            if key not in seen:
+                seen.add(key)
+                buf.append(u)
+
+        if slots < chunk_files and len(buf) < max_chunk_updates:
+            continue
+        suspicious = filter_suspicious_from_ris(
+            buf, prefix, expected_origin, use_valley_free, known_prefix_origin
+        ) if buf else []
+        chunk = _close_chunk(chunk_idx, first, last, files, missing, buf, suspicious)
+        total_suspicious += len(suspicious)
+        exhausted = last + timedelta(minutes=5) >= et or (max_files is not None and total_slots >= max_files)
+        if stop_after is not None and total_suspicious >= stop_after and not exhausted:
+            chunk["stopped_early"] = True
+        logger.debug(
+            f"RIS 分块 {chunk_idx}: {chunk['start_time']} ~ {chunk['end_time']}, "
+            f"{files} 个文件, {len(buf)} 条 updates, {len(suspicious)} 条可疑"
+        )
+        yield chunk
+        if chunk["stopped_early"]:
+            slot_iter.close()
+            return
+        chunk_idx += 1
+        first = last = None
+        slots = files = missing = 0
+        buf = []
+        seen = set()
+
+    if slots:
+        suspicious = filter_suspicious_from_ris(
+            buf, prefix, expected_origin, use_valley_free, known_prefix_origin
+        ) if buf else []
+        yield _close_chunk(chunk_idx, first, last, files, missing, buf, suspicious)
+
+
+def fetch_suspicious_windowed(
+    prefix: str,
+    expected_origin: str,
+    start_time: str,
+    end_time: str,
+    **kwargs,
+) -> Tuple[List[Dict], Dict]:
+    """
+    iter_suspicious_chunks 的汇总版：只累积可疑 updates，原始 updates 逐块释放。
+    其余参数同 iter_suspicious_chunks。
+    :return: (suspicious_updates, summary)，summary 含窗口覆盖情况与逐块统计
+    """
+    suspicious: List[Dict] = []
+    chunks = []
+    stats = kwargs.pop("collector_stats", None)
+    stats = {} if stats is None else stats
+    for chunk in iter_suspicious_chunks(
+        prefix, expected_origin, start_time, end_time, collector_stats=stats, **kwargs
+    ):
+        suspicious.extend(chunk["suspicious"])
+        chunks.append(dict(chunk, suspicious=len(chunk["suspicious"])))
+    summary = {
+        "source": "ris_mrt",
+        "start_time": start_time,
+        "end_time": end_time,
+        "files": sum(c["files"] for c in chunks),
+        "missing_files": sum(c["missing_files"] for c in chunks),
+        "updates": sum(c["updates"] for c in chunks),
+        "stopped_early": bool(chunks and chunks[-1]["stopped_early"]),
+        "chunks": chunks,
+        "collector_stats": _finish_collector_stats(stats),
+    }
+    return suspicious, summary
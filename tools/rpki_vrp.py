@@ -0,0 +1,207 @@
+"""
+离线 RPKI Origin 校验：本地 VRP 表 + RFC 6811 分类
+加载 relying-party 工具导出的 VRP（Validated ROA Payload），按前缀建 PrefixIndex，
+对 (prefix, origin) 给出与 RIPEstat rpki-validation 相同取值的状态：
+
+- valid           存在覆盖该前缀的 VRP，ASN 相同且前缀长度 <= maxLength
+- invalid_length  有 ASN 相同的覆盖 VRP，但前缀长度超过其 maxLength
+- invalid_asn     有覆盖 VRP，但 ASN 均不匹配（含 AS0 ROA）
+- unknown         没有任何覆盖 VRP（RFC 6811 NotFound）
+
+支持的导出格式（可 gzip 压缩）：
+- CSV：Routinator / rpki-client / FORT 的 "ASN,IP Prefix,Max Length,Trust Anchor[,...]"，无表头时按此列序
+- JSON：{"roas": [{"asn": "AS13335", "prefix": "1.1.1.0/24", "maxLength": 24, "ta": "apnic"}, ...]} 或直接为列表
+"""
+import os
+import csv
+import gzip
+import json
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .project_paths import RPKI_VRP_FILE
+from .prefix_index import PrefixIndex, addr_to_int
+
+logger = logging.getLogger("RPKI_VRP")
+
+_ASN_KEYS = ("asn", "origin", "origin_as")
+_PREFIX_KEYS = ("ip prefix", "prefix", "ip_prefix")
+_MAXLEN_KEYS = ("max length", "maxlength", "max_length", "maxlen")
+
+
+def _norm_asn(asn) -> str:
+    s = str(asn).strip().upper()
+    return s[2:] if s.startswith("AS") else s
+
+
+def _parse_vrp_prefix(prefix: str) -> Tuple[int, int, int]:
+    """'a.b.c.d/len' -> (ip_version, 网络号整数, 长度)；只做 inet_pton + 移位，比 ipaddress 快数倍"""
+    addr, sep, plen = str(prefix).strip().partition("/")
+    version, value = addr_to_int(addr)
+    bits = 32 if version == 4 else 128
+    length = int(plen) if sep else bits
+    if not 0 <= length <= bits:
+        raise ValueError(f"非法前缀长度: {prefix}")
+    return version, value >> (bits - length) << (bits - length), length
+
+
+def _open_text(path: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, "r", encoding="utf-8", newline="")
+
+
+def _pick(row: Dict, keys: Iterable[str]):
+    for k in keys:
+        if k in row and row[k] not in (None, ""):
+            return row[k]
+    return None
+
+
+def _iter_csv(f) -> Iterable[Tuple[str, str, Optional[str]]]:
+    reader = csv.reader(f)
+    header = None
+    for row in reader:
+        if not row or row[0].startswith("#"):
+            continue
+        if header is None:
+            cells = [c.strip().lower() for c in row]
+            if any(c in _PREFIX_KEYS for c in cells):
+                header = cells
+                continue
+            header = ["asn", "ip prefix", "max length"]
+        rec = dict(zip(header, (c.strip() for c in row)))
+        yield _pick(rec, _ASN_KEYS), _pick(rec, _PREFIX_KEYS), _pick(rec, _MAXLEN_KEYS)
+
+
+def _iter_json(f) -> Iterable[Tuple[str, str, Optional[str]]]:
+    data = json.load(f)
+    roas = data.get("roas", data.get("vrps", [])) if isinstance(data, dict) else data
+    for roa in roas or []:
+        rec = {str(k).lower(): v for k, v in roa.items()}
+        yield _pick(rec, _ASN_KEYS), _pick(rec, _PREFIX_KEYS), _pick(rec, _MAXLEN_KEYS)
+
+
+def iter_vrp_file(path: str) -> Iterable[Tuple[Optional[str], Optional[str], Optional[str]]]:
+    """逐条读取 VRP 导出：(asn, prefix, max_length)，按扩展名（.json / .csv，可带 .gz）选择格式"""
+    base = path[:-3] if path.endswith(".gz") else path
+    with _open_text(path) as f:
+        yield from (_iter_json(f) if base.endswith(".json") else _iter_csv(f))
+
+
+class VRPTable:
+    """
+    VRP 前缀索引。每个 VRP 以 (asn, max_length, prefix) 存入 PrefixIndex，
+    validate 只取覆盖该前缀的 VRP（逐层整数查找），单次查询为微秒级。
+    """
+
+    def __init__(self, meta: Optional[Dict] = None):
+        self.meta = dict(meta or {})
+        self._index = PrefixIndex()
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def add(self, prefix: str, asn, max_length: Optional[int] = None) -> None:
+        version, net, length = _parse_vrp_prefix(prefix)
+        max_length = length if max_length in (None, "") else int(max_length)
+        self._index.add_int(version, net, length, (_norm_asn(asn), max_length, str(prefix).strip()))
+        self.size += 1
+
+    def covering(self, prefix: str) -> List[Tuple[str, int, str]]:
+        """覆盖该前缀的全部 VRP：[(asn, max_length, vrp_prefix), ...]，按 VRP 前缀从短到长"""
+        addr, _, length = str(prefix).strip().partition("/")
+        if not length:
+            return []
+        try:
+            return self._index.covering(addr, int(length))
+        except (ValueError, KeyError):
+            return []
+
+    def validate(self, prefix: str, origin_as) -> Dict:
+        """
+        RFC 6811 路由源校验。
+        :return: {"status": valid|invalid_asn|invalid_length|unknown,
+                  "matched": 判定依据的 VRP 或 None, "covering": 覆盖 VRP 数}
+        """
+        vrps = self.covering(prefix)
+        if not vrps:
+            return {"status": "unknown", "matched": None, "covering": 0}
+        origin = _norm_asn(origin_as)
+        length = int(str(prefix).rsplit("/", 1)[1])
+        too_long = None
+        for vrp in vrps:
+            asn, max_length, _ = vrp
+            # AS0 ROA（RFC 7607）不为任何 Origin 授权
+            if asn != origin or asn == "0":
+                continue
+            if length <= max_length:
+                return {"status": "valid", "matched": vrp, "covering": len(vrps)}
+            too_long = too_long or vrp
+        if too_long is not None:
+            return {"status": "invalid_length", "matched": too_long, "covering": len(vrps)}
+        return {"status": "invalid_asn", "matched": vrps[-1], "covering": len(vrps)}
+
+    def status(self, prefix: str, origin_as) -> str:
+        return self.validate(prefix, origin_as)["status"]
+
+    @classmethod
+    def load(cls, path: str) -> "VRPTable":
+        """读取 VRP 导出，无法解析的行跳过"""
+        table = cls({"path": str(path)})
+        skipped = 0
+        for asn, prefix, max_length in iter_vrp_file(str(path)):
+            if asn is None or prefix is None:
+                skipped += 1
+                continue
+            try:
+                table.add(prefix, asn, max_length)
+            except ValueError:
+                skipped += 1
+        table.meta["skipped"] = skipped
+        return table
+
+
+_LOADED: Dict[str, Tuple[float, VRPTable]] = {}
+_LOAD_LOCK = threading.Lock()
+_DEFAULT_PATH: Optional[str] = None
+
+
+def set_default_vrp(path: Optional[str]) -> None:
+    """指定 get_vrp_table 使用的 VRP 文件（None 恢复环境变量 / 默认路径）"""
+    global _DEFAULT_PATH
+    _DEFAULT_PATH = str(path) if path else None
+
+
+def vrp_path() -> Optional[str]:
+    """当前配置的 VRP 文件：set_default_vrp > 环境变量 RPKI_VRP_FILE > data/rpki/vrps.csv（存在时）"""
+    path = _DEFAULT_PATH or os.getenv("RPKI_VRP_FILE")
+    if path:
+        return path
+    return str(RPKI_VRP_FILE) if os.path.isfile(RPKI_VRP_FILE) else None
+
+
+def get_vrp_table() -> Optional[VRPTable]:
+    """返回已配置的 VRP 表（按文件 mtime 缓存，文件更新后重新加载），未配置或读取失败返回 None"""
+    path = vrp_path()
+    if not path:
+        return None
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        logger.warning(f"VRP 文件不存在: {path}")
+        return None
+    with _LOAD_LOCK:
+        cached = _LOADED.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        try:
+            table = VRPTable.load(path)
+        except (OSError, EOFError, ValueError) as e:
+            logger.warning(f"加载 VRP 失败 {path}: {e}")
+            return None
+        _LOADED[path] = (mtime, table)
+        logger.info(f"已加载 VRP {path}（{len(table)} 条，跳过 {table.meta.get('skipped', 0)} 条）")
+        return table
@@ -1,23 +1,42 @@
 # 拓扑与泄露检测
 from .data_provider import BGPDataProvider
 from .config_loader import get_tier1_asns
+from .valley_free import get_relationship_table
 
 class TopologyInspector:
-    """Valley-Free 违规检测，Tier-1 列表从知识库加载"""
+    """
+    Valley-Free 违规检测：配置了 AS-relationship 文件时按真实 AS 关系判定（tools/valley_free.py，给出 RFC 7908 泄露类型），
+    否则退回 Tier-1 启发式，Tier-1 列表从知识库加载
+    """
+
+    @staticmethod
+    def _name(asn):
+        info = BGPDataProvider.get_as_info(asn)
+        return info.get('holder', asn)
 
     def run(self, context):
-        as_path = context.get('as_path', "").split(" ")
+        as_path = [a for a in context.get('as_path', "").split() if a.isdigit()]
         if len(as_path) < 3:
             return "NORMAL: 路径过短，无需检查。"
 
+        relationships = get_relationship_table()
+        if relationships is not None:
+            res = relationships.check_path(as_path)
+            if not res["valid"]:
+                curr = res["leaker"]
+                return (f"ROUTE_LEAK: 路由泄露 [RFC 7908 {res['leak_name']}]！"
+                        f"[{self._name(curr)} (AS{curr})] 把从 AS{res['received_from']} 学到的路由"
+                        f"发给了 AS{res['sent_to']}，违反 Valley-Free 导出规则。")
+            note = f"（{res['unknown_links']} 段链路关系未知）" if res["unknown_links"] else ""
+            return f"NORMAL: 按 AS 关系逐跳检查未发现 Valley-Free 违规{note}。"
+
         tier1 = get_tier1_asns()
         for i in range(1, len(as_path) - 1):
             prev = as_path[i-1]
             curr = as_path[i]
             next_as = as_path[i+1]
             if prev in tier1 and next_as in tier1 and curr not in tier1:
-                info = BGPDataProvider.get_as_info(curr)
-                name = info.get('holder', curr)
+                name = self._name(curr)
                 return f"ROUTE_LEAK: 疑似路由泄露！流量穿透了非骨干网 AS [{name} (AS{curr})]。"
-                
-        return "NORMAL: 未发现明显的 Valley-Free 违规或泄露模式。"
\ No newline at end of file
+
+        return "NORMAL: 未发现明显的 Valley-Free 违规或泄露模式。"
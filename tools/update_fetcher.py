@@ -2,18 +2,32 @@
 BGP Updates 抓取与观测过滤模块
 从 RIPEstat BGPlay API 下载目标前缀在指定时间窗口内的原始 BGP updates，
 并按论文四步法筛选可疑 updates。
+安装 ijson 时 BGPlay 响应流式解析（stream_bgplay_suspicious），条目边下载边筛选。
 参考: https://stat.ripe.net/docs/02.data-api/bgplay.html
 """
+import os
+import gzip
 import requests
 import logging
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import Iterator, List, Dict, Optional, Tuple
 from .config_loader import get_known_prefix_origin, get_tier1_asns
 
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
 logger = logging.getLogger("UpdateFetcher")
 
 RIPESTAT_BGPLAY = "https://stat.ripe.net/data/bgplay/data.json"
 SOURCE_APP = "bgp-anomaly-analysis-tool"
+# RIPEstat 数据源默认流式解析 BGPlay 响应（需要 ijson，缺失时整体 resp.json()）
+STREAM_BGPLAY = True
+
+# 流式解析时逐条送入筛选的数组，以及需要记录的标量字段（ijson 前缀路径）
+_BGPLAY_ITEMS = {"data.initial_state.item": "initial_state", "data.events.item": "events"}
+_BGPLAY_SCALARS = {"status", "status_code", "data.query_starttime", "data.query_endtime"}
 
 
 def fetch_bgp_updates(prefix: str, start_time: str, end_time: str) -> Dict:
@@ -46,104 +60,90 @@ def fetch_bgp_updates(prefix: str, start_time: str, end_time: str) -> Dict:
 def _parse_path(path) -> List[str]:
     """解析 AS path，返回 AS 号列表"""
     if isinstance(path, list):
-        return [str(p).strip() for p in path if str(p).strip().replace(",", "").isdigit()]
+        hops = []
+        for p in path:
+            p = str(p).strip()
+            if p.replace(",", "").isdigit():
+                hops.append(p)
+        return hops
     if isinstance(path, str):
-        return [p.strip() for p in path.replace(",", " ").split() if p.strip().isdigit()]
+        return [p for p in path.replace(",", " ").split() if p.isdigit()]
     return []
 
 
-def _extract_origin(path) -> Optional[str]:
-    """从 path 提取 Origin（最右侧 AS）"""
-    parsed = _parse_path(path)
-    return parsed[-1] if parsed else None
-
-
-def _path_to_str(path) -> str:
-    """将 path 转为空格分隔字符串"""
-    parsed = _parse_path(path)
-    return " ".join(parsed) if parsed else ""
-
-
-def filter_suspicious_updates(
-    bgplay_data: Dict,
-    prefix: str,
-    expected_origin: str,
-    use_valley_free: bool = True,
-    known_prefix_origin: Optional[Dict[str, str]] = None,
-) -> List[Dict]:
+def _valley_rules(use_valley_free: bool):
     """
-    按论文四步法筛选可疑 updates。
-
-    1. 前缀过滤：BGPlay 已按 prefix 查询，天然满足
-    2. Origin 校验：Detected Origin != Expected Owner -> 异常
-    3. 时间相关：已限定时间窗口
-    4. Valley-Free（可选）：路径违反 Tier1->非Tier1->Tier1 视为泄露
-
-    :return: list of {prefix, as_path, detected_origin, expected_origin, timestamp, reason}
+    Valley-Free 判定依据：(tier1, relationships)。
+    配置了 AS-relationship 文件时用真实关系（tools/valley_free.py），tier1 为空；否则退回 Tier1 启发式。
     """
-    result = []
-    expected = str(expected_origin).strip()
+    if not use_valley_free:
+        return set(), None
+    from .valley_free import get_relationship_table
 
-    # 确定 expected_origin：优先参数，其次知识库
-    if not expected and known_prefix_origin:
-        expected = known_prefix_origin.get(prefix, "")
+    relationships = get_relationship_table()
+    if relationships is not None:
+        return set(), relationships
+    return get_tier1_asns(), None
 
-    if not expected:
-        logger.warning(f"无法确定 prefix {prefix} 的合法 Owner，跳过筛选")
-        return result
 
-    tier1 = get_tier1_asns() if use_valley_free else set()
-    events = bgplay_data.get("events", [])
-    initial_state = bgplay_data.get("initial_state", [])
+def _classify_hops(hops: List[str], origin: str, expected: str, tier1,
+                   relationships=None) -> Optional[Tuple[str, Optional[str]]]:
+    """
+    在已解析的 AS 列表上依次做 Origin 校验与 Valley-Free 检查（四步法第 2、4 步）。
+    BGPlay 与 RIS 两条过滤路径共用，每条 path 只解析一次。
+    :param tier1: Tier1 AS 集合，为空时跳过 Tier1 启发式
+    :param relationships: valley_free.RelationshipTable，给出时按真实 AS 关系判定泄露（优先于 tier1）
+    :return: (reason, suspicious_as)，正常路径返回 None
+    """
+    # 2. Origin 校验：MOAS 冲突
+    if origin != expected:
+        return "ORIGIN_MISMATCH", None
+    # 4. Valley-Free：按 AS 关系找第一个违反导出规则的 AS（泄露者）
+    if relationships is not None:
+        leaker = relationships.leaker(hops)
+        return ("VALLEY_FREE_VIOLATION", leaker) if leaker is not None else None
+    # Tier1 -> 非 Tier1 -> Tier1 视为泄露（Tier1 集合来自 config/knowledge_base.json）
+    if tier1 and len(hops) >= 3:
+        for prev, curr, nxt in zip(hops, hops[1:], hops[2:]):
+            if curr not in tier1 and prev in tier1 and nxt in tier1:
+                return "VALLEY_FREE_VIOLATION", curr
+    return None
+
+
+def _bgplay_checkers(prefix: str, expected: str, tier1, result: List[Dict], relationships=None):
+    """
+    BGPlay 条目判定函数，可疑项追加到 result。
+    :return: (check_update(entry, ts), process_event(ev))，前者用于 initial_state，后者用于 events
+    """
 
     def check_update(entry, ts=None):
         # BGPlay: initial_state 用 path, events 用 attrs.path
         attrs = entry.get("attrs", entry)
         path = attrs.get("path", entry.get("path", entry.get("as_path", [])))
-        origin = _extract_origin(path)
-        if not origin:
+        hops = _parse_path(path)
+        if not hops:
             return
-        as_path_str = _path_to_str(path)
-        target = attrs.get("target_prefix", entry.get("target_prefix", entry.get("target", prefix)))
-        pfx = target if "/" in str(target) else prefix
-
-        # 2. Origin 校验：MOAS 冲突
-        if str(origin) != str(expected):
-            result.append({
-                "prefix": pfx,
-                "as_path": as_path_str,
-                "detected_origin": origin,
-                "expected_origin": expected,
-                "timestamp": ts,
-                "reason": "ORIGIN_MISMATCH",
-            })
+        origin = hops[-1]
+        verdict = _classify_hops(hops, origin, expected, tier1, relationships)
+        if verdict is None:
             return
-
-
-        #Tier1 集合来自 config/knowledge_base.json 的 ，已知的骨干网络as号# 4. Valley-Free：路径中间违反商业关系
-        if use_valley_free and tier1 and len(_parse_path(path)) >= 3:
-            for i in range(1, len(_parse_path(path)) - 1):
-                prev = _parse_path(path)[i - 1]
-                curr = _parse_path(path)[i]
-                nxt = _parse_path(path)[i + 1]
-                if prev in tier1 and nxt in tier1 and curr not in tier1:
-                    result.append({
-                        "prefix": pfx,
-                        "as_path": as_path_str,
-                        "detected_origin": origin,
-                        "expected_origin": expected,
-                        "timestamp": ts,
-                        "reason": "VALLEY_FREE_VIOLATION",
-                        "suspicious_as": curr,
-                    })
-                    return
-
-    # 处理 initial_state
-    for entry in initial_state:
-        if isinstance(entry, dict):
-            check_update(entry, bgplay_data.get("query_starttime"))
-
-    # 处理 events（BGPlay 格式：{ timestamp, type, attrs: { path, target_prefix } }）
+        reason, suspicious_as = verdict
+        target = attrs.get("target_prefix", entry.get("target_prefix", entry.get("target", prefix)))
+        record = {
+            "prefix": target if "/" in str(target) else prefix,
+            "as_path": " ".join(hops),
+            "detected_origin": origin,
+            "expected_origin": expected,
+            "timestamp": ts,
+            "reason": reason,
+        }
+        if suspicious_as is not None:
+            record["suspicious_as"] = suspicious_as
+            if relationships is not None:
+                record["leak_type"] = relationships.first_leak(hops)[1]
+        result.append(record)
+
+    # events（BGPlay 格式：{ timestamp, type, attrs: { path, target_prefix } }）
     def process_entry(e, ts=None):
         if not isinstance(e, dict):
             return
@@ -155,7 +155,7 @@ def filter_suspicious_updates(
             for sub in e.get("updates", e.get("entries", [])):
                 process_entry(sub, ts or e.get("timestamp"))
 
-    for ev in events:
+    def process_event(ev):
         if isinstance(ev, dict):
             ts = ev.get("timestamp", ev.get("time"))
             if ev.get("path") or ev.get("as_path"):
@@ -167,9 +167,185 @@ def filter_suspicious_updates(
             for e in ev:
                 process_entry(e)
 
+    return check_update, process_event
+
+
+def _resolve_expected(prefix: str, expected_origin, known_prefix_origin: Optional[Dict[str, str]]) -> str:
+    """确定 expected_origin：优先参数，其次知识库"""
+    expected = str(expected_origin).strip()
+    if not expected and known_prefix_origin:
+        expected = known_prefix_origin.get(prefix, "")
+    return str(expected)
+
+
+def filter_suspicious_updates(
+    bgplay_data: Dict,
+    prefix: str,
+    expected_origin: str,
+    use_valley_free: bool = True,
+    known_prefix_origin: Optional[Dict[str, str]] = None,
+) -> List[Dict]:
+    """
+    按论文四步法筛选可疑 updates。
+
+    1. 前缀过滤：BGPlay 已按 prefix 查询，天然满足
+    2. Origin 校验：Detected Origin != Expected Owner -> 异常
+    3. 时间相关：已限定时间窗口
+    4. Valley-Free（可选）：按真实 AS 关系违反导出规则（RFC 7908 泄露），无关系文件时 Tier1->非Tier1->Tier1 视为泄露
+
+    :return: list of {prefix, as_path, detected_origin, expected_origin, timestamp, reason}
+    """
+    result = []
+    expected = _resolve_expected(prefix, expected_origin, known_prefix_origin)
+    if not expected:
+        logger.warning(f"无法确定 prefix {prefix} 的合法 Owner，跳过筛选")
+        return result
+
+    tier1, relationships = _valley_rules(use_valley_free)
+    check_update, process_event = _bgplay_checkers(prefix, expected, tier1, result, relationships)
+
+    for entry in bgplay_data.get("initial_state", []):
+        if isinstance(entry, dict):
+            check_update(entry, bgplay_data.get("query_starttime"))
+    for ev in bgplay_data.get("events", []):
+        process_event(ev)
     return result
 
 
+class _TeeReader:
+    """读取 HTTP 响应流的同时统计字节数，并可把原始字节写入 gzip 副本"""
+
+    def __init__(self, src, sink=None):
+        self._src = src
+        self._sink = sink
+        self.bytes = 0
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._src.read(size)
+        if data:
+            self.bytes += len(data)
+            if self._sink is not None:
+                self._sink.write(data)
+        return data
+
+
+def _iter_bgplay_stream(fileobj, scalars: Dict) -> Iterator[Tuple[str, object]]:
+    """
+    增量解析 BGPlay 响应，逐个产出 ("initial_state" | "events", 条目)；
+    _BGPLAY_SCALARS 中的标量字段（status、query_starttime 等）随解析写入 scalars。
+    """
+    builder = item_prefix = None
+    for path, event, value in ijson.parse(fileobj, use_float=True):
+        if builder is not None:
+            if path == item_prefix and event in ("end_map", "end_array"):
+                builder.event(event, value)
+                yield _BGPLAY_ITEMS[item_prefix], builder.value
+                builder = item_prefix = None
+            else:
+                builder.event(event, value)
+            continue
+        kind = _BGPLAY_ITEMS.get(path)
+        if kind is not None:
+            if event in ("start_map", "start_array"):
+                builder, item_prefix = ijson.ObjectBuilder(), path
+                builder.event(event, value)
+            else:
+                yield kind, value
+        elif path in _BGPLAY_SCALARS and event not in ("start_map", "start_array", "map_key"):
+            scalars[path] = value
+
+
+def stream_bgplay_suspicious(
+    prefix: str,
+    expected_origin: str,
+    start_time: str,
+    end_time: str,
+    use_valley_free: bool = True,
+    known_prefix_origin: Optional[Dict[str, str]] = None,
+    raw_copy_path: Optional[str] = None,
+) -> Tuple[List[Dict], Dict]:
+    """
+    流式版 fetch_bgp_updates + filter_suspicious_updates：边下载边解析，每个 initial_state / events 条目
+    解析完即送入筛选后丢弃，内存只与可疑 update 数相关，不随窗口长度增长。
+    :param raw_copy_path: 同时把原始响应写成 gzip 副本（如 raw_bgplay.json.gz），None 不保存
+    :return: (suspicious_updates, summary)，summary 含条目数、字节数、副本路径；请求失败返回 ([], {})
+    """
+    result: List[Dict] = []
+    expected = _resolve_expected(prefix, expected_origin, known_prefix_origin)
+    if not expected:
+        logger.warning(f"无法确定 prefix {prefix} 的合法 Owner，跳过筛选")
+    tier1, relationships = _valley_rules(use_valley_free)
+    check_update, process_event = _bgplay_checkers(prefix, expected, tier1, result, relationships)
+
+    params = {
+        "resource": prefix,
+        "starttime": start_time,
+        "endtime": end_time,
+        "sourceapp": SOURCE_APP,
+    }
+    scalars: Dict = {}
+    counts = {"initial_state": 0, "events": 0}
+    initial_records: List[Dict] = []
+    tmp_copy = f"{raw_copy_path}.part" if raw_copy_path else None
+    sink = None
+    try:
+        with requests.get(RIPESTAT_BGPLAY, params=params, timeout=60, stream=True) as resp:
+            resp.raise_for_status()
+            resp.raw.decode_content = True
+            if tmp_copy:
+                os.makedirs(os.path.dirname(os.path.abspath(tmp_copy)), exist_ok=True)
+                # gzip 默认 9 级压缩会拖慢流式解析；6 级耗时不到一半，体积只多约 4%
+                sink = gzip.open(tmp_copy, "wb", compresslevel=6)
+            reader = _TeeReader(resp.raw, sink)
+            for kind, item in _iter_bgplay_stream(reader, scalars):
+                counts[kind] += 1
+                if not expected:
+                    continue
+                if kind == "initial_state":
+                    if isinstance(item, dict):
+                        n = len(result)
+                        check_update(item, scalars.get("data.query_starttime", start_time))
+                        initial_records.extend(result[n:])
+                else:
+                    process_event(item)
+        if sink is not None:
+            sink.close()
+            sink = None
+    except Exception as e:
+        logger.error(f"BGPlay 流式请求失败: {e}")
+        if sink is not None:
+            sink.close()
+        if tmp_copy and os.path.exists(tmp_copy):
+            os.unlink(tmp_copy)
+        return [], {}
+
+    if scalars.get("status") != "ok":
+        logger.warning(f"BGPlay 返回非 ok: status={scalars.get('status')} code={scalars.get('status_code')}")
+        if tmp_copy and os.path.exists(tmp_copy):
+            os.unlink(tmp_copy)
+        return [], {}
+    if tmp_copy:
+        os.replace(tmp_copy, raw_copy_path)
+
+    # query_starttime 在响应中可能晚于 initial_state 出现，此前的可疑项先用请求的 start_time 占位
+    query_start = scalars.get("data.query_starttime")
+    if query_start is not None:
+        for record in initial_records:
+            record["timestamp"] = query_start
+
+    summary = {
+        "source": "ripestat",
+        "streamed": True,
+        "query_starttime": query_start,
+        "query_endtime": scalars.get("data.query_endtime"),
+        "initial_state": counts["initial_state"],
+        "events": counts["events"],
+        "bytes": reader.bytes,
+        "raw_copy": raw_copy_path,
+    }
+    return result, summary
+
+
 def fetch_and_filter(
     prefix: str,
     expected_origin: str,
@@ -177,6 +353,11 @@ def fetch_and_filter(
     end_time: str,
     use_valley_free: bool = True,
     source: str = "ris_mrt",
+    ris_updates: Optional[List[Dict]] = None,
+    full_window: bool = False,
+    collectors: Optional[List[str]] = None,
+    stream: Optional[bool] = None,
+    raw_copy_path: Optional[str] = None,
 ) -> tuple[List[Dict], Dict, str]:
     """
     一站式：下载真实 BGP updates + 按论文四步法筛选。
@@ -184,14 +365,50 @@ def fetch_and_filter(
       - ris_mrt: RIPE RIS MRT 文件 (https://data.ris.ripe.net/...)，支持历史数据
       - ripestat: RIPEstat BGPlay API，仅 2024-01+
       - auto: 优先 RIS MRT，失败则 RIPEstat
+    :param ris_updates: 已预抓取的 RIS 解析结果（如 fetch_and_parse_multi 的输出），
+      提供时不再重复下载 MRT
+    :param full_window: RIS 分块覆盖完整时间窗口（不受 MAX_FILES 限制），
+      原始 updates 逐块释放，raw_data 只含窗口覆盖统计
+    :param collectors: RIS collector 列表（如 ["rrc00", "rrc24", "rrc25"]），多个时并发抓取、
+      跨 collector 去重，raw_data["collector_stats"] 为各 collector 吞吐/延迟统计
+    :param stream: RIPEstat 是否流式解析 BGPlay 响应（默认 STREAM_BGPLAY 且已安装 ijson），
+      流式时 raw_data 只含条目统计（summary），原始响应写入 raw_copy_path（gzip，可选）
     :return: (suspicious_updates, raw_data, data_source)
     """
     known = get_known_prefix_origin()
+    # 事件与知识库都未给出 Owner 时，用本地 RIB 基线（tools/rib_baseline.py）推断
+    if not str(expected_origin or "").strip() and not known.get(prefix):
+        from .rib_baseline import infer_expected_origin
+        inferred = infer_expected_origin(prefix, start_time)
+        if inferred:
+            logger.info(f"RIB 基线推断 {prefix} 的 Owner 为 AS{inferred}")
+            expected_origin = inferred
 
     def _try_ris():
         try:
-            from .ris_mrt_fetcher import fetch_and_parse, filter_suspicious_from_ris
-            raw_updates, ds = fetch_and_parse(prefix, start_time, end_time)
+            from .ris_mrt_fetcher import (
+                fetch_and_parse, fetch_and_parse_collectors, fetch_suspicious_windowed,
+                filter_suspicious_from_ris, DEFAULT_RRC,
+            )
+            if full_window and ris_updates is None:
+                suspicious, summary = fetch_suspicious_windowed(
+                    prefix, expected_origin, start_time, end_time,
+                    rrc=collectors or DEFAULT_RRC,
+                    use_valley_free=use_valley_free,
+                    known_prefix_origin=known,
+                )
+                if not summary["updates"]:
+                    return [], {}, "empty"
+                return suspicious, summary, "ris_mrt"
+            collector_stats = {}
+            if ris_updates is not None:
+                raw_updates, ds = ris_updates, ("ris_mrt" if ris_updates else "empty")
+            elif collectors:
+                raw_updates, ds = fetch_and_parse_collectors(
+                    prefix, start_time, end_time, collectors, stats=collector_stats
+                )
+            else:
+                raw_updates, ds = fetch_and_parse(prefix, start_time, end_time)
             if ds != "ris_mrt" or not raw_updates:
                 return [], {}, ds
             suspicious = filter_suspicious_from_ris(
@@ -200,12 +417,24 @@ def fetch_and_filter(
                 known_prefix_origin=known,
             )
             raw_data = {"source": "ris_mrt", "updates": raw_updates}
+            if collector_stats:
+                raw_data["collector_stats"] = collector_stats
             return suspicious, raw_data, "ris_mrt"
         except Exception as e:
             logger.warning(f"RIS MRT 抓取失败: {e}")
             return None, None, None
 
     def _try_ripestat():
+        if (STREAM_BGPLAY if stream is None else stream) and ijson is not None:
+            suspicious, summary = stream_bgplay_suspicious(
+                prefix, expected_origin, start_time, end_time,
+                use_valley_free=use_valley_free,
+                known_prefix_origin=known,
+                raw_copy_path=raw_copy_path,
+            )
+            if not summary:
+                return [], {}, "empty"
+            return suspicious, summary, "ripestat"
         data = fetch_bgp_updates(prefix, start_time, end_time)
         if not data:
             return [], {}, "empty"
@@ -0,0 +1,201 @@
+"""
+基于真实 AS 关系的 Valley-Free 检查（RFC 7908 路由泄露分类）
+AS-relationship 文件（CAIDA serial-1 / serial-2，见 tools/as_graph.py）载入为 {(a, b): 关系} 哈希表，
+沿传播方向（Origin -> 采集点）单遍扫描 AS_PATH，按 Gao-Rexford 导出规则判定每一跳：
+
+    从 provider / peer 学到的路由只能发给 customer；发给 provider 或 peer 即为泄露，泄露者是发出方
+
+RFC 7908 泄露类型（由泄露者学到路由的来源与发往对象决定）：
+    Type 1  provider -> provider（hairpin，多宿主客户把一个上游的全表转发给另一上游）
+    Type 2  peer -> peer（横向 ISP-ISP-ISP 泄露）
+    Type 3  provider -> peer（把上游路由泄露给对等方）
+    Type 4  peer -> provider（把对等方路由泄露给上游）
+Type 5（重新起源）/ Type 6（内部前缀泄露）无法仅从 AS_PATH 判定。
+
+关系未知的链路不判定（接收方的路由来源记为未知，下一跳也不判定），sibling 链路透明传递来源。
+相同 AS_PATH 在批量检查中只扫描一次；同一 AS 连续出现（prepend）视为一跳。
+"""
+import os
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .as_graph import as_rel_path, iter_as_rel
+
+logger = logging.getLogger("ValleyFree")
+
+# 站在发出方看接收方的角色（与 tools/as_graph.py 一致）
+REL_CUSTOMER = 1
+REL_PEER = 0
+REL_PROVIDER = -1
+REL_SIBLING = 2
+
+# 接收方学到路由的来源（站在接收方看发出方）
+_LEARNED = {REL_PROVIDER: "customer", REL_PEER: "peer", REL_CUSTOMER: "provider"}
+_SENT = {REL_PROVIDER: "provider", REL_PEER: "peer"}
+
+LEAK_TYPES = {
+    ("provider", "provider"): 1,
+    ("peer", "peer"): 2,
+    ("provider", "peer"): 3,
+    ("peer", "provider"): 4,
+}
+LEAK_TYPE_NAMES = {
+    1: "Type 1 hairpin（provider 路由发给另一 provider）",
+    2: "Type 2 横向泄露（peer 路由发给另一 peer）",
+    3: "Type 3（provider 路由发给 peer）",
+    4: "Type 4（peer 路由发给 provider）",
+}
+
+
+class RelationshipTable:
+    """
+    AS 关系哈希表：键为 (较小 ASN << 32) | 较大 ASN 的整数，值为站在较小 ASN 看较大 ASN 的角色；
+    反向查询时 customer / provider 互换。
+    """
+
+    def __init__(self, meta: Optional[Dict] = None):
+        self.meta = dict(meta or {})
+        self._rels: Dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._rels)
+
+    def add(self, a: int, b: int, rel: int) -> None:
+        """rel 为 CAIDA 取值：-1 表示 a 是 b 的 provider，0 peer，1 sibling；重复的 AS 对保留先出现的关系"""
+        if a == b:
+            return
+        role = REL_CUSTOMER if rel == -1 else (REL_PEER if rel == 0 else REL_SIBLING)
+        if a > b:
+            a, b = b, a
+            role = -role if role in (REL_CUSTOMER, REL_PROVIDER) else role
+        self._rels.setdefault((a << 32) | b, role)
+
+    @classmethod
+    def build(cls, edges: Iterable[Tuple[int, int, int]], meta: Optional[Dict] = None) -> "RelationshipTable":
+        table = cls(meta)
+        for a, b, rel in edges:
+            table.add(a, b, rel)
+        return table
+
+    @classmethod
+    def load(cls, path: str) -> "RelationshipTable":
+        return cls.build(iter_as_rel(str(path)), {"path": str(path)})
+
+    def role(self, a, b) -> Optional[int]:
+        """站在 a 看 b 的角色（REL_*），没有记录返回 None"""
+        a, b = int(a), int(b)
+        if a <= b:
+            return self._rels.get((a << 32) | b)
+        role = self._rels.get((b << 32) | a)
+        if role is None:
+            return None
+        return -role if role in (REL_CUSTOMER, REL_PROVIDER) else role
+
+    def first_leak(self, hops: List[str]) -> Optional[Tuple[int, int]]:
+        """
+        单遍扫描，返回第一个泄露点 (泄露者在 hops 中的下标, 泄露类型)；无泄露返回 None。
+        hops 为采集点 -> Origin 顺序（AS_PATH 原始顺序），只含数字 ASN。
+        """
+        rels = self._rels
+        n = len(hops)
+        if n < 3:
+            return None
+        i = n - 1
+        x = int(hops[i])
+        learned = "origin"
+        for j in range(n - 2, -1, -1):
+            y = int(hops[j])
+            if y == x:
+                continue
+            if x <= y:
+                role = rels.get((x << 32) | y)
+            else:
+                role = rels.get((y << 32) | x)
+                if role is not None and role != REL_PEER and role != REL_SIBLING:
+                    role = -role
+            if role is None:
+                learned = None
+            elif role == REL_SIBLING:
+                pass
+            else:
+                if (learned == "provider" or learned == "peer") and role != REL_CUSTOMER:
+                    return i, LEAK_TYPES[(learned, _SENT[role])]
+                learned = _LEARNED[role]
+            x, i = y, j
+        return None
+
+    def check_path(self, hops: List[str]) -> Dict:
+        """
+        完整检查结果：{valid, leak_type, leak_name, leaker, index, received_from, sent_to, unknown_links}
+        received_from / sent_to 为泄露者的上一跳（路由来源）与下一跳（泄露对象）
+        """
+        leak = self.first_leak(hops)
+        unknown = 0
+        prev = None
+        for h in hops:
+            if prev is not None and h != prev and self.role(prev, h) is None:
+                unknown += 1
+            prev = h
+        if leak is None:
+            return {"valid": True, "leak_type": None, "leak_name": None, "leaker": None, "index": None,
+                    "received_from": None, "sent_to": None, "unknown_links": unknown}
+        index, leak_type = leak
+        leaker = hops[index]
+        received_from = next((h for h in hops[index + 1:] if h != leaker), None)
+        sent_to = next((h for h in reversed(hops[:index]) if h != leaker), None)
+        return {"valid": False, "leak_type": leak_type, "leak_name": LEAK_TYPE_NAMES[leak_type], "leaker": leaker,
+                "index": index, "received_from": received_from, "sent_to": sent_to, "unknown_links": unknown}
+
+    def first_leak_many(self, paths: Iterable[List[str]]) -> List[Optional[Tuple[int, int]]]:
+        """批量 first_leak，相同路径只扫描一次"""
+        memo: Dict[Tuple[str, ...], Optional[Tuple[int, int]]] = {}
+        out = []
+        for hops in paths:
+            key = tuple(hops)
+            if key not in memo:
+                memo[key] = self.first_leak(hops)
+            out.append(memo[key])
+        return out
+
+    def leaker(self, hops: List[str]) -> Optional[str]:
+        """泄露者 ASN（无泄露返回 None），供可疑 update 过滤器使用"""
+        leak = self.first_leak(hops)
+        return hops[leak[0]] if leak else None
+
+    def stats(self) -> Dict:
+        counts = {"p2c": 0, "p2p": 0, "s2s": 0}
+        for role in self._rels.values():
+            counts["p2p" if role == REL_PEER else "s2s" if role == REL_SIBLING else "p2c"] += 1
+        return {"links": len(self._rels), **counts, **self.meta}
+
+
+_TABLES: Dict[str, Tuple[float, RelationshipTable]] = {}
+_LOAD_LOCK = threading.Lock()
+# 设为 False 时过滤器与 TopologyInspector 固定使用 Tier-1 启发式
+USE_RELATIONSHIPS = os.getenv("VALLEY_FREE_RELATIONSHIPS", "1").lower() not in ("0", "false", "no")
+
+
+def get_relationship_table() -> Optional[RelationshipTable]:
+    """返回已配置 AS-relationship 文件（与 tools/as_graph.py 同一来源）的关系表，按 mtime 缓存；未配置返回 None"""
+    if not USE_RELATIONSHIPS:
+        return None
+    path = as_rel_path()
+    if not path:
+        return None
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    with _LOAD_LOCK:
+        cached = _TABLES.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        try:
+            table = RelationshipTable.load(path)
+        except (OSError, EOFError, ValueError) as e:
+            logger.warning(f"加载 AS 关系表失败 {path}: {e}")
+            return None
+        _TABLES[path] = (mtime, table)
+        logger.info(f"已加载 AS 关系表 {path}（{len(table)} 条链路）")
+        return table
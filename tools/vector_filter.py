@@ -0,0 +1,134 @@
+"""
+可疑 update 批量向量化判定（四步法第 2、4 步）
+filter_suspicious_from_ris 在大批量时调用：
+
+- 相同 as_path 只编码一次；去重后的路径整体切分，ASN 字符串驻留为连续整数 id
+- 路径拼成一维 int32 数组，每跳附带所属路径下标
+- Origin 不一致、Tier1 -> 非 Tier1 -> Tier1 谷形在整批上用 NumPy 一次算出
+
+判定结果与逐条实现（update_fetcher._classify_hops）一致。依赖 numpy，缺失时调用方回退逐条判定。
+"""
+from itertools import repeat
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# 低于该批量时逐条判定更快（数组构建的固定开销）
+VECTOR_MIN_BATCH = 2048
+
+
+def vector_filter_available() -> bool:
+    return np is not None
+
+
+def _all_str(values: List) -> bool:
+    return all(map(isinstance, values, repeat(str)))
+
+
+# 拼接去重路径时的分隔 token（非数字，不会被当作 ASN）
+_SEP = "|"
+
+
+def _encode_paths(paths: List) -> Tuple[List[str], "np.ndarray", "np.ndarray"]:
+    """
+    去重后的 as_path 列表 -> (token 表, 每跳 token id, 每跳所属路径下标)。
+    字符串路径整体拼接后一次切分（与 _parse_path 的切分规则一致），其余形态逐条 _parse_path。
+    """
+    from .update_fetcher import _parse_path
+
+    tokens = None
+    if _all_str(paths):
+        tokens = f" {_SEP} ".join(paths).replace(",", " ").split()
+        tokens.append(_SEP)
+        # 路径自身含独立的分隔 token 时无法按分隔符还原边界
+        if tokens.count(_SEP) != len(paths):
+            tokens = None
+    bulk = tokens is not None
+    if not bulk:
+        tokens = []
+        for p in paths:
+            tokens.extend(_parse_path(p))
+            tokens.append(_SEP)
+
+    table = {t: k for k, t in enumerate(dict.fromkeys(tokens))}
+    names = list(table)
+    ids = np.fromiter(map(table.__getitem__, tokens), dtype=np.int32, count=len(tokens))
+    is_sep = ids == table[_SEP]
+    # 每个 token 之前的分隔符个数即所属路径下标
+    owner = np.cumsum(is_sep) - is_sep
+    if bulk:
+        keep = np.fromiter((t.isdigit() for t in names), dtype=bool, count=len(names))[ids]
+    else:
+        keep = ~is_sep
+    return names, ids[keep], owner[keep]
+
+
+def classify_updates(
+    updates: List[Dict], expected: str, tier1: Iterable[str], relationships=None
+) -> List[Tuple[int, str, Optional[str]]]:
+    """
+    批量判定 RIS updates。
+    :param expected: 合法 Origin（字符串）
+    :param tier1: Tier1 AS 集合，为空时跳过 Tier1 启发式
+    :param relationships: valley_free.RelationshipTable，给出时每条去重路径按真实 AS 关系扫描一次（优先于 tier1）
+    :return: [(update 下标, reason, suspicious_as), ...]，按 update 顺序；正常 update 不出现
+    """
+    rows = [i for i, u in enumerate(updates) if u.get("detected_origin", "")]
+    if not rows:
+        return []
+    batch = updates if len(rows) == len(updates) else [updates[i] for i in rows]
+
+    keys = [u.get("as_path", "") for u in batch]
+    if not _all_str(keys):
+        keys = [k if isinstance(k, str) else tuple(k or ()) for k in keys]
+    path_ids = {k: n for n, k in enumerate(dict.fromkeys(keys))}
+    row_paths = np.fromiter(map(path_ids.__getitem__, keys), dtype=np.int32, count=len(keys))
+    origins = list(map(str, (u["detected_origin"] for u in batch)))
+    origin_ids = {o: k for k, o in enumerate(dict.fromkeys(origins))}
+
+    # 2. Origin 校验
+    mismatch = np.fromiter(map(origin_ids.__getitem__, origins), dtype=np.int32, count=len(rows)) \
+        != origin_ids.get(expected, -1)
+
+    # 4. Valley-Free：每条去重路径第一个谷形中间 AS 的 token id（-1 表示无）
+    n_paths = len(path_ids)
+    first_valley = np.full(n_paths, -1, dtype=np.int64)
+    names: List[str] = []
+    if relationships is not None:
+        from .update_fetcher import _parse_path
+
+        for n, key in enumerate(path_ids):
+            leaker = relationships.leaker(_parse_path(key if isinstance(key, str) else list(key)))
+            if leaker is not None:
+                first_valley[n] = len(names)
+                names.append(leaker)
+    elif tier1:
+        names, hops, owner = _encode_paths([
+            key if isinstance(key, str) else list(key) for key in path_ids
+        ])
+        table = dict(zip(names, range(len(names))))
+        tier1_ids = [table[a] for a in tier1 if a in table]
+        if tier1_ids and hops.size >= 3:
+            is_tier1 = np.zeros(len(names), dtype=bool)
+            is_tier1[tier1_ids] = True
+            t = is_tier1[hops]
+            # 三元组 (j, j+1, j+2) 须落在同一条路径内
+            valley = t[:-2] & ~t[1:-1] & t[2:] & (owner[:-2] == owner[2:])
+            pos = np.flatnonzero(valley)
+            if pos.size:
+                # pos 升序，np.unique 的 return_index 即每条路径的第一个谷形
+                paths_hit, first = np.unique(owner[pos], return_index=True)
+                first_valley[paths_hit] = hops[pos[first] + 1]
+
+    row_valley = first_valley[row_paths]
+    hit = np.flatnonzero(mismatch | (row_valley >= 0))
+    out = []
+    for j, is_mismatch, v in zip(hit.tolist(), mismatch[hit].tolist(), row_valley[hit].tolist()):
+        if is_mismatch:
+            out.append((rows[j], "ORIGIN_MISMATCH", None))
+        else:
+            out.append((rows[j], "VALLEY_FREE_VIOLATION", names[v]))
+    return out